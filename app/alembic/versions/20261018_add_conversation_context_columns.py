@@ -0,0 +1,21 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_conversation_context_columns'
+down_revision = '20240716_add_is_ai_generated_to_questions'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('ai_conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('ai_conversations', sa.Column('summary_token_count', sa.Integer(), nullable=True, server_default='0'))
+    op.add_column('ai_conversations', sa.Column('summarized_message_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('ai_conversation_messages', sa.Column('token_count', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('ai_conversation_messages', 'token_count')
+    op.drop_column('ai_conversations', 'summarized_message_count')
+    op.drop_column('ai_conversations', 'summary_token_count')
+    op.drop_column('ai_conversations', 'summary')
@@ -0,0 +1,51 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_create_course_catalog'
+down_revision = '20261018_add_conversation_context_columns'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'course_catalog',
+        sa.Column('course_id', sa.CHAR(36), sa.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('academy_id', sa.Integer(), nullable=False),
+        sa.Column('academy_name', sa.String(200), nullable=True),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('category_title', sa.String(255), nullable=True),
+        sa.Column('trainer_id', sa.Integer(), nullable=True),
+        sa.Column('trainer_name', sa.String(255), nullable=True),
+        sa.Column('title', sa.String(255), nullable=False),
+        sa.Column('slug', sa.String(255), nullable=False),
+        sa.Column('image', sa.String(255), nullable=True),
+        sa.Column('short_content', sa.Text(), nullable=True),
+        sa.Column('level', sa.Enum('beginner', 'intermediate', 'advanced', name='courselevel'), nullable=False),
+        sa.Column('type', sa.Enum('live', 'recorded', 'attend', name='coursetype'), nullable=False),
+        sa.Column('featured', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('price', sa.Numeric(10, 2), nullable=False, server_default='0.00'),
+        sa.Column('discount_price', sa.Numeric(10, 2), nullable=True),
+        sa.Column('discount_ends_at', sa.DateTime(), nullable=True),
+        sa.Column('effective_price', sa.Numeric(10, 2), nullable=False, server_default='0.00'),
+        sa.Column('currency', sa.String(3), nullable=False, server_default='SAR'),
+        sa.Column('avg_rating', sa.Numeric(3, 2), nullable=False, server_default='0.00'),
+        sa.Column('ratings_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('students_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('lessons_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_course_catalog_newest', 'course_catalog', ['featured', 'created_at', 'course_id'])
+    op.create_index('ix_course_catalog_academy_newest', 'course_catalog', ['academy_id', 'featured', 'created_at', 'course_id'])
+    op.create_index('ix_course_catalog_category_newest', 'course_catalog', ['category_id', 'featured', 'created_at', 'course_id'])
+    op.create_index('ix_course_catalog_price', 'course_catalog', ['effective_price', 'course_id'])
+    op.create_index('ix_course_catalog_rating', 'course_catalog', ['avg_rating', 'course_id'])
+    op.create_index('ix_course_catalog_popularity', 'course_catalog', ['students_count', 'course_id'])
+    op.create_index('ix_course_catalog_level', 'course_catalog', ['level'])
+    op.create_index('ix_course_catalog_discount_ends_at', 'course_catalog', ['discount_ends_at'])
+
+
+def downgrade():
+    op.drop_table('course_catalog')
@@ -0,0 +1,39 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261020_add_content_aggregates'
+down_revision = '20261019_create_course_catalog'
+branch_labels = None
+depends_on = None
+
+CHAPTER_COUNTERS = (
+    'lessons_count', 'video_lessons_count', 'exam_lessons_count', 'tool_lessons_count',
+    'free_preview_lessons_count', 'total_duration_seconds'
+)
+COURSE_COUNTERS = (
+    'video_lessons_count', 'exam_lessons_count', 'tool_lessons_count',
+    'free_preview_lessons_count', 'total_duration_seconds'
+)
+
+
+def upgrade():
+    for name in CHAPTER_COUNTERS:
+        op.add_column('chapters', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('chapters', sa.Column('total_video_bytes', sa.BigInteger(), nullable=False, server_default='0'))
+
+    for name in COURSE_COUNTERS:
+        op.add_column('courses', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('courses', sa.Column('total_video_bytes', sa.BigInteger(), nullable=False, server_default='0'))
+
+    # Aggregates are backfilled with: python -m app.services.content_aggregates
+
+
+def downgrade():
+    op.drop_column('courses', 'total_video_bytes')
+    for name in reversed(COURSE_COUNTERS):
+        op.drop_column('courses', name)
+
+    op.drop_column('chapters', 'total_video_bytes')
+    for name in reversed(CHAPTER_COUNTERS):
+        op.drop_column('chapters', name)
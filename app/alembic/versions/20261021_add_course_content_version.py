@@ -0,0 +1,15 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261021_add_course_content_version'
+down_revision = '20261020_add_content_aggregates'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('courses', sa.Column('content_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    op.drop_column('courses', 'content_version')
@@ -0,0 +1,23 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261023_unique_student_course_enrollment'
+down_revision = '20261022_add_academy_content_version'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Keep the oldest enrollment of each student and course before enforcing uniqueness
+    op.execute(
+        "DELETE FROM student_courses WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM student_courses "
+        "GROUP BY student_id, course_id) AS keep)"
+    )
+    op.create_unique_constraint(
+        'uq_student_courses_student_course', 'student_courses', ['student_id', 'course_id']
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_student_courses_student_course', 'student_courses', type_='unique')
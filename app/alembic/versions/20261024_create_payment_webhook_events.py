@@ -0,0 +1,44 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261024_create_payment_webhook_events'
+down_revision = '20261023_unique_student_course_enrollment'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'payment_webhook_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('gateway', sa.String(length=50), nullable=False),
+        sa.Column('event_id', sa.String(length=100), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=True),
+        sa.Column('invoice_reference', sa.String(length=100), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column(
+            'status',
+            sa.Enum('PENDING', 'PROCESSING', 'PROCESSED', 'DEAD', name='webhookeventstatus'),
+            nullable=False
+        ),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('locked_by', sa.String(length=100), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('gateway', 'event_id', name='uq_payment_webhook_events_gateway_event'),
+    )
+    op.create_index('ix_payment_webhook_events_id', 'payment_webhook_events', ['id'])
+    op.create_index('ix_payment_webhook_events_invoice_reference', 'payment_webhook_events', ['invoice_reference'])
+    op.create_index(
+        'ix_payment_webhook_events_status_next_attempt', 'payment_webhook_events', ['status', 'next_attempt_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_payment_webhook_events_status_next_attempt', table_name='payment_webhook_events')
+    op.drop_index('ix_payment_webhook_events_invoice_reference', table_name='payment_webhook_events')
+    op.drop_index('ix_payment_webhook_events_id', table_name='payment_webhook_events')
+    op.drop_table('payment_webhook_events')
@@ -0,0 +1,69 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261025_create_wallet_ledger'
+down_revision = '20261024_create_payment_webhook_events'
+branch_labels = None
+depends_on = None
+
+TRANSACTION_TYPES = ('PAYMENT', 'REFUND', 'WITHDRAWAL', 'COMMISSION', 'SUBSCRIPTION')
+
+
+def upgrade():
+    op.add_column('academy_finances', sa.Column('balance', sa.Numeric(12, 2), nullable=False, server_default='0'))
+    op.add_column(
+        'academy_finances', sa.Column('total_commission', sa.Numeric(12, 2), nullable=False, server_default='0')
+    )
+    op.add_column('academy_finances', sa.Column('payments_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table(
+        'ledger_entries',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('journal_id', sa.String(length=36), nullable=False),
+        sa.Column('academy_id', sa.Integer(), sa.ForeignKey('academies.id'), nullable=False),
+        sa.Column(
+            'account',
+            sa.Enum('ACADEMY_WALLET', 'PLATFORM_COMMISSION', 'GATEWAY_CLEARING', 'BANK_PAYOUT', name='ledgeraccount'),
+            nullable=False
+        ),
+        sa.Column('entry_type', sa.Enum(*TRANSACTION_TYPES, name='transactiontype'), nullable=False),
+        sa.Column('debit', sa.Numeric(12, 2), nullable=False, server_default='0'),
+        sa.Column('credit', sa.Numeric(12, 2), nullable=False, server_default='0'),
+        sa.Column('balance_after', sa.Numeric(12, 2), nullable=True),
+        sa.Column('payment_id', sa.Integer(), sa.ForeignKey('payments.id'), nullable=True),
+        sa.Column('withdrawal_id', sa.Integer(), sa.ForeignKey('withdrawal_requests.id'), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('payment_id', 'account', 'entry_type', name='uq_ledger_entries_payment_account_type'),
+    )
+    op.create_index('ix_ledger_entries_id', 'ledger_entries', ['id'])
+    op.create_index('ix_ledger_entries_journal_id', 'ledger_entries', ['journal_id'])
+    op.create_index('ix_ledger_entries_academy_account_id', 'ledger_entries', ['academy_id', 'account', 'id'])
+
+    op.create_table(
+        'academy_revenue_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('academy_id', sa.Integer(), sa.ForeignKey('academies.id'), nullable=False),
+        sa.Column('period', sa.Enum('DAY', 'WEEK', 'MONTH', 'YEAR', name='rollupperiod'), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('revenue', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('commission', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('withdrawals', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('payments_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('academy_id', 'period', 'period_start', name='uq_academy_revenue_rollups_bucket'),
+    )
+    op.create_index('ix_academy_revenue_rollups_id', 'academy_revenue_rollups', ['id'])
+
+
+def downgrade():
+    op.drop_index('ix_academy_revenue_rollups_id', table_name='academy_revenue_rollups')
+    op.drop_table('academy_revenue_rollups')
+    op.drop_index('ix_ledger_entries_academy_account_id', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_journal_id', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_id', table_name='ledger_entries')
+    op.drop_table('ledger_entries')
+    op.drop_column('academy_finances', 'payments_count')
+    op.drop_column('academy_finances', 'total_commission')
+    op.drop_column('academy_finances', 'balance')
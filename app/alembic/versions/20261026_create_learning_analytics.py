@@ -0,0 +1,55 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261026_create_learning_analytics'
+down_revision = '20261025_create_wallet_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'learning_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('student_id', sa.Integer(), sa.ForeignKey('students.id', ondelete='CASCADE'), nullable=False),
+        sa.Column(
+            'event_type',
+            sa.Enum(
+                'LOGIN', 'LESSON_STARTED', 'PROGRESS_HEARTBEAT', 'LESSON_COMPLETED', 'EXAM_SUBMITTED',
+                name='learningeventtype'
+            ),
+            nullable=False
+        ),
+        sa.Column('course_id', sa.String(length=36), nullable=True),
+        sa.Column('lesson_id', sa.String(length=36), nullable=True),
+        sa.Column('exam_id', sa.String(length=36), nullable=True),
+        sa.Column('study_seconds', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('score', sa.Numeric(5, 2), nullable=True),
+        sa.Column('passed', sa.Boolean(), nullable=True),
+        sa.Column('dedupe_key', sa.String(length=100), nullable=True),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('dedupe_key'),
+    )
+    op.create_index('ix_learning_events_id', 'learning_events', ['id'])
+    op.create_index('ix_learning_events_student_occurred', 'learning_events', ['student_id', 'occurred_at'])
+
+    op.create_table(
+        'student_daily_activity',
+        sa.Column('student_id', sa.Integer(), sa.ForeignKey('students.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('study_seconds', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('lessons_started', sa.SmallInteger(), nullable=False, server_default='0'),
+        sa.Column('lessons_completed', sa.SmallInteger(), nullable=False, server_default='0'),
+        sa.Column('exams_submitted', sa.SmallInteger(), nullable=False, server_default='0'),
+        sa.Column('exams_passed', sa.SmallInteger(), nullable=False, server_default='0'),
+        sa.Column('score_total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('logins', sa.SmallInteger(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade():
+    op.drop_table('student_daily_activity')
+    op.drop_index('ix_learning_events_student_occurred', table_name='learning_events')
+    op.drop_index('ix_learning_events_id', table_name='learning_events')
+    op.drop_table('learning_events')
@@ -0,0 +1,29 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261027_create_video_views'
+down_revision = '20261026_create_learning_analytics'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('videos', sa.Column('views_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table(
+        'video_daily_views',
+        sa.Column('video_id', sa.CHAR(36), sa.ForeignKey('videos.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('lesson_id', sa.CHAR(36), nullable=False),
+        sa.Column('course_id', sa.CHAR(36), nullable=False),
+        sa.Column('academy_id', sa.BigInteger(), nullable=False),
+        sa.Column('views', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_video_daily_views_academy_day', 'video_daily_views', ['academy_id', 'day'])
+
+
+def downgrade():
+    op.drop_index('ix_video_daily_views_academy_day', table_name='video_daily_views')
+    op.drop_table('video_daily_views')
+    op.drop_column('videos', 'views_count')
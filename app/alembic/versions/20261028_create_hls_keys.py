@@ -0,0 +1,27 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261028_create_hls_keys'
+down_revision = '20261027_create_video_views'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'hls_keys',
+        sa.Column('key_id', sa.String(length=32), primary_key=True),
+        sa.Column('key', sa.LargeBinary(length=16), nullable=False),
+        sa.Column('session_id', sa.String(length=100), nullable=False),
+        sa.Column('video_id', sa.String(length=36), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_hls_keys_expires_at', 'hls_keys', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_hls_keys_expires_at', table_name='hls_keys')
+    op.drop_table('hls_keys')
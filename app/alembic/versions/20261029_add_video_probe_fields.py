@@ -0,0 +1,30 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261029_add_video_probe_fields'
+down_revision = '20261028_create_hls_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('videos', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('videos', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('videos', sa.Column('video_codec', sa.String(length=32), nullable=True))
+    op.add_column('videos', sa.Column('audio_codec', sa.String(length=32), nullable=True))
+    op.add_column('videos', sa.Column('bitrate', sa.Integer(), nullable=True))
+    op.add_column('videos', sa.Column('keyframe_interval', sa.Float(), nullable=True))
+    op.add_column('videos', sa.Column('needs_faststart', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column('videos', sa.Column('probed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('videos', 'probed_at')
+    op.drop_column('videos', 'needs_faststart')
+    op.drop_column('videos', 'keyframe_interval')
+    op.drop_column('videos', 'bitrate')
+    op.drop_column('videos', 'audio_codec')
+    op.drop_column('videos', 'video_codec')
+    op.drop_column('videos', 'height')
+    op.drop_column('videos', 'width')
@@ -0,0 +1,20 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261030_add_video_storyboards'
+down_revision = '20261029_add_video_probe_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('videos', sa.Column('storyboard_url', sa.String(length=255), nullable=True))
+    op.add_column('videos', sa.Column('storyboard_bytes', sa.Integer(), nullable=True))
+    op.add_column('videos', sa.Column('storyboard_seconds', sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('videos', 'storyboard_seconds')
+    op.drop_column('videos', 'storyboard_bytes')
+    op.drop_column('videos', 'storyboard_url')
@@ -0,0 +1,15 @@
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20261031_index_course_catalog_refreshed_at'
+down_revision = '20261030_add_video_storyboards'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_course_catalog_refreshed_at', 'course_catalog', ['refreshed_at'])
+
+
+def downgrade():
+    op.drop_index('ix_course_catalog_refreshed_at', table_name='course_catalog')
@@ -9,13 +9,15 @@ from sqlalchemy.orm import Session, joinedload
 from typing import Optional, Dict, Any
 from datetime import datetime
 
-from app.deps import get_db, get_current_academy_user
+from app.deps import get_db, get_read_db, get_current_academy_user
 from app.models.user import User
 from app.models.academy import Academy, AcademyUser
 from app.models.template import Template, About, Slider, Faq, Opinion
 from app.models.settings import Settings
 from app.crud import academy_content
 from app.core.response_handler import SayanSuccessResponse
+from app.core.response_utils import etag_matches, not_modified_response
+from app.services.academy_storefront import academy_storefront_service, CACHE_CONTROL
 
 router = APIRouter()
 
@@ -251,133 +253,33 @@ async def get_academy_profile_summary(
 async def get_public_academy_profile(
     academy_slug: str,
     request: Request,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> dict:
     """
     Get public academy profile
     
-    Returns public academy information accessible to all users
+    Returns public academy information accessible to all users, served from
+    the storefront cache with an ETag for conditional requests
     """
     try:
-        # Get academy by slug
-        academy = db.query(Academy).filter(
-            Academy.slug == academy_slug,
-            Academy.status == "active"
-        ).first()
+        entry = academy_storefront_service.public_profile(db, academy_slug)
         
-        if not academy:
+        if not entry:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="الأكاديمية غير موجودة"
             )
         
-        # Get public academy info
-        academy_info = {
-            "id": academy.id,
-            "name": academy.name,
-            "slug": academy.slug,
-            "about": academy.about,
-            "image": academy.image,
-            "email": academy.email,
-            "phone": academy.phone,
-            "address": academy.address,
-            "users_count": academy.users_count,
-            "courses_count": academy.courses_count,
-            "created_at": academy.created_at,
-        }
+        # Repeat visits revalidate against the strong ETag
+        if etag_matches(request, entry.etag):
+            return not_modified_response(entry.etag, CACHE_CONTROL)
         
-        # Get public social links
-        social_links = {
-            "facebook": academy.facebook,
-            "twitter": academy.twitter,
-            "instagram": academy.instagram,
-            "snapchat": academy.snapchat,
-        }
-        
-        # Get public template info
-        template = academy_content.get_template(db, academy.id)
-        template_info = None
-        if template:
-            template_info = {
-                "primary_color": template.primary_color,
-                "secondary_color": template.secondary_color,
-            }
-        
-        # Get public about info
-        about = academy_content.get_about(db, academy.id)
-        about_info = None
-        if about:
-            about_info = {
-                "title": about.title,
-                "content": about.content,
-                "mission": about.mission,
-                "vision": about.vision,
-                "image": about.image,
-                "statistics": about.statistics,
-            }
-        
-        # Get active sliders
-        sliders = academy_content.get_active_sliders(db, academy.id)
-        sliders_info = []
-        for slider in sliders:
-            sliders_info.append({
-                "id": slider.id,
-                "title": slider.title,
-                "subtitle": slider.subtitle,
-                "image": slider.image,
-                "link": slider.link,
-                "button_text": slider.button_text,
-                "order": slider.order,
-            })
-        
-        # Get active FAQs
-        faqs = academy_content.get_active_faqs(db, academy.id)
-        faqs_info = []
-        for faq in faqs:
-            faqs_info.append({
-                "id": faq.id,
-                "question": faq.question,
-                "answer": faq.answer,
-                "category": faq.category,
-                "order": faq.order,
-            })
-        
-        # Get approved opinions
-        opinions = academy_content.get_approved_opinions(db, academy.id, limit=10)
-        opinions_info = []
-        for opinion in opinions:
-            opinions_info.append({
-                "id": opinion.id,
-                "name": opinion.name,
-                "title": opinion.title,
-                "content": opinion.content,
-                "rating": opinion.rating,
-                "image": opinion.image,
-                "featured": opinion.featured,
-                "created_at": opinion.created_at,
-            })
-        
-        public_data = {
-            "academy": academy_info,
-            "template": template_info,
-            "about": about_info,
-            "social_links": social_links,
-            "sliders": sliders_info,
-            "faqs": faqs_info,
-            "opinions": opinions_info,
-        }
-        
-        return SayanSuccessResponse(
-            data=public_data,
-            message="تم جلب بروفايل الأكاديمية العام بنجاح",
-            request=request
-        )
+        return entry.response(request.url.path)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"خطأ في جلب البروفايل العام: {str(e)}"
         ) 
- 
- 
- 
\ No newline at end of file
@@ -6,8 +6,9 @@ Main API endpoints for AI assistant functionality.
 Includes video transcription, exam correction, chat, and content generation.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, BackgroundTasks, Request
 from fastapi.responses import JSONResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 import asyncio
@@ -33,6 +34,10 @@ from app.schemas.ai_assistant import (
 from app.services.ai.openai_service import (
     OpenAITranscriptionService, OpenAIChatService, OpenAIServiceError
 )
+from app.services.ai.chat_streaming import stream_conversation_reply, create_sse_response
+from app.services.ai.conversation_context import ConversationContextManager, refresh_conversation_summary
+from app.services.ai.token_counter import count_message_tokens
+from app.services.exam_grading import ExamGradingEngine, FreeTextCorrector
 from app.core.ai_config import AIServiceFactory, ai_config
 
 logger = logging.getLogger(__name__)
@@ -320,91 +325,45 @@ async def correct_exam(
     feedback, scoring, and study recommendations.
     """
     try:
-        # Validate service availability
-        if not ai_config.is_service_available("chat"):
-            return get_standard_error_response(
-                "خدمة تصحيح الامتحانات غير متاحة حالياً",
-                "SERVICE_UNAVAILABLE"
-            )
-        
-        # Validate exam exists and get questions
-        from app.models.exam import Exam
-        from app.models.question import Question
-        
-        exam = db.query(Exam).filter(Exam.id == exam_id).first()
-        if not exam:
+        # Objective questions are graded locally; only free-text answers
+        # reach the chat service, in one call per submission
+        corrector = None
+        if ai_config.is_service_available("chat"):
+            corrector = FreeTextCorrector(AIServiceFactory.create_chat_service())
+        
+        engine = ExamGradingEngine(db, corrector=corrector)
+        answer_key = engine.get_answer_key(exam_id)
+        if not answer_key:
             return get_standard_error_response(
                 "الامتحان المحدد غير موجود",
                 "EXAM_NOT_FOUND"
             )
         
-        # Get exam questions and correct answers
-        questions = db.query(Question).filter(Question.exam_id == exam_id).all()
-        if not questions:
+        if not answer_key.questions:
             return get_standard_error_response(
                 "لا توجد أسئلة في هذا الامتحان",
                 "NO_QUESTIONS_FOUND"
             )
         
-        # Prepare exam data for AI analysis
-        exam_data = {
-            "title": exam.title,
-            "questions": [
-                {
-                    "id": q.id,
-                    "title": q.title,
-                    "type": q.type,
-                    "correct_answer": q.correct_answer,
-                    "score": q.score
-                }
-                for q in questions
-            ]
-        }
-        
-        # Generate AI feedback
-        service = AIServiceFactory.create_chat_service()
-        feedback_result = await service.generate_exam_feedback(
-            exam_data=exam_data,
-            student_answers=student_answers,
+        grading = await engine.grade(answer_key, student_answers)
+        correction_id = engine.persist(
+            answer_key,
+            current_user.id,  # Assuming current user is student
+            grading,
             academy_id=current_user.academy_id
         )
-        
-        # Calculate scores
-        total_score = 0
-        max_score = sum(q.score for q in questions)
-        
-        # Process individual answers (simplified scoring)
-        for answer in student_answers:
-            question = next((q for q in questions if q.id == answer.get("question_id")), None)
-            if question and answer.get("answer") == question.correct_answer:
-                total_score += question.score
-        
-        percentage = (total_score / max_score * 100) if max_score > 0 else 0
-        
-        # Create correction record
-        correction_id = str(uuid.uuid4())
-        correction = ExamCorrection(
-            id=correction_id,
-            exam_id=exam_id,
-            student_id=current_user.id,  # Assuming current user is student
-            academy_id=current_user.academy_id,
-            submission_data={"answers": student_answers},
-            total_score=total_score,
-            max_score=max_score,
-            percentage=percentage,
-            ai_feedback=feedback_result.get("content", "")
-        )
-        
-        db.add(correction)
         db.commit()
         
+        percentage = grading["percentage"]
+        
         return get_standard_success_response(
             {
                 "correction_id": correction_id,
-                "total_score": total_score,
-                "max_score": max_score,
+                "total_score": grading["total_score"],
+                "max_score": grading["max_score"],
                 "percentage": round(percentage, 2),
-                "feedback": feedback_result.get("content", ""),
+                "feedback": grading["feedback"],
+                "questions": grading["questions"],
                 "grade": "ممتاز" if percentage >= 90 else "جيد جداً" if percentage >= 80 else "جيد" if percentage >= 70 else "مقبول" if percentage >= 60 else "ضعيف"
             },
             "تم تصحيح الامتحان بنجاح"
@@ -431,9 +390,12 @@ async def correct_exam(
 @router.post("/chat", response_model=Dict[str, Any])
 async def chat_with_ai(
     message: str,
+    background_tasks: BackgroundTasks,
     context_type: str = "general",
     context_id: Optional[str] = None,
     conversation_id: Optional[str] = None,
+    stream: bool = False,
+    request: Request = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -442,6 +404,9 @@ async def chat_with_ai(
     
     This endpoint provides intelligent responses to user questions
     with context awareness for lessons, exams, and courses.
+    
+    With ``stream=true`` the reply is sent as Server-Sent Events while it
+    is generated and saved once the stream ends.
     """
     try:
         # Validate service availability
@@ -471,35 +436,43 @@ async def chat_with_ai(
             db.add(conversation)
             db.commit()
         
-        # Add user message
-        user_message = AIConversationMessage(
-            id=str(uuid.uuid4()),
-            conversation_id=conversation.id,
-            sender_type=SenderType.USER,
-            message=message
-        )
-        db.add(user_message)
-        
         # Generate AI response
         service = AIServiceFactory.create_chat_service()
+        model = service.config.model_name
         
         # Prepare context-aware system prompt
         system_prompt = """أنت مساعد تعليمي ذكي لمنصة سيان. مهمتك مساعدة الطلاب والأساتذة 
         بالإجابة على أسئلتهم التعليمية وتقديم الدعم المناسب. كن مفيداً ومهذباً ودقيقاً في إجاباتك."""
         
-        # Get conversation history for context
-        previous_messages = db.query(AIConversationMessage).filter(
-            AIConversationMessage.conversation_id == conversation.id
-        ).order_by(AIConversationMessage.created_at.desc()).limit(10).all()
+        # Build token-budgeted context: rolling summary + newest messages that fit
+        context_manager = ConversationContextManager(db, model=model)
+        context = context_manager.build_context(conversation, message, system_prompt=system_prompt)
+        chat_messages = context["messages"]
         
-        chat_messages = []
-        for msg in reversed(previous_messages[-5:]):  # Last 5 messages for context
-            chat_messages.append({
-                "role": "user" if msg.sender_type == SenderType.USER else "assistant",
-                "content": msg.message
-            })
+        # Add user message
+        user_message = AIConversationMessage(
+            id=str(uuid.uuid4()),
+            conversation_id=conversation.id,
+            sender_type=SenderType.USER,
+            message=message,
+            token_count=count_message_tokens(message, model)
+        )
+        db.add(user_message)
         
-        chat_messages.append({"role": "user", "content": message})
+        if stream:
+            # Persist the user message now; the AI reply is saved by the stream
+            db.commit()
+            return create_sse_response(
+                stream_conversation_reply(
+                    service=service,
+                    conversation_id=conversation.id,
+                    messages=chat_messages,
+                    system_prompt=system_prompt,
+                    academy_id=getattr(current_user, 'academy_id', None),
+                    request=request
+                ),
+                background=BackgroundTask(refresh_conversation_summary, conversation.id, service)
+            )
         
         ai_response = await service.generate_completion(
             messages=chat_messages,
@@ -513,18 +486,23 @@ async def chat_with_ai(
             conversation_id=conversation.id,
             sender_type=SenderType.AI,
             message=ai_response["content"],
-            ai_model_used=ai_response.get("model", "gpt-4"),
-            processing_time_ms=ai_response.get("processing_time_ms", 0)
+            ai_model_used=ai_response.get("model", model),
+            processing_time_ms=ai_response.get("processing_time_ms", 0),
+            token_count=count_message_tokens(ai_response["content"], model)
         )
         db.add(ai_message)
         db.commit()
         
+        # Fold overflowing turns into the summary after the response is sent
+        background_tasks.add_task(refresh_conversation_summary, conversation.id, service)
+        
         return get_standard_success_response(
             {
                 "conversation_id": conversation.id,
                 "message_id": ai_message.id,
                 "response": ai_response["content"],
-                "usage": ai_response.get("usage", {})
+                "usage": ai_response.get("usage", {}),
+                "context_tokens": context["prompt_tokens"]
             },
             "تم الحصول على الرد بنجاح"
         )
@@ -12,7 +12,9 @@ Educational Notes:
 - Includes authentication and authorization checks
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
@@ -21,6 +23,10 @@ from datetime import datetime
 from app.deps.database import get_db
 from app.deps.auth import get_current_user
 from app.services.ai_service import AIService
+from app.services.ai.chat_streaming import stream_conversation_reply, create_sse_response
+from app.services.ai.conversation_context import refresh_conversation_summary
+from app.services.exam_grading import create_free_text_corrector
+from app.core.ai_config import AIServiceFactory
 from app.models.ai_assistant import AIAnswerType, ConversationType, SenderType
 from app.models.user import User
 
@@ -28,6 +34,9 @@ from app.models.user import User
 # Create router
 router = APIRouter(prefix="/ai", tags=["AI Assistant"])
 
+CHAT_SYSTEM_PROMPT = """أنت مساعد تعليمي ذكي لمنصة سيان. مهمتك مساعدة الطلاب والأساتذة 
+بالإجابة على أسئلتهم التعليمية وتقديم الدعم المناسب. كن مفيداً ومهذباً ودقيقاً في إجاباتك."""
+
 
 # ========================================
 # REQUEST/RESPONSE MODELS
@@ -255,6 +264,59 @@ async def add_message_to_conversation(
         )
 
 
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def stream_message_to_conversation(
+    conversation_id: str,
+    request: MessageRequest,
+    http_request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> StreamingResponse:
+    """
+    Add a message to a conversation and stream the AI reply.
+    
+    The reply is sent as Server-Sent Events (`start`, `delta`, `done`,
+    `error`) as soon as tokens are generated. The full reply is saved
+    once the stream ends; closing the connection cancels generation.
+    """
+    try:
+        chat_service = AIServiceFactory.create_chat_service()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="خدمة المحادثة غير متاحة حالياً"
+        )
+    
+    ai_service = AIService(db)
+    result = ai_service.prepare_streamed_turn(
+        conversation_id=conversation_id,
+        user_id=current_user.id,
+        message=request.message,
+        model=chat_service.config.model_name,
+        system_prompt=CHAT_SYSTEM_PROMPT
+    )
+    
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=result["message"]
+        )
+    
+    turn = result["data"]
+    return create_sse_response(
+        stream_conversation_reply(
+            service=chat_service,
+            conversation_id=turn["conversation_id"],
+            messages=turn["messages"],
+            system_prompt=CHAT_SYSTEM_PROMPT,
+            academy_id=turn["academy_id"],
+            request=http_request
+        ),
+        # Fold overflowing turns into the summary once the reply is sent
+        background=BackgroundTask(refresh_conversation_summary, turn["conversation_id"], chat_service)
+    )
+
+
 # ========================================
 # VIDEO TRANSCRIPTION ENDPOINTS
 # ========================================
@@ -371,14 +433,15 @@ async def correct_exam(
         
         ai_service = AIService(db)
         
-        # Get academy ID from exam context (you'd implement this logic)
-        academy_id = None  # get_academy_from_exam(exam_id)
+        # Academy ID is resolved from the exam's course by the grading engine
+        academy_id = None
         
-        result = ai_service.correct_exam(
+        result = await ai_service.correct_exam(
             exam_id=exam_id,
             student_id=current_user.student_profile.id,
             academy_id=academy_id,
-            student_answers=request.student_answers
+            student_answers=request.student_answers,
+            corrector=create_free_text_corrector()
         )
         
         if not result["success"]:
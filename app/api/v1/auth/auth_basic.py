@@ -26,6 +26,7 @@ from app.schemas import (
 )
 from app.models.user import User
 from app.services.cart_service import CartService
+from app.services.learning_analytics import learning_analytics
 from .auth_utils import (
     get_current_timestamp,
     generate_user_tokens,
@@ -159,6 +160,14 @@ async def unified_login(
         )
 
 
+def record_student_login(user: User, db: Session) -> None:
+    """Count the login in the student's learning analytics"""
+    if user.user_type != "student" or not user.student_profile:
+        return
+    learning_analytics.record_login(db, user.student_profile.id)
+    db.commit()
+
+
 async def handle_auto_detect_login(body: dict, db: Session, cookie_id: Optional[str] = None) -> Token:
     """Login with automatic user type detection and cart merging"""
     
@@ -233,8 +242,8 @@ async def handle_auto_detect_login(body: dict, db: Session, cookie_id: Optional[
             }
         )
     
-    # Generate tokens without cart merge
-    return generate_user_tokens(user, db)
+    record_student_login(user, db)
+    return generate_user_tokens(user, db, cookie_id)
 
 
 async def handle_local_login(login_data: UnifiedLogin, db: Session, cookie_id: Optional[str] = None) -> Token:
@@ -308,8 +317,8 @@ async def handle_local_login(login_data: UnifiedLogin, db: Session, cookie_id: O
         
         logger.info("توليد التوكن للمستخدم")
         
-        # Generate tokens without cart merge
-        return generate_user_tokens(user, db)
+        record_student_login(user, db)
+        return generate_user_tokens(user, db, cookie_id)
         
     except Exception as e:
         logger.error(f"خطأ في تسجيل الدخول: {str(e)}")
@@ -371,8 +380,8 @@ async def handle_google_login(google_request, db: Session, cookie_id: Optional[s
             }
         )
     
-    # Generate tokens without cart merge
-    return generate_user_tokens(user, db)
+    record_student_login(user, db)
+    return generate_user_tokens(user, db, cookie_id)
 
 
 
@@ -387,7 +396,8 @@ async def unified_register(
     password: str = Form(..., description="كلمة المرور"),
     user_type: str = Form(..., description="نوع المستخدم (student/academy)"),
     avatar: Optional[UploadFile] = File(default=None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    the_cookie: Optional[str] = Header(None, alias="TheCookie")
 ) -> Any:
     """
     
@@ -421,7 +431,7 @@ async def unified_register(
         }
         
         register_request = UnifiedRegister(**registration_data)
-        user_tokens = await RegistrationService.register_local_user(register_request, db, avatar)
+        user_tokens = await RegistrationService.register_local_user(register_request, db, avatar, the_cookie)
         
         return user_tokens
         
@@ -575,7 +585,8 @@ def logout(
 @router.post("/refresh", response_model=Token, response_model_exclude_none=True, tags=["Authentication"])
 async def refresh(
     request: Request,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    the_cookie: Optional[str] = Header(None, alias="TheCookie")
 ) -> Any:
     """تحديث الرمز المميز باستخدام refresh_token - يدعم JSON و Form Data"""
     
@@ -706,7 +717,7 @@ async def refresh(
             )
         
         # توليد tokens جديدة
-        return generate_user_tokens(user, db)
+        return generate_user_tokens(user, db, the_cookie)
         
     except HTTPException:
         raise
@@ -5,7 +5,7 @@ OTP request and verification functionality with comprehensive support
 """
 
 from typing import Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Header
 from sqlalchemy.orm import Session
 
 from app.deps import get_db
@@ -277,7 +277,8 @@ def request_otp(
 @router.post("/verify", response_model=BaseResponse, response_model_exclude_none=True, tags=["OTP"])
 def verify_otp(
     otp_verify: OTPVerify = Body(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    the_cookie: Optional[str] = Header(None, alias="TheCookie")
 ) -> Any:
     
 
@@ -392,7 +393,7 @@ def verify_otp(
             )
         
         # الأغراض الأخرى تُرجع JWT
-        tokens = generate_user_tokens(user, db)
+        tokens = generate_user_tokens(user, db, the_cookie)
         return create_unified_success_response(
             data=tokens,
             message="تم التحقق من OTP وتوليد التوكنات بنجاح",
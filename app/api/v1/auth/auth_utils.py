@@ -18,6 +18,7 @@ from app.models.user import User
 from app.models.student import Student
 from app.models.academy import Academy, AcademyUser, AcademyStatus, TrialStatus
 from app.models.otp import OTP, OTPPurpose
+from app.services.cart_service import CartService
 from app.services.email_service import email_service
 
 _verification_tokens: Dict[str, Dict] = {}
@@ -203,8 +204,22 @@ def send_verification_otp(user: User, db: Session):
         return False
 
 
-def generate_user_tokens(user: User, db: Session) -> Token:
-    """Generate JWT tokens for user with optional additional data"""
+def merge_guest_cart(user: User, db: Session, the_cookie: Optional[str]) -> None:
+    """Move the guest cart of this browser to the student receiving tokens"""
+    cookie_id = CartService.extract_cookie_id(the_cookie)
+    if not cookie_id or user.user_type != "student" or not user.student_profile:
+        return
+    CartService.migrate_guest_cart(db, user.student_profile.id, cookie_id)
+
+
+def generate_user_tokens(user: User, db: Session, the_cookie: Optional[str] = None) -> Token:
+    """
+    Generate JWT tokens for user with optional additional data
+
+    Every path that signs a student in passes the TheCookie header, so the
+    guest cart of the browser moves to the student whichever way they got in.
+    """
+    merge_guest_cart(user, db, the_cookie)
     try:
         token_data = {
             "user_id": user.id,
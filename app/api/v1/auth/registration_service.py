@@ -54,7 +54,8 @@ class RegistrationService:
     async def register_local_user(
         register_data: Any,
         db: Session,
-        avatar_file: Optional[Any] = None
+        avatar_file: Optional[Any] = None,
+        the_cookie: Optional[str] = None
     ) -> Dict[str, Any]:
         """Register a local user (email/password)"""
         
@@ -130,13 +131,14 @@ class RegistrationService:
         except Exception as e:
             print(f"خطأ في إرسال رمز التحقق: {str(e)}")
         
-        return generate_user_tokens(new_user, db)
+        return generate_user_tokens(new_user, db, the_cookie)
     
     @staticmethod
     def register_google_user(
         google_data: Dict[str, Any],
         user_type: str,
-        db: Session
+        db: Session,
+        the_cookie: Optional[str] = None
     ) -> Dict[str, Any]:
         """Register a Google OAuth user"""
         
@@ -159,7 +161,7 @@ class RegistrationService:
                 )
             else:
                 # Link existing local account to Google
-                return RegistrationService.link_google_account(existing_user, google_data, db)
+                return RegistrationService.link_google_account(existing_user, google_data, db, the_cookie)
         
         # Parse name
         name_parts = RegistrationService.parse_google_name(google_data.get('name', ''))
@@ -196,12 +198,17 @@ class RegistrationService:
         elif user_type == "academy":
             create_academy_profile(new_user, profile_data, db)
         
-        return generate_user_tokens(new_user, db)
+        return generate_user_tokens(new_user, db, the_cookie)
     
 
     
     @staticmethod
-    def link_google_account(user: User, google_data: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    def link_google_account(
+        user: User,
+        google_data: Dict[str, Any],
+        db: Session,
+        the_cookie: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Link existing local account to Google"""
         user.google_id = google_data['id']
         user.account_type = "google"
@@ -213,7 +220,7 @@ class RegistrationService:
         
         db.commit()
         db.refresh(user)
-        return generate_user_tokens(user, db)
+        return generate_user_tokens(user, db, the_cookie)
     
     @staticmethod
     def parse_google_name(full_name: str) -> Dict[str, Optional[str]]:
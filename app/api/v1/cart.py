@@ -4,12 +4,13 @@ Cart API endpoints
 
 from typing import Optional, Any
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Header
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 import uuid
 from datetime import datetime
 
-from app.deps.database import get_db
+from app.deps.database import get_async_db, get_db
 from app.deps.auth import get_optional_current_user, get_current_student
 from app.models.student import Student
 from app.models.user import User
@@ -44,10 +45,10 @@ class AddToCartRequest(BaseModel):
 
 
 @router.get("/")
-def get_cart(
+async def get_cart(
     request: Request,
     response: Response,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_optional_current_user),
     the_cookie: Optional[str] = Header(None, alias="TheCookie")
 ) -> Any:
@@ -57,11 +58,11 @@ def get_cart(
         student_id = _get_user_identifier(current_user)
         
         # Get cart summary instead of just items
-        result = CartService.get_cart_summary(
-            db=db,
+        result = await db.run_sync(lambda session: CartService.get_cart_summary(
+            db=session,
             student_id=student_id,
             cookie_id=cookie_id
-        )
+        ))
         
         if not result.get("success"):
             raise HTTPException(
@@ -95,6 +96,44 @@ def get_cart(
         )
 
 
+@router.get("/summary")
+async def get_cart_badge(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[User] = Depends(get_optional_current_user),
+    the_cookie: Optional[str] = Header(None, alias="TheCookie")
+) -> Any:
+    """Item count and totals for the header badge"""
+    try:
+        student_id = _get_user_identifier(current_user)
+        
+        result = await db.run_sync(lambda session: CartService.get_cart_badge(
+            db=session,
+            student_id=student_id,
+            cookie_id=the_cookie
+        ))
+        
+        if not result.get("success"):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail={"message": result.get("message", "خطأ في جلب السلة")}
+            )
+        
+        return SayanSuccessResponse(
+            data=result.get("data", {}),
+            message=result.get("message", "ملخص السلة"),
+            request=request
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"message": f"خطأ في جلب السلة: {str(e)}"}
+        )
+
+
 @router.post("/add", status_code=status.HTTP_201_CREATED)
 def add_to_cart(
     cart_data: AddToCartRequest,
@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form, Request
 from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 
-from app.deps.database import get_db
+from app.deps.database import get_async_read_db, get_db
 from app.deps.auth_improved import get_current_academy_user_improved, verify_course_ownership_improved
 from app.deps.auth import get_current_student
 from app.models.chapter import Chapter
-from app.models.course import Course
+from app.models.course import Course, CourseStatus
 from app.models.user import User
 from app.models.student import Student
 from app.models.lesson import Lesson
@@ -18,9 +20,12 @@ from app.schemas.chapter import (
     ChapterCreate, ChapterUpdate, ChapterResponse, ChapterDetailResponse,
     ChapterListResponse, ChapterOrderUpdate, ChaptersBulkOrderUpdate
 )
+from app.services.content_aggregates import chapter_statistics
+from app.services.course_content import course_content_service, PUBLIC
+from app.services.playback_grants import content_video_ids, playback_grants
 from app.core.response_utils import (
     create_success_response, create_error_response, create_list_response,
-    success_json_response, error_json_response
+    success_json_response, error_json_response, etag_matches, not_modified_response, etag_json_response
 )
 
 router = APIRouter()
@@ -38,6 +43,7 @@ async def get_course_chapters(
     Get all chapters for a specific course with lessons data included.
     
     Returns ordered list of chapters with lesson details, counts and duration information.
+    Send the returned ETag in If-None-Match to get 304 while the content is unchanged.
     """
     # Verify course ownership with improved error handling
     verify_course_ownership_improved(course_id, current_user, db, request)
@@ -48,138 +54,21 @@ async def get_course_chapters(
         Course.academy_id == current_user.academy.id
     ).first()
     
-    # Get chapters first to avoid collation issues
-    chapters = db.query(Chapter).filter(
-        Chapter.course_id == course_id
-    ).order_by(Chapter.order_number).all()
+    # The tree is cached per content version, which also serves as the ETag
+    etag = course_content_service.etag(course)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
     
-    # Convert chapters to response format with lessons data
-    chapters_data = []
+    chapters_data = course_content_service.get_tree(db, course)
     
-    for chapter in chapters:
-        # Get lessons for this chapter separately to avoid collation issues
-        lessons = db.query(Lesson).filter(
-            Lesson.chapter_id == chapter.id
-        ).order_by(Lesson.order_number).all()
-        
-        # Calculate chapter statistics
-        total_lessons = len(lessons)
-        video_lessons = [l for l in lessons if l.type == "video"]
-        exam_lessons = [l for l in lessons if l.type == "exam"]
-        tool_lessons = [l for l in lessons if l.type == "tool"]
-        
-        total_duration = sum(l.video_duration or 0 for l in video_lessons)
-        total_size = sum(l.size_bytes or 0 for l in video_lessons)
-        
-        # Prepare lessons data
-        lessons_data = []
-        for lesson in lessons:
-            lesson_info = {
-                "id": lesson.id,
-                "title": lesson.title,
-                "description": lesson.description,
-                "type": lesson.type,
-                "order_number": lesson.order_number,
-                "status": lesson.status,
-                "is_free_preview": lesson.is_free_preview,
-                "created_at": lesson.created_at.isoformat() if lesson.created_at else None,
-                "updated_at": lesson.updated_at.isoformat() if lesson.updated_at else None
-            }
-            
-            # Add type-specific information
-            if lesson.type == "video":
-                # Get videos count separately
-                videos_count = db.query(Video).filter(
-                    Video.lesson_id == lesson.id,
-                    Video.status == True,
-                    Video.deleted_at.is_(None)
-                ).count()
-                
-                # Get first video for direct URL
-                first_video = db.query(Video).filter(
-                    Video.lesson_id == lesson.id,
-                    Video.status == True,
-                    Video.deleted_at.is_(None)
-                ).first()
-                
-                lesson_info.update({
-                    "video_duration": lesson.video_duration or 0,
-                    "size_bytes": lesson.size_bytes or 0,
-                    "duration_formatted": f"{lesson.video_duration}m" if lesson.video_duration else "0m",
-                    "file_size_formatted": f"{round((lesson.size_bytes or 0) / (1024*1024), 2)} MB",
-                    "views_count": lesson.views_count or 0,
-                    "has_video": bool(lesson.video),
-                    "video_count": videos_count,
-                    "video_id": first_video.id if first_video else None
-                })
-            elif lesson.type == "exam":
-                # Get exams and questions count separately
-                exams = db.query(Exam).filter(
-                    Exam.lesson_id == lesson.id,
-                    Exam.status == True
-                ).all()
-                
-                questions_count = sum(
-                    db.query(Question).filter(
-                        Question.exam_id == exam.id
-                    ).count() for exam in exams
-                )
-                
-                lesson_info.update({
-                    "exam_count": len(exams),
-                    "questions_count": questions_count,
-                    "duration_minutes": sum(exam.duration // 60 for exam in exams) if exams else 0
-                })
-            elif lesson.type == "tool":
-                # Get tools count separately
-                tools_count = db.query(InteractiveTool).filter(
-                    InteractiveTool.lesson_id == lesson.id
-                ).count()
-                
-                lesson_info.update({
-                    "tools_count": tools_count
-                })
-            
-            lessons_data.append(lesson_info)
-        
-        # Sort lessons by order_number
-        lessons_data.sort(key=lambda x: x["order_number"])
-        
-        # Create chapter response with lessons
-        chapter_data = {
-            "id": chapter.id,
-            "title": chapter.title,
-            "description": chapter.description,
-            "order_number": chapter.order_number,
-            "is_published": chapter.is_published,
-            "created_at": chapter.created_at.isoformat() if chapter.created_at else None,
-            "updated_at": chapter.updated_at.isoformat() if chapter.updated_at else None,
-            
-            # Chapter statistics
-            "statistics": {
-                "total_lessons": total_lessons,
-                "video_lessons": len(video_lessons),
-                "exam_lessons": len(exam_lessons),
-                "tool_lessons": len(tool_lessons),
-                "total_duration_minutes": total_duration // 60 if total_duration else 0,
-                "total_duration_hours": round((total_duration // 60) / 60, 1) if total_duration else 0,
-                "total_size_mb": round(total_size / (1024*1024), 2) if total_size else 0,
-                "free_preview_lessons": len([l for l in lessons if l.is_free_preview])
-            },
-            
-            # Lessons data
-            "lessons": lessons_data
-        }
-        
-        chapters_data.append(chapter_data)
-    
-    return success_json_response(
+    return etag_json_response(
         data=create_list_response(
             items=chapters_data,
-            total=len(chapters),
+            total=len(chapters_data),
             message="تم استرجاع الفصول مع الدروس بنجاح",
             path=str(request.url.path)
         )["data"],
+        etag=etag,
         message="تم استرجاع الفصول مع الدروس بنجاح",
         request=request
     )
@@ -292,122 +181,18 @@ async def get_chapter_details(
             request=request
         )
     
-    # Get lessons for this chapter separately to avoid collation issues
-    lessons = db.query(Lesson).filter(
-        Lesson.chapter_id == chapter.id
-    ).order_by(Lesson.order_number).all()
-    
-    # Calculate chapter statistics
-    total_lessons = len(lessons)
-    video_lessons = [l for l in lessons if l.type == "video"]
-    exam_lessons = [l for l in lessons if l.type == "exam"]
-    tool_lessons = [l for l in lessons if l.type == "tool"]
-    
-    total_duration = sum(l.video_duration or 0 for l in video_lessons)
-    total_size = sum(l.size_bytes or 0 for l in video_lessons)
-    
-    # Prepare lessons data
-    lessons_data = []
-    for lesson in lessons:
-        lesson_info = {
-            "id": lesson.id,
-            "title": lesson.title,
-            "description": lesson.description,
-            "type": lesson.type,
-            "order_number": lesson.order_number,
-            "status": lesson.status,
-            "is_free_preview": lesson.is_free_preview,
-            "created_at": lesson.created_at.isoformat() if lesson.created_at else None,
-            "updated_at": lesson.updated_at.isoformat() if lesson.updated_at else None
-        }
-        
-        # Add type-specific information
-        if lesson.type == "video":
-            # Get videos count separately
-            videos_count = db.query(Video).filter(
-                Video.lesson_id == lesson.id,
-                Video.status == True,
-                Video.deleted_at.is_(None)
-            ).count()
-            
-            # Get first video for direct URL
-            first_video = db.query(Video).filter(
-                Video.lesson_id == lesson.id,
-                Video.status == True,
-                Video.deleted_at.is_(None)
-            ).first()
-            
-            lesson_info.update({
-                "video_duration": lesson.video_duration or 0,
-                "size_bytes": lesson.size_bytes or 0,
-                "duration_formatted": f"{lesson.video_duration}m" if lesson.video_duration else "0m",
-                "file_size_formatted": f"{round((lesson.size_bytes or 0) / (1024*1024), 2)} MB",
-                "views_count": lesson.views_count or 0,
-                "has_video": bool(lesson.video),
-                "video_count": videos_count,
-                "video_id": first_video.id if first_video else None
-            })
-        elif lesson.type == "exam":
-            # Get exams and questions count separately
-            exams = db.query(Exam).filter(
-                Exam.lesson_id == lesson.id,
-                Exam.status == True
-            ).all()
-            
-            questions_count = sum(
-                db.query(Question).filter(
-                    Question.exam_id == exam.id
-                ).count() for exam in exams
-            )
-            
-            lesson_info.update({
-                "exam_count": len(exams),
-                "questions_count": questions_count,
-                "duration_minutes": sum(exam.duration // 60 for exam in exams) if exams else 0
-            })
-        elif lesson.type == "tool":
-            # Get tools count separately
-            tools_count = db.query(InteractiveTool).filter(
-                InteractiveTool.lesson_id == lesson.id
-            ).count()
-            
-            lesson_info.update({
-                "tools_count": tools_count
-            })
-        
-        lessons_data.append(lesson_info)
-    
-    # Sort lessons by order_number
-    lessons_data.sort(key=lambda x: x["order_number"])
-    
-    # Create chapter response with lessons
-    chapter_data = {
-        "id": chapter.id,
-        "title": chapter.title,
-        "description": chapter.description,
-        "order_number": chapter.order_number,
-        "is_published": chapter.is_published,
-        "created_at": chapter.created_at.isoformat() if chapter.created_at else None,
-        "updated_at": chapter.updated_at.isoformat() if chapter.updated_at else None,
-        
-        # Chapter statistics
-        "statistics": {
-            "total_lessons": total_lessons,
-            "video_lessons": len(video_lessons),
-            "exam_lessons": len(exam_lessons),
-            "tool_lessons": len(tool_lessons),
-            "total_duration_minutes": total_duration // 60 if total_duration else 0,
-            "total_duration_hours": round((total_duration // 60) / 60, 1) if total_duration else 0,
-            "total_size_mb": round(total_size / (1024*1024), 2) if total_size else 0,
-            "free_preview_lessons": len([l for l in lessons if l.is_free_preview])
-        },
-        
-        # Lessons data
-        "lessons": lessons_data
-    }
+    # Served from the course tree, cached per content version
+    etag = course_content_service.etag(course)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    
+    chapter_data = next(
+        item for item in course_content_service.get_tree(db, course) if item["id"] == chapter.id
+    )
     
-    return success_json_response(
+    return etag_json_response(
         data=chapter_data,
+        etag=etag,
         message="تم استرجاع بيانات الفصل بنجاح",
         request=request
     )
@@ -517,8 +302,11 @@ async def delete_chapter(
         )
     
     try:
+        video_ids = content_video_ids(db, chapter_id=chapter.id)
         db.delete(chapter)
         db.commit()
+        for video_id in video_ids:
+            playback_grants.revoke(video_id=video_id)
         
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -655,20 +443,22 @@ async def get_public_chapter_details(
 async def get_public_course_chapters(
     course_id: str,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get published chapters for a course (public view).
     
-    Returns only published chapters that are publicly accessible.
-    No authentication required for published content.
+    Returns only published chapters that are publicly accessible, each with
+    an outline of its active lessons. No authentication required for published content.
     """
     try:
         # Verify course is published
-        course = db.query(Course).filter(
-            Course.id == course_id,
-            Course.status == "published"
-        ).first()
+        course = await db.scalar(
+            select(Course).where(
+                Course.id == course_id,
+                Course.course_state == CourseStatus.published
+            )
+        )
     
         if not course:
             return error_json_response(
@@ -678,22 +468,19 @@ async def get_public_course_chapters(
                 request=request
             )
     
-        # Get published chapters
-        chapters = db.query(Chapter).filter(
-            Chapter.course_id == course_id,
-            Chapter.is_published == True
-        ).order_by(Chapter.order_number).all()
+        etag = course_content_service.etag(course, PUBLIC)
+        if etag_matches(request, etag):
+            return not_modified_response(etag, cache_control="public, no-cache")
     
-        # Convert to response format
-        chapters_response = ChapterListResponse(
-            chapters=chapters,
-            total=len(chapters)
-        )
+        # Published chapters with their lesson outline, cached per content version
+        chapters = await db.run_sync(lambda session: course_content_service.get_tree(session, course, PUBLIC))
         
-        return success_json_response(
-            data=chapters_response,
+        return etag_json_response(
+            data={"chapters": chapters, "total": len(chapters)},
+            etag=etag,
             message="تم جلب فصول الدورة بنجاح",
-            request=request
+            request=request,
+            cache_control="public, no-cache"
         )
         
     except Exception as e:
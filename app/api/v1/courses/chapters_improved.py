@@ -17,6 +17,7 @@ from app.schemas.chapter import (
     ChapterCreate, ChapterUpdate, ChapterResponse, ChapterDetailResponse,
     ChapterListResponse, ChapterOrderUpdate, ChaptersBulkOrderUpdate
 )
+from app.services.content_aggregates import chapter_statistics
 from app.core.response_utils import (
     create_success_response, create_error_response, create_list_response,
     success_json_response, error_json_response
@@ -124,20 +125,6 @@ async def get_course_chapters_improved(
         # Convert chapters to response format with lessons data
         chapters_data = []
         for chapter in chapters:
-            # Get lessons for this chapter separately to avoid collation issues
-            lessons = db.query(Lesson).filter(
-                Lesson.chapter_id == chapter.id
-            ).order_by(Lesson.order_number).all()
-            
-            # Calculate chapter statistics
-            total_lessons = len(lessons)
-            video_lessons = [l for l in lessons if l.type == "video"]
-            exam_lessons = [l for l in lessons if l.type == "exam"]
-            tool_lessons = [l for l in lessons if l.type == "tool"]
-            
-            total_duration = sum(l.video_duration or 0 for l in video_lessons)
-            total_size = sum(l.size_bytes or 0 for l in video_lessons)
-            
             chapter_data = {
                 "id": chapter.id,
                 "title": chapter.title,
@@ -148,16 +135,7 @@ async def get_course_chapters_improved(
                 "updated_at": chapter.updated_at.isoformat() if chapter.updated_at else None,
                 
                 # Chapter statistics
-                "statistics": {
-                    "total_lessons": total_lessons,
-                    "video_lessons": len(video_lessons),
-                    "exam_lessons": len(exam_lessons),
-                    "tool_lessons": len(tool_lessons),
-                    "total_duration_minutes": total_duration // 60 if total_duration else 0,
-                    "total_duration_hours": round((total_duration // 60) / 60, 1) if total_duration else 0,
-                    "total_size_mb": round(total_size / (1024*1024), 2) if total_size else 0,
-                    "free_preview_lessons": len([l for l in lessons if l.is_free_preview])
-                }
+                "statistics": chapter_statistics(chapter)
             }
             
             chapters_data.append(chapter_data)
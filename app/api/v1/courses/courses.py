@@ -17,6 +17,7 @@ from app.schemas.course import (
     CourseListResponse, CourseFilters, CourseStatusUpdate
 )
 from app.services.file_service import file_service
+from app.services.playback_grants import content_video_ids, playback_grants
 from app.core.config import settings
 
 router = APIRouter()
@@ -372,7 +373,10 @@ async def update_course_status(
             else:  # DRAFT
                 product.status = "draft"
         
+        video_ids = content_video_ids(db, course_id=course.id) if status_data.status != CourseStatus.published else []
         db.commit()
+        for video_id in video_ids:
+            playback_grants.revoke(video_id=video_id)
         db.refresh(course)
         
         return CourseResponse.from_course_model(course)
@@ -429,8 +433,11 @@ async def delete_course(
         if product:
             db.delete(product)
         
+        video_ids = content_video_ids(db, course_id=course.id)
         db.delete(course)
         db.commit()
+        for video_id in video_ids:
+            playback_grants.revoke(video_id=video_id)
         
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -1,14 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form
 from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import text
+from sqlalchemy import select, text
 from typing import List, Optional, Any, Dict
 import uuid
 from datetime import datetime
 from dateutil import parser
 from decimal import Decimal
 
-from app.deps.database import get_db
+from app.deps.database import get_async_read_db, get_db
 from app.deps.auth import get_current_academy_user, get_current_student, get_current_user
 from app.models.course import Course, CourseStatus, CourseType, CourseLevel
 from app.models.academy import Academy, AcademyUser
@@ -18,6 +19,9 @@ from app.schemas.course import (
     CourseListResponse, CourseFilters, CourseStatusUpdate
 )
 from app.services.file_service import file_service
+from app.services.course_catalog import course_catalog_service, InvalidCursorError
+from app.services.course_search import course_search_engine
+from app.services.playback_grants import content_video_ids, playback_grants
 from app.core.config import settings
 from app.models.product import Product, ProductType, ProductStatus
 from app.models.chapter import Chapter
@@ -863,7 +867,10 @@ async def unpublish_course(
         if course.product:
             course.product.status = "draft"
         
+        video_ids = content_video_ids(db, course_id=course.id)
         db.commit()
+        for video_id in video_ids:
+            playback_grants.revoke(video_id=video_id)
         db.refresh(course)
         
         course_data = CourseResponse.from_course_model(course).dict()
@@ -931,10 +938,11 @@ async def delete_course(
                 }
             )
         
-        # Store file paths before deletion for cleanup
+        # Store file paths and videos before deletion for cleanup
         image_path = course.image
         preview_video_path = course.preview_video  
         gallery_paths = course.gallery
+        video_ids = content_video_ids(db, course_id=course.id)
         
         # Delete related records safely to avoid constraint issues
         try:
@@ -950,9 +958,14 @@ async def delete_course(
         except Exception as e:
             print(f"Warning: Could not delete course content: {e}")
         
+        # Raw SQL bypasses the ORM hooks that maintain the catalog
+        course_catalog_service.remove_courses(db, [course_id])
+
         # Delete the course from database using raw SQL to avoid relationship loading
         db.execute(text("DELETE FROM courses WHERE id = :course_id"), {"course_id": course_id})
         db.commit()
+        for video_id in video_ids:
+            playback_grants.revoke(video_id=video_id)
         
         # Delete associated files safely after successful database deletion
         try:
@@ -1007,66 +1020,90 @@ async def delete_course(
 @router.get("/public/courses", response_model=CourseListResponse)
 async def get_public_courses(
     filters: CourseFilters = Depends(),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get published courses for public browsing.
     
     Returns only published courses with comprehensive filtering
     for students and visitors to browse available courses.
+    Pages are read from the course catalog read model; pass ``cursor``
+    to walk deep pages at constant cost.
     """
     try:
-        # Build base query for published courses only with category join
-        query = db.query(Course).options(
-            joinedload(Course.category),
-            joinedload(Course.trainer),
-            joinedload(Course.product)
-        ).join(Product).filter(Course.course_state == CourseStatus.published)
-        
-        # Apply filters (same as academy endpoint but only for published courses)
-        if filters.academy_id:
-            query = query.filter(Course.academy_id == filters.academy_id)
-        if filters.category_id:
-            query = query.filter(Course.category_id == filters.category_id)
-        if filters.level:
-            query = query.filter(Course.level == filters.level)
-        if filters.price_from is not None:
-            query = query.filter(Product.price >= filters.price_from)
-        if filters.price_to is not None:
-            query = query.filter(Product.price <= filters.price_to)
-        if filters.featured is not None:
-            query = query.filter(Course.featured == filters.featured)
-        if filters.search:
-            search_term = f"%{filters.search}%"
-            query = query.filter(Product.title.ilike(search_term))
-        
-        # Order by featured first, then by creation date
-        query = query.order_by(Course.featured.desc(), Course.created_at.desc())
-        
-        # Get total count before pagination
-        total = query.count()
-        
-        # Apply pagination
-        offset = (filters.page - 1) * filters.per_page
-        courses = query.offset(offset).limit(filters.per_page).all()
-        
-        # Calculate pagination info
-        total_pages = (total + filters.per_page - 1) // filters.per_page
-        
-        data = {
-            "courses": [CourseResponse.from_course_model(c).dict() for c in courses],
-            "total": total,
-            "page": filters.page,
-            "per_page": filters.per_page,
-            "total_pages": total_pages
-        }
+        def load(session: Session) -> dict:
+            catalog_filters = {
+                "academy_id": filters.academy_id,
+                "category_id": filters.category_id,
+                "trainer_id": filters.trainer_id,
+                "level": filters.level.value if filters.level else None,
+                "type": filters.type.value if filters.type else None,
+                "price_from": filters.price_from,
+                "price_to": filters.price_to,
+                "featured": filters.featured
+            }
+            offset = (filters.page - 1) * filters.per_page
+
+            if filters.search:
+                # Ranked full-text search; pages by offset over the ranked ids
+                results = course_search_engine.search(
+                    session, filters.search, filters=catalog_filters, offset=offset, limit=filters.per_page
+                )
+                course_ids = results["course_ids"]
+                page = {"total": results["total"], "total_is_estimate": False, "next_cursor": None}
+            else:
+                try:
+                    page = course_catalog_service.list_courses(
+                        session,
+                        filters=catalog_filters,
+                        cursor=cursor,
+                        limit=filters.per_page,
+                        offset=None if cursor else offset
+                    )
+                except InvalidCursorError:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="مؤشر الصفحة غير صالح"
+                    )
+                course_ids = [row.course_id for row in page["items"]]
+
+            # Hydrate only the courses on this page, keeping catalog order
+            courses_by_id = {
+                course.id: course
+                for course in session.query(Course).options(
+                    joinedload(Course.category),
+                    joinedload(Course.trainer),
+                    joinedload(Course.product)
+                ).filter(Course.id.in_(course_ids)).all()
+            } if course_ids else {}
+            courses = [courses_by_id[course_id] for course_id in course_ids if course_id in courses_by_id]
+
+            total = page["total"]
+            total_pages = (total + filters.per_page - 1) // filters.per_page
+        
+            data = {
+                "courses": [CourseResponse.from_course_model(c).dict() for c in courses],
+                "total": total,
+                "total_is_estimate": page["total_is_estimate"],
+                "page": filters.page,
+                "per_page": filters.per_page,
+                "total_pages": total_pages,
+                "next_cursor": page["next_cursor"]
+            }
+            if filters.search:
+                data["facets"] = results["facets"]
+            return data
 
+        data = await db.run_sync(load)
         return build_response(
             message="تم جلب الدورات بنجاح",
             data=data,
             path="/api/v1/public/courses"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1077,7 +1114,7 @@ async def get_public_courses(
 @router.get("/public/courses/{course_id}", response_model=CourseDetailResponse)
 async def get_public_course_details(
     course_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get detailed information for a specific published course.
@@ -1085,14 +1122,16 @@ async def get_public_course_details(
     Returns course details available to the public including
     course outline, preview content, and enrollment information.
     """
-    course = db.query(Course).options(
-        joinedload(Course.category),
-        joinedload(Course.trainer),
-        joinedload(Course.product)
-    ).filter(
-        Course.id == course_id,
-        Course.course_state == CourseStatus.published
-    ).first()
+    course = await db.scalar(
+        select(Course).options(
+            joinedload(Course.category),
+            joinedload(Course.trainer),
+            joinedload(Course.product)
+        ).where(
+            Course.id == course_id,
+            Course.course_state == CourseStatus.published
+        )
+    )
     
     if not course:
         raise HTTPException(
@@ -1100,7 +1139,8 @@ async def get_public_course_details(
             detail="الدورة غير موجودة أو غير متاحة"
         )
     
-    data = CourseDetailResponse.from_orm(course).dict()
+    # Attributes the schema reads beyond the joined relations load inside run_sync
+    data = await db.run_sync(lambda session: CourseDetailResponse.from_orm(course).dict())
     return build_response(
         message="تم جلب تفاصيل الكورس بنجاح",
         data=data,
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Dict, Any
 
-from app.deps.database import get_db
+from app.deps.database import get_read_db
 from app.deps.auth import get_current_user
 from app.models.student import Student
 from app.services.lesson_access_service import LessonAccessService
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/progression", tags=["Course Progression"])
 @router.get("/course/{course_id}")
 def get_course_progression(
     course_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: Student = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
@@ -55,7 +55,7 @@ def get_course_progression(
 @router.get("/lesson/{lesson_id}/access")
 def check_lesson_access(
     lesson_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: Student = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
@@ -89,7 +89,7 @@ def check_lesson_access(
 @router.get("/chapter/{chapter_id}/completion")
 def get_chapter_completion(
     chapter_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: Student = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
@@ -123,7 +123,7 @@ def get_chapter_completion(
 @router.get("/course/{course_id}/next-lesson")
 def get_next_lesson(
     course_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: Student = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
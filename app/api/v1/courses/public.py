@@ -1,77 +1,52 @@
 from typing import Any, List, Optional
-from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import random
 
-from app.deps.database import get_db
+from app.deps.database import get_async_read_db, get_read_db
 from app.deps.auth import get_current_student, get_optional_current_user
+from app.models.student_course import StudentCourse
+from app.models.course_catalog import CourseCatalog
+from app.services.course_catalog import course_catalog_service, InvalidCursorError
+from app.services.course_search import course_search_engine
+from app.services.image_variants import image_variants
 
 router = APIRouter()
 
 
-def generate_mock_course_public(course_id: int):
-    """Generate mock course data for public viewing"""
-    course_titles = [
-        "Python Programming Masterclass",
-        "Web Development with React",
-        "Data Science & Machine Learning",
-        "Mobile App Development",
-        "Digital Marketing Strategy",
-        "UI/UX Design Fundamentals",
-        "Cybersecurity Essentials",
-        "Cloud Computing with AWS"
-    ]
-    
-    return {
-        "id": course_id,
-        "academy": {
-            "id": (course_id % 3) + 1,
-            "name": f"Tech Academy {(course_id % 3) + 1}",
-            "slug": f"tech-academy-{(course_id % 3) + 1}",
-            "logo": f"https://example.com/academy-{(course_id % 3) + 1}-logo.jpg",
-            "verified": True,
-            "rating": round(random.uniform(4.0, 5.0), 1)
-        },
-        "title": course_titles[(course_id - 1) % len(course_titles)],
-        "slug": f"course-{course_id}-{course_titles[(course_id - 1) % len(course_titles)].lower().replace(' ', '-')}",
-        "description": f"Comprehensive course covering all aspects of {course_titles[(course_id - 1) % len(course_titles)]}",
-        "short_description": f"Learn {course_titles[(course_id - 1) % len(course_titles)]} from scratch to advanced level",
-        "thumbnail": f"https://example.com/course-{course_id}.jpg",
-        "preview_video": f"https://example.com/preview-{course_id}.mp4",
-        "price": round(random.uniform(99.99, 499.99), 2),
-        "discount_price": round(random.uniform(49.99, 299.99), 2) if course_id % 3 == 0 else None,
-        "final_price": round(random.uniform(49.99, 299.99), 2) if course_id % 3 == 0 else round(random.uniform(99.99, 499.99), 2),
-        "is_free": course_id % 10 == 0,
-        "currency": "USD",
-        "level": ["BEGINNER", "INTERMEDIATE", "ADVANCED"][course_id % 3],
-        "language": "Arabic",
-        "duration": f"{random.randint(10, 50)} hours",
-        "lessons_count": random.randint(20, 100),
-        "students_count": random.randint(100, 5000),
-        "rating": round(random.uniform(4.0, 5.0), 1),
-        "reviews_count": random.randint(50, 1000),
-        "created_at": datetime.now() - timedelta(days=random.randint(1, 365)),
-        "updated_at": datetime.now() - timedelta(days=random.randint(1, 30)),
-        "tags": ["programming", "web", "technology", "education"],
-        "instructor": {
-            "id": course_id % 5 + 1,
-            "name": f"Dr. Ahmed {course_id % 5 + 1}",
-            "avatar": f"https://example.com/instructor-{course_id % 5 + 1}.jpg",
-            "title": "Senior Developer",
-            "experience": f"{random.randint(5, 15)} years"
-        },
-        "certificate": True,
-        "has_preview": True,
-        "enrollment_count": random.randint(100, 5000),
-        "last_updated": datetime.now() - timedelta(days=random.randint(1, 30))
+def _with_enrollment_status(db: Session, courses: List[dict], current_user) -> List[dict]:
+    """Add enrollment status and progress for an authenticated student"""
+    student = getattr(current_user, "student_profile", None) if current_user else None
+    if not student or not courses:
+        return courses
+
+    enrollments = {
+        str(enrollment.course_id): enrollment
+        for enrollment in db.query(StudentCourse).filter(
+            StudentCourse.student_id == student.id,
+            StudentCourse.course_id.in_([course["id"] for course in courses])
+        ).all()
     }
+    for course in courses:
+        enrollment = enrollments.get(str(course["id"]))
+        course["is_enrolled"] = enrollment is not None
+        course["progress"] = enrollment.progress if enrollment else 0
+    return courses
+
+
+def _with_image_variants(courses: List[dict]) -> List[dict]:
+    """Add the srcset manifest of each course image; None for images from before variants"""
+    manifests = image_variants.manifests(course["image"] for course in courses)
+    for course in courses:
+        course["image_variants"] = manifests.get(course["image"])
+    return courses
 
 
 @router.get("/public/courses")
-def get_courses(
+async def get_courses(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
     search: Optional[str] = Query(None, min_length=2),
     category: Optional[str] = Query(None),
     level: Optional[str] = Query(None, regex="^(beginner|intermediate|advanced)$"),
@@ -81,62 +56,63 @@ def get_courses(
     academy_id: Optional[int] = Query(None),
     sort_by: str = Query("created_at", regex="^(created_at|price|rating|popularity|title)$"),
     order: str = Query("desc", regex="^(asc|desc)$"),
-    current_user = Depends(get_optional_current_user)
+    current_user = Depends(get_optional_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ) -> Any:
     """Get list of all courses (public endpoint)"""
     try:
-        courses = [generate_mock_course_public(i) for i in range(1, 51)]
-        
-        # Apply filters
-        if academy_id:
-            courses = [c for c in courses if c["academy"]["id"] == academy_id]
-        
-        if search:
-            courses = [c for c in courses if search.lower() in c["title"].lower() or search.lower() in c["description"].lower()]
-        
-        if category:
-            courses = [c for c in courses if category.lower() in " ".join(c["tags"]).lower()]
-        
-        if level:
-            courses = [c for c in courses if c["level"] == level.upper()]
-        
-        if price_min is not None:
-            courses = [c for c in courses if c["final_price"] >= price_min]
-        
-        if price_max is not None:
-            courses = [c for c in courses if c["final_price"] <= price_max]
-        
-        if is_free is not None:
-            courses = [c for c in courses if c["is_free"] == is_free]
-        
-        # Sort courses
-        reverse = order == "desc"
-        if sort_by == "popularity":
-            courses.sort(key=lambda x: x["enrollment_count"], reverse=reverse)
-        elif sort_by == "rating":
-            courses.sort(key=lambda x: x["rating"], reverse=reverse)
-        elif sort_by == "price":
-            courses.sort(key=lambda x: x["final_price"], reverse=reverse)
-        else:
-            courses.sort(key=lambda x: x[sort_by], reverse=reverse)
-        
-        # Add enrollment status for authenticated users
-        if current_user:
-            for course in courses:
-                course["is_enrolled"] = course["id"] % 7 == 0
-                course["progress"] = random.randint(0, 100) if course["is_enrolled"] else 0
-        
-        return {
-            "data": courses[skip:skip + limit],
-            "total": len(courses),
-            "skip": skip,
-            "limit": limit,
-            "filters": {
-                "categories": ["Programming", "Design", "Marketing", "Business", "Technology"],
-                "levels": ["BEGINNER", "INTERMEDIATE", "ADVANCED"],
-                "price_range": {"min": 0, "max": 500}
+        def load(session: Session) -> dict:
+            filters = {
+                "academy_id": academy_id,
+                "level": level,
+                "price_from": price_min,
+                "price_to": price_max
             }
-        }
+
+            if search:
+                results = course_search_engine.search(
+                    session, search, filters={**filters, "category_title": category, "price_to": 0 if is_free else price_max}, offset=skip, limit=limit
+                )
+                rows_by_id = {
+                    row.course_id: row
+                    for row in session.query(CourseCatalog).filter(CourseCatalog.course_id.in_(results["course_ids"])).all()
+                } if results["course_ids"] else {}
+                rows = [rows_by_id[course_id] for course_id in results["course_ids"] if course_id in rows_by_id]
+                page = {"total": results["total"], "total_is_estimate": False, "next_cursor": None}
+                facets = results["facets"]
+            else:
+                page = course_catalog_service.list_courses(
+                    session,
+                    filters={**filters, "category_title": category, "is_free": is_free},
+                    sort="newest" if sort_by == "created_at" else sort_by,
+                    descending=order == "desc",
+                    cursor=cursor,
+                    limit=limit,
+                    offset=None if cursor else skip
+                )
+                rows = page["items"]
+                facets = None
+            courses = _with_image_variants([course_catalog_service.serialize(row) for row in rows])
+
+            return {
+                "data": _with_enrollment_status(session, courses, current_user),
+                "total": page["total"],
+                "total_is_estimate": page["total_is_estimate"],
+                "skip": skip,
+                "limit": limit,
+                "next_cursor": page["next_cursor"],
+                "facets": facets,
+                "filters": {
+                    "levels": ["BEGINNER", "INTERMEDIATE", "ADVANCED"]
+                }
+            }
+
+        return await db.run_sync(load)
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="مؤشر الصفحة غير صالح"
+        )
     except Exception as e:
         return {
             "status": "error",
@@ -147,24 +123,23 @@ def get_courses(
 
 
 @router.get("/public/courses/featured")
-def get_featured_courses(
+async def get_featured_courses(
     limit: int = Query(8, ge=1, le=20),
-    current_user = Depends(get_optional_current_user)
+    current_user = Depends(get_optional_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ) -> Any:
     """Get featured courses"""
     try:
-        courses = [generate_mock_course_public(i) for i in range(1, 21) if i <= 8]
-        
-        # Add enrollment status for authenticated users
-        if current_user:
-            for course in courses:
-                course["is_enrolled"] = course["id"] % 7 == 0
-                course["progress"] = random.randint(0, 100) if course["is_enrolled"] else 0
-        
-        return {
-            "data": courses[:limit],
-            "total": len(courses)
-        }
+        def load(session: Session) -> dict:
+            page = course_catalog_service.list_courses(session, filters={"featured": True}, limit=limit)
+            courses = _with_image_variants([course_catalog_service.serialize(row) for row in page["items"]])
+
+            return {
+                "data": _with_enrollment_status(session, courses, current_user),
+                "total": page["total"]
+            }
+
+        return await db.run_sync(load)
     except Exception as e:
         return {
             "status": "error",
@@ -174,26 +149,30 @@ def get_featured_courses(
         }
 
 
+@router.get("/public/images/manifest")
+def get_image_manifest(
+    path: str = Query(..., description="Stored image path or URL")
+) -> Any:
+    """Width and format variants of an uploaded image, for srcset and <picture>"""
+    manifest = image_variants.manifest(path)
+    if manifest is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="لا توجد نسخ متعددة لهذه الصورة"
+        )
+    return manifest
+
+
 @router.get("/public/courses/search/suggestions")
 def get_search_suggestions(
     query: str = Query(..., min_length=2),
-    limit: int = Query(10, ge=1, le=20)
+    limit: int = Query(10, ge=1, le=20),
+    db: Session = Depends(get_read_db)
 ) -> Any:
     """Get search suggestions based on query"""
-    suggestions = [
-        "Python Programming", "Web Development", "Data Science",
-        "Machine Learning", "Mobile Development", "UI/UX Design",
-        "Digital Marketing", "Business Analysis", "Cybersecurity",
-        "Cloud Computing", "Artificial Intelligence", "React Development"
-    ]
-    
-    # Filter suggestions based on query
-    filtered_suggestions = [
-        s for s in suggestions 
-        if query.lower() in s.lower()
-    ]
-    
+    suggestions = course_search_engine.suggest(db, query, limit)
+
     return {
-        "data": filtered_suggestions[:limit],
-        "total": len(filtered_suggestions)
-    } 
\ No newline at end of file
+        "data": suggestions,
+        "total": len(suggestions)
+    }
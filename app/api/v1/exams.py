@@ -18,6 +18,9 @@ from app.models.course import Course
 from app.models.user import User
 from app.models.student import Student
 from app.core.response_handler import SayanSuccessResponse
+from app.services.course_content import course_content_service
+from app.services.exam_grading import ExamGradingEngine, answer_key_cache, create_free_text_corrector
+from app.services.learning_analytics import learning_analytics
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -253,6 +256,9 @@ async def delete_exam(
                 detail="ليس لديك صلاحية لحذف هذا الامتحان"
             )
         
+        # Kept for the raw-SQL fallback, which runs after a rollback expires the lesson
+        lesson_id = lesson.id
+        
         # Delete exam and all related data
         try:
             # Delete questions and options first
@@ -278,7 +284,10 @@ async def delete_exam(
                     db.execute(text("DELETE FROM question_options WHERE question_id IN (SELECT id FROM questions WHERE exam_id = :exam_id)"), {"exam_id": exam_id})
                     db.execute(text("DELETE FROM questions WHERE exam_id = :exam_id"), {"exam_id": exam_id})
                     db.execute(text("DELETE FROM exams WHERE id = :exam_id"), {"exam_id": exam_id})
+                    # Raw SQL bypasses the flush hook that versions the course content tree
+                    course_content_service.bump_versions(db, {"lessons": {lesson_id}})
                     db.commit()
+                    answer_key_cache.invalidate(exam_id)
                     return SayanSuccessResponse(
                         message="تم حذف الامتحان بنجاح"
                     )
@@ -504,24 +513,49 @@ async def submit_exam_answers(
 ) -> Any:
     """Submit exam answers and get results"""
     
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    engine = ExamGradingEngine(db, corrector=create_free_text_corrector())
+    answer_key = engine.get_answer_key(exam_id)
     
-    if not exam:
+    if not answer_key:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="الامتحان غير موجود"
         )
     
+    try:
+        grading = await engine.grade(answer_key, answers)
+        correction_id = engine.persist(answer_key, current_student.id, grading)
+        learning_analytics.record_exam(
+            db, current_student.id, exam_id, correction_id, grading["percentage"], grading["passed"]
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error grading exam {exam_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"حدث خطأ أثناء تصحيح الامتحان: {str(e)}"
+        )
+    
     return SayanSuccessResponse(
         data={
             "results": {
-                "score": 0,
-                "total_marks": exam.total_marks,
-                "passed": False,
-                "percentage": 0
+                "correction_id": correction_id,
+                "score": grading["total_score"],
+                "total_marks": grading["max_score"],
+                "passed": grading["passed"],
+                "percentage": grading["percentage"],
+                "questions": [
+                    {
+                        "question_id": result["question_id"],
+                        "is_correct": result["is_correct"],
+                        "score": result["score_awarded"],
+                        "max_score": result["max_score"],
+                        "feedback": result["feedback"]
+                    }
+                    for result in grading["questions"]
+                ]
             }
         },
         message="تم تسليم الامتحان بنجاح"
     ) 
-
- 
\ No newline at end of file
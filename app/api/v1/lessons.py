@@ -1,14 +1,16 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Path, BackgroundTasks, Body
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
 import uuid
 import logging
 import os
 import json
 
-from app.deps.database import get_db
+from app.deps.database import get_async_db, get_db
 from app.deps.auth_custom import get_current_academy_user_custom, get_current_student_custom
 from app.models.lesson import Lesson
 from app.models.chapter import Chapter
@@ -34,10 +36,14 @@ from app.services.file_service import FileService
 from app.services.video_streaming import VideoStreamingService
 from app.core.response_handler import SayanSuccessResponse, SayanErrorResponse
 from app.services.lesson_access_service import LessonAccessService
+from app.services.learning_analytics import learning_analytics
+from app.services.media_pipeline import media_pipeline
+from app.services.playback_grants import playback_grants
 from app.services.video_processing import VideoProcessingService
 from app.core.ai_config import AIServiceFactory, ai_config, AIServiceConfig
 from app.core.config import settings
 from app.services.ai.openai_service import OpenAIChatService, OpenAIServiceError
+from app.services.ai.question_generation import QuestionGenerationPipeline
 
 router = APIRouter(tags=["Lessons Management"])
 file_service = FileService()
@@ -433,7 +439,7 @@ async def get_academy_lessons(
 @router.get("/lessons/{lesson_id}", summary="Get Lesson Details")
 async def get_lesson(
     lesson_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_academy_user_custom)
 ) -> Any:
     """
@@ -441,11 +447,9 @@ async def get_lesson(
     Academy owners get direct video access without tokens
     """
     try:
-        from sqlalchemy.orm import joinedload
-        
-        lesson = db.query(Lesson).options(
-            joinedload(Lesson.chapter)
-        ).filter(Lesson.id == lesson_id).first()
+        lesson = await db.scalar(
+            select(Lesson).options(joinedload(Lesson.chapter)).where(Lesson.id == lesson_id)
+        )
         
         if not lesson:
             return SayanErrorResponse(
@@ -455,12 +459,12 @@ async def get_lesson(
             )
         
         # Check permissions and load product relationship
-        course = db.query(Course).options(
-            joinedload(Course.product)
-        ).filter(
-            Course.id == lesson.course_id,
-            Course.academy_id == current_user.academy.id
-        ).first()
+        course = await db.scalar(
+            select(Course).options(joinedload(Course.product)).where(
+                Course.id == lesson.course_id,
+                Course.academy_id == current_user.academy.id
+            )
+        )
         
         if not course:
             return SayanErrorResponse(
@@ -470,20 +474,18 @@ async def get_lesson(
             )
         
         # Get lesson videos
-        videos = db.query(Video).filter(
-            Video.lesson_id == lesson_id,
-            Video.deleted_at.is_(None)
-        ).all()
+        videos = (await db.scalars(
+            select(Video).where(
+                Video.lesson_id == lesson_id,
+                Video.deleted_at.is_(None)
+            )
+        )).all()
         
         # Prepare video information with direct access for academy
         video_info = None
         if lesson.video:
             # Get first video for direct URL
-            first_video = db.query(Video).filter(
-                Video.lesson_id == lesson.id,
-                Video.status == True,
-                Video.deleted_at.is_(None)
-            ).first()
+            first_video = next((video for video in videos if video.status), None)
             
             # Use video ID instead of direct URL
             video_id = first_video.id if first_video else None
@@ -495,6 +497,7 @@ async def get_lesson(
                 "video_duration": lesson.video_duration,
                 "file_size_formatted": f"{round(lesson.size_bytes / (1024*1024), 2)} MB" if lesson.size_bytes else "0 MB",
                 "duration_formatted": f"{lesson.video_duration}m" if lesson.video_duration else "0m",
+                "storyboard_url": first_video.storyboard_url if first_video else None,
                 "videos_count": len(videos),
                 "academy_access": True,  # Academy has direct access
                 "download_available": True  # Academy can download video
@@ -508,6 +511,7 @@ async def get_lesson(
                 "video_duration": 0,
                 "file_size_formatted": "0 MB",
                 "duration_formatted": "0m",
+                "storyboard_url": None,
                 "videos_count": len(videos),
                 "academy_access": True,
                 "download_available": False
@@ -565,7 +569,7 @@ async def get_lesson(
             })
         elif lesson.type == "exam":
             # Get exam information
-            exam = db.query(Exam).filter(Exam.lesson_id == lesson_id).first()
+            exam = await db.scalar(select(Exam).where(Exam.lesson_id == lesson_id).limit(1))
             exam_info = {
                 "has_exam": exam is not None,
                 "exam_id": exam.id if exam else None,
@@ -592,7 +596,7 @@ async def get_lesson(
             })
         elif lesson.type == "tool":
             # Get tool information
-            tools = db.query(InteractiveTool).filter(InteractiveTool.lesson_id == lesson_id).all()
+            tools = (await db.scalars(select(InteractiveTool).where(InteractiveTool.lesson_id == lesson_id))).all()
             tool_info = {
                 "tools_count": len(tools),
                 "tools": [
@@ -747,8 +751,11 @@ async def delete_lesson(
             )
         
         # Delete the lesson (cascade will handle related records)
+        video_ids = [video.id for video in lesson.videos]
         db.delete(lesson)
         db.commit()
+        for video_id in video_ids:
+            playback_grants.revoke(video_id=video_id)
         
         return SayanSuccessResponse(
             message="تم حذف الدرس بنجاح"
@@ -866,6 +873,9 @@ async def upload_lesson_video(
         db.commit()
         db.refresh(video)
         
+        # Measure duration, codecs and layout once, off the request
+        media_pipeline.submit(video.id, file_service.upload_dir / video_path)
+        
         # Prepare response with transcription info
         transcription_info = {
             "can_transcribe": can_transcribe,
@@ -1883,6 +1893,10 @@ async def update_lesson_progress(
             LessonProgress.student_id == current_student.id
         ).first()
         
+        # Values before this update, for learning analytics
+        previous_watched_at = progress.last_watched_at or progress.created_at if progress else None
+        was_completed = bool(progress and progress.completed)
+        
         if not progress:
             # Create new progress record
             lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
@@ -1898,7 +1912,8 @@ async def update_lesson_progress(
                 course_id=lesson.course_id,
                 progress_percentage=progress_data.progress_percentage,
                 completed=progress_data.completed or False,
-                current_position_seconds=progress_data.current_position_seconds or 0
+                current_position_seconds=progress_data.current_position_seconds or 0,
+                last_watched_at=datetime.now()
             )
             
             db.add(progress)
@@ -1911,6 +1926,8 @@ async def update_lesson_progress(
                 progress.current_position_seconds = progress_data.current_position_seconds
             progress.last_watched_at = datetime.now()
         
+        db.flush()
+        learning_analytics.record_progress(db, progress, previous_watched_at, was_completed)
         db.commit()
         db.refresh(progress)
         
@@ -2315,12 +2332,12 @@ async def create_exam_lesson_with_ai(
                     VideoTranscription.processing_status == ProcessingStatus.COMPLETED
                 ).all()
                 
-                combined_content = []
+                content_sources = []
                 
-                # Add video transcription content
+                # Add video transcription content (one source per lesson)
                 for transcript in chapter_transcripts:
                     if transcript.transcription_text and transcript.transcription_text.strip():
-                        combined_content.append(f"محتوى الدرس: {transcript.transcription_text}")
+                        content_sources.append(f"محتوى الدرس: {transcript.transcription_text}")
                         context_sources.append({
                             "type": "video_transcription",
                             "lesson_id": transcript.lesson_id
@@ -2328,24 +2345,24 @@ async def create_exam_lesson_with_ai(
                 
                 # Add provided exam description
                 if exam_description and exam_description.strip():
-                    combined_content.append(f"وصف الاختبار: {exam_description}")
+                    content_sources.append(f"وصف الاختبار: {exam_description}")
                     context_sources.append({
                         "type": "provided_description",
                         "content": exam_description
                     })
                 
                 # Check if we have content to work with
-                if not combined_content:
+                if not content_sources:
                     return SayanErrorResponse(
                         message="لا توجد محتويات فيديو أو نصوص في هذا الفصل. يجب إضافة وصف للاختبار أو رفع فيديوهات الدروس أولاً",
                         error_type="NO_CONTENT_AVAILABLE",
                         status_code=400
                     )
                 
-                # Generate questions using AI
+                # Generate questions using AI over the full chapter content
                 questions_created = await generate_ai_questions(
                     exam_id=exam.id,
-                    content="\n\n".join(combined_content),
+                    content_sources=content_sources,
                     questions_count=questions_count,
                     difficulty_level=difficulty_level,
                     question_types=question_types.split(",") if question_types else ["multiple_choice"],
@@ -2435,7 +2452,7 @@ async def create_exam_lesson_with_ai(
 
 async def generate_ai_questions(
     exam_id: str,
-    content: str,
+    content_sources: List[str],
     questions_count: int,
     difficulty_level: str,
     question_types: List[str],
@@ -2445,6 +2462,10 @@ async def generate_ai_questions(
     """
     Generate questions using AI based on provided content
     
+    Every source is split into token-bounded chunks, candidates are
+    generated per chunk concurrently, deduplicated and balanced, then
+    bulk-inserted into the current transaction.
+    
     Returns:
         Number of questions successfully created
     """
@@ -2460,139 +2481,17 @@ async def generate_ai_questions(
         )
         
         ai_service = OpenAIChatService(config)
+        pipeline = QuestionGenerationPipeline(ai_service)
         
-        # Prepare system prompt for question generation
-        system_prompt = """أنت خبير في إنشاء الأسئلة التعليمية. مهمتك إنشاء أسئلة تعليمية عالية الجودة بناءً على المحتوى المقدم.
-        يجب أن تكون الأسئلة واضحة ومفيدة وتقيس فهم الطلاب للمحتوى بشكل فعال.
-        تأكد من أن الأسئلة متنوعة وتغطي جوانب مختلفة من المحتوى."""
-        
-        # Prepare generation prompt
-        types_text = ", ".join(question_types)
-        generation_prompt = f"""
-        بناءً على المحتوى التالي، أنشئ {questions_count} سؤال تعليمي:
-
-        المحتوى:
-        {content[:4000]}
-
-        المتطلبات:
-        - عدد الأسئلة: {questions_count}
-        - مستوى الصعوبة: {difficulty_level}
-        - أنواع الأسئلة: {types_text}
-        - يجب أن تكون الأسئلة باللغة العربية
-        - اجعل الأسئلة مفيدة وتقيس الفهم الحقيقي
-
-        قدم الأسئلة في تنسيق JSON بالشكل التالي:
-        {{
-            "questions": [
-                {{
-                    "type": "multiple_choice",
-                    "question": "نص السؤال",
-                    "options": [
-                        {{"text": "الخيار الأول", "is_correct": false}},
-                        {{"text": "الخيار الثاني", "is_correct": true}},
-                        {{"text": "الخيار الثالث", "is_correct": false}},
-                        {{"text": "الخيار الرابع", "is_correct": false}}
-                    ],
-                    "explanation": "شرح الإجابة الصحيحة"
-                }},
-                {{
-                    "type": "true_false",
-                    "question": "نص السؤال",
-                    "options": [
-                        {{"text": "صحيح", "is_correct": true}},
-                        {{"text": "خطأ", "is_correct": false}}
-                    ],
-                    "explanation": "شرح الإجابة"
-                }}
-            ]
-        }}
-        """
-        
-        # Generate questions using AI
-        messages = [{"role": "user", "content": generation_prompt}]
-        
-        ai_response = await ai_service.generate_completion(
-            messages=messages,
-            system_prompt=system_prompt,
-            academy_id=academy_id,
-            max_tokens=2000,
-            temperature=0.7
+        result = await pipeline.generate(
+            sources=content_sources,
+            questions_count=questions_count,
+            difficulty_level=difficulty_level,
+            question_types=question_types,
+            academy_id=academy_id
         )
         
-        # Parse AI response
-        try:
-            # Clean and parse JSON response
-            response_content = ai_response["content"].strip()
-            
-            # Extract JSON if it's wrapped in markdown
-            if "```json" in response_content:
-                start_idx = response_content.find("```json") + 7
-                end_idx = response_content.find("```", start_idx)
-                response_content = response_content[start_idx:end_idx].strip()
-            elif "```" in response_content:
-                start_idx = response_content.find("```") + 3
-                end_idx = response_content.find("```", start_idx)
-                response_content = response_content[start_idx:end_idx].strip()
-            
-            questions_data = json.loads(response_content)
-            questions_list = questions_data.get("questions", [])
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse AI response as JSON: {str(e)}")
-            logger.error(f"AI Response: {ai_response['content'][:500]}")
-            raise OpenAIServiceError("فشل في تحليل استجابة توليد الأسئلة")
-        
-        # Create questions in database
-        created_count = 0
-        
-        for question_data in questions_list:
-            try:
-                # Determine question type
-                q_type = question_data.get("type", "multiple_choice")
-                if q_type == "multiple_choice":
-                    question_type = QuestionType.MULTIPLE_CHOICE
-                elif q_type == "true_false":
-                    question_type = QuestionType.TRUE_FALSE
-                else:
-                    question_type = QuestionType.TEXT
-                
-                # Create question
-                question = Question(
-                    exam_id=exam_id,
-                    title=question_data.get("question", ""),
-                    description=question_data.get("explanation", ""),
-                    type=question_type,
-                    score=10,
-                    is_ai_generated=True
-                )
-                
-                db.add(question)
-                db.flush()
-                
-                # Add options for choice-based questions
-                options = question_data.get("options", [])
-                correct_answer_text = ""
-                
-                for option_data in options:
-                    option = QuestionOption(
-                        question_id=question.id,
-                        text=option_data.get("text", ""),
-                        is_correct=option_data.get("is_correct", False)
-                    )
-                    db.add(option)
-                    
-                    if option_data.get("is_correct", False):
-                        correct_answer_text = option_data.get("text", "")
-                
-                # Set correct answer
-                question.correct_answer = correct_answer_text
-                created_count += 1
-                
-            except Exception as question_error:
-                logger.error(f"Error creating individual question: {str(question_error)}")
-                continue
-        
-        return created_count
+        return pipeline.persist_questions(db, exam_id, result["questions"])
         
     except OpenAIServiceError:
         raise
@@ -5,11 +5,13 @@ Current user profile management with complete academy details
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
-from app.deps import get_db, get_current_user
+from app.deps import get_async_db, get_db, get_read_db, get_current_user
 from app.models.user import User
 from app.models.student import Student
 from app.models.academy import AcademyUser, Academy
@@ -18,14 +20,15 @@ from app.models.template import Template, About, Slider, Faq, Opinion
 from app.models.settings import Settings
 from app.schemas.base import BaseResponse
 from app.core.response_handler import SayanSuccessResponse
-from app.crud.academy_content import CRUDAcademyContent
+from app.core.response_utils import etag_matches, not_modified_response
+from app.services.academy_storefront import academy_storefront_service, CACHE_CONTROL
 
 router = APIRouter()
 
 @router.get("/me", response_model=None, summary="Get Current User Profile")
 async def get_current_user_profile(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> dict:
     """Returns the current authenticated user's profile with complete academy details"""
@@ -53,7 +56,7 @@ async def get_current_user_profile(
     academy_memberships = []
 
     if user_type == "student":
-        student = db.query(Student).filter(Student.user_id == user.id).first()
+        student = await db.scalar(select(Student).where(Student.user_id == user.id).limit(1))
         if student:
             student_profile = {
                 "id": student.id,
@@ -67,42 +70,19 @@ async def get_current_user_profile(
         user_info["student_profile"] = student_profile
         
     elif user_type == "academy":
-        memberships = db.query(AcademyUser).filter(AcademyUser.user_id == user.id).all()
-        academy_content = CRUDAcademyContent()
-        
-        for membership in memberships:
-            academy = db.query(Academy).filter(Academy.id == membership.academy_id).first()
+        memberships = (await db.execute(
+            select(AcademyUser, Academy)
+            .join(Academy, Academy.id == AcademyUser.academy_id)
+            .where(AcademyUser.user_id == user.id)
+        )).all()
+        for membership, academy in memberships:
             if academy:
-                # Get academy content with error handling
-                try:
-                    template = academy_content.get_template(db, academy.id)
-                except Exception:
-                    template = None
-                
-                try:
-                    about = academy_content.get_about(db, academy.id)
-                except Exception:
-                    about = None
-                
-                try:
-                    sliders = academy_content.get_sliders(db, academy.id)
-                except Exception:
-                    sliders = []
-                
+                # Academy content comes from the storefront cache shared with /academy/{id}/content
                 try:
-                    faqs = academy_content.get_faqs(db, academy.id)
+                    entry = await db.run_sync(academy_storefront_service.academy_content, academy.id)
+                    content = entry.data
                 except Exception:
-                    faqs = []
-                
-                try:
-                    opinions = academy_content.get_opinions(db, academy.id)
-                except Exception:
-                    opinions = []
-                
-                try:
-                    settings = academy_content.get_settings(db)
-                except Exception:
-                    settings = {}
+                    content = {}
                 
                 academy_memberships.append({
                     "membership_id": membership.id,
@@ -121,12 +101,12 @@ async def get_current_user_profile(
                         "status": getattr(academy, "status", "active"),
                         "created_at": getattr(academy, "created_at", None),
                     },
-                    "template": template,
-                    "about_content": about,
-                    "sliders": sliders,
-                    "faqs": faqs,
-                    "opinions": opinions,
-                    "settings": settings
+                    "template": content.get("template"),
+                    "about_content": content.get("about_content"),
+                    "sliders": content.get("sliders", []),
+                    "faqs": content.get("faqs", []),
+                    "opinions": content.get("opinions", []),
+                    "settings": content.get("settings") or {}
                 })
         
         user_info["academy_memberships"] = academy_memberships
@@ -142,52 +122,25 @@ async def get_current_user_profile(
 async def get_academy_public_content(
     academy_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> dict:
-    """Get public academy content (template, about, sliders, faqs, opinions, settings)"""
+    """
+    Get public academy content (template, about, sliders, faqs, opinions, settings)
+    
+    Served from the storefront cache with an ETag for conditional requests.
+    """
     try:
-        # Check if academy exists
-        academy = db.query(Academy).filter(Academy.id == academy_id).first()
-        if not academy:
+        entry = academy_storefront_service.academy_content(db, academy_id)
+        if not entry:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="الأكاديمية غير موجودة"
             )
         
-        academy_content = CRUDAcademyContent()
-        
-        # Get all academy content
-        template = academy_content.get_template(db, academy_id)
-        about = academy_content.get_about(db, academy_id)
-        sliders = academy_content.get_sliders(db, academy_id)
-        faqs = academy_content.get_faqs(db, academy_id)
-        opinions = academy_content.get_opinions(db, academy_id)
-        settings = academy_content.get_settings(db)
+        if etag_matches(request, entry.etag):
+            return not_modified_response(entry.etag, CACHE_CONTROL)
         
-        content_data = {
-            "academy_info": {
-                "id": academy.id,
-                "name": academy.name,
-                "slug": getattr(academy, "slug", ""),
-                "image": getattr(academy, "image", ""),
-                "email": getattr(academy, "email", ""),
-                "phone": getattr(academy, "phone", ""),
-                "address": getattr(academy, "address", ""),
-                "status": getattr(academy, "status", "active"),
-            },
-            "template": template,
-            "about_content": about,
-            "sliders": sliders,
-            "faqs": faqs,
-            "opinions": opinions,
-            "settings": settings
-        }
-        
-        return SayanSuccessResponse(
-            data=content_data,
-            message="تم جلب محتوى الأكاديمية بنجاح",
-            request=request
-        )
+        return entry.response(request.url.path)
         
     except HTTPException:
         raise
@@ -195,4 +148,4 @@ async def get_academy_public_content(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"خطأ في جلب محتوى الأكاديمية: {str(e)}"
-    ) 
\ No newline at end of file
+    )
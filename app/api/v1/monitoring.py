@@ -0,0 +1,37 @@
+"""
+Monitoring
+==========
+Admin endpoints exposing this worker's runtime statistics
+"""
+
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.deps import get_current_admin
+from app.db.instrumentation import query_stats
+
+router = APIRouter()
+
+
+def _require_admin_user(current_user=Depends(get_current_admin)):
+    if current_user.user_type != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="صلاحيات غير كافية"
+        )
+    return current_user
+
+
+@router.get("/queries", summary="Per-Route Query Statistics")
+def get_query_stats(current_user=Depends(_require_admin_user)) -> Any:
+    """
+    Query count and database time per route over the recent requests
+    served by this worker, most database time first, with the most
+    repeated statement of routes that look like N+1s
+    """
+    return {
+        "repeat_threshold": query_stats.repeat_threshold,
+        "window": query_stats.window,
+        "routes": query_stats.table()
+    }
@@ -14,6 +14,7 @@ from app.models.student import Student
 from app.services.payment_service import PaymentService
 from app.services.cart_service import CartService
 from app.services.moyasar_service import MoyasarService
+from app.services.payment_webhooks import WebhookRejected, ingest_webhook
 from app.core.response_handler import SayanSuccessResponse
 
 
@@ -41,10 +42,9 @@ def process_checkout(
     try:
         # Initialize services
         payment_service = PaymentService(db)
-        cart_service = CartService(db)
         
         # Extract cookie for cart identification
-        cookie_id = cart_service.extract_cookie_id(the_cookie)
+        cookie_id = CartService.extract_cookie_id(the_cookie)
         
         # Create invoice from student's cart
         invoice_result = payment_service.create_invoice_from_cart(
@@ -239,32 +239,30 @@ async def moyasar_webhook(
     db: Session = Depends(get_db)
 ) -> Any:
     """
-    Handle Moyasar webhook for payment status updates
+    Receive a Moyasar webhook; it is stored and acknowledged at once and
+    processed by the webhook workers
     """
     try:
-        moyasar_service = MoyasarService(db)
-        
         body = await request.body()
         signature = request.headers.get("x-moyasar-signature", "")
         
-        webhook_result = moyasar_service.process_webhook(body, signature)
+        webhook_result = ingest_webhook(db, body, signature)
         
-        if webhook_result["success"]:
-            return SayanSuccessResponse(
-                data=webhook_result,
-                message="تم معالجة الـ webhook بنجاح",
-                request=request
-            )
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "message": webhook_result.get("error", "فشل في معالجة الـ webhook"),
-                    "error_type": webhook_result.get("error_code", "Webhook Error"),
-                    "data": None
-                }
-            )
-            
+        return SayanSuccessResponse(
+            data=webhook_result,
+            message="تم استلام الـ webhook",
+            request=request
+        )
+        
+    except WebhookRejected as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": str(e),
+                "error_type": e.error_code,
+                "data": None
+            }
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
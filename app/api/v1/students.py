@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 import random
 
 from app.deps import get_db, get_current_student, get_current_admin
+from app.services.learning_analytics import learning_analytics
 
 router = APIRouter()
 
@@ -413,54 +414,11 @@ def delete_note(
 @router.get("/analytics")
 def get_student_analytics(
     period: str = Query("month", pattern="^(week|month|year)$"),
-    current_user = Depends(get_current_student)
+    current_user = Depends(get_current_student),
+    db: Session = Depends(get_db)
 ) -> Any:
     """Get student learning analytics"""
-    
-    analytics = {
-        "period": period,
-        "study_time": {
-            "total_minutes": random.randint(1000, 5000),
-            "daily_average": random.randint(30, 120),
-            "weekly_data": [
-                {
-                    "day": f"Day {i}",
-                    "minutes": random.randint(0, 180)
-                }
-                for i in range(1, 8)
-            ]
-        },
-        "progress": {
-            "lessons_completed": random.randint(20, 100),
-            "quizzes_passed": random.randint(10, 50),
-            "certificates_earned": random.randint(1, 5),
-            "average_quiz_score": random.randint(75, 95)
-        },
-        "engagement": {
-            "login_days": random.randint(15, 30),
-            "video_completion_rate": random.randint(80, 95),
-            "quiz_participation_rate": random.randint(70, 90),
-            "note_taking_frequency": random.randint(5, 20)
-        },
-        "achievements": [
-            {
-                "id": 1,
-                "title": "Fast Learner",
-                "description": "Completed 10 lessons in a week",
-                "icon": "",
-                "earned_at": datetime.now().isoformat()
-            },
-            {
-                "id": 2,
-                "title": "Quiz Master",
-                "description": "Scored 90%+ on 5 consecutive quizzes",
-                "icon": "",
-                "earned_at": datetime.now().isoformat()
-            }
-        ]
-    }
-    
-    return analytics
+    return learning_analytics.get_analytics(db, current_user.id, period)
 
 
 # Admin endpoints for student management
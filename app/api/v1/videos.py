@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, Any
 
 from app.deps.database import get_db
-from app.deps.auth import get_current_student, get_current_academy_user, get_current_user
+from app.deps.auth import get_current_student, get_current_academy_user, get_current_user, security_scheme
 from app.models.student import Student
 from app.models.lesson import Lesson
 from app.models.video import Video
@@ -12,7 +12,11 @@ from app.models.course import Course
 from app.models.user import User
 from app.models.student_course import StudentCourse
 from app.services.video_streaming import video_streaming_service
+from app.services.media_faststart import seek_indexes
+from app.services.playback_grants import playback_grants
+from app.services.view_counter import view_counter
 from app.services.file_service import file_service
+from app.core.config import settings
 from app.core.response_handler import SayanSuccessResponse, SayanErrorResponse
 
 router = APIRouter()
@@ -22,17 +26,35 @@ router = APIRouter()
 async def watch_video(
     video_id: str,
     request: Request,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    grant: Optional[str] = Query(None, description="Playback grant from a previous response"),
+    db: Session = Depends(get_db)
 ):
     """
     Simple unified video streaming endpoint
     Provide video_id and we handle all verification
+
+    The first request is fully authorized and answered with a playback grant
+    (cookie and X-Playback-Grant header); range requests that present it are
+    served without touching the database.
     """
     try:
         # Block download tools first
-        video_streaming_service._block_download_tools(request)
-        
+        video_streaming_service._check_user_agent(request.headers.get("user-agent", ""))
+        range_header = request.headers.get("range")
+
+        # Fast path: a valid grant already authorized this playback session
+        playback = playback_grants.verify(
+            grant or request.cookies.get(settings.PLAYBACK_GRANT_COOKIE), video_id
+        )
+        if playback:
+            return video_streaming_service.create_range_response(
+                playback.file_path, range_header, playback.file_size, playback.mime_type,
+                seek_indexes.get(playback.file_path, playback.file_size)
+            )
+
+        credentials = await security_scheme(request)
+        current_user = await get_current_user(credentials, db)
+
         # Get video information
         video = db.query(Video).filter(
             Video.id == video_id,
@@ -71,7 +93,7 @@ async def watch_video(
         
         # Academy owner access
         if hasattr(current_user, 'academy') and current_user.user_type == "academy":
-            if course.academy_id == current_user.academy.id:
+            if current_user.academy and course.academy_id == current_user.academy.id:
                 has_access = True
         
         # Student access - free preview
@@ -98,12 +120,29 @@ async def watch_video(
         # Get video file path
         file_path = video_streaming_service.get_video_file_path(video)
         
-        # Log access
+        # Log access once per playback session
         video_streaming_service.log_video_access(db, video_id, current_user.id, request)
         
-        # Create streaming response
-        range_header = request.headers.get("range")
-        return video_streaming_service.create_streaming_response(file_path, range_header)
+        # Create streaming response with a grant for the following range requests
+        # Size and MIME type as measured at upload, once the media probe has run
+        file_size, mime_type = (video.file_size, video.format) if video.probed_at else (None, None)
+        response = video_streaming_service.create_range_response(
+            file_path, range_header, file_size, mime_type, seek_indexes.get(file_path, file_size)
+        )
+        new_grant = playback_grants.issue(video_id, current_user.id, file_path, file_size, mime_type)
+        if video.storyboard_url:
+            response.headers["X-Storyboard"] = video.storyboard_url
+        response.headers["X-Playback-Grant"] = new_grant
+        response.set_cookie(
+            settings.PLAYBACK_GRANT_COOKIE,
+            new_grant,
+            max_age=settings.PLAYBACK_GRANT_TTL_SECONDS,
+            path=request.url.path,
+            secure=request.url.scheme == "https",
+            httponly=True,
+            samesite="lax"
+        )
+        return response
         
     except HTTPException:
         raise
@@ -550,4 +589,16 @@ async def get_video_info(
         ) 
 
 
- 
\ No newline at end of file
+ 
+
+@router.get("/analytics/daily-views")
+async def get_daily_video_views(
+    days: int = Query(30, ge=1, le=365, description="Number of days up to today"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_academy_user)
+):
+    """Daily views across the academy's videos for the dashboard"""
+    return SayanSuccessResponse(
+        data={"daily_views": view_counter.get_daily_views(db, current_user.academy.id, days)},
+        message="تم استرجاع إحصائيات المشاهدات بنجاح"
+    )
@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 import random
 
 from app.deps import get_db, get_current_academy_user
+from app.models.finance import RollupPeriod, TransactionType
+from app.services.wallet_ledger import wallet_ledger
 
 router = APIRouter()
 
@@ -21,25 +23,6 @@ def generate_mock_wallet():
     }
 
 
-def generate_mock_transaction(trans_id: int, academy_id: int):
-    """Generate mock transaction"""
-    trans_types = ["payment", "withdrawal", "commission", "refund"]
-    trans_type = trans_types[trans_id % len(trans_types)]
-    
-    return {
-        "id": f"TRX_{trans_id}_{academy_id}",
-        "academy_id": academy_id,
-        "type": trans_type,
-        "amount": round(random.uniform(50, 1000), 2),
-        "balance_before": round(random.uniform(1000, 10000), 2),
-        "balance_after": round(random.uniform(1000, 10000), 2),
-        "description": f"{trans_type.capitalize()} transaction #{trans_id}",
-        "reference_id": f"REF_{trans_id}",
-        "status": "completed",
-        "created_at": (datetime.now() - timedelta(days=trans_id)).isoformat()
-    }
-
-
 def generate_mock_withdrawal(withdrawal_id: int, academy_id: int):
     """Generate mock withdrawal request"""
     statuses = ["pending", "approved", "rejected", "completed"]
@@ -65,23 +48,11 @@ def generate_mock_withdrawal(withdrawal_id: int, academy_id: int):
 # Wallet endpoints
 @router.get("/")
 def get_wallet(
-    current_user = Depends(get_current_academy_user)
+    current_user = Depends(get_current_academy_user),
+    db: Session = Depends(get_db)
 ) -> Any:
     """Get academy wallet information"""
-    wallet = generate_mock_wallet()
-    wallet["academy_id"] = 1  # Mock academy ID
-    
-    # Add statistics
-    wallet["statistics"] = {
-        "today_earnings": round(random.uniform(100, 500), 2),
-        "week_earnings": round(random.uniform(1000, 3000), 2),
-        "month_earnings": round(random.uniform(5000, 15000), 2),
-        "pending_payments": random.randint(5, 20),
-        "total_students": random.randint(100, 500),
-        "active_courses": random.randint(10, 30)
-    }
-    
-    return wallet
+    return wallet_ledger.get_wallet(db, current_user.academy.id)
 
 
 @router.post("/withdraw")
@@ -152,106 +123,39 @@ def get_withdrawals(
 @router.get("/stats")
 def get_wallet_statistics(
     period: str = Query("month", pattern="^(day|week|month|year)$"),
-    current_user = Depends(get_current_academy_user)
+    current_user = Depends(get_current_academy_user),
+    db: Session = Depends(get_db)
 ) -> Any:
     """Get wallet statistics"""
-    # Generate mock statistics based on period
-    stats = {
-        "period": period,
-        "start_date": (datetime.now() - timedelta(days=30)).isoformat(),
-        "end_date": datetime.now().isoformat(),
-        "total_revenue": round(random.uniform(10000, 50000), 2),
-        "total_withdrawals": round(random.uniform(5000, 20000), 2),
-        "net_earnings": round(random.uniform(5000, 30000), 2),
-        "commission_rate": 15,  # 15%
-        "commission_paid": round(random.uniform(1500, 7500), 2),
-        "transactions_count": random.randint(50, 200),
-        "average_transaction": round(random.uniform(100, 300), 2),
-        "growth_rate": round(random.uniform(-10, 30), 2),  # Percentage
-        "chart_data": {
-            "labels": [f"Day {i}" for i in range(1, 8)],
-            "revenue": [round(random.uniform(500, 2000), 2) for _ in range(7)],
-            "withdrawals": [round(random.uniform(0, 1000), 2) for _ in range(7)]
-        }
-    }
-    
-    return stats
+    return wallet_ledger.get_statistics(db, current_user.academy.id, RollupPeriod(period))
 
 
 @router.get("/transactions")
 def get_transactions(
-    skip: int = Query(0, ge=0),
+    cursor: Optional[int] = Query(None, ge=1, description="next_cursor of the previous page"),
     limit: int = Query(10, ge=1, le=100),
-    type: Optional[str] = None,
+    type: Optional[TransactionType] = None,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
-    current_user = Depends(get_current_academy_user)
+    current_user = Depends(get_current_academy_user),
+    db: Session = Depends(get_db)
 ) -> Any:
     """Get transaction history"""
-    transactions = [generate_mock_transaction(i, 1) for i in range(1, 51)]
-    
-    # Filter by type
-    if type:
-        transactions = [t for t in transactions if t["type"] == type]
-    
-    # Sort by date (newest first)
-    transactions.sort(key=lambda x: x["created_at"], reverse=True)
-    
-    return {
-        "data": transactions[skip:skip + limit],
-        "total": len(transactions),
-        "skip": skip,
-        "limit": limit
-    }
+    return wallet_ledger.get_transactions(
+        db, current_user.academy.id, limit=limit, cursor=cursor,
+        entry_type=type, date_from=date_from, date_to=date_to
+    )
 
 
 @router.get("/completed-payments")
 def get_completed_payments(
-    skip: int = Query(0, ge=0),
+    cursor: Optional[int] = Query(None, ge=1, description="next_cursor of the previous page"),
     limit: int = Query(10, ge=1, le=100),
-    current_user = Depends(get_current_academy_user)
+    current_user = Depends(get_current_academy_user),
+    db: Session = Depends(get_db)
 ) -> Any:
     """Get completed payments for academy courses"""
-    payments = []
-    
-    for i in range(1, 31):
-        payment = {
-            "id": f"PAY_{i}",
-            "student": {
-                "id": i,
-                "name": f"Student {i}",
-                "email": f"student{i}@example.com"
-            },
-            "course": {
-                "id": (i % 5) + 1,
-                "title": f"Course {(i % 5) + 1}: Programming Basics",
-                "price": 299.99
-            },
-            "amount": 299.99,
-            "commission_rate": 15,
-            "commission_amount": 45.00,
-            "net_amount": 254.99,
-            "payment_method": random.choice(["credit_card", "bank_transfer", "moyasar"]),
-            "status": "completed",
-            "paid_at": (datetime.now() - timedelta(days=i)).isoformat()
-        }
-        payments.append(payment)
-    
-    # Calculate summary
-    summary = {
-        "total_payments": len(payments),
-        "total_amount": sum(p["amount"] for p in payments),
-        "total_commission": sum(p["commission_amount"] for p in payments),
-        "total_net": sum(p["net_amount"] for p in payments)
-    }
-    
-    return {
-        "data": payments[skip:skip + limit],
-        "total": len(payments),
-        "summary": summary,
-        "skip": skip,
-        "limit": limit
-    }
+    return wallet_ledger.get_completed_payments(db, current_user.academy.id, limit=limit, cursor=cursor)
 
 
 # Bank account management
@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import List, Union, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl, validator
 import json
@@ -13,6 +13,17 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: str = ""  # Defaults to DATABASE_URL with its async driver (aiomysql)
+    ASYNC_DB_POOL_SIZE: int = 10
+    ASYNC_DB_MAX_OVERFLOW: int = 10
+    DATABASE_REPLICA_URLS: Union[List[str], str] = []  # Read replicas, JSON list or comma-separated
+    REPLICA_MAX_LAG_SECONDS: float = 5  # Replicas further behind serve no reads
+    REPLICA_HEALTH_CHECK_SECONDS: float = 5
+
+    # Query Instrumentation
+    QUERY_INSTRUMENTATION_ENABLED: bool = True  # Server-Timing headers and per-route query stats
+    QUERY_REPEAT_THRESHOLD: int = 5  # Runs of one statement per request reported as a likely N+1
+    QUERY_STATS_WINDOW: int = 200  # Requests kept per route
 
     # JWT
     SECRET_KEY: str
@@ -79,6 +90,51 @@ class Settings(BaseSettings):
     MOYASAR_SUCCESS_URL: str = ""
     MOYASAR_BACK_URL: str = ""
 
+    # Payment Webhooks
+    PAYMENT_WEBHOOK_WORKERS: int = 2  # Inbox worker threads per process; 0 when run separately
+    PAYMENT_WEBHOOK_MAX_ATTEMPTS: int = 8  # Dead-letter an event after this many failed attempts
+    PAYMENT_WEBHOOK_RETRY_SECONDS: float = 5  # First retry delay, doubled after each failure
+    PAYMENT_WEBHOOK_LEASE_SECONDS: int = 300  # Reclaim events left in processing by a stopped worker
+    PAYMENT_WEBHOOK_POLL_SECONDS: float = 2  # Idle wait between inbox polls
+
+    # Academy Wallet
+    PLATFORM_COMMISSION_RATE: float = 0.15  # Commission for academies without their own rate
+
+    # Learning Analytics
+    LEARNING_HEARTBEAT_MAX_GAP_SECONDS: int = 120  # Longer gaps between progress updates count as a break
+
+    # Video Playback Grants
+    PLAYBACK_GRANT_TTL_SECONDS: int = 600  # Also bounds how long a revocation takes to reach every worker
+    PLAYBACK_GRANT_COOKIE: str = "playback_grant"
+
+    # Video Views
+    VIDEO_VIEW_DEDUPE_SECONDS: int = 1800  # One view per user, video and playback session in this window
+    VIDEO_VIEW_FLUSH_SECONDS: float = 10  # Interval between batched view count writes; 0 disables the flusher
+
+    # HLS Encryption Keys
+    HLS_KEY_EXPIRY_HOURS: int = 24
+    HLS_KEY_CACHE_SIZE: int = 10000  # Hot keys kept per worker
+    HLS_KEY_CACHE_SECONDS: float = 300  # How long a worker may serve a key deleted elsewhere
+
+    # Media Pipeline
+    MEDIA_PROBE_WORKERS: int = 2  # Concurrent ffprobe runs per worker process
+    MEDIA_PROBE_TIMEOUT_SECONDS: int = 120
+    MEDIA_PROBE_KEYFRAME_SECONDS: int = 60  # Leading seconds scanned for the keyframe interval
+    MEDIA_REMUX_TIMEOUT_SECONDS: int = 1800
+    VIDEO_SEEK_RANGE_BYTES: int = 2 * 1024 * 1024  # Least whole-fragment bytes sent for an open-ended range
+    STORYBOARD_INTERVAL_SECONDS: int = 10  # One seek-preview thumbnail per interval
+    STORYBOARD_THUMB_WIDTH: int = 160
+    STORYBOARD_GRID: int = 10  # Thumbnails per sprite sheet side
+    STORYBOARD_FORMAT: str = "webp"  # webp or jpg
+    STORYBOARD_STORAGE_PATH: str = "static/storyboards"
+    STORYBOARD_URL_PREFIX: str = "/static/storyboards"
+
+    # Image Variants
+    IMAGE_VARIANT_WORKERS: int = 2  # Encoding processes per worker process; 0 encodes in a thread
+    IMAGE_VARIANT_AVIF: bool = True  # Only where Pillow was built with AVIF
+    IMAGE_VARIANT_STORAGE_PATH: str = "static/uploads/images"
+    IMAGE_VARIANT_URL_PREFIX: str = "/static/uploads/images"
+
     # AI Assistant Settings - OpenAI Configuration
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4"
@@ -86,6 +142,33 @@ class Settings(BaseSettings):
     OPENAI_TEMPERATURE: float = 0.7
     OPENAI_RATE_LIMIT: int = 40
 
+    # AI Conversation Context
+    AI_CONTEXT_TOKEN_BUDGET: int = 3000  # Prompt tokens for summary + history + new message
+    AI_SUMMARY_TOKEN_BUDGET: int = 400  # Maximum size of the rolling conversation summary
+
+    # Exam Grading
+    EXAM_ANSWER_KEY_TTL_SECONDS: int = 300  # Recompile cached answer keys after this age
+
+    # Course Catalog
+    COURSE_CATALOG_COUNT_TTL_SECONDS: int = 60  # Reuse filtered catalog totals for this long
+    COURSE_CATALOG_DISCOUNT_SWEEP_SECONDS: float = 60  # Ended discounts leave the stored price this often
+
+    # Course Search
+    COURSE_SEARCH_INDEX_PATH: Optional[str] = "storage/search/course_index.pkl"  # Persisted search index
+    COURSE_SEARCH_SYNC_SECONDS: int = 30  # Catch up with catalog changes from other workers
+    COURSE_SEARCH_SYNC_OVERLAP_SECONDS: int = 300  # Re-read rows refreshed this long before the watermark
+
+    # Course Content Tree
+    COURSE_CONTENT_CACHE_SIZE: int = 512  # Assembled chapter/lesson trees kept in memory per worker
+
+    # Academy Storefront
+    ACADEMY_STOREFRONT_CACHE_BYTES: int = 32 * 1024 * 1024  # Rendered storefront pages kept per worker
+    ACADEMY_STOREFRONT_VERSION_TTL_SECONDS: float = 5  # Trust a remembered content version this long
+
+    # Cart
+    CART_SUMMARY_CACHE_SIZE: int = 10000  # Cart badge summaries kept in memory per worker
+    CART_SUMMARY_TTL_SECONDS: float = 60  # Catch up with cart changes made by other workers
+
     # AI Features Toggle
     AI_TRANSCRIPTION_ENABLED: bool = True
     AI_CHAT_ENABLED: bool = True
@@ -104,6 +187,15 @@ class Settings(BaseSettings):
             return v
         raise ValueError(v)
 
+    @validator("DATABASE_REPLICA_URLS", pre=True)
+    def assemble_replica_urls(cls, v: Union[str, List[str]]) -> List[str]:
+        if isinstance(v, str):
+            try:
+                return json.loads(v)
+            except json.JSONDecodeError:
+                return [i.strip() for i in v.split(",") if i.strip()]
+        return v
+
     # pydantic-settings (v2) يسمح بتخصيص مصدر الإعدادات.
     # نحدد ملف env الافتراضي، ونمنع مصادر OS Environment variables.
 
@@ -75,6 +75,17 @@ class FFmpegConfig:
             f"macOS: brew install ffmpeg"
         )
     
+    @classmethod
+    def get_ffprobe_path(cls) -> str:
+        """
+        Detect ffprobe, which is installed next to FFmpeg
+        """
+        ffmpeg_path = cls.get_ffmpeg_path()
+        ffprobe_name = "ffprobe.exe" if ffmpeg_path.endswith(".exe") else "ffprobe"
+        if os.path.dirname(ffmpeg_path):
+            return str(Path(ffmpeg_path).with_name(ffprobe_name))
+        return ffprobe_name
+    
     @classmethod
     def verify_ffmpeg_installation(cls) -> bool:
         """
@@ -7,7 +7,7 @@ Utility functions for creating unified API responses across all endpoints
 from datetime import datetime
 from typing import Any, Dict, Optional, List
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 
@@ -173,6 +173,44 @@ def error_json_response(
     return JSONResponse(status_code=status_code, content=response_data)
 
 
+def etag_matches(request: Optional[Request], etag: str) -> bool:
+    """
+    Check whether the request's If-None-Match already names ``etag``
+    
+    Comparison is weak, as RFC 9110 requires for If-None-Match.
+    """
+    header = request.headers.get("if-none-match") if request else None
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified_response(etag: str, cache_control: str = "private, no-cache") -> Response:
+    """Create an empty 304 response for a matching conditional GET"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def etag_json_response(
+    data: Any,
+    etag: str,
+    message: str = "تم الطلب بنجاح",
+    request: Optional[Request] = None,
+    cache_control: str = "private, no-cache"
+) -> JSONResponse:
+    """
+    Create a unified success response that clients can revalidate with ``etag``
+    
+    Callers check ``etag_matches`` first so a 304 skips building ``data``.
+    """
+    response = success_json_response(data=data, message=message, request=request)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
 # Arabic error messages mapping
 ERROR_MESSAGES = {
     400: "طلب غير صحيح",
@@ -0,0 +1,21 @@
+import mimetypes
+
+from starlette.responses import Response
+from fastapi.staticfiles import StaticFiles
+
+# Not in every system's mime.types
+mimetypes.add_type("text/vtt", ".vtt")
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    Static files whose URLs change whenever their content does,
+    so browsers and CDNs may keep them for a year without revalidating
+    """
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -329,6 +329,38 @@ class CRUDAcademyContent:
         except Exception as e:
             raise Exception(f"Error creating/updating settings: {str(e)}")
     
+    def get_storefront_content(
+        self, db: Session, academy_id: int, public: bool = True, limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Read-only bundle of academy content for storefront pages
+        
+        Unlike ``get_template``/``get_settings`` nothing is created when
+        missing, so building a cached page never writes. ``public`` keeps
+        only active sliders and approved opinions; ``limit`` caps the
+        sliders, FAQs and opinions each.
+        """
+        try:
+            sliders = db.query(Slider).filter(Slider.academy_id == academy_id)
+            opinions = db.query(Opinion).filter(Opinion.academy_id == academy_id)
+            if public:
+                sliders = sliders.filter(Slider.is_active == True)
+                opinions = opinions.filter(Opinion.is_approved == True)
+            return {
+                "template": db.query(Template).filter(Template.academy_id == academy_id).first(),
+                "about": self.get_about(db, academy_id),
+                "sliders": sliders.order_by(Slider.order, Slider.id).limit(limit).all(),
+                "faqs": db.query(Faq).filter(
+                    and_(
+                        Faq.academy_id == academy_id,
+                        Faq.is_active == True
+                    )
+                ).order_by(Faq.order, Faq.id).limit(limit).all(),
+                "opinions": opinions.order_by(desc(Opinion.created_at), desc(Opinion.id)).limit(limit).all()
+            }
+        except Exception as e:
+            raise Exception(f"Error retrieving storefront content: {str(e)}")
+    
     def get_academy_content_summary(self, db: Session, academy_id: int) -> Dict[str, Any]:
         """Get summary of all academy content"""
         try:
@@ -0,0 +1,221 @@
+"""
+Per-Request Query Instrumentation
+=================================
+
+Counts the SQL every request runs, so N+1 patterns show up in response
+headers, an admin table and the test suite instead of in production.
+
+- ``before_cursor_execute``/``after_cursor_execute`` listeners on every
+  engine (primary, replicas, the async engines' sync side) add each
+  statement to the current request's ``RequestQueries``: count, time in
+  the driver, and how often each statement fingerprint ran. The request
+  is found through a context variable, which threadpool and ``run_sync``
+  calls inherit; statements outside a request are not counted.
+- ``QueryInstrumentationMiddleware`` is a pure ASGI middleware, outermost,
+  that opens the per-request record and adds a ``Server-Timing`` header
+  (``db`` time and query count, ``app`` time). For streaming responses
+  the header reflects the queries run before the body started.
+- A fingerprint is the statement with literals and ``IN`` lists folded,
+  so ``WHERE id = 3`` and ``WHERE id = 4`` match. One that runs
+  ``QUERY_REPEAT_THRESHOLD`` or more times in a request is a likely N+1
+  and is logged the first time it is seen on a route.
+- ``QueryStats`` keeps the last ``QUERY_STATS_WINDOW`` requests per route
+  template (per worker) for ``GET /api/v1/admin/monitoring/queries``.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETER_LISTS = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))+\s*\)")
+
+
+def fingerprint(statement: str) -> str:
+    """The statement with literals and parameter lists folded"""
+    statement = _LITERALS.sub("?", _WHITESPACE.sub(" ", statement).strip())
+    return _PARAMETER_LISTS.sub("(?)", statement)
+
+
+@dataclass
+class RequestQueries:
+    """What one request ran against the database"""
+    count: int = 0
+    seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Fingerprints that ran at least ``threshold`` times, most frequent first"""
+        return [(statement, times) for statement, times in self.statements.most_common() if times >= threshold]
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def current_queries() -> Optional[RequestQueries]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None and context is not None:
+        context._instrumentation_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    started = getattr(context, "_instrumentation_started", None)
+    if queries is None or started is None:
+        return
+    queries.count += 1
+    queries.seconds += time.perf_counter() - started
+    queries.statements[fingerprint(statement)] += 1
+
+
+def install():
+    """Listen on every engine; safe to call more than once"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@dataclass(frozen=True)
+class RequestSample:
+    queries: int
+    db_seconds: float
+    seconds: float
+    repeated: Optional[Tuple[str, int]]  # The most repeated fingerprint at or over the threshold
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class QueryStats:
+    """Rolling per-route query counts and database time"""
+
+    def __init__(self, window: int = 200, repeat_threshold: int = 5, max_routes: int = 500):
+        self.window = window
+        self.repeat_threshold = repeat_threshold
+        self.max_routes = max_routes
+        self.listeners: List[Callable[[str, RequestQueries], Any]] = []
+        self._routes: "OrderedDict[str, Deque[RequestSample]]" = OrderedDict()
+        self._totals: Counter = Counter()
+        self._reported: set = set()
+        self._lock = threading.Lock()
+
+    def record(self, route: str, queries: RequestQueries, seconds: float):
+        repeated = queries.repeated(self.repeat_threshold)
+        sample = RequestSample(
+            queries=queries.count,
+            db_seconds=queries.seconds,
+            seconds=seconds,
+            repeated=repeated[0] if repeated else None
+        )
+        with self._lock:
+            samples = self._routes.get(route)
+            if samples is None:
+                samples = self._routes[route] = deque(maxlen=self.window)
+                while len(self._routes) > self.max_routes:
+                    evicted, _ = self._routes.popitem(last=False)
+                    self._totals.pop(evicted, None)
+            samples.append(sample)
+            self._totals[route] += 1
+            first_seen = [(statement, times) for statement, times in repeated if (route, statement) not in self._reported]
+            self._reported.update((route, statement) for statement, _ in first_seen)
+        for statement, times in first_seen:
+            logger.warning(f"Possible N+1 on {route}: {times} times in one request: {statement[:300]}")
+        for listener in list(self.listeners):
+            listener(route, queries)
+
+    def table(self) -> List[Dict[str, Any]]:
+        """One row per route, most database time first"""
+        with self._lock:
+            routes = [(route, list(samples), self._totals[route]) for route, samples in self._routes.items()]
+        rows = []
+        for route, samples, total in routes:
+            counts = [sample.queries for sample in samples]
+            db_seconds = [sample.db_seconds for sample in samples]
+            repeats = [sample.repeated for sample in samples if sample.repeated]
+            worst = max(repeats, key=lambda repeat: repeat[1]) if repeats else None
+            rows.append({
+                "route": route,
+                "requests": total,
+                "window": len(samples),
+                "queries_avg": round(sum(counts) / len(counts), 1),
+                "queries_max": max(counts),
+                "db_ms_avg": round(sum(db_seconds) / len(samples) * 1000, 2),
+                "db_ms_p95": round(_percentile(db_seconds, 0.95) * 1000, 2),
+                "db_share": round(sum(db_seconds) / max(sum(sample.seconds for sample in samples), 1e-9), 3),
+                "repeated_requests": len(repeats),
+                "worst_repeat": {"statement": worst[0], "times": worst[1]} if worst else None
+            })
+        rows.sort(key=lambda row: row["db_ms_avg"] * row["window"], reverse=True)
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+            self._totals.clear()
+            self._reported.clear()
+
+
+def route_key(scope: Dict[str, Any]) -> Optional[str]:
+    """``METHOD /path/{template}`` of the matched route; None for mounts and unmatched paths"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return f"{scope['method']} {path}" if path else None
+
+
+class QueryInstrumentationMiddleware:
+    """Pure ASGI middleware recording each request's queries"""
+
+    def __init__(self, app, stats: "QueryStats" = None):
+        self.app = app
+        self.stats = stats or query_stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        queries = RequestQueries()
+        token = _current.set(queries)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries", app;dur={elapsed * 1000:.1f}'
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = route_key(scope)
+            if route is not None:
+                self.stats.record(route, queries, time.perf_counter() - started)
+
+
+query_stats = QueryStats(
+    window=settings.QUERY_STATS_WINDOW,
+    repeat_threshold=settings.QUERY_REPEAT_THRESHOLD
+)
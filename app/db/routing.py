@@ -0,0 +1,288 @@
+"""
+Read/Write Session Routing
+==========================
+
+Sends the reads of endpoints tagged with ``get_read_db`` or
+``get_async_read_db`` to read replicas; everything else stays on the
+primary through ``get_db``/``get_async_db``.
+
+- Replicas come from ``DATABASE_REPLICA_URLS``. A background thread
+  checks each one every ``REPLICA_HEALTH_CHECK_SECONDS``: it must answer,
+  be replicating (``SHOW REPLICA STATUS``, or ``SHOW SLAVE STATUS`` on
+  older servers) and be at most ``REPLICA_MAX_LAG_SECONDS`` behind. A
+  replica whose connection drops is taken out at once, without waiting
+  for the next check. With no replica fit to serve, reads go to the
+  primary.
+- Read-your-writes: every successful write request sets a short-lived
+  ``db_written_at`` cookie with the time of the write. While it is
+  present a replica only serves the client if, as of its last check, it
+  had applied everything up to that time; otherwise the read goes to the
+  primary. The cookie lives for one lag budget plus one check interval,
+  after which every healthy replica qualifies again. The timestamps come
+  from the application servers' clocks, which are assumed to agree.
+- Read sessions refuse to write: flushing ORM changes and executing any
+  INSERT, UPDATE, DELETE or DDL, whether built with Core or written as
+  text, raise ``ReadOnlySessionError``. A tagged endpoint that starts
+  writing fails loudly instead of writing to a replica.
+- Replicas can be any URLs SQLAlchemy understands; two SQLite files work
+  as local stand-ins, which are always treated as caught up.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+
+logger = logging.getLogger(__name__)
+
+WRITTEN_AT_COOKIE = "db_written_at"
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class ReadOnlySessionError(RuntimeError):
+    """A read session was asked to write"""
+
+
+_WRITE_KEYWORDS = frozenset({
+    "INSERT", "UPDATE", "DELETE", "REPLACE", "MERGE", "UPSERT",
+    "CREATE", "ALTER", "DROP", "TRUNCATE", "RENAME", "GRANT", "REVOKE", "LOCK"
+})
+
+
+def _reject_writes(conn, cursor, statement, parameters, context, executemany):
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if keyword in _WRITE_KEYWORDS or (
+        context is not None and (context.isinsert or context.isupdate or context.isdelete)
+    ):
+        raise ReadOnlySessionError(f"Read-only endpoints must use get_db for writes: {statement[:100]}")
+
+
+class ReadOnlySession(Session):
+    """Session handed to read-only endpoints; it may be bound to a replica"""
+
+    def flush(self, objects=None):
+        if self.new or self.dirty or self.deleted:
+            raise ReadOnlySessionError("Read-only endpoints must use get_db for writes")
+        super().flush(objects)
+
+
+@event.listens_for(ReadOnlySession, "after_begin")
+def _guard_connection(session, transaction, connection):
+    # Every statement the session runs goes through this connection, ORM or Core
+    if not event.contains(connection, "before_cursor_execute", _reject_writes):
+        event.listen(connection, "before_cursor_execute", _reject_writes)
+
+
+@dataclass
+class Replica:
+    """One read replica and what its last health check saw"""
+    name: str
+    url: str
+    engine: Engine
+    healthy: bool = False
+    lag: Optional[float] = None  # Seconds behind the primary
+    checked_at: Optional[float] = None
+    error: Optional[str] = None
+    async_engine: Optional[AsyncEngine] = field(default=None, repr=False)
+
+
+def replica_lag(connection: Connection) -> Optional[float]:
+    """Seconds a replica is behind its source; None when replication is stopped"""
+    if connection.dialect.name == "mysql":
+        for statement, column in (
+            ("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+            ("SHOW SLAVE STATUS", "Seconds_Behind_Master")  # MySQL before 8.0.22, MariaDB
+        ):
+            try:
+                row = connection.exec_driver_sql(statement).mappings().first()
+            except DBAPIError:
+                continue
+            if row is None:
+                return 0.0  # Not replicating: a stand-in, or another primary
+            return None if row[column] is None else float(row[column])
+    # Other databases, or no privilege to read the status: reachable is all we know
+    connection.exec_driver_sql("SELECT 1")
+    return 0.0
+
+
+def written_at_from(value: Optional[str]) -> Optional[float]:
+    """The write timestamp of a ``db_written_at`` cookie; None when absent or malformed"""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class ReplicaRouter:
+    """Picks the database each read session talks to"""
+
+    def __init__(
+        self,
+        primary: Engine,
+        replica_urls: Iterable[str] = (),
+        primary_async: Optional[Callable[[], AsyncEngine]] = None,
+        max_lag_seconds: float = 5,
+        check_seconds: float = 5,
+        engine_factory: Callable[[str], Engine] = create_engine,
+        async_engine_factory: Optional[Callable[[str], AsyncEngine]] = None,
+        lag_probe: Callable[[Connection], Optional[float]] = replica_lag,
+        clock: Callable[[], float] = time.time
+    ):
+        self.primary = primary
+        self.primary_async = primary_async
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.async_engine_factory = async_engine_factory
+        self.lag_probe = lag_probe
+        self.clock = clock
+        self.replicas = [
+            Replica(name=f"replica-{number}", url=url, engine=engine_factory(url))
+            for number, url in enumerate(replica_urls, start=1)
+        ]
+        for replica in self.replicas:
+            self._watch(replica, replica.engine)
+
+        self._sessions = sessionmaker(class_=ReadOnlySession, autoflush=False)
+        self._async_sessions = async_sessionmaker(
+            sync_session_class=ReadOnlySession, autoflush=False, expire_on_commit=False
+        )
+        self._turn = itertools.count()
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def sticky_seconds(self) -> int:
+        """Lifetime of the write cookie: by then a check has seen every healthy replica past the write"""
+        return int(self.max_lag_seconds + self.check_seconds) + 1
+
+    # ----------------------------------------
+    # Health
+    # ----------------------------------------
+
+    def check(self):
+        """Probe every replica once"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    lag = self.lag_probe(connection)
+                error = None if lag is not None else "Replication is stopped"
+            except Exception as e:
+                lag, error = None, str(e)
+            healthy = lag is not None and lag <= self.max_lag_seconds
+            if replica.healthy and not healthy:
+                logger.warning(f"Read replica {replica.name} out of rotation: {error or f'{lag:.1f}s behind'}")
+            elif healthy and not replica.healthy:
+                logger.info(f"Read replica {replica.name} in rotation, {lag:.1f}s behind")
+            with self._lock:
+                replica.healthy, replica.lag, replica.error = healthy, lag, error
+                replica.checked_at = self.clock()
+        self._checked_at = self.clock()
+
+    def _watch(self, replica: Replica, engine: Engine):
+        # A dropped connection takes the replica out until the next check brings it back
+        @event.listens_for(engine, "handle_error")
+        def _on_error(context):
+            if context.is_disconnect and replica.healthy:
+                with self._lock:
+                    replica.healthy = False
+                    replica.error = str(context.original_exception)
+                logger.warning(f"Read replica {replica.name} out of rotation: connection lost")
+
+    def status(self) -> List[Dict]:
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag,
+                "checked_at": replica.checked_at,
+                "error": replica.error
+            }
+            for replica in self.replicas
+        ]
+
+    # ----------------------------------------
+    # Routing
+    # ----------------------------------------
+
+    def choose(self, written_at: Optional[float] = None) -> Optional[Replica]:
+        """A replica fit to serve the read, in turn; None sends it to the primary"""
+        if not self.replicas:
+            return None
+        if self._checked_at is None:
+            self.check()  # Scripts and tests that never started the health thread
+        with self._lock:
+            candidates = [
+                replica for replica in self.replicas
+                if replica.healthy and (
+                    # Caught up with the client's write as of the last check
+                    written_at is None or replica.checked_at - replica.lag >= written_at
+                )
+            ]
+            if not candidates:
+                return None
+            return candidates[next(self._turn) % len(candidates)]
+
+    def read_session(self, written_at: Optional[float] = None) -> Session:
+        replica = self.choose(written_at)
+        db = self._sessions(bind=replica.engine if replica else self.primary)
+        db.info["replica"] = replica.name if replica else None
+        return db
+
+    def async_read_session(self, written_at: Optional[float] = None) -> AsyncSession:
+        replica = self.choose(written_at)
+        db = self._async_sessions(bind=self._async_engine(replica) if replica else self.primary_async())
+        db.sync_session.info["replica"] = replica.name if replica else None
+        return db
+
+    def _async_engine(self, replica: Replica) -> AsyncEngine:
+        with self._lock:
+            if replica.async_engine is None:
+                replica.async_engine = self.async_engine_factory(replica.url)
+                self._watch(replica, replica.async_engine.sync_engine)
+            return replica.async_engine
+
+    # ----------------------------------------
+    # Lifecycle
+    # ----------------------------------------
+
+    def start(self):
+        if self._thread or not self.replicas or self.check_seconds <= 0:
+            return
+        self.check()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.check_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning(f"Read replica health check failed: {e}")
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    async def dispose_async(self):
+        for replica in self.replicas:
+            engine, replica.async_engine = replica.async_engine, None
+            if engine is not None:
+                await engine.dispose()
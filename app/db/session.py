@@ -1,7 +1,12 @@
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db.routing import ReplicaRouter
 
 # Create engine for MySQL with improved connection handling
 engine = create_engine(
@@ -22,4 +27,78 @@ engine = create_engine(
     }
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) 
\ No newline at end of file
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# Async engine for endpoints migrated to AsyncSession. It runs side by side
+# with the sync engine above, on its own pool, and is created on first use
+# so workers that never serve an async endpoint open no extra connections.
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite"
+}
+
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+_async_engine: Optional[AsyncEngine] = None
+
+
+def async_database_url(url: str) -> str:
+    """The same database through its async driver"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+def _create_async_engine(url: str) -> AsyncEngine:
+    options = {"pool_pre_ping": True, "pool_recycle": 3600, "echo": settings.DEBUG}
+    if url.startswith("mysql"):
+        options.update(
+            pool_size=settings.ASYNC_DB_POOL_SIZE,
+            max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+            pool_timeout=30,
+            connect_args={"connect_timeout": 60, "charset": "utf8mb4", "autocommit": False}
+        )
+    return create_async_engine(url, **options)
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = _create_async_engine(settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL))
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    global _async_engine
+    engine, _async_engine = _async_engine, None
+    if engine is not None:
+        await engine.dispose()
+
+
+# Read replicas for endpoints tagged with get_read_db / get_async_read_db
+def create_replica_engine(url: str) -> Engine:
+    """A replica engine with the primary's pool settings"""
+    options = {"pool_pre_ping": True, "pool_recycle": 3600, "echo": settings.DEBUG}
+    if url.startswith("mysql"):
+        options.update(
+            pool_size=5,
+            max_overflow=10,
+            pool_timeout=30,
+            connect_args={"connect_timeout": 60, "read_timeout": 60, "charset": "utf8mb4", "autocommit": False}
+        )
+    return create_engine(url, **options)
+
+
+replica_router = ReplicaRouter(
+    engine,
+    settings.DATABASE_REPLICA_URLS,
+    primary_async=get_async_engine,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    check_seconds=settings.REPLICA_HEALTH_CHECK_SECONDS,
+    engine_factory=create_replica_engine,
+    async_engine_factory=lambda url: _create_async_engine(async_database_url(url))
+)
@@ -0,0 +1,43 @@
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy.orm import Session
+
+
+def upsert_increment(
+    db: Session,
+    model,
+    rows: List[Dict[str, Any]],
+    keys: Sequence[str],
+    increments: Sequence[str] = (),
+    updates: Sequence[str] = ()
+) -> None:
+    """
+    Insert rows in one statement.
+
+    On a conflict on ``keys`` the ``increments`` columns of the existing row
+    are increased by the new row's values and the ``updates`` columns are
+    replaced by them; without either the existing row is left alone.
+    """
+    dialect = db.get_bind().dialect.name
+    table = model.__table__
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        statement = mysql_insert(table).values(rows)
+        changes = {name: table.c[name] + statement.inserted[name] for name in increments}
+        changes.update({name: statement.inserted[name] for name in updates})
+        statement = statement.on_duplicate_key_update(changes or {keys[0]: statement.inserted[keys[0]]})
+    elif dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as conflict_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as conflict_insert
+        statement = conflict_insert(table).values(rows)
+        if increments or updates:
+            changes = {name: table.c[name] + statement.excluded[name] for name in increments}
+            changes.update({name: statement.excluded[name] for name in updates})
+            statement = statement.on_conflict_do_update(index_elements=list(keys), set_=changes)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(keys))
+    else:
+        raise NotImplementedError(f"Upsert is not supported on {dialect}")
+    db.execute(statement)
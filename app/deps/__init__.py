@@ -1,4 +1,4 @@
-from app.deps.database import get_db
+from app.deps.database import get_db, get_async_db, get_read_db, get_async_read_db
 from app.deps.auth import (
     get_current_user,
     get_current_admin,
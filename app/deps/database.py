@@ -1,5 +1,10 @@
-from typing import Generator
-from app.db.session import SessionLocal
+from typing import AsyncGenerator, Generator
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.routing import WRITTEN_AT_COOKIE, written_at_from
+from app.db.session import AsyncSessionLocal, SessionLocal, get_async_engine, replica_router
 
 
 def get_db() -> Generator:
@@ -13,4 +18,48 @@ def get_db() -> Generator:
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async database dependency for endpoints migrated off the sync session.
+
+    Queries awaited on it leave the event loop free; sync service code is
+    reused through ``await db.run_sync(...)``.
+
+    Yields:
+        SQLAlchemy AsyncSession object
+    """
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db(request: Request) -> Generator:
+    """
+    Database dependency for read-only endpoints.
+
+    The session is bound to a healthy read replica that has caught up with
+    the client's last write, or to the primary when there is none. It
+    cannot flush changes.
+
+    Yields:
+        SQLAlchemy Session object
+    """
+    db = replica_router.read_session(written_at_from(request.cookies.get(WRITTEN_AT_COOKIE)))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async counterpart of ``get_read_db`` for read-only async endpoints.
+
+    Yields:
+        SQLAlchemy AsyncSession object
+    """
+    async with replica_router.async_read_session(written_at_from(request.cookies.get(WRITTEN_AT_COOKIE))) as db:
+        yield db
@@ -16,7 +16,19 @@ from datetime import datetime
 import logging
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
+from app.core.config import settings
 from app.core.response_handler import SayanErrorResponse
+from app.core.static_files import ImmutableStaticFiles
+from app.db import instrumentation
+from app.db.instrumentation import QueryInstrumentationMiddleware
+from app.db.routing import WRITE_METHODS, WRITTEN_AT_COOKIE
+from app.db.session import dispose_async_engine, replica_router
+from app.services.course_catalog import course_catalog_service
+from app.services.course_search import course_search_engine
+from app.services.image_variants import image_variants
+from app.services.media_pipeline import media_pipeline
+from app.services.payment_webhooks import payment_webhook_workers
+from app.services.view_counter import view_counter
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -72,6 +84,25 @@ class CORSLoggingMiddleware(BaseHTTPMiddleware):
         
         return response
 
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """
+    Marks clients that just wrote, so their reads skip replicas that have
+    not caught up with the write yet
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        if replica_router.replicas and request.method in WRITE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                WRITTEN_AT_COOKIE,
+                f"{replica_router.clock():.3f}",
+                max_age=replica_router.sticky_seconds,
+                httponly=True,
+                samesite="lax"
+            )
+        return response
+
 from app.models import (
     User, UserType, UserStatus, AccountType, Student, Gender, Academy, AcademyUser, AcademyStatus, AcademyUserRole,
     OTP, OTPPurpose, AcademyFinance, StudentFinance, Transaction, Admin, Coupon, Course, CourseStatus, CourseType,
@@ -277,6 +308,15 @@ except Exception as e:
     ai_test_router = None
     print(f"Failed to load AI Test router: {e}")
 
+try:
+    from app.api.v1.monitoring import router as monitoring_router
+    monitoring_available = True
+    print("Successfully loaded monitoring router")
+except Exception as e:
+    monitoring_available = False
+    monitoring_router = None
+    print(f"Failed to load monitoring router: {e}")
+
 static_dir = Path("static")
 static_dir.mkdir(exist_ok=True)
 (static_dir / "uploads").mkdir(exist_ok=True)
@@ -293,7 +333,19 @@ app = FastAPI(
 # Add middlewares
 app.add_middleware(CORSLoggingMiddleware)
 app.add_middleware(VideoProtectionMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 
+# Mounted before /static so storyboards and image variants get their long-lived cache headers
+app.mount(
+    settings.STORYBOARD_URL_PREFIX,
+    ImmutableStaticFiles(directory=settings.STORYBOARD_STORAGE_PATH, check_dir=False),
+    name="storyboards"
+)
+app.mount(
+    settings.IMAGE_VARIANT_URL_PREFIX,
+    ImmutableStaticFiles(directory=settings.IMAGE_VARIANT_STORAGE_PATH, check_dir=False),
+    name="image_variants"
+)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Get CORS origins from settings
@@ -338,6 +390,11 @@ app.add_middleware(
     max_age=86400,  # Cache preflight requests for 24 hours
 )
 
+# Outermost, so its timing covers the other middlewares
+if settings.QUERY_INSTRUMENTATION_ENABLED:
+    instrumentation.install()
+    app.add_middleware(QueryInstrumentationMiddleware)
+
 # Add handler for 401 Unauthorized errors specifically
 @app.exception_handler(401)
 async def unauthorized_handler(request: Request, exc):
@@ -647,6 +704,14 @@ if ai_test_available:
     )
     print("AI Test router registered successfully")
 
+if monitoring_available:
+    app.include_router(
+        monitoring_router,
+        prefix="/api/v1/admin/monitoring",
+        tags=["Monitoring"]
+    )
+    print("Monitoring router registered successfully")
+
 @app.get("/", summary="Root Endpoint")
 def root():
     return RedirectResponse(url="/docs")
@@ -656,6 +721,7 @@ def health_check():
     return {
         "status": "healthy",
         "version": "2.0.0",
+        "database_replicas": replica_router.status(),
         "available_endpoints": [
             "/docs - API Documentation",
             "/redoc - ReDoc Documentation", 
@@ -707,3 +773,27 @@ def on_startup():
         import traceback
         print("Failed to connect to database:", e)
         print(traceback.format_exc())
+    payment_webhook_workers.start()
+    view_counter.start()
+    course_catalog_service.start()
+    replica_router.start()
+    # The first search catches up from the saved watermark
+    course_search_engine.load()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    payment_webhook_workers.stop()
+    view_counter.stop()
+    course_catalog_service.stop()
+    replica_router.stop()
+    replica_router.dispose()
+    media_pipeline.shutdown()
+    image_variants.shutdown()
+    course_search_engine.save()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+    await replica_router.dispose_async()
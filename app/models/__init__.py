@@ -3,7 +3,10 @@ from .user import User, UserType, UserStatus, AccountType
 from .student import Student, Gender
 from .academy import Academy, AcademyUser, AcademyStatus, AcademyUserRole
 from .otp import OTP, OTPPurpose
-from .finance import AcademyFinance, StudentFinance, Transaction
+from .finance import (
+    AcademyFinance, StudentFinance, Transaction,
+    LedgerEntry, LedgerAccount, AcademyRevenueRollup, RollupPeriod
+)
 from .admin import Admin
 from .marketing import Coupon
 
@@ -12,16 +15,20 @@ from .course import Course, CourseStatus, CourseType, CourseLevel, Category
 from .product import Product, DigitalProduct, Package, StudentProduct, ProductStatus, ProductType, PackageType
 from .chapter import Chapter
 from .lesson import Lesson, LessonType, VideoType
-from .video import Video
+from .video import Video, VideoDailyViews
+from .hls_key import HLSKey
 from .cart import Cart, CartSession
 from .payment import (
     Invoice, InvoiceProduct, Payment, PaymentGatewayLog, 
-    CouponUsage, PaymentStatus, PaymentGateway
+    CouponUsage, PaymentStatus, PaymentGateway,
+    PaymentWebhookEvent, WebhookEventStatus
 )
 from .exam import Exam, Question, QuestionOption, QuestionType
 from .interactive_tool import InteractiveTool, ToolType
 from .lesson_progress import LessonProgress
 from .student_course import StudentCourse
+from .course_catalog import CourseCatalog
+from .learning_analytics import LearningEvent, LearningEventType, StudentDailyActivity
 
 # AI Assistant models - comprehensive AI functionality
 from .ai_assistant import (
@@ -50,6 +57,7 @@ __all__ = [
     "Academy", "AcademyUser", "AcademyStatus", "AcademyUserRole",
     "OTP", "OTPPurpose",
     "AcademyFinance", "StudentFinance", "Transaction",
+    "LedgerEntry", "LedgerAccount", "AcademyRevenueRollup", "RollupPeriod",
     "Admin",
     "Coupon",
     
@@ -57,10 +65,12 @@ __all__ = [
     "Course", "CourseStatus", "CourseType", "CourseLevel", "Category",
     "Product", "DigitalProduct", "Package", "StudentProduct", "ProductStatus", "ProductType", "PackageType",
     "Chapter", "Lesson", "LessonType", "VideoType",
-    "Video", "Cart", "CartSession",
+    "Video", "VideoDailyViews", "HLSKey", "Cart", "CartSession",
     "Invoice", "InvoiceProduct", "Payment", "PaymentGatewayLog", "CouponUsage", "PaymentStatus", "PaymentGateway",
+    "PaymentWebhookEvent", "WebhookEventStatus",
     "Exam", "Question", "QuestionOption", "QuestionType",
-    "InteractiveTool", "ToolType", "LessonProgress", "StudentCourse",
+    "InteractiveTool", "ToolType", "LessonProgress", "StudentCourse", "CourseCatalog",
+    "LearningEvent", "LearningEventType", "StudentDailyActivity",
     
     # Template models
     "Template", "About", "Slider", "Faq", "Opinion",
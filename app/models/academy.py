@@ -49,6 +49,7 @@ class Academy(Base):
     courses_count = Column(Integer, default=0)
     package_id = Column(BigInteger, nullable=True)
     slug = Column(String(155), unique=True, index=True, nullable=False)
+    content_version = Column(Integer, default=1, nullable=False)  # Bumped on storefront content changes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
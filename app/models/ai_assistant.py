@@ -564,6 +564,11 @@ class AIConversation(Base):
     status = Column(SQLEnum(ConversationStatus), default=ConversationStatus.ACTIVE, nullable=False, index=True)
     context_metadata = Column(JSON, comment="Additional context and configuration")
     
+    # Rolling summary of turns that no longer fit in the prompt budget
+    summary = Column(Text, comment="Incrementally maintained summary of older messages")
+    summary_token_count = Column(Integer, default=0, comment="Token count of the summary")
+    summarized_message_count = Column(Integer, default=0, nullable=False, comment="Number of oldest messages folded into the summary")
+    
     # User satisfaction
     satisfaction_rating = Column(Integer, comment="User satisfaction rating (1-5)")
     
@@ -609,6 +614,7 @@ class AIConversationMessage(Base):
     message = Column(Text, nullable=False, comment="Message content")
     message_type = Column(SQLEnum(MessageType), default=MessageType.TEXT, comment="Type of message")
     attachments = Column(JSON, comment="File attachments and media")
+    token_count = Column(Integer, comment="Cached prompt token count of the message")
     
     # AI-specific metadata (for AI messages)
     ai_model_used = Column(String(50), comment="AI model used for response")
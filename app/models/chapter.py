@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, BigInteger, Boolean, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import CHAR
 from sqlalchemy.sql import func
@@ -24,6 +24,15 @@ class Chapter(Base):
     order_number = Column(Integer, nullable=False, default=0, index=True)
     is_published = Column(Boolean, default=True, nullable=False)
     
+    # Content aggregates (maintained by app.services.content_aggregates)
+    lessons_count = Column(Integer, default=0, nullable=False)
+    video_lessons_count = Column(Integer, default=0, nullable=False)
+    exam_lessons_count = Column(Integer, default=0, nullable=False)
+    tool_lessons_count = Column(Integer, default=0, nullable=False)
+    free_preview_lessons_count = Column(Integer, default=0, nullable=False)
+    total_duration_seconds = Column(Integer, default=0, nullable=False)
+    total_video_bytes = Column(BigInteger, default=0, nullable=False)
+    
     # Timestamps
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
@@ -40,18 +49,6 @@ class Chapter(Base):
     def __repr__(self):
         return f"<Chapter(id={self.id}, title='{self.title}', order={self.order_number})>"
     
-    @property
-    def lessons_count(self) -> int:
-        """Get the total number of lessons in this chapter"""
-        return len(self.lessons) if self.lessons else 0
-    
-    @property
-    def total_duration_seconds(self) -> int:
-        """Calculate total duration of all lessons in this chapter"""
-        if not self.lessons:
-            return 0
-        return sum(lesson.video_duration or 0 for lesson in self.lessons if lesson.video_duration)
-    
     @property
     def is_accessible(self) -> bool:
         """Check if chapter is accessible to students"""
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Enum as SQLEnum, JSON, CHAR
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, Text, Float, Enum as SQLEnum, JSON, CHAR
 from sqlalchemy.types import Numeric
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -91,6 +91,15 @@ class Course(Base):
     lessons_count = Column(Integer, default=0, nullable=False)
     completion_rate = Column(Numeric(5, 2), default=0.00, nullable=False)
     
+    # Content aggregates (maintained by app.services.content_aggregates)
+    video_lessons_count = Column(Integer, default=0, nullable=False)
+    exam_lessons_count = Column(Integer, default=0, nullable=False)
+    tool_lessons_count = Column(Integer, default=0, nullable=False)
+    free_preview_lessons_count = Column(Integer, default=0, nullable=False)
+    total_duration_seconds = Column(Integer, default=0, nullable=False)
+    total_video_bytes = Column(BigInteger, default=0, nullable=False)
+    content_version = Column(Integer, default=1, nullable=False)  # Bumped on any chapter/lesson/content change
+    
     # Timestamps
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
@@ -135,14 +144,9 @@ class Course(Base):
         return self.product.price
     
     @property
-    def duration_seconds(self):
-        """Compute total duration of all lessons in seconds."""
-        total = 0
-        for chapter in getattr(self, 'chapters', []) or []:
-            for lesson in getattr(chapter, 'lessons', []) or []:
-                if lesson.duration_seconds:
-                    total += lesson.duration_seconds
-        return total
+    def duration_seconds(self) -> int:
+        """Total duration of all lessons in seconds, from the maintained aggregate"""
+        return self.total_duration_seconds or 0
 
     @property
     def duration_formatted(self):
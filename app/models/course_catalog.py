@@ -0,0 +1,71 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, Enum as SQLEnum, CHAR
+from sqlalchemy.types import Numeric
+from sqlalchemy.sql import func
+from app.db.base import Base
+from app.models.course import CourseLevel, CourseType
+
+
+class CourseCatalog(Base):
+    """
+    Denormalized read model of published courses for public browsing.
+
+    One row per published course with everything the catalog lists, filters
+    and sorts on, so browsing never joins Course, Product, Category, Academy
+    and User. Rows are refreshed by ``app.services.course_catalog`` when a
+    course, its product, category, academy or enrollments change.
+    """
+    __tablename__ = "course_catalog"
+
+    course_id = Column(CHAR(36), ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(Integer, nullable=False)
+
+    # Denormalized relations
+    academy_id = Column(Integer, nullable=False)
+    academy_name = Column(String(200))
+    category_id = Column(Integer, nullable=False)
+    category_title = Column(String(255))
+    trainer_id = Column(Integer)
+    trainer_name = Column(String(255))
+
+    # Listing content
+    title = Column(String(255), nullable=False)
+    slug = Column(String(255), nullable=False)
+    image = Column(String(255))
+    short_content = Column(Text)
+    level = Column(SQLEnum(CourseLevel), nullable=False)
+    type = Column(SQLEnum(CourseType), nullable=False)
+    featured = Column(Boolean, default=False, nullable=False)
+
+    # Pricing
+    price = Column(Numeric(10, 2), nullable=False, default=0.00)
+    discount_price = Column(Numeric(10, 2), nullable=True)
+    discount_ends_at = Column(DateTime, nullable=True)
+    effective_price = Column(Numeric(10, 2), nullable=False, default=0.00)
+    currency = Column(String(3), nullable=False, default='SAR')
+
+    # Statistics
+    avg_rating = Column(Numeric(3, 2), default=0.00, nullable=False)
+    ratings_count = Column(Integer, default=0, nullable=False)
+    students_count = Column(Integer, default=0, nullable=False)
+    lessons_count = Column(Integer, default=0, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, nullable=False)
+    refreshed_at = Column(DateTime, default=func.now(), nullable=False)
+
+    # Every sort order ends with course_id so keyset cursors are unique
+    __table_args__ = (
+        Index('ix_course_catalog_newest', 'featured', 'created_at', 'course_id'),
+        Index('ix_course_catalog_academy_newest', 'academy_id', 'featured', 'created_at', 'course_id'),
+        Index('ix_course_catalog_category_newest', 'category_id', 'featured', 'created_at', 'course_id'),
+        Index('ix_course_catalog_price', 'effective_price', 'course_id'),
+        Index('ix_course_catalog_rating', 'avg_rating', 'course_id'),
+        Index('ix_course_catalog_popularity', 'students_count', 'course_id'),
+        Index('ix_course_catalog_level', 'level'),
+        Index('ix_course_catalog_discount_ends_at', 'discount_ends_at'),
+        # Search index catch-up
+        Index('ix_course_catalog_refreshed_at', 'refreshed_at'),
+    )
+
+    def __repr__(self):
+        return f"<CourseCatalog(course_id={self.course_id}, title='{self.title}')>"
@@ -1,7 +1,7 @@
 from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey, Enum as SQLEnum, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import CHAR
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, false
 from app.db.base import Base
 import enum
 import uuid
@@ -97,6 +97,7 @@ class Question(Base):
     type = Column(SQLEnum(QuestionType), nullable=False)
     score = Column(Integer, nullable=False)
     correct_answer = Column(String(255))  # For text and simple questions
+    is_ai_generated = Column(Boolean, default=False, server_default=false(), nullable=False)
     
     # Timestamps
     created_at = Column(DateTime, default=func.now(), nullable=False)
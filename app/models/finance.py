@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Enum as SQLEnum, JSON
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text, Float, Numeric, Enum as SQLEnum, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
 import enum
+from datetime import datetime
 from app.models.marketing import Coupon
 
 
@@ -32,6 +33,20 @@ class TransactionType(str, enum.Enum):
     SUBSCRIPTION = "subscription"
 
 
+class LedgerAccount(str, enum.Enum):
+    ACADEMY_WALLET = "academy_wallet"  # What the platform owes the academy
+    PLATFORM_COMMISSION = "platform_commission"
+    GATEWAY_CLEARING = "gateway_clearing"  # Funds collected by the payment gateway
+    BANK_PAYOUT = "bank_payout"  # Funds paid out to the academy's bank
+
+
+class RollupPeriod(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+    YEAR = "year"
+
+
 class WithdrawalStatus(str, enum.Enum):
     PENDING = "pending"
     APPROVED = "approved"
@@ -111,6 +126,10 @@ class AcademyFinance(Base):
     total_withdrawals = Column(Float, default=0.0)
     pending_withdrawals = Column(Float, default=0.0)
     commission_rate = Column(Float, default=0.15)  # 15% default commission
+    # Running totals kept by the wallet ledger
+    balance = Column(Numeric(12, 2), default=0, nullable=False)
+    total_commission = Column(Numeric(12, 2), default=0, nullable=False)
+    payments_count = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -118,6 +137,53 @@ class AcademyFinance(Base):
     # academy = relationship("Academy", back_populates="finance")
 
 
+class LedgerEntry(Base):
+    """
+    Append-only double-entry ledger.
+
+    Every posting is a journal of entries whose debits equal their credits.
+    Entries are never updated or deleted; corrections are new journals.
+    """
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        # Keyset pagination of an academy's account, newest first
+        Index("ix_ledger_entries_academy_account_id", "academy_id", "account", "id"),
+        # A payment settles into the ledger once
+        UniqueConstraint("payment_id", "account", "entry_type", name="uq_ledger_entries_payment_account_type"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    journal_id = Column(String(36), nullable=False, index=True)
+    academy_id = Column(Integer, ForeignKey("academies.id"), nullable=False)
+    account = Column(SQLEnum(LedgerAccount), nullable=False)
+    entry_type = Column(SQLEnum(TransactionType), nullable=False)
+    debit = Column(Numeric(12, 2), default=0, nullable=False)
+    credit = Column(Numeric(12, 2), default=0, nullable=False)
+    balance_after = Column(Numeric(12, 2), nullable=True)  # Academy wallet balance after this entry
+    payment_id = Column(Integer, ForeignKey("payments.id"), nullable=True)
+    withdrawal_id = Column(Integer, ForeignKey("withdrawal_requests.id"), nullable=True)
+    description = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AcademyRevenueRollup(Base):
+    """Revenue, commission and withdrawal totals per academy and period bucket"""
+    __tablename__ = "academy_revenue_rollups"
+    __table_args__ = (
+        UniqueConstraint("academy_id", "period", "period_start", name="uq_academy_revenue_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    academy_id = Column(Integer, ForeignKey("academies.id"), nullable=False)
+    period = Column(SQLEnum(RollupPeriod), nullable=False)
+    period_start = Column(Date, nullable=False)
+    revenue = Column(Numeric(14, 2), default=0, nullable=False)
+    commission = Column(Numeric(14, 2), default=0, nullable=False)
+    withdrawals = Column(Numeric(14, 2), default=0, nullable=False)
+    payments_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 class StudentFinance(Base):
     __tablename__ = "student_finances"
 
@@ -0,0 +1,27 @@
+"""
+AES-128 keys of encrypted HLS encodes.
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class HLSKey(Base):
+    """
+    One HLS encryption key. Rows past ``expires_at`` are purged in bulk.
+    """
+
+    __tablename__ = "hls_keys"
+
+    key_id = Column(String(32), primary_key=True)
+    key = Column(LargeBinary(16), nullable=False)
+    session_id = Column(String(100), nullable=False)
+    video_id = Column(String(36), nullable=True)
+    user_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<HLSKey(key_id={self.key_id}, session_id={self.session_id}, expires_at={self.expires_at})>"
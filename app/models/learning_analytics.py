@@ -0,0 +1,75 @@
+"""
+Learning events and per-student daily activity buckets.
+"""
+
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Date, Boolean, ForeignKey, Numeric, Enum, Index
+from datetime import datetime
+from enum import Enum as PyEnum
+
+from app.db.base import Base
+
+
+class LearningEventType(PyEnum):
+    """Learning event type enumeration"""
+    LOGIN = "login"
+    LESSON_STARTED = "lesson_started"
+    PROGRESS_HEARTBEAT = "progress_heartbeat"
+    LESSON_COMPLETED = "lesson_completed"
+    EXAM_SUBMITTED = "exam_submitted"
+
+
+class LearningEvent(Base):
+    """
+    Append-only stream of student learning events.
+
+    Rows are never updated; analytics read the daily buckets they feed.
+    """
+
+    __tablename__ = "learning_events"
+    __table_args__ = (
+        Index("ix_learning_events_student_occurred", "student_id", "occurred_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    event_type = Column(Enum(LearningEventType), nullable=False)
+
+    # Subject of the event
+    course_id = Column(String(36), nullable=True)
+    lesson_id = Column(String(36), nullable=True)
+    exam_id = Column(String(36), nullable=True)
+
+    # Measurements
+    study_seconds = Column(Integer, default=0, nullable=False)
+    score = Column(Numeric(5, 2), nullable=True)  # Exam percentage
+    passed = Column(Boolean, nullable=True)
+
+    # Events that must be counted once carry a key, e.g. lesson_progress:<id>:completed
+    dedupe_key = Column(String(100), unique=True, nullable=True)
+
+    occurred_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<LearningEvent(id={self.id}, student_id={self.student_id}, type={self.event_type})>"
+
+
+class StudentDailyActivity(Base):
+    """
+    One compact row per student and UTC day with that day's totals.
+    """
+
+    __tablename__ = "student_daily_activity"
+
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    study_seconds = Column(Integer, default=0, nullable=False)
+    lessons_started = Column(SmallInteger, default=0, nullable=False)
+    lessons_completed = Column(SmallInteger, default=0, nullable=False)
+    exams_submitted = Column(SmallInteger, default=0, nullable=False)
+    exams_passed = Column(SmallInteger, default=0, nullable=False)
+    score_total = Column(Integer, default=0, nullable=False)  # Sum of exam percentages
+    logins = Column(SmallInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<StudentDailyActivity(student_id={self.student_id}, day={self.day})>"
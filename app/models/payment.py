@@ -2,7 +2,7 @@
 Payment, Invoice, and related models for handling payments and billing.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Numeric, JSON, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Numeric, JSON, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum as PyEnum
@@ -31,6 +31,14 @@ class PaymentGateway(PyEnum):
     WALLET = "wallet"
 
 
+class WebhookEventStatus(PyEnum):
+    """Payment webhook inbox event status"""
+    PENDING = "pending"
+    PROCESSING = "processing"
+    PROCESSED = "processed"
+    DEAD = "dead"
+
+
 class Invoice(Base):
     """
     Invoice model for managing billing and payment tracking.
@@ -271,4 +279,45 @@ class CouponUsage(Base):
     invoice = relationship("Invoice")
     
     def __repr__(self):
-        return f"<CouponUsage(id={self.id}, coupon_id={self.coupon_id}, student_id={self.student_id})>" 
\ No newline at end of file
+        return f"<CouponUsage(id={self.id}, coupon_id={self.coupon_id}, student_id={self.student_id})>" 
+
+
+class PaymentWebhookEvent(Base):
+    """
+    Inbox of verified payment gateway webhook deliveries.
+    
+    Each gateway event is stored once, keyed by its gateway event id, and
+    processed later by the webhook workers.
+    """
+    
+    __tablename__ = "payment_webhook_events"
+    __table_args__ = (
+        UniqueConstraint("gateway", "event_id", name="uq_payment_webhook_events_gateway_event"),
+        Index("ix_payment_webhook_events_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Gateway event identification
+    gateway = Column(String(50), nullable=False)
+    event_id = Column(String(100), nullable=False)
+    event_type = Column(String(100), nullable=True)
+    invoice_reference = Column(String(100), nullable=True, index=True)  # Events of one invoice run in order
+    
+    # Raw request body as delivered
+    payload = Column(Text, nullable=False)
+    
+    # Processing state
+    status = Column(Enum(WebhookEventStatus), default=WebhookEventStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    
+    # Timestamps
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<PaymentWebhookEvent(id={self.id}, event_id={self.event_id}, status={self.status})>"
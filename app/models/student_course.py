@@ -2,7 +2,7 @@
 Student Course relationship model for tracking course enrollments.
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Numeric, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -18,6 +18,9 @@ class StudentCourse(Base):
     """
     
     __tablename__ = "student_courses"
+    __table_args__ = (
+        UniqueConstraint("student_id", "course_id", name="uq_student_courses_student_course"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, BigInteger, Boolean, DateTime, Date, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import CHAR
 from sqlalchemy.sql import func
@@ -28,6 +28,22 @@ class Video(Base):
     duration = Column(Integer, default=0)  # Duration in seconds
     file_size = Column(Integer, default=0)  # File size in bytes
     format = Column(String(50))  # Video format/content type
+    views_count = Column(Integer, default=0, nullable=False)  # Flushed in batches by the view counter
+
+    # Measured once at upload by the media probe
+    width = Column(Integer)
+    height = Column(Integer)
+    video_codec = Column(String(32))
+    audio_codec = Column(String(32))
+    bitrate = Column(Integer)  # Bits per second
+    keyframe_interval = Column(Float)  # Seconds between keyframes
+    needs_faststart = Column(Boolean, default=False, nullable=False)  # moov atom after the media data
+    probed_at = Column(DateTime)
+
+    # Seek-preview storyboard
+    storyboard_url = Column(String(255))  # WebVTT thumbnail track
+    storyboard_bytes = Column(Integer)  # Sprite sheet bytes
+    storyboard_seconds = Column(Float)  # Generation time
     
     # Timestamps and soft delete
     deleted_at = Column(DateTime)
@@ -68,4 +84,24 @@ class Video(Base):
         if hours > 0:
             return f"{hours}:{minutes:02d}:{seconds:02d}"
         else:
-            return f"{minutes}:{seconds:02d}" 
\ No newline at end of file
+            return f"{minutes}:{seconds:02d}"
+
+
+class VideoDailyViews(Base):
+    """
+    Views of one video on one UTC day, kept for academy dashboards.
+    """
+    __tablename__ = "video_daily_views"
+    __table_args__ = (
+        Index("ix_video_daily_views_academy_day", "academy_id", "day"),
+    )
+
+    video_id = Column(CHAR(36), ForeignKey("videos.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    lesson_id = Column(CHAR(36), nullable=False)
+    course_id = Column(CHAR(36), nullable=False)
+    academy_id = Column(BigInteger, nullable=False)
+    views = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<VideoDailyViews(video_id={self.video_id}, day={self.day}, views={self.views})>"
@@ -0,0 +1,389 @@
+"""
+Academy Storefront Service
+==========================
+
+Serves the public academy pages (profile by slug, academy content) from
+pre-serialized JSON.
+
+- ``academies.content_version`` is bumped in the same flush as any change
+  to the academy row or its template, about, sliders, FAQs or opinions;
+  platform settings changes bump every academy.
+- Serialized page data is cached per (page, academy, version) in an LRU
+  bounded by a byte budget, each with a strong ETag over it. Only the
+  envelope (path, timestamp) is written per response.
+- Versions are remembered per worker for a few seconds, so a repeat visit
+  with a matching If-None-Match is answered 304 without a query. Commits in
+  this worker forget the version at once; other workers catch up within
+  the TTL.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from itertools import chain
+from typing import Any, Dict, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.academy_content import academy_content
+from app.models.academy import Academy
+from app.models.settings import Settings
+from app.models.template import Template, About, Slider, Faq, Opinion
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE = "profile"
+CONTENT = "content"
+
+CACHE_CONTROL = "public, no-cache"
+
+# Rows per section on the public profile and the content page
+PROFILE_SECTION_LIMIT = 10
+CONTENT_SECTION_LIMIT = 100
+
+
+def _columns(obj) -> Optional[Dict[str, Any]]:
+    if obj is None:
+        return None
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class StorefrontEntry:
+    """Serialized page data and its ETag"""
+
+    __slots__ = ("version", "etag", "payload", "data", "message")
+
+    def __init__(self, version: int, etag: str, payload: bytes, data: Any, message: str = ""):
+        self.version = version
+        self.etag = etag
+        self.payload = payload
+        self.data = data
+        self.message = message
+
+    def response(self, path: str) -> Response:
+        """The success envelope around the cached data, for this request"""
+        body = b"".join((
+            b'{"status":"success","status_code":200,"error_type":null,"message":', _dumps(self.message),
+            b',"data":', self.payload,
+            b',"path":', _dumps(path),
+            b',"timestamp":', _dumps(datetime.utcnow().isoformat() + "Z"),
+            b"}"
+        ))
+        return Response(
+            content=body, media_type="application/json",
+            headers={"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        )
+
+
+class StorefrontCache:
+    """LRU of entries bounded by the total size of their payloads"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self._entries: "OrderedDict[Tuple[str, int], StorefrontEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[str, int], version: int) -> Optional[StorefrontEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple[str, int], entry: StorefrontEntry):
+        size = len(entry.payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes_used -= len(previous.payload)
+            self._entries[key] = entry
+            self.bytes_used += size
+            while self.bytes_used > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes_used -= len(evicted.payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+
+
+class AcademyStorefrontService:
+    """Versioned, pre-serialized academy storefront pages"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, version_ttl_seconds: float = 5):
+        self.cache = StorefrontCache(max_bytes)
+        self.version_ttl_seconds = version_ttl_seconds
+        self._versions: Dict[int, Tuple[int, float]] = {}
+        self._slugs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------
+    # Versions
+    # ----------------------------------------
+
+    def _remember(self, academy_id: int, version: int, slug: Optional[str] = None):
+        with self._lock:
+            self._versions[academy_id] = (version, time.monotonic())
+            if slug is not None:
+                self._slugs[slug] = academy_id
+
+    def _known_version(self, academy_id: Optional[int]) -> Optional[int]:
+        known = self._versions.get(academy_id) if academy_id is not None else None
+        if known and time.monotonic() - known[1] < self.version_ttl_seconds:
+            return known[0]
+        return None
+
+    def forget(self, academy_ids: Optional[Set[int]] = None):
+        """Drop remembered versions (all of them when ``academy_ids`` is None)"""
+        with self._lock:
+            if academy_ids is None:
+                self._versions.clear()
+                self._slugs.clear()
+                return
+            for academy_id in academy_ids:
+                self._versions.pop(academy_id, None)
+            for slug in [slug for slug, academy_id in self._slugs.items() if academy_id in academy_ids]:
+                del self._slugs[slug]
+
+    def bump_versions(self, session: Session, academy_ids: Optional[Set[int]]):
+        """Increment content versions in the current transaction; None means every academy"""
+        table = Academy.__table__
+        statement = update(table).values(content_version=table.c.content_version + 1)
+        if academy_ids is not None:
+            statement = statement.where(table.c.id.in_(academy_ids))
+        session.connection().execute(statement)
+        for obj in list(session.identity_map.values()):
+            if isinstance(obj, Academy) and (academy_ids is None or obj.id in academy_ids):
+                session.expire(obj, ["content_version", "updated_at"])
+
+    # ----------------------------------------
+    # Pages
+    # ----------------------------------------
+
+    def public_profile(self, db: Session, slug: str) -> Optional[StorefrontEntry]:
+        """Public profile of an active academy, or None when there is none"""
+        academy_id = self._slugs.get(slug)
+        version = self._known_version(academy_id)
+        if version is not None:
+            entry = self.cache.get((PROFILE, academy_id), version)
+            if entry is not None:
+                return entry
+
+        academy = db.query(Academy).filter(Academy.slug == slug, Academy.status == "active").first()
+        if not academy:
+            return None
+        self._remember(academy.id, academy.content_version, slug)
+        return self._entry(
+            PROFILE, academy, "تم جلب بروفايل الأكاديمية العام بنجاح",
+            lambda: self._profile_data(db, academy)
+        )
+
+    def academy_content(self, db: Session, academy_id: int) -> Optional[StorefrontEntry]:
+        """Content page of an academy, or None when it does not exist"""
+        version = self._known_version(academy_id)
+        if version is not None:
+            entry = self.cache.get((CONTENT, academy_id), version)
+            if entry is not None:
+                return entry
+
+        academy = db.query(Academy).filter(Academy.id == academy_id).first()
+        if not academy:
+            return None
+        self._remember(academy.id, academy.content_version)
+        return self._entry(
+            CONTENT, academy, "تم جلب محتوى الأكاديمية بنجاح",
+            lambda: self._content_data(db, academy)
+        )
+
+    def _entry(self, page: str, academy: Academy, message: str, build) -> StorefrontEntry:
+        key, version = (page, academy.id), academy.content_version
+        entry = self.cache.get(key, version)
+        if entry is not None:
+            return entry
+
+        data = jsonable_encoder(build())
+        digest = hashlib.sha256(
+            json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        ).hexdigest()
+
+        entry = StorefrontEntry(version, f'"{page}-{academy.id}-{digest[:32]}"', _dumps(data), data, message)
+        self.cache.put(key, entry)
+        return entry
+
+    @staticmethod
+    def _profile_data(db: Session, academy: Academy) -> Dict[str, Any]:
+        content = academy_content.get_storefront_content(db, academy.id, limit=PROFILE_SECTION_LIMIT)
+        template, about = content["template"], content["about"]
+        return {
+            "academy": {
+                "id": academy.id,
+                "name": academy.name,
+                "slug": academy.slug,
+                "about": academy.about,
+                "image": academy.image,
+                "email": academy.email,
+                "phone": academy.phone,
+                "address": academy.address,
+                "users_count": academy.users_count,
+                "courses_count": academy.courses_count,
+                "created_at": academy.created_at,
+            },
+            "template": {
+                "primary_color": template.primary_color,
+                "secondary_color": template.secondary_color,
+            } if template else None,
+            "about": {
+                "title": about.title,
+                "content": about.content,
+                "mission": about.mission,
+                "vision": about.vision,
+                "values": about.values,
+                "image": about.image,
+                "video_url": about.video_url,
+            } if about else None,
+            "social_links": {
+                "facebook": academy.facebook,
+                "twitter": academy.twitter,
+                "instagram": academy.instagram,
+                "snapchat": academy.snapchat,
+            },
+            "sliders": [
+                {
+                    "id": slider.id,
+                    "title": slider.title,
+                    "subtitle": slider.subtitle,
+                    "image": slider.image,
+                    "link": slider.link,
+                    "button_text": slider.button_text,
+                    "order": slider.order,
+                }
+                for slider in content["sliders"]
+            ],
+            "faqs": [
+                {
+                    "id": faq.id,
+                    "question": faq.question,
+                    "answer": faq.answer,
+                    "category": faq.category,
+                    "order": faq.order,
+                }
+                for faq in content["faqs"]
+            ],
+            "opinions": [
+                {
+                    "id": opinion.id,
+                    "name": opinion.name,
+                    "title": opinion.title,
+                    "content": opinion.content,
+                    "rating": opinion.rating,
+                    "image": opinion.image,
+                    "featured": opinion.is_featured,
+                    "created_at": opinion.created_at,
+                }
+                for opinion in content["opinions"]
+            ],
+        }
+
+    @staticmethod
+    def _content_data(db: Session, academy: Academy) -> Dict[str, Any]:
+        content = academy_content.get_storefront_content(
+            db, academy.id, public=False, limit=CONTENT_SECTION_LIMIT
+        )
+        return {
+            "academy_info": {
+                "id": academy.id,
+                "name": academy.name,
+                "slug": academy.slug or "",
+                "image": academy.image,
+                "email": academy.email,
+                "phone": academy.phone,
+                "address": academy.address,
+                "status": academy.status,
+            },
+            "template": _columns(content["template"]),
+            "about_content": _columns(content["about"]),
+            "sliders": [_columns(slider) for slider in content["sliders"]],
+            "faqs": [_columns(faq) for faq in content["faqs"]],
+            "opinions": [_columns(opinion) for opinion in content["opinions"]],
+            "settings": _columns(db.query(Settings).first()),
+        }
+
+
+academy_storefront_service = AcademyStorefrontService(
+    max_bytes=settings.ACADEMY_STOREFRONT_CACHE_BYTES,
+    version_ttl_seconds=settings.ACADEMY_STOREFRONT_VERSION_TTL_SECONDS
+)
+
+
+# ----------------------------------------
+# Version bumps on ORM writes
+# ----------------------------------------
+
+_AFFECTED = "academy_storefront_affected"
+_BUMPED = "academy_storefront_bumped"
+_ALL = "all"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_storefront_changes(session: Session, flush_context):
+    affected = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Academy):
+            if obj in session.new:
+                continue
+            value = obj.id
+        elif isinstance(obj, (Template, About, Slider, Faq, Opinion)):
+            value = obj.academy_id
+        elif isinstance(obj, Settings):
+            value = _ALL
+        else:
+            continue
+        if affected is None:
+            affected = session.info.setdefault(_AFFECTED, set())
+        affected.add(value)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _bump_storefront_versions(session: Session, flush_context):
+    affected = session.info.pop(_AFFECTED, None)
+    if not affected:
+        return
+    academy_ids = None if _ALL in affected else {value for value in affected if value is not None}
+    academy_storefront_service.bump_versions(session, academy_ids)
+
+    bumped = session.info.get(_BUMPED, set())
+    session.info[_BUMPED] = _ALL if academy_ids is None or bumped == _ALL else bumped | academy_ids
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_storefront_versions(session: Session):
+    bumped = session.info.pop(_BUMPED, None)
+    if bumped:
+        academy_storefront_service.forget(None if bumped == _ALL else bumped)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_storefront_changes(session: Session):
+    session.info.pop(_AFFECTED, None)
+    session.info.pop(_BUMPED, None)
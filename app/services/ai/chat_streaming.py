@@ -0,0 +1,186 @@
+"""
+Chat Streaming Service
+======================
+
+Proxies chat completion token deltas to the client as Server-Sent Events.
+
+The assistant message is assembled while streaming and persisted to
+``AIConversationMessage`` once at the end. If the client disconnects the
+upstream generation is cancelled and whatever was produced so far is kept.
+"""
+
+import json
+import time
+import uuid
+import logging
+import anyio
+from typing import Optional, Dict, Any, List, AsyncIterator, Callable
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.db.session import SessionLocal
+from app.models.ai_assistant import AIConversation, AIConversationMessage, SenderType, MessageType
+from app.services.ai.openai_service import OpenAIChatService, OpenAIServiceError
+from app.services.ai.token_counter import count_message_tokens
+
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Disable proxy buffering (nginx) so deltas reach the client immediately
+    "X-Accel-Buffering": "no"
+}
+
+
+def format_sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode one Server-Sent Event frame"""
+    frame = ""
+    if event:
+        frame += f"event: {event}\n"
+    frame += f"data: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+    return frame
+
+
+async def stream_conversation_reply(
+    service: OpenAIChatService,
+    conversation_id: str,
+    messages: List[Dict[str, str]],
+    system_prompt: Optional[str] = None,
+    academy_id: Optional[int] = None,
+    request: Optional[Request] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+    **kwargs
+) -> AsyncIterator[str]:
+    """
+    Stream an AI reply as SSE frames and persist the assembled message
+
+    The request-scoped session is closed by the time the response body is
+    iterated, so the final message is written through ``session_factory``.
+
+    Args:
+        service: Chat service used for the upstream completion
+        conversation_id: Conversation the reply belongs to
+        messages: Conversation context sent to the model
+        system_prompt: Optional system prompt
+        academy_id: Academy ID for metrics
+        request: Incoming request, polled for client disconnects
+        session_factory: Factory for the session used to persist the reply
+
+    Yields:
+        Encoded SSE frames (``start``, ``delta``, ``done`` or ``error``)
+    """
+    message_id = str(uuid.uuid4())
+    start_time = time.time()
+    parts: List[str] = []
+    final: Optional[Dict[str, Any]] = None
+    disconnected = False
+
+    upstream = service.stream_completion(
+        messages=messages,
+        system_prompt=system_prompt,
+        academy_id=academy_id,
+        **kwargs
+    )
+
+    try:
+        yield format_sse({"conversation_id": conversation_id, "message_id": message_id}, event="start")
+
+        async for event in upstream:
+            if request is not None and await request.is_disconnected():
+                disconnected = True
+                logger.info(f"Client disconnected from conversation {conversation_id}, cancelling generation")
+                break
+
+            if event["type"] == "delta":
+                parts.append(event["content"])
+                yield format_sse({"content": event["content"]}, event="delta")
+            elif event["type"] == "done":
+                final = event
+
+    except OpenAIServiceError as e:
+        logger.error(f"OpenAI service error in streamed chat: {str(e)}")
+        yield format_sse(
+            {"message": f"خطأ في خدمة الذكاء الاصطناعي: {e.message}", "error_code": e.error_code or "AI_SERVICE_ERROR"},
+            event="error"
+        )
+
+    finally:
+        # Closing the upstream generator closes the OpenAI HTTP stream. The
+        # scope is shielded because Starlette cancels the body task when the
+        # client goes away.
+        with anyio.CancelScope(shield=True):
+            await upstream.aclose()
+
+        content = final["content"] if final else "".join(parts)
+        processing_time_ms = final["processing_time_ms"] if final else int((time.time() - start_time) * 1000)
+
+        if content:
+            _persist_ai_message(
+                session_factory,
+                message_id=message_id,
+                conversation_id=conversation_id,
+                content=content,
+                model=service.config.model_name,
+                processing_time_ms=processing_time_ms
+            )
+
+        if final:
+            logger.info(
+                f"Streamed reply {message_id}: first token {final['first_token_ms']}ms, "
+                f"total {processing_time_ms}ms, tokens {final['usage']['total_tokens']}"
+            )
+        elif disconnected:
+            logger.info(f"Streamed reply {message_id} cancelled after {processing_time_ms}ms")
+
+    if final:
+        yield format_sse(
+            {
+                "conversation_id": conversation_id,
+                "message_id": message_id,
+                "finish_reason": final["finish_reason"],
+                "usage": final["usage"],
+                "first_token_ms": final["first_token_ms"],
+                "processing_time_ms": processing_time_ms
+            },
+            event="done"
+        )
+
+
+def _persist_ai_message(
+    session_factory: Callable[[], Session],
+    message_id: str,
+    conversation_id: str,
+    content: str,
+    model: str,
+    processing_time_ms: int
+):
+    """Write the assembled assistant message in a single commit"""
+    try:
+        with session_factory() as db:
+            db.add(AIConversationMessage(
+                id=message_id,
+                conversation_id=conversation_id,
+                sender_type=SenderType.AI,
+                message=content,
+                message_type=MessageType.TEXT,
+                ai_model_used=model,
+                processing_time_ms=processing_time_ms,
+                token_count=count_message_tokens(content, model)
+            ))
+            db.query(AIConversation).filter(
+                AIConversation.id == conversation_id
+            ).update({AIConversation.updated_at: func.now()}, synchronize_session=False)
+            db.commit()
+    except Exception as e:
+        logger.error(f"Failed to persist streamed message {message_id}: {str(e)}")
+
+
+def create_sse_response(stream: AsyncIterator[str], background: Optional[BackgroundTask] = None) -> StreamingResponse:
+    """Wrap an SSE frame iterator in a streaming response"""
+    return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS, background=background)
@@ -0,0 +1,215 @@
+"""
+Conversation Context Manager
+============================
+
+Builds token-budgeted prompts for AI conversations.
+
+- Every message caches its token count on the row (``token_count``).
+- The prompt is filled newest-first until the configured budget is reached.
+- Turns that no longer fit are folded into a rolling summary stored on
+  ``AIConversation`` after the reply is sent, so every turn only loads a
+  bounded, precomputed context.
+"""
+
+import logging
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.ai_assistant import AIConversation, AIConversationMessage, SenderType
+from app.services.ai.token_counter import count_message_tokens
+
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "ملخص ما سبق من المحادثة: "
+
+Summarizer = Callable[[Optional[str], List[Dict[str, str]], int], Awaitable[str]]
+
+
+class ConversationContextManager:
+    """
+    Selects which conversation messages are sent to the model.
+
+    Args:
+        db: Database session
+        model: Model name used for token counting
+        token_budget: Prompt tokens available for summary, history and the new message
+        summary_token_budget: Maximum tokens of the rolling summary
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        model: str = "gpt-4",
+        token_budget: Optional[int] = None,
+        summary_token_budget: Optional[int] = None
+    ):
+        self.db = db
+        self.model = model
+        self.token_budget = token_budget or settings.AI_CONTEXT_TOKEN_BUDGET
+        self.summary_token_budget = summary_token_budget or settings.AI_SUMMARY_TOKEN_BUDGET
+
+    def message_tokens(self, message: AIConversationMessage) -> int:
+        """Token count of a message, computed once and cached on the row"""
+        if message.token_count is None:
+            message.token_count = count_message_tokens(message.message, self.model)
+        return message.token_count
+
+    def load_unsummarized(self, conversation: AIConversation) -> List[AIConversationMessage]:
+        """Messages that are not yet folded into the summary, oldest first"""
+        return self.db.query(AIConversationMessage).filter(
+            AIConversationMessage.conversation_id == conversation.id
+        ).order_by(
+            AIConversationMessage.created_at, AIConversationMessage.id
+        ).offset(conversation.summarized_message_count or 0).all()
+
+    def _fit_newest_first(self, rows: List[AIConversationMessage], budget: int) -> int:
+        """Return how many of the newest rows fit into ``budget``"""
+        used = 0
+        fitted = 0
+        for row in reversed(rows):
+            tokens = self.message_tokens(row)
+            if used + tokens > budget:
+                break
+            used += tokens
+            fitted += 1
+        return fitted
+
+    def build_context(
+        self,
+        conversation: AIConversation,
+        new_message: str,
+        system_prompt: Optional[str] = None,
+        history: Optional[List[AIConversationMessage]] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the chat messages for the next turn
+
+        Args:
+            conversation: Conversation being continued
+            new_message: The user's new message (not yet in ``history``)
+            system_prompt: System prompt that will be sent with the messages
+            history: Preloaded unsummarized messages, loaded when omitted
+
+        Returns:
+            Dictionary with ``messages`` and token accounting
+        """
+        rows = history if history is not None else self.load_unsummarized(conversation)
+
+        fixed_tokens = count_message_tokens(new_message, self.model)
+        if system_prompt:
+            fixed_tokens += count_message_tokens(system_prompt, self.model)
+
+        summary_messages: List[Dict[str, str]] = []
+        if conversation.summary:
+            summary_content = SUMMARY_PREFIX + conversation.summary
+            summary_messages.append({"role": "system", "content": summary_content})
+            fixed_tokens += count_message_tokens(summary_content, self.model)
+
+        fitted = self._fit_newest_first(rows, max(0, self.token_budget - fixed_tokens))
+        selected = rows[len(rows) - fitted:] if fitted else []
+
+        messages = summary_messages + [
+            {
+                "role": "user" if row.sender_type == SenderType.USER else "assistant",
+                "content": row.message
+            }
+            for row in selected
+        ]
+        messages.append({"role": "user", "content": new_message})
+
+        return {
+            "messages": messages,
+            "prompt_tokens": fixed_tokens + sum(row.token_count for row in selected),
+            "history_messages": len(selected),
+            "overflow_messages": len(rows) - len(selected)
+        }
+
+    async def refresh_summary(self, conversation: AIConversation, summarizer: Summarizer) -> int:
+        """
+        Fold messages that no longer fit the history budget into the summary
+
+        Returns:
+            Number of messages folded
+        """
+        rows = self.load_unsummarized(conversation)
+        history_budget = self.token_budget - self.summary_token_budget
+        fitted = self._fit_newest_first(rows, max(0, history_budget // 2))
+
+        # Only fold once the tail has outgrown the budget, and then fold down
+        # to half of it so summarization runs every few turns, not every turn
+        if sum(self.message_tokens(row) for row in rows) <= history_budget:
+            self.db.commit()
+            return 0
+
+        overflow = rows[:len(rows) - fitted]
+        if not overflow:
+            self.db.commit()
+            return 0
+
+        summary = await summarizer(
+            conversation.summary,
+            [
+                {
+                    "role": "user" if row.sender_type == SenderType.USER else "assistant",
+                    "content": row.message
+                }
+                for row in overflow
+            ],
+            self.summary_token_budget
+        )
+
+        conversation.summary = summary
+        conversation.summary_token_count = count_message_tokens(summary, self.model)
+        conversation.summarized_message_count = (conversation.summarized_message_count or 0) + len(overflow)
+        self.db.commit()
+
+        logger.info(f"Folded {len(overflow)} messages into summary of conversation {conversation.id}")
+        return len(overflow)
+
+
+def make_chat_summarizer(chat_service) -> Summarizer:
+    """Summarizer backed by the chat completion service"""
+
+    async def summarize(previous_summary: Optional[str], messages: List[Dict[str, str]], max_tokens: int) -> str:
+        transcript = "\n".join(
+            f"{'الطالب' if m['role'] == 'user' else 'المساعد'}: {m['content']}" for m in messages
+        )
+        prompt = f"""حدّث ملخص المحادثة التالي بإضافة الرسائل الجديدة.
+        احتفظ بالحقائق والأسئلة والقرارات المهمة فقط، واكتب الملخص بإيجاز.
+
+        الملخص الحالي:
+        {previous_summary or "لا يوجد"}
+
+        الرسائل الجديدة:
+        {transcript}
+        """
+        response = await chat_service.generate_completion(
+            messages=[{"role": "user", "content": prompt}],
+            system_prompt="أنت مساعد يلخص المحادثات التعليمية بدقة وإيجاز.",
+            max_tokens=max_tokens,
+            temperature=0.3
+        )
+        return response["content"].strip()
+
+    return summarize
+
+
+async def refresh_conversation_summary(
+    conversation_id: str,
+    chat_service,
+    session_factory: Callable[[], Session] = SessionLocal
+):
+    """Background task: fold overflowing turns of a conversation into its summary"""
+    try:
+        with session_factory() as db:
+            conversation = db.query(AIConversation).filter(AIConversation.id == conversation_id).first()
+            if not conversation:
+                return
+            manager = ConversationContextManager(db, model=chat_service.config.model_name)
+            await manager.refresh_summary(conversation, make_chat_summarizer(chat_service))
+    except Exception as e:
+        logger.error(f"Failed to refresh summary of conversation {conversation_id}: {str(e)}")
@@ -9,7 +9,7 @@ Includes comprehensive error handling and rate limiting.
 import asyncio
 import time
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 import openai
 from openai import OpenAI, AsyncOpenAI
 from openai.types.audio import Transcription
@@ -386,7 +386,176 @@ class OpenAIChatService(BaseOpenAIService):
             )
             
             raise OpenAIServiceError(error_msg, original_error=e)
-    
+
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        academy_id: Optional[int] = None,
+        **kwargs
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream chat completion deltas from OpenAI API
+
+        Yields ``{"type": "delta", "content": ...}`` for every token chunk and a
+        final ``{"type": "done", ...}`` event carrying the assembled content,
+        usage and latency. Closing the generator (e.g. on client disconnect)
+        closes the upstream HTTP stream so generation stops.
+
+        Args:
+            messages: List of conversation messages
+            system_prompt: Optional system prompt
+            academy_id: Academy ID for metrics
+            **kwargs: Additional parameters
+
+        Raises:
+            OpenAIServiceError: If the stream cannot be started or fails
+        """
+        start_time = time.time()
+
+        chat_messages = []
+        if system_prompt:
+            chat_messages.append({"role": "system", "content": system_prompt})
+        chat_messages.extend(messages)
+
+        request_data = {
+            "model": self.config.model_name,
+            "messages": chat_messages,
+            "max_tokens": kwargs.get("max_tokens", self.config.max_tokens),
+            "temperature": kwargs.get("temperature", self.config.temperature),
+            "stream": True
+        }
+
+        content_parts: List[str] = []
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        finish_reason = None
+        first_token_ms = None
+        completed = False
+        stream = None
+
+        try:
+            self._check_rate_limit()
+
+            logger.info(f"Starting streamed chat completion with model {self.config.model_name}")
+
+            stream = await self.async_client.chat.completions.create(
+                model=self.config.model_name,
+                messages=chat_messages,
+                max_tokens=kwargs.get("max_tokens", self.config.max_tokens),
+                temperature=kwargs.get("temperature", self.config.temperature),
+                timeout=self.config.timeout,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            async for chunk in stream:
+                # The final chunk carries usage only and has no choices
+                if getattr(chunk, "usage", None):
+                    usage = {
+                        "prompt_tokens": chunk.usage.prompt_tokens or 0,
+                        "completion_tokens": chunk.usage.completion_tokens or 0,
+                        "total_tokens": chunk.usage.total_tokens or 0
+                    }
+                if not chunk.choices:
+                    continue
+
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+
+                delta = choice.delta.content if choice.delta else None
+                if not delta:
+                    continue
+
+                if first_token_ms is None:
+                    first_token_ms = int((time.time() - start_time) * 1000)
+                content_parts.append(delta)
+                yield {"type": "delta", "content": delta}
+
+            completed = True
+            processing_time_ms = int((time.time() - start_time) * 1000)
+
+            yield {
+                "type": "done",
+                "content": "".join(content_parts),
+                "role": "assistant",
+                "finish_reason": finish_reason,
+                "usage": usage,
+                "first_token_ms": first_token_ms or processing_time_ms,
+                "processing_time_ms": processing_time_ms
+            }
+
+        except openai.RateLimitError as e:
+            error_msg = f"OpenAI rate limit exceeded: {str(e)}"
+            logger.error(error_msg)
+            self._log_metric(
+                service_type=MetricType.CONVERSATION,
+                request_data=request_data,
+                processing_time_ms=int((time.time() - start_time) * 1000),
+                success=False,
+                error_message=error_msg,
+                academy_id=academy_id
+            )
+            raise OpenAIServiceError(error_msg, error_code="RATE_LIMIT", original_error=e)
+
+        except openai.AuthenticationError as e:
+            error_msg = f"OpenAI authentication failed: {str(e)}"
+            logger.error(error_msg)
+            self._log_metric(
+                service_type=MetricType.CONVERSATION,
+                request_data=request_data,
+                processing_time_ms=int((time.time() - start_time) * 1000),
+                success=False,
+                error_message=error_msg,
+                academy_id=academy_id
+            )
+            raise OpenAIServiceError(error_msg, error_code="AUTH_ERROR", original_error=e)
+
+        except OpenAIServiceError:
+            raise
+
+        except Exception as e:
+            error_msg = f"Chat completion stream failed: {str(e)}"
+            logger.error(error_msg)
+            self._log_metric(
+                service_type=MetricType.CONVERSATION,
+                request_data=request_data,
+                processing_time_ms=int((time.time() - start_time) * 1000),
+                success=False,
+                error_message=error_msg,
+                academy_id=academy_id
+            )
+            raise OpenAIServiceError(error_msg, original_error=e)
+
+        finally:
+            # Runs on normal completion and when the consumer closes us early
+            if stream is not None and not completed:
+                try:
+                    await stream.close()
+                except Exception as close_error:
+                    logger.warning(f"Failed to close upstream stream: {str(close_error)}")
+
+            if completed or content_parts:
+                processing_time_ms = int((time.time() - start_time) * 1000)
+                self._log_metric(
+                    service_type=MetricType.CONVERSATION,
+                    request_data=request_data,
+                    response_data={
+                        "finish_reason": finish_reason if completed else "cancelled",
+                        "first_token_ms": first_token_ms,
+                        "streamed": True
+                    },
+                    processing_time_ms=processing_time_ms,
+                    tokens_used=usage["total_tokens"],
+                    success=completed,
+                    error_message=None if completed else "Client disconnected before completion",
+                    academy_id=academy_id
+                )
+                logger.info(
+                    f"Streamed chat completion {'completed' if completed else 'cancelled'} "
+                    f"in {processing_time_ms}ms (first token {first_token_ms}ms)"
+                )
+
     async def generate_exam_feedback(
         self,
         exam_data: Dict[str, Any],
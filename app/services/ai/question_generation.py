@@ -0,0 +1,383 @@
+"""
+AI Question Generation Pipeline
+===============================
+
+Map-reduce question generation over full chapter content.
+
+- Map: chapter sources are split into token-bounded chunks and candidate
+  questions are generated for every chunk concurrently (with a cap).
+- Reduce: candidates are deduplicated by normalized-text similarity and a
+  set balanced across chunks and difficulty levels is selected.
+- Persist: selected questions and options are bulk-inserted in the caller's
+  transaction.
+"""
+
+import asyncio
+import json
+import math
+import re
+import time
+import uuid
+import logging
+from collections import defaultdict, deque
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.exam import Question, QuestionOption, QuestionType
+from app.services.ai.openai_service import OpenAIChatService, OpenAIServiceError
+from app.services.ai.token_counter import count_tokens, split_into_chunks
+
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTY_LEVELS = ["easy", "medium", "hard"]
+
+SYSTEM_PROMPT = """أنت خبير في إنشاء الأسئلة التعليمية. مهمتك إنشاء أسئلة تعليمية عالية الجودة بناءً على المحتوى المقدم.
+يجب أن تكون الأسئلة واضحة ومفيدة وتقيس فهم الطلاب للمحتوى بشكل فعال.
+تأكد من أن الأسئلة متنوعة وتغطي جوانب مختلفة من المحتوى."""
+
+_DIACRITICS_RE = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_PUNCTUATION_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_ARABIC_FOLDS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+
+
+def normalize_question_text(text: str) -> str:
+    """Fold diacritics, letter variants, punctuation and spacing"""
+    text = _DIACRITICS_RE.sub("", (text or "").lower())
+    text = text.translate(_ARABIC_FOLDS)
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def extract_json_payload(content: str) -> Dict[str, Any]:
+    """Parse a JSON object that may be wrapped in a markdown code fence"""
+    content = (content or "").strip()
+    if "```json" in content:
+        start_idx = content.find("```json") + 7
+        end_idx = content.find("```", start_idx)
+        content = content[start_idx:end_idx].strip()
+    elif "```" in content:
+        start_idx = content.find("```") + 3
+        end_idx = content.find("```", start_idx)
+        content = content[start_idx:end_idx].strip()
+    return json.loads(content)
+
+
+class QuestionGenerationPipeline:
+    """
+    Generates exam questions from long content with bounded prompts.
+
+    Each chunk prompt stays under ``chunk_tokens`` so long chapters are
+    covered end to end, and every call only asks for a handful of questions
+    so completions do not truncate.
+    """
+
+    def __init__(
+        self,
+        chat_service: OpenAIChatService,
+        chunk_tokens: int = 1500,
+        max_concurrency: int = 4,
+        oversample: float = 1.5,
+        similarity_threshold: float = 0.8,
+        max_tokens_per_call: int = 1500
+    ):
+        self.chat_service = chat_service
+        self.chunk_tokens = chunk_tokens
+        self.max_concurrency = max_concurrency
+        self.oversample = oversample
+        self.similarity_threshold = similarity_threshold
+        self.max_tokens_per_call = max_tokens_per_call
+
+    # ----------------------------------------
+    # Map
+    # ----------------------------------------
+
+    def build_chunks(self, sources: List[str]) -> List[str]:
+        """Chunk every source separately so chunks never straddle lessons"""
+        model = self.chat_service.config.model_name
+        chunks: List[str] = []
+        for source in sources:
+            if source and source.strip():
+                chunks.extend(split_into_chunks(source, self.chunk_tokens, model))
+        return chunks
+
+    def _build_prompt(self, chunk: str, count: int, difficulty_level: str, question_types: List[str]) -> str:
+        if difficulty_level == "mixed":
+            difficulty_text = "متنوع (easy, medium, hard) وحدد مستوى كل سؤال في الحقل difficulty"
+        else:
+            difficulty_text = difficulty_level
+
+        return f"""
+        بناءً على المحتوى التالي، أنشئ {count} سؤال تعليمي:
+
+        المحتوى:
+        {chunk}
+
+        المتطلبات:
+        - عدد الأسئلة: {count}
+        - مستوى الصعوبة: {difficulty_text}
+        - أنواع الأسئلة: {", ".join(question_types)}
+        - يجب أن تكون الأسئلة باللغة العربية
+        - اجعل الأسئلة مفيدة وتقيس الفهم الحقيقي
+
+        قدم الأسئلة في تنسيق JSON بالشكل التالي:
+        {{
+            "questions": [
+                {{
+                    "type": "multiple_choice",
+                    "difficulty": "medium",
+                    "question": "نص السؤال",
+                    "options": [
+                        {{"text": "الخيار الأول", "is_correct": false}},
+                        {{"text": "الخيار الثاني", "is_correct": true}}
+                    ],
+                    "explanation": "شرح الإجابة الصحيحة"
+                }}
+            ]
+        }}
+        """
+
+    async def _generate_for_chunk(
+        self,
+        semaphore: asyncio.Semaphore,
+        chunk_index: int,
+        chunk: str,
+        count: int,
+        difficulty_level: str,
+        question_types: List[str],
+        academy_id: Optional[int]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        async with semaphore:
+            response = await self.chat_service.generate_completion(
+                messages=[{"role": "user", "content": self._build_prompt(chunk, count, difficulty_level, question_types)}],
+                system_prompt=SYSTEM_PROMPT,
+                academy_id=academy_id,
+                max_tokens=self.max_tokens_per_call,
+                temperature=0.7
+            )
+
+        try:
+            questions = extract_json_payload(response["content"]).get("questions", [])
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.error(f"Failed to parse questions for chunk {chunk_index}: {str(e)}")
+            questions = []
+
+        for question in questions:
+            question["_chunk"] = chunk_index
+            if question.get("difficulty") not in DIFFICULTY_LEVELS:
+                question["difficulty"] = difficulty_level if difficulty_level in DIFFICULTY_LEVELS else "medium"
+
+        return questions, response.get("usage", {})
+
+    # ----------------------------------------
+    # Reduce
+    # ----------------------------------------
+
+    def deduplicate(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop empty questions and near-duplicates (word-set Jaccard)"""
+        kept: List[Dict[str, Any]] = []
+        kept_sets: List[frozenset] = []
+        seen_exact = set()
+
+        for candidate in candidates:
+            normalized = normalize_question_text(candidate.get("question", ""))
+            if not normalized or normalized in seen_exact:
+                continue
+
+            words = frozenset(normalized.split())
+            if any(_jaccard(words, other) >= self.similarity_threshold for other in kept_sets):
+                continue
+
+            seen_exact.add(normalized)
+            kept_sets.append(words)
+            kept.append(candidate)
+
+        return kept
+
+    def select_balanced(self, candidates: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        """
+        Pick ``count`` questions round-robin across chunks, preferring the
+        difficulty level that has been picked least so far.
+        """
+        by_chunk: Dict[int, Dict[str, deque]] = defaultdict(lambda: defaultdict(deque))
+        for candidate in candidates:
+            by_chunk[candidate["_chunk"]][candidate["difficulty"]].append(candidate)
+
+        picked: List[Dict[str, Any]] = []
+        difficulty_counts = {level: 0 for level in DIFFICULTY_LEVELS}
+        chunk_order = deque(sorted(by_chunk))
+
+        while chunk_order and len(picked) < count:
+            chunk_index = chunk_order.popleft()
+            buckets = by_chunk[chunk_index]
+            available = [level for level, bucket in buckets.items() if bucket]
+            if not available:
+                continue
+
+            level = min(available, key=lambda lvl: (difficulty_counts.get(lvl, 0), lvl))
+            picked.append(buckets[level].popleft())
+            difficulty_counts[level] = difficulty_counts.get(level, 0) + 1
+
+            if any(buckets.values()):
+                chunk_order.append(chunk_index)
+
+        return picked
+
+    # ----------------------------------------
+    # Pipeline
+    # ----------------------------------------
+
+    async def generate(
+        self,
+        sources: List[str],
+        questions_count: int,
+        difficulty_level: str = "medium",
+        question_types: Optional[List[str]] = None,
+        academy_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Run the full map-reduce generation
+
+        Args:
+            sources: Content sources (one per lesson transcript/description)
+            questions_count: Number of questions wanted
+            difficulty_level: easy, medium, hard or mixed
+            question_types: Question types to request
+            academy_id: Academy ID for metrics
+
+        Returns:
+            Dictionary with selected ``questions`` and generation ``stats``
+
+        Raises:
+            OpenAIServiceError: If no chunk could be processed
+        """
+        start_time = time.perf_counter()
+        question_types = question_types or ["multiple_choice"]
+
+        chunks = self.build_chunks(sources)
+        if not chunks:
+            return {"questions": [], "stats": {"chunks": 0}}
+
+        per_chunk = max(1, math.ceil(questions_count * self.oversample / len(chunks)))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        results = await asyncio.gather(
+            *[
+                self._generate_for_chunk(
+                    semaphore, index, chunk, per_chunk, difficulty_level, question_types, academy_id
+                )
+                for index, chunk in enumerate(chunks)
+            ],
+            return_exceptions=True
+        )
+
+        candidates: List[Dict[str, Any]] = []
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        failed_chunks = 0
+
+        for result in results:
+            if isinstance(result, BaseException):
+                failed_chunks += 1
+                logger.error(f"Question generation chunk failed: {str(result)}")
+                continue
+            questions, chunk_usage = result
+            candidates.extend(questions)
+            for key in usage:
+                usage[key] += chunk_usage.get(key, 0)
+
+        if failed_chunks == len(chunks):
+            first_error = next(r for r in results if isinstance(r, BaseException))
+            if isinstance(first_error, OpenAIServiceError):
+                raise first_error
+            raise OpenAIServiceError(f"فشل في توليد الأسئلة: {str(first_error)}", original_error=first_error)
+
+        unique = self.deduplicate(candidates)
+        selected = self.select_balanced(unique, questions_count)
+
+        stats = {
+            "chunks": len(chunks),
+            "failed_chunks": failed_chunks,
+            "content_tokens": sum(count_tokens(chunk, self.chat_service.config.model_name) for chunk in chunks),
+            "candidates": len(candidates),
+            "duplicates_removed": len(candidates) - len(unique),
+            "selected": len(selected),
+            "usage": usage,
+            "wall_clock_ms": int((time.perf_counter() - start_time) * 1000)
+        }
+        logger.info(f"Question generation finished: {stats}")
+
+        return {"questions": selected, "stats": stats}
+
+    # ----------------------------------------
+    # Persistence
+    # ----------------------------------------
+
+    @staticmethod
+    def persist_questions(db: Session, exam_id: str, questions: List[Dict[str, Any]], score: int = 10) -> int:
+        """
+        Bulk-insert questions and their options.
+
+        Runs two multi-row INSERTs inside the caller's transaction; the caller
+        commits or rolls back.
+
+        Returns:
+            Number of questions inserted
+        """
+        question_rows: List[Dict[str, Any]] = []
+        option_rows: List[Dict[str, Any]] = []
+
+        for question_data in questions:
+            title = (question_data.get("question") or "").strip()
+            if not title:
+                continue
+
+            q_type = question_data.get("type", "multiple_choice")
+            if q_type == "multiple_choice":
+                question_type = QuestionType.MULTIPLE_CHOICE
+            elif q_type == "true_false":
+                question_type = QuestionType.TRUE_FALSE
+            else:
+                question_type = QuestionType.TEXT
+
+            question_id = str(uuid.uuid4())
+            correct_answer_text = ""
+
+            for option_data in question_data.get("options", []) or []:
+                option_text = (option_data.get("text") or "").strip()
+                if not option_text:
+                    continue
+                is_correct = bool(option_data.get("is_correct", False))
+                if is_correct and not correct_answer_text:
+                    correct_answer_text = option_text
+                option_rows.append({
+                    "id": str(uuid.uuid4()),
+                    "question_id": question_id,
+                    "text": option_text[:255],
+                    "is_correct": is_correct
+                })
+
+            question_rows.append({
+                "id": question_id,
+                "exam_id": exam_id,
+                "title": title[:255],
+                "description": question_data.get("explanation", ""),
+                "type": question_type,
+                "score": score,
+                "correct_answer": correct_answer_text[:255],
+                "is_ai_generated": True
+            })
+
+        if question_rows:
+            db.execute(insert(Question), question_rows)
+        if option_rows:
+            db.execute(insert(QuestionOption), option_rows)
+
+        return len(question_rows)
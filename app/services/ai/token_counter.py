@@ -0,0 +1,123 @@
+"""
+Token Counting Utilities
+========================
+
+Estimates model token counts for prompt budgeting and chunking.
+Uses ``tiktoken`` when it is installed and falls back to a character based
+estimate tuned for mixed Arabic/English text otherwise.
+"""
+
+import re
+from functools import lru_cache
+from typing import List
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Tokens added by the chat format around every message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_ARABIC_CHAR_RE = re.compile(r"[\u0600-\u06FF\u0750-\u077F]")
+_SENTENCE_END_RE = re.compile(r"(?<=[\.\!\?؟۔])\s+|\n+")
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """
+    Count (or estimate) the tokens in a text
+
+    Args:
+        text: Text to measure
+        model: Model whose tokenizer should be used
+
+    Returns:
+        Number of tokens
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+
+    # Arabic script tokenizes at roughly 2 chars/token, Latin at roughly 4
+    arabic_chars = len(_ARABIC_CHAR_RE.findall(text))
+    other_chars = len(text) - arabic_chars
+    return max(1, int(arabic_chars / 2 + other_chars / 4 + 0.5))
+
+
+def count_message_tokens(content: str, model: str = "gpt-4") -> int:
+    """Token cost of one chat message including format overhead"""
+    return count_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS
+
+
+def split_into_chunks(text: str, max_tokens: int, model: str = "gpt-4") -> List[str]:
+    """
+    Split text into chunks of at most ``max_tokens`` tokens
+
+    Splits on sentence boundaries where possible; single sentences longer
+    than the budget are split on words.
+
+    Args:
+        text: Text to split
+        max_tokens: Token budget per chunk
+        model: Model whose tokenizer should be used
+
+    Returns:
+        List of non-empty chunks
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append(" ".join(current).strip())
+        current = []
+        current_tokens = 0
+
+    for sentence in _SENTENCE_END_RE.split(text or ""):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+
+        sentence_tokens = count_tokens(sentence, model)
+
+        if sentence_tokens > max_tokens:
+            flush()
+            words: List[str] = []
+            words_tokens = 0
+            for word in sentence.split():
+                word_tokens = count_tokens(word, model) + 1
+                if words and words_tokens + word_tokens > max_tokens:
+                    chunks.append(" ".join(words))
+                    words, words_tokens = [], 0
+                words.append(word)
+                words_tokens += word_tokens
+            if words:
+                chunks.append(" ".join(words))
+            continue
+
+        if current and current_tokens + sentence_tokens > max_tokens:
+            flush()
+
+        current.append(sentence)
+        current_tokens += sentence_tokens + 1
+
+    flush()
+    return [chunk for chunk in chunks if chunk]
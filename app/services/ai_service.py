@@ -31,6 +31,9 @@ from app.models.exam import Exam
 from app.models.student import Student
 from app.models.academy import Academy
 from app.core.config import settings
+from app.services.ai.conversation_context import ConversationContextManager
+from app.services.ai.token_counter import count_message_tokens
+from app.services.exam_grading import ExamGradingEngine, FreeTextCorrector
 
 
 class AIService:
@@ -456,92 +459,134 @@ class AIService:
                 "error": str(e)
             }
     
+    def prepare_streamed_turn(
+        self,
+        conversation_id: str,
+        user_id: int,
+        message: str,
+        model: str = "gpt-4",
+        system_prompt: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Store the user message and build the model context for a streamed reply.
+
+        The context is filled newest-first within the configured token budget
+        on top of the conversation summary. The AI reply itself is persisted
+        by the streaming layer once the stream finishes.
+
+        Args:
+            conversation_id: Conversation ID
+            user_id: Owner of the conversation
+            message: User message content
+            model: Model name used for token counting
+            system_prompt: System prompt sent with the messages
+
+        Returns:
+            Dictionary containing the conversation and chat messages
+        """
+        try:
+            conversation = self.db.query(AIConversation).filter(
+                AIConversation.id == conversation_id,
+                AIConversation.user_id == user_id
+            ).first()
+
+            if not conversation:
+                return {
+                    "success": False,
+                    "message": "لم يتم العثور على المحادثة",
+                    "data": None
+                }
+
+            context_manager = ConversationContextManager(self.db, model=model)
+            context = context_manager.build_context(conversation, message, system_prompt=system_prompt)
+
+            user_message = AIConversationMessage(
+                conversation_id=conversation_id,
+                sender_type=SenderType.USER,
+                message=message,
+                message_type=MessageType.TEXT,
+                token_count=count_message_tokens(message, model)
+            )
+            self.db.add(user_message)
+            self.db.commit()
+
+            return {
+                "success": True,
+                "message": "تم إضافة الرسالة بنجاح",
+                "data": {
+                    "conversation_id": conversation.id,
+                    "academy_id": conversation.academy_id,
+                    "user_message_id": user_message.id,
+                    "messages": context["messages"],
+                    "prompt_tokens": context["prompt_tokens"]
+                }
+            }
+
+        except Exception as e:
+            self.db.rollback()
+            return {
+                "success": False,
+                "message": "حدث خطأ في إضافة الرسالة",
+                "error": str(e)
+            }
+
     # ========================================
     # EXAM CORRECTION
     # ========================================
     
-    def correct_exam(
+    async def correct_exam(
         self, 
         exam_id: str,
         student_id: int,
-        academy_id: int,
-        student_answers: List[Dict[str, Any]]
+        academy_id: Optional[int],
+        student_answers: List[Dict[str, Any]],
+        corrector: Optional[FreeTextCorrector] = None
     ) -> Dict[str, Any]:
         """
-        Correct an exam using AI.
+        Correct an exam against its cached answer key.
+        
+        Objective questions are graded locally; free-text answers go to
+        ``corrector`` in one batched call.
         
         Args:
             exam_id: Exam ID
             student_id: Student ID
-            academy_id: Academy ID
+            academy_id: Academy ID, taken from the exam's course when omitted
             student_answers: List of student answers
+            corrector: Free-text corrector
             
         Returns:
             Dictionary containing correction results
         """
         try:
+            engine = ExamGradingEngine(self.db, corrector=corrector)
+            
             # Validate exam exists
-            exam = self.db.query(Exam).filter(Exam.id == exam_id).first()
-            if not exam:
+            answer_key = engine.get_answer_key(exam_id)
+            if not answer_key:
                 return {
                     "success": False,
                     "message": "لم يتم العثور على الامتحان",
                     "data": None
                 }
             
-            # Process answers and calculate scores
-            correction_results = self._process_exam_answers(exam, student_answers)
-            
-            # Create exam correction record
-            exam_correction = ExamCorrection(
-                exam_id=exam_id,
-                student_id=student_id,
-                academy_id=academy_id,
-                submission_id=str(uuid.uuid4()),
-                total_score=correction_results["total_score"],
-                max_score=correction_results["max_score"],
-                percentage=correction_results["percentage"],
-                auto_feedback=correction_results["feedback"],
-                recommendations=correction_results["recommendations"],
-                improvement_areas=correction_results["improvement_areas"],
-                strengths=correction_results["strengths"],
-                study_plan=correction_results["study_plan"],
-                correction_time_ms=correction_results["processing_time"]
-            )
-            
-            self.db.add(exam_correction)
-            self.db.flush()
-            
-            # Create individual question corrections
-            for question_result in correction_results["questions"]:
-                question_correction = QuestionCorrection(
-                    exam_correction_id=exam_correction.id,
-                    question_id=question_result["question_id"],
-                    student_answer=question_result["student_answer"],
-                    correct_answer=question_result["correct_answer"],
-                    is_correct=question_result["is_correct"],
-                    score_awarded=question_result["score_awarded"],
-                    max_score=question_result["max_score"],
-                    ai_feedback=question_result["feedback"]
-                )
-                
-                self.db.add(question_correction)
-            
+            grading = await engine.grade(answer_key, student_answers)
+            correction_id = engine.persist(answer_key, student_id, grading, academy_id=academy_id)
             self.db.commit()
-            self.db.refresh(exam_correction)
             
             return {
                 "success": True,
                 "message": "تم تصحيح الامتحان بنجاح",
                 "data": {
-                    "correction_id": exam_correction.id,
-                    "total_score": float(exam_correction.total_score),
-                    "max_score": float(exam_correction.max_score),
-                    "percentage": float(exam_correction.percentage),
-                    "feedback": exam_correction.auto_feedback,
-                    "recommendations": exam_correction.recommendations,
-                    "passed": exam_correction.percentage >= 60.0,
-                    "corrected_at": exam_correction.corrected_at
+                    "correction_id": correction_id,
+                    "total_score": grading["total_score"],
+                    "max_score": grading["max_score"],
+                    "percentage": grading["percentage"],
+                    "feedback": grading["feedback"],
+                    "recommendations": grading["recommendations"],
+                    "passed": grading["passed"],
+                    "questions": grading["questions"],
+                    "corrected_at": datetime.utcnow()
                 }
             }
             
@@ -602,47 +647,6 @@ class AIService:
             "processing_time": 950
         }
     
-    def _process_exam_answers(self, exam: Exam, student_answers: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """
-        Process exam answers and calculate scores.
-        This would integrate with actual AI grading service.
-        """
-        # Simulate exam correction
-        total_score = 0
-        max_score = 100
-        questions = []
-        
-        for answer in student_answers:
-            # Simulate question correction
-            is_correct = answer.get("answer") == "correct_answer"  # Simplified
-            score = 10 if is_correct else 0
-            total_score += score
-            
-            questions.append({
-                "question_id": answer["question_id"],
-                "student_answer": answer["answer"],
-                "correct_answer": "correct_answer",
-                "is_correct": is_correct,
-                "score_awarded": score,
-                "max_score": 10,
-                "feedback": "إجابة صحيحة، أحسنت!" if is_correct else "إجابة خاطئة، يرجى المراجعة"
-            })
-        
-        percentage = (total_score / max_score) * 100
-        
-        return {
-            "total_score": total_score,
-            "max_score": max_score,
-            "percentage": percentage,
-            "feedback": f"حصلت على {percentage}% في هذا الامتحان",
-            "recommendations": ["راجع المواضيع التي لم تجب عليها بشكل صحيح"],
-            "improvement_areas": ["الفهم القرائي", "التحليل"],
-            "strengths": ["الحفظ", "الفهم الأساسي"],
-            "study_plan": {"week_1": "راجع الدرس الأول", "week_2": "حل تمارين إضافية"},
-            "processing_time": 2500,
-            "questions": questions
-        }
-    
     def _log_ai_performance(
         self, 
         metric_type: MetricType,
@@ -1,23 +1,44 @@
 """
 Cart service for managing shopping cart operations.
 Supports both authenticated students and guest users through cookies.
+
+Cart reads load rows, products and linked courses in one joined query and
+price each item once. Guest carts are merged into the student's cart when
+tokens are issued (login, registration, OTP verification, refresh), not
+on reads. Per-owner summaries (count, subtotal, discount) are cached for
+the header badge and dropped whenever the owner's cart rows change.
 """
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional, Dict, Any
+from sqlalchemy import and_, or_, event, inspect, select
+from typing import List, Optional, Dict, Any, Set, Tuple
+from collections import OrderedDict
+from itertools import chain
+import logging
+import threading
+import time
 import uuid
 from datetime import datetime, timedelta
 
+from app.core.config import settings
 from app.models.cart import Cart
-from app.models.product import Product
+from app.models.product import Product, ProductType
 from app.models.course import Course
 from app.models.product import DigitalProduct
 from app.models.student import Student
 from app.core.response_handler import ResponseHandler
 
 
+logger = logging.getLogger(__name__)
+
+
 class CartService:
+    @staticmethod
+    def extract_cookie_id(the_cookie: Optional[str]) -> Optional[str]:
+        """Guest cart identifier from the TheCookie header, if any"""
+        the_cookie = (the_cookie or "").strip()
+        return the_cookie or None
+
     @staticmethod
     def add_to_cart(
         db: Session,
@@ -202,6 +223,115 @@ class CartService:
         except Exception:
             return None
 
+    @staticmethod
+    def _owner_filter(student_id: Optional[int], cookie_id: Optional[str]):
+        """Filter selecting the rows of a student cart or a guest cart"""
+        if student_id:
+            return and_(Cart.student_id == student_id, Cart.deleted_at.is_(None))
+        if cookie_id:
+            return and_(Cart.cookie_id == cookie_id, Cart.student_id.is_(None), Cart.deleted_at.is_(None))
+        return None
+
+    @staticmethod
+    def _load_items(
+        db: Session,
+        student_id: Optional[int] = None,
+        cookie_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Cart rows with their products and linked courses in one query"""
+        owner_filter = CartService._owner_filter(student_id, cookie_id)
+        if owner_filter is None:
+            return []
+
+        rows = db.execute(
+            select(Cart.id, Cart.product_id, Product, Course.image, Course.short_content)
+            .outerjoin(Product, Product.id == Cart.product_id)
+            .outerjoin(Course, Course.product_id == Product.id)
+            .where(owner_filter)
+            .order_by(Cart.created_at, Cart.id, Course.created_at)
+        ).all()
+
+        now = datetime.utcnow()
+        items = []
+        seen = set()
+        for cart_id, product_id, product, course_image, course_summary in rows:
+            # A product with several courses comes back once per course; the first one wins
+            if cart_id in seen:
+                continue
+            seen.add(cart_id)
+            item = CartService._item_details(product_id, product, course_image, course_summary, now)
+            item["cart_id"] = cart_id
+            items.append(item)
+        return items
+
+    @staticmethod
+    def _item_details(
+        product_id: int,
+        product: Optional[Product],
+        course_image: Optional[str],
+        course_summary: Optional[str],
+        now: datetime
+    ) -> Dict[str, Any]:
+        """Same shape as Cart.get_item_details, priced once"""
+        if product is None:
+            return {
+                'id': str(product_id) if product_id else 'unknown',
+                'title': 'منتج غير متوفر',
+                'price': 0,
+                'original_price': 0,
+                'discount_amount': 0,
+                'has_discount': False,
+                'image': None,
+                'description': 'المنتج غير متوفر حالياً',
+                'currency': 'SAR',
+                'type': 'unknown'
+            }
+
+        original_price = float(product.price) if product.price else 0.0
+        price = original_price
+        if product.discount_price and product.discount_ends_at and now < product.discount_ends_at:
+            price = float(product.discount_price)
+        discount_amount = max(0.0, original_price - price)
+
+        is_course = product.product_type == ProductType.course
+        return {
+            'id': str(product_id),
+            'title': product.title,
+            'price': price,
+            'original_price': original_price,
+            'discount_amount': discount_amount,
+            'has_discount': discount_amount > 0,
+            'image': course_image if is_course else None,
+            'description': product.description or ((course_summary or '') if is_course else ''),
+            'currency': product.currency or 'SAR',
+            'type': product.product_type,
+            # Not part of the response; bounds how long a cached summary stays valid
+            '_discount_ends_at': product.discount_ends_at if discount_amount > 0 else None
+        }
+
+    @staticmethod
+    def _summarize(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        subtotal = sum(item["price"] for item in items)
+        total_discount = sum(item["discount_amount"] for item in items)
+        return {
+            "count": len(items),
+            "subtotal": subtotal,
+            "total_discount": total_discount,
+            "total": subtotal - total_discount,
+            "currency": "SAR"
+        }
+
+    @staticmethod
+    def _remember_summary(student_id: Optional[int], cookie_id: Optional[str],
+                          items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Summarize loaded items, cache the summary and strip internal keys"""
+        summary = CartService._summarize(items)
+        deadlines = [item.pop("_discount_ends_at") for item in items]
+        owner = cart_owner(student_id, cookie_id)
+        if owner is not None:
+            cart_summary_cache.put(owner, summary, min(filter(None, deadlines), default=None))
+        return summary
+
     @staticmethod
     def get_cart_items(
         db: Session,
@@ -210,33 +340,10 @@ class CartService:
     ) -> dict:
         """Get all cart items for user"""
         try:
-            # Migrate guest cart if authenticated user
-            if student_id and cookie_id:
-                CartService._migrate_guest_cart(db, student_id, cookie_id)
-            
-            # Build query
-            query = db.query(Cart)
-            
-            if student_id:
-                query = query.filter(Cart.student_id == student_id)
-            elif cookie_id:
-                query = query.filter(
-                    and_(Cart.cookie_id == cookie_id, Cart.student_id.is_(None))
-                )
-            else:
-                return ResponseHandler.success(
-                    message="السلة فارغة",
-                    data={
-                        "items": [],
-                        "total": 0,
-                        "count": 0,
-                        "currency": "SAR"
-                    }
-                )
-            
-            cart_items = query.all()
-            
-            if not cart_items:
+            items = CartService._load_items(db, student_id, cookie_id)
+            summary = CartService._remember_summary(student_id, cookie_id, items)
+
+            if not items:
                 return ResponseHandler.success(
                     message="السلة فارغة",
                     data={
@@ -246,26 +353,17 @@ class CartService:
                         "currency": "SAR"
                     }
                 )
-            
-            # Calculate totals
-            total = sum(item.price for item in cart_items)
-            
-            items_data = []
-            for item in cart_items:
-                item_details = item.get_item_details()
-                item_details['cart_id'] = item.id
-                items_data.append(item_details)
-            
+
             return ResponseHandler.success(
-                message=f"تم العثور على {len(cart_items)} منتجات في السلة",
+                message=f"تم العثور على {len(items)} منتجات في السلة",
                 data={
-                    "items": items_data,
-                    "total": total,
-                    "count": len(cart_items),
+                    "items": items,
+                    "total": summary["subtotal"],
+                    "count": len(items),
                     "currency": "SAR"
                 }
             )
-            
+
         except Exception as e:
             return ResponseHandler.error(
                 message=f"خطأ في استرجاع السلة: {str(e)}",
@@ -273,40 +371,33 @@ class CartService:
             )
 
     @staticmethod
-    def _migrate_guest_cart(db: Session, student_id: int, cookie_id: str):
-        """Migrate guest cart items to authenticated user"""
+    def migrate_guest_cart(db: Session, student_id: int, cookie_id: str) -> int:
+        """
+        Move a guest cart to the student who just logged in.
+
+        Called when the student is issued tokens. Guest rows for products the student already
+        has are dropped; the rest change owner. Returns the number of rows
+        moved.
+        """
         try:
-            # Find guest cart items
-            guest_items = db.query(Cart).filter(
-                and_(Cart.cookie_id == cookie_id, Cart.student_id.is_(None))
-            ).all()
-            
-            if not guest_items:
-                return
-            
-            # Update guest items to be owned by the student
-            for item in guest_items:
-                # Check if student already has this product
-                existing = db.query(Cart).filter(
-                    and_(
-                        Cart.student_id == student_id,
-                        Cart.product_id == item.product_id
-                    )
-                ).first()
-                
-                if existing:
-                    # Delete duplicate guest item
-                    db.delete(item)
-                else:
-                    # Transfer ownership
-                    item.student_id = student_id
-                    item.updated_at = datetime.utcnow()
-            
+            guest_filter = and_(Cart.cookie_id == cookie_id, Cart.student_id.is_(None))
+            owned_products = select(Cart.product_id).where(Cart.student_id == student_id).scalar_subquery()
+
+            db.query(Cart).filter(guest_filter, Cart.product_id.in_(owned_products)).delete(
+                synchronize_session=False
+            )
+            moved = db.query(Cart).filter(guest_filter).update(
+                {"student_id": student_id, "updated_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            mark_carts_changed(db, {("student", student_id), ("guest", cookie_id)})
             db.commit()
-            
+            return moved
+
         except Exception as e:
             db.rollback()
-            print(f"Error migrating guest cart: {e}")
+            logger.error(f"Error migrating guest cart: {e}")
+            return 0
 
     @staticmethod
     def remove_from_cart(
@@ -428,33 +519,150 @@ class CartService:
     ) -> dict:
         """Get cart summary with totals"""
         try:
-            cart_result = CartService.get_cart_items(db, student_id, cookie_id)
-            
-            if not cart_result.get("success"):
-                return cart_result
-            
-            cart_data = cart_result.get("data", {})
-            items = cart_data.get("items", [])
-            
-            # Calculate detailed totals
-            subtotal = sum(item.get("price", 0) for item in items)
-            total_discount = sum(item.get("discount_amount", 0) for item in items)
-            total = subtotal - total_discount
-            
+            items = CartService._load_items(db, student_id, cookie_id)
+            summary = CartService._remember_summary(student_id, cookie_id, items)
+
             return ResponseHandler.success(
                 message="ملخص السلة",
-                data={
-                    "count": len(items),
-                    "subtotal": subtotal,
-                    "total_discount": total_discount,
-                    "total": total,
-                    "currency": "SAR",
-                    "items": items
-                }
+                data={**summary, "items": items}
             )
-            
+
+        except Exception as e:
+            return ResponseHandler.error(
+                message=f"خطأ في حساب ملخص السلة: {str(e)}",
+                status_code=500
+            )
+
+    @staticmethod
+    def get_cart_badge(
+        db: Session,
+        student_id: Optional[int] = None,
+        cookie_id: Optional[str] = None
+    ) -> dict:
+        """Count and totals for the header badge, from cache when possible"""
+        try:
+            owner = cart_owner(student_id, cookie_id)
+            summary = cart_summary_cache.get(owner) if owner is not None else None
+            if summary is None:
+                items = CartService._load_items(db, student_id, cookie_id)
+                summary = CartService._remember_summary(student_id, cookie_id, items)
+
+            return ResponseHandler.success(message="ملخص السلة", data=dict(summary))
+
         except Exception as e:
             return ResponseHandler.error(
                 message=f"خطأ في حساب ملخص السلة: {str(e)}",
                 status_code=500
-            ) 
\ No newline at end of file
+            )
+
+
+def cart_owner(student_id: Optional[int], cookie_id: Optional[str]) -> Optional[Tuple[str, Any]]:
+    """Cache key of a student cart or a guest cart"""
+    if student_id:
+        return ("student", student_id)
+    if cookie_id:
+        return ("guest", cookie_id)
+    return None
+
+
+class CartSummaryCache:
+    """
+    Per-worker cart summaries (count, subtotal, discount) keyed by owner.
+
+    Entries are dropped when the owner's cart rows change in this worker,
+    when any product price changes, once the earliest discount in the cart
+    ends, and after a TTL so changes from other workers show up.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, Any], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, owner: Tuple[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(owner)
+            if entry is None:
+                return None
+            summary, expires_at, discount_ends_at = entry
+            if time.monotonic() >= expires_at or (discount_ends_at and datetime.utcnow() >= discount_ends_at):
+                del self._entries[owner]
+                return None
+            self._entries.move_to_end(owner)
+            return summary
+
+    def put(self, owner: Tuple[str, Any], summary: Dict[str, Any], discount_ends_at: Optional[datetime] = None):
+        with self._lock:
+            self._entries[owner] = (summary, time.monotonic() + self.ttl_seconds, discount_ends_at)
+            self._entries.move_to_end(owner)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, owners: Optional[Set[Tuple[str, Any]]] = None):
+        """Drop the given owners' summaries (all of them when ``owners`` is None)"""
+        with self._lock:
+            if owners is None:
+                self._entries.clear()
+                return
+            for owner in owners:
+                self._entries.pop(owner, None)
+
+
+cart_summary_cache = CartSummaryCache(
+    max_entries=settings.CART_SUMMARY_CACHE_SIZE,
+    ttl_seconds=settings.CART_SUMMARY_TTL_SECONDS
+)
+
+
+# ----------------------------------------
+# Invalidation on ORM writes
+# ----------------------------------------
+
+_CHANGED = "cart_summary_changed"
+_ALL = "all"
+_PRICE_FIELDS = ("price", "discount_price", "discount_ends_at")
+
+
+def mark_carts_changed(session: Session, owners: Set[Tuple[str, Any]]):
+    """Queue cache invalidation for cart rows written around the ORM"""
+    changed = session.info.get(_CHANGED, set())
+    if changed != _ALL:
+        session.info[_CHANGED] = changed | {owner for owner in owners if owner[1] is not None}
+
+
+def _history_values(obj, name: str) -> Set:
+    history = inspect(obj).attrs[name].history
+    return set(chain(history.added, history.unchanged, history.deleted))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_cart_changes(session: Session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Cart):
+            owners = {("student", student_id) for student_id in _history_values(obj, "student_id") if student_id}
+            if None in _history_values(obj, "student_id"):
+                owners.update(("guest", cookie_id) for cookie_id in _history_values(obj, "cookie_id"))
+            mark_carts_changed(session, owners)
+        elif isinstance(obj, Product) and obj in session.dirty:
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in _PRICE_FIELDS):
+                session.info[_CHANGED] = _ALL
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_cart_summaries(session: Session):
+    changed = session.info.pop(_CHANGED, None)
+    if changed:
+        cart_summary_cache.invalidate(None if changed == _ALL else changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _invalidate_rolled_back_carts(session: Session):
+    # Summaries read inside the failed transaction may include its writes
+    changed = session.info.pop(_CHANGED, None)
+    if changed:
+        cart_summary_cache.invalidate(None if changed == _ALL else changed)
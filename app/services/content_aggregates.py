@@ -0,0 +1,253 @@
+"""
+Content Aggregates Service
+==========================
+
+Maintains the content aggregates stored on ``chapters`` and ``courses``:
+lesson counts by type, free previews, total video duration and bytes.
+
+- Every flush that creates, edits, moves or deletes a lesson or video
+  recomputes the affected chapters and courses with one grouped query each,
+  in the same transaction, so readers get one row instead of a tree.
+- ``recompute_all`` backfills every chapter and course; run it once after
+  the migration with ``python -m app.services.content_aggregates``.
+
+Duration and bytes follow the chapter statistics the endpoints always
+reported: only video lessons count, and a lesson counts the larger of its
+own ``video_duration``/``size_bytes`` and the sum over its active videos.
+"""
+
+import logging
+from itertools import chain
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import bindparam, case, event, func, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.chapter import Chapter
+from app.models.course import Course
+from app.models.lesson import Lesson, LessonType
+from app.models.video import Video
+from app.services.course_catalog import mark_courses_changed
+
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_FIELDS = (
+    "lessons_count", "video_lessons_count", "exam_lessons_count", "tool_lessons_count",
+    "free_preview_lessons_count", "total_duration_seconds", "total_video_bytes"
+)
+
+# Attribute changes that can move an aggregate
+LESSON_FIELDS = ("chapter_id", "course_id", "type", "is_free_preview", "video_duration", "size_bytes")
+VIDEO_FIELDS = ("lesson_id", "duration", "file_size", "status", "deleted_at")
+
+
+def chapter_statistics(chapter: Chapter) -> dict:
+    """Chapter statistics as returned by the chapter endpoints, read from the aggregates"""
+    total_duration = chapter.total_duration_seconds or 0
+    total_size = chapter.total_video_bytes or 0
+    return {
+        "total_lessons": chapter.lessons_count or 0,
+        "video_lessons": chapter.video_lessons_count or 0,
+        "exam_lessons": chapter.exam_lessons_count or 0,
+        "tool_lessons": chapter.tool_lessons_count or 0,
+        "total_duration_minutes": total_duration // 60,
+        "total_duration_hours": round((total_duration // 60) / 60, 1),
+        "total_size_mb": round(total_size / (1024 * 1024), 2),
+        "free_preview_lessons": chapter.free_preview_lessons_count or 0
+    }
+
+
+def _larger(own, from_videos):
+    own, from_videos = func.coalesce(own, 0), func.coalesce(from_videos, 0)
+    return case((from_videos > own, from_videos), else_=own)
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+class ContentAggregateService:
+    """Recomputes chapter and course content aggregates from their lessons"""
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+
+    # ----------------------------------------
+    # Recompute
+    # ----------------------------------------
+
+    def _totals(self, connection: Connection, group_column, ids: List) -> Dict[object, Dict[str, int]]:
+        """One grouped query over the lessons of ``ids``; groups without lessons get zeros"""
+        lesson_ids = select(Lesson.id).where(group_column.in_(ids))
+        videos = select(
+            Video.lesson_id,
+            func.sum(func.coalesce(Video.duration, 0)).label("duration"),
+            func.sum(func.coalesce(Video.file_size, 0)).label("bytes")
+        ).where(
+            Video.lesson_id.in_(lesson_ids), Video.status == True, Video.deleted_at.is_(None)
+        ).group_by(Video.lesson_id).subquery()
+
+        is_video = Lesson.type == LessonType.VIDEO.value
+        statement = select(
+            group_column,
+            func.count(Lesson.id),
+            _count_where(is_video),
+            _count_where(Lesson.type == LessonType.EXAM.value),
+            _count_where(Lesson.type == LessonType.TOOL.value),
+            _count_where(Lesson.is_free_preview == True),
+            func.coalesce(func.sum(case((is_video, _larger(Lesson.video_duration, videos.c.duration)), else_=0)), 0),
+            func.coalesce(func.sum(case((is_video, _larger(Lesson.size_bytes, videos.c.bytes)), else_=0)), 0)
+        ).outerjoin(videos, videos.c.lesson_id == Lesson.id).where(group_column.in_(ids)).group_by(group_column)
+
+        totals = {key: dict.fromkeys(AGGREGATE_FIELDS, 0) for key in ids}
+        for row in connection.execute(statement):
+            totals[row[0]] = dict(zip(AGGREGATE_FIELDS, (int(value or 0) for value in row[1:])))
+        return totals
+
+    def _write(self, connection: Connection, model, totals: Dict[object, Dict[str, int]]):
+        if not totals:
+            return
+        table = model.__table__
+        statement = update(table).where(table.c.id == bindparam("_id")).values(
+            {field: bindparam(f"_{field}") for field in AGGREGATE_FIELDS}
+        )
+        connection.execute(statement, [
+            {"_id": key, **{f"_{field}": value for field, value in values.items()}}
+            for key, values in totals.items()
+        ])
+
+    def _recompute(self, connection: Connection, model, group_column, ids: Iterable) -> int:
+        ids = sorted(ids)
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            self._write(connection, model, self._totals(connection, group_column, batch))
+        return len(ids)
+
+    def recompute_chapters(self, connection: Connection, chapter_ids: Iterable[int]) -> int:
+        return self._recompute(connection, Chapter, Lesson.chapter_id, chapter_ids)
+
+    def recompute_courses(self, connection: Connection, course_ids: Iterable[str]) -> int:
+        return self._recompute(connection, Course, Lesson.course_id, course_ids)
+
+    def recompute_all(self, db: Session) -> Tuple[int, int]:
+        """Backfill every chapter and course; the caller commits"""
+        connection = db.connection()
+        chapters = self.recompute_chapters(connection, connection.execute(select(Chapter.id)).scalars().all())
+        course_ids = connection.execute(select(Course.id)).scalars().all()
+        courses = self.recompute_courses(connection, course_ids)
+        mark_courses_changed(db, course_ids)
+        return chapters, courses
+
+    # ----------------------------------------
+    # Affected rows
+    # ----------------------------------------
+
+    def resolve_lessons(self, connection: Connection, lesson_ids: Set[str]) -> Tuple[Set[int], Set[str]]:
+        """Chapters and courses of lessons whose videos changed"""
+        chapter_ids, course_ids = set(), set()
+        if lesson_ids:
+            rows = connection.execute(
+                select(Lesson.chapter_id, Lesson.course_id).where(Lesson.id.in_(lesson_ids))
+            )
+            for chapter_id, course_id in rows:
+                chapter_ids.add(chapter_id)
+                course_ids.add(course_id)
+        return chapter_ids, course_ids
+
+    def apply(self, session: Session, affected: Dict[str, Set]):
+        connection = session.connection()
+        chapter_ids, course_ids = self.resolve_lessons(connection, affected.get("lessons", set()))
+        chapter_ids |= affected.get("chapters", set())
+        course_ids |= affected.get("courses", set())
+        chapter_ids.discard(None)
+        course_ids.discard(None)
+
+        self.recompute_chapters(connection, chapter_ids)
+        self.recompute_courses(connection, course_ids)
+
+        # Loaded objects must not keep serving the pre-flush values
+        for obj in list(session.identity_map.values()):
+            if (isinstance(obj, Chapter) and obj.id in chapter_ids) or (
+                isinstance(obj, Course) and obj.id in course_ids
+            ):
+                session.expire(obj, AGGREGATE_FIELDS)
+
+        # The catalog denormalizes lessons_count
+        mark_courses_changed(session, course_ids)
+
+
+content_aggregate_service = ContentAggregateService()
+
+
+# ----------------------------------------
+# Maintain on ORM writes
+# ----------------------------------------
+
+_AFFECTED = "content_aggregates_affected"
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Load the old parent on reassignment so the chapter a lesson leaves is recomputed too
+for _attribute in (Lesson.chapter_id, Lesson.course_id, Video.lesson_id):
+    event.listen(_attribute, "set", _keep_previous_value, active_history=True)
+
+
+def _values(obj, name: str) -> Set:
+    """Current and pre-flush values of an attribute"""
+    history = inspect(obj).attrs[name].history
+    return {value for value in chain(history.added, history.unchanged, history.deleted) if value is not None}
+
+
+def _changed(obj, names: Tuple[str, ...]) -> bool:
+    attrs = inspect(obj).attrs
+    return any(attrs[name].history.has_changes() for name in names)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_affected_content(session: Session, flush_context):
+    affected = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Lesson):
+            if obj in session.dirty and not _changed(obj, LESSON_FIELDS):
+                continue
+            entries = (("chapters", _values(obj, "chapter_id")), ("courses", _values(obj, "course_id")))
+        elif isinstance(obj, Video):
+            if obj in session.dirty and not _changed(obj, VIDEO_FIELDS):
+                continue
+            entries = (("lessons", _values(obj, "lesson_id")),)
+        else:
+            continue
+        if affected is None:
+            affected = session.info.setdefault(_AFFECTED, {})
+        for key, values in entries:
+            affected.setdefault(key, set()).update(values)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _recompute_affected_content(session: Session, flush_context):
+    affected = session.info.pop(_AFFECTED, None)
+    if affected:
+        content_aggregate_service.apply(session, affected)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_affected_content(session: Session):
+    session.info.pop(_AFFECTED, None)
+
+
+if __name__ == "__main__":
+    from app.db.session import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        chapters, courses = content_aggregate_service.recompute_all(db)
+        db.commit()
+        logger.info(f"Recomputed content aggregates for {chapters} chapters and {courses} courses")
+    finally:
+        db.close()
@@ -0,0 +1,555 @@
+"""
+Course Catalog Service
+======================
+
+Maintains and serves the ``course_catalog`` read model.
+
+- Rows are rebuilt for the affected courses in the same transaction that
+  publishes, unpublishes, re-prices or otherwise changes a course, its
+  product, category, academy or enrollments.
+- Pages are served with keyset (cursor) pagination over composite indexes,
+  so page 500 costs the same as page 1.
+- Totals are counted once per filter set and cached for a short TTL; the
+  response marks them as estimates.
+- Reads never write. Ended discounts are swept from the stored effective
+  price by a background thread on the primary every
+  ``COURSE_CATALOG_DISCOUNT_SWEEP_SECONDS``; until then serialized items
+  already show the list price, only price sorts and filters lag a sweep.
+- The migration creates the table empty; fill it once after migrating with
+  ``python -m app.services.course_catalog``.
+"""
+
+import base64
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Dict, Any, List, Iterable, Set, Tuple, Callable
+
+from sqlalchemy import literal, tuple_, select, delete, update, insert, func, event, Boolean, DateTime, Numeric
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.academy import Academy
+from app.models.course import Course, Category, CourseStatus
+from app.models.course_catalog import CourseCatalog
+from app.models.product import Product
+from app.models.student_course import StudentCourse
+from app.models.user import User
+
+
+logger = logging.getLogger(__name__)
+
+SORTS = {
+    "newest": (CourseCatalog.featured, CourseCatalog.created_at),
+    "price": (CourseCatalog.effective_price,),
+    "rating": (CourseCatalog.avg_rating,),
+    "popularity": (CourseCatalog.students_count,),
+    "title": (CourseCatalog.title,),
+}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded for the requested sort"""
+
+
+def effective_price(price: Optional[Decimal], discount_price: Optional[Decimal],
+                    discount_ends_at: Optional[datetime], now: Optional[datetime] = None) -> Decimal:
+    """Same rule as ``Course.current_price``: a discount needs a future end date"""
+    price = price if price is not None else Decimal("0.00")
+    if discount_price is not None and discount_ends_at and (now or datetime.utcnow()) < discount_ends_at:
+        return discount_price
+    return price
+
+
+class CourseCatalogService:
+    """
+    Refreshes and queries the course catalog read model
+
+    Args:
+        count_ttl_seconds: How long a filtered total is reused
+        discount_check_seconds: Interval between expired-discount sweeps
+        session_factory: Sessions on the primary for the sweeps
+    """
+
+    def __init__(
+        self,
+        count_ttl_seconds: int = 60,
+        discount_check_seconds: float = 60,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self.count_ttl_seconds = count_ttl_seconds
+        self.discount_check_seconds = discount_check_seconds
+        self.session_factory = session_factory
+        self._counts: Dict[Tuple, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listeners: List[Callable[[List[Dict[str, Any]], List[str]], None]] = []
+
+    def add_listener(self, listener: Callable[[List[Dict[str, Any]], List[str]], None]):
+        """
+        Register a callback for committed catalog changes
+
+        The callback receives the written rows and the removed course ids after
+        the transaction commits; it must not use the database session.
+        """
+        self._listeners.append(listener)
+
+    def notify(self, rows: List[Dict[str, Any]], removed_ids: List[str]):
+        for listener in self._listeners:
+            try:
+                listener(rows, removed_ids)
+            except Exception as e:
+                logger.error(f"Course catalog listener failed: {str(e)}")
+
+    # ----------------------------------------
+    # Refresh
+    # ----------------------------------------
+
+    def _source_query(self):
+        enrollments = select(func.count(StudentCourse.id)).where(
+            StudentCourse.course_id == Course.id
+        ).correlate(Course).scalar_subquery()
+
+        return select(
+            Course.id, Course.product_id, Course.academy_id, Academy.name.label("academy_name"),
+            Course.category_id, Category.title.label("category_title"), Course.trainer_id,
+            User.fname, User.lname, Product.title, Course.slug, Course.image, Course.short_content,
+            Course.level, Course.type, Course.featured, Product.price, Product.discount_price,
+            Product.discount_ends_at, Product.currency, Course.avg_rating, Course.ratings_count,
+            Course.students_count, enrollments.label("enrollments"), Course.lessons_count, Course.created_at
+        ).join(
+            Product, Product.id == Course.product_id
+        ).outerjoin(
+            Academy, Academy.id == Course.academy_id
+        ).outerjoin(
+            Category, Category.id == Course.category_id
+        ).outerjoin(
+            User, User.id == Course.trainer_id
+        ).where(Course.course_state == CourseStatus.published)
+
+    def _to_row(self, source, now: datetime) -> Dict[str, Any]:
+        trainer_name = " ".join(part for part in (source.fname, source.lname) if part) or None
+        return {
+            "course_id": source.id,
+            "product_id": source.product_id,
+            "academy_id": source.academy_id,
+            "academy_name": source.academy_name,
+            "category_id": source.category_id,
+            "category_title": source.category_title,
+            "trainer_id": source.trainer_id,
+            "trainer_name": trainer_name,
+            "title": source.title,
+            "slug": source.slug,
+            "image": source.image,
+            "short_content": source.short_content,
+            "level": source.level,
+            "type": source.type,
+            "featured": bool(source.featured),
+            "price": source.price if source.price is not None else Decimal("0.00"),
+            "discount_price": source.discount_price,
+            "discount_ends_at": source.discount_ends_at,
+            "effective_price": effective_price(source.price, source.discount_price, source.discount_ends_at, now),
+            "currency": source.currency or "SAR",
+            "avg_rating": source.avg_rating or Decimal("0.00"),
+            "ratings_count": source.ratings_count or 0,
+            "students_count": max(source.students_count or 0, source.enrollments or 0),
+            "lessons_count": source.lessons_count or 0,
+            "created_at": source.created_at,
+            "refreshed_at": now
+        }
+
+    def refresh_courses(self, db: Session, course_ids: Iterable[str]) -> int:
+        """
+        Rebuild the catalog rows of the given courses in the current transaction
+
+        Unpublished or deleted courses lose their row.
+
+        Returns:
+            Number of catalog rows written
+        """
+        course_ids = [course_id for course_id in set(course_ids) if course_id]
+        if not course_ids:
+            return 0
+
+        now = datetime.utcnow()
+        rows = [
+            self._to_row(source, now)
+            for source in db.execute(self._source_query().where(Course.id.in_(course_ids)))
+        ]
+
+        db.execute(delete(CourseCatalog).where(CourseCatalog.course_id.in_(course_ids)))
+        if rows:
+            db.execute(insert(CourseCatalog), rows)
+
+        written = db.info.setdefault(_WRITTEN_ROWS, {})
+        written.update(dict.fromkeys(course_ids))
+        written.update((row["course_id"], row) for row in rows)
+        return len(rows)
+
+    def remove_courses(self, db: Session, course_ids: Iterable[str]):
+        """Drop catalog rows, for deletions done with raw SQL"""
+        course_ids = list(course_ids)
+        if course_ids:
+            db.execute(delete(CourseCatalog).where(CourseCatalog.course_id.in_(course_ids)))
+            db.info.setdefault(_WRITTEN_ROWS, {}).update(dict.fromkeys(course_ids))
+
+    def rebuild(self, db: Session, batch_size: int = 1000) -> int:
+        """
+        Rebuild the whole catalog in batches, committing after each batch
+
+        Returns:
+            Number of catalog rows written
+        """
+        db.execute(delete(CourseCatalog))
+        written = 0
+        last_id = ""
+        while True:
+            sources = db.execute(
+                self._source_query().where(Course.id > last_id).order_by(Course.id).limit(batch_size)
+            ).all()
+            if not sources:
+                break
+            now = datetime.utcnow()
+            db.execute(insert(CourseCatalog), [self._to_row(source, now) for source in sources])
+            db.commit()
+            written += len(sources)
+            last_id = sources[-1].id
+
+        db.commit()
+        self.clear_counts()
+        logger.info(f"Course catalog rebuilt with {written} courses")
+        return written
+
+    def expire_discounts(self, db: Session) -> int:
+        """Reset the effective price of rows whose discount has ended"""
+        result = db.execute(
+            update(CourseCatalog).where(
+                CourseCatalog.discount_ends_at <= datetime.utcnow()
+            ).values(
+                effective_price=CourseCatalog.price,
+                discount_ends_at=None
+            )
+        )
+        if result.rowcount:
+            db.commit()
+        return result.rowcount or 0
+
+    def start(self):
+        if self._thread or self.discount_check_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="course-catalog-discounts", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # Every worker sweeps; the UPDATE is idempotent
+        while not self._stop.wait(self.discount_check_seconds):
+            db = self.session_factory()
+            try:
+                expired = self.expire_discounts(db)
+                if expired:
+                    logger.info(f"Course catalog: {expired} discounts ended")
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Course catalog discount sweep failed: {e}")
+            finally:
+                db.close()
+
+    def apply_changes(self, db: Session, changes: Dict[str, Set]):
+        """Refresh the rows affected by changes collected from a flush"""
+        course_ids = set(changes.get("courses", ()))
+
+        if changes.get("products"):
+            course_ids.update(db.execute(
+                select(Course.id).where(Course.product_id.in_(changes["products"]))
+            ).scalars())
+
+        for category in changes.get("categories", ()):
+            db.execute(update(CourseCatalog).where(
+                CourseCatalog.category_id == category.id
+            ).values(category_title=category.title))
+
+        for academy in changes.get("academies", ()):
+            db.execute(update(CourseCatalog).where(
+                CourseCatalog.academy_id == academy.id
+            ).values(academy_name=academy.name))
+
+        self.refresh_courses(db, course_ids)
+
+    # ----------------------------------------
+    # Queries
+    # ----------------------------------------
+
+    def _filtered(self, statement, filters: Dict[str, Any]):
+        if filters.get("academy_id"):
+            statement = statement.where(CourseCatalog.academy_id == filters["academy_id"])
+        if filters.get("category_id"):
+            statement = statement.where(CourseCatalog.category_id == filters["category_id"])
+        if filters.get("category_title"):
+            statement = statement.where(CourseCatalog.category_title == filters["category_title"])
+        if filters.get("trainer_id"):
+            statement = statement.where(CourseCatalog.trainer_id == filters["trainer_id"])
+        if filters.get("level"):
+            statement = statement.where(CourseCatalog.level == filters["level"])
+        if filters.get("type"):
+            statement = statement.where(CourseCatalog.type == filters["type"])
+        if filters.get("price_from") is not None:
+            statement = statement.where(CourseCatalog.effective_price >= filters["price_from"])
+        if filters.get("price_to") is not None:
+            statement = statement.where(CourseCatalog.effective_price <= filters["price_to"])
+        if filters.get("is_free") is not None:
+            statement = statement.where(
+                CourseCatalog.effective_price <= 0 if filters["is_free"] else CourseCatalog.effective_price > 0
+            )
+        if filters.get("featured") is not None:
+            statement = statement.where(CourseCatalog.featured == filters["featured"])
+        if filters.get("search"):
+            statement = statement.where(CourseCatalog.title.ilike(f"%{filters['search']}%"))
+        return statement
+
+    def _sort_columns(self, sort: str, descending: bool) -> List[Tuple[Any, bool]]:
+        # A single direction across the key keeps the cursor predicate a plain index range
+        if sort not in SORTS:
+            raise InvalidCursorError(f"Unknown sort: {sort}")
+        return [(column, descending) for column in SORTS[sort]] + [(CourseCatalog.course_id, descending)]
+
+    @staticmethod
+    def _keyset_after(columns: List[Tuple[Any, bool]], values: List[Any]):
+        """Rows strictly after ``values`` in the sort order, as one row-value range on the index"""
+        descending = columns[0][1]
+        keys = tuple_(*[column for column, _ in columns])
+        bound = tuple_(*[literal(value, column.type) for (column, _), value in zip(columns, values)])
+        return keys < bound if descending else keys > bound
+
+    @staticmethod
+    def encode_cursor(sort: str, descending: bool, values: List[Any]) -> str:
+        encoded = [
+            value.isoformat() if isinstance(value, datetime)
+            else str(value) if isinstance(value, Decimal)
+            else value
+            for value in values
+        ]
+        payload = json.dumps({"s": sort, "d": descending, "v": encoded}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str, sort: str, descending: bool) -> List[Any]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            columns = self._sort_columns(sort, descending)
+            if payload["s"] != sort or payload["d"] != descending or len(payload["v"]) != len(columns):
+                raise InvalidCursorError("Cursor does not match the requested sort")
+
+            values = []
+            for (column, _), value in zip(columns, payload["v"]):
+                if isinstance(column.type, DateTime):
+                    value = datetime.fromisoformat(value)
+                elif isinstance(column.type, Numeric):
+                    value = Decimal(value)
+                elif isinstance(column.type, Boolean):
+                    value = bool(value)
+                values.append(value)
+            return values
+        except InvalidCursorError:
+            raise
+        except Exception as e:
+            raise InvalidCursorError(f"Invalid cursor: {str(e)}")
+
+    def count(self, db: Session, filters: Dict[str, Any]) -> int:
+        """Total rows for the filters, cached for ``count_ttl_seconds``"""
+        cache_key = tuple(sorted((k, str(v)) for k, v in filters.items() if v is not None))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._counts.get(cache_key)
+            if cached and cached[0] > now:
+                return cached[1]
+
+        total = db.execute(self._filtered(select(func.count()).select_from(CourseCatalog), filters)).scalar() or 0
+        with self._lock:
+            self._counts[cache_key] = (now + self.count_ttl_seconds, total)
+        return total
+
+    def clear_counts(self):
+        with self._lock:
+            self._counts.clear()
+
+    def list_courses(
+        self,
+        db: Session,
+        filters: Optional[Dict[str, Any]] = None,
+        sort: str = "newest",
+        descending: bool = True,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        offset: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of the catalog
+
+        Args:
+            filters: Column filters (academy_id, category_id, level, price_from, ...)
+            sort: One of ``SORTS``
+            descending: Sort direction
+            cursor: ``next_cursor`` of the previous page
+            limit: Page size
+            offset: Legacy page offset, only used without a cursor
+
+        Returns:
+            Dictionary with ``items`` (catalog rows), ``next_cursor`` and an approximate ``total``
+        """
+        filters = filters or {}
+        columns = self._sort_columns(sort, descending)
+        statement = self._filtered(select(CourseCatalog), filters)
+        if cursor:
+            statement = statement.where(self._keyset_after(columns, self.decode_cursor(cursor, sort, descending)))
+        elif offset:
+            statement = statement.offset(offset)
+        statement = statement.order_by(
+            *[column.desc() if column_descending else column.asc() for column, column_descending in columns]
+        ).limit(limit + 1)
+
+        items = db.execute(statement).scalars().all()
+        has_more = len(items) > limit
+        items = items[:limit]
+
+        next_cursor = None
+        if has_more and items:
+            last = items[-1]
+            next_cursor = self.encode_cursor(
+                sort, descending, [getattr(last, column.key) for column, _ in columns]
+            )
+
+        return {
+            "items": items,
+            "next_cursor": next_cursor,
+            "total": self.count(db, filters),
+            "total_is_estimate": True
+        }
+
+    @staticmethod
+    def serialize(row: CourseCatalog) -> Dict[str, Any]:
+        """Public listing representation of a catalog row, priced as of now"""
+        current_price = effective_price(row.price, row.discount_price, row.discount_ends_at)
+        return {
+            "id": row.course_id,
+            "title": row.title,
+            "slug": row.slug,
+            "image": row.image,
+            "short_content": row.short_content,
+            "level": row.level.value if row.level else None,
+            "type": row.type.value if row.type else None,
+            "featured": row.featured,
+            "price": float(row.price),
+            "discount_price": float(row.discount_price) if row.discount_price is not None else None,
+            "discount_ends_at": row.discount_ends_at.isoformat() if row.discount_ends_at else None,
+            "final_price": float(current_price),
+            "is_free": current_price <= 0,
+            "currency": row.currency,
+            "rating": float(row.avg_rating),
+            "reviews_count": row.ratings_count,
+            "students_count": row.students_count,
+            "lessons_count": row.lessons_count,
+            "academy": {"id": row.academy_id, "name": row.academy_name},
+            "category": {"id": row.category_id, "title": row.category_title},
+            "instructor": {"id": row.trainer_id, "name": row.trainer_name},
+            "created_at": row.created_at.isoformat() if row.created_at else None
+        }
+
+
+course_catalog_service = CourseCatalogService(
+    count_ttl_seconds=settings.COURSE_CATALOG_COUNT_TTL_SECONDS,
+    discount_check_seconds=settings.COURSE_CATALOG_DISCOUNT_SWEEP_SECONDS
+)
+
+
+# ----------------------------------------
+# Refresh on ORM writes
+# ----------------------------------------
+
+_PENDING_CHANGES = "course_catalog_changes"
+_REFRESHING = "course_catalog_refreshing"
+_WRITTEN_ROWS = "course_catalog_written"
+
+
+def mark_courses_changed(session: Session, course_ids: Iterable[str]):
+    """Queue catalog refreshes for courses changed outside the ORM unit of work"""
+    course_ids = set(course_ids)
+    if course_ids:
+        session.info.setdefault(_PENDING_CHANGES, {}).setdefault("courses", set()).update(course_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session: Session, flush_context):
+    if session.info.get(_REFRESHING):
+        return
+
+    changes = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Course):
+            key, value = "courses", obj.id
+        elif isinstance(obj, StudentCourse):
+            key, value = "courses", obj.course_id
+        elif isinstance(obj, Product):
+            key, value = "products", obj.id
+        elif isinstance(obj, Category) and obj not in session.new:
+            key, value = "categories", obj
+        elif isinstance(obj, Academy) and obj not in session.new:
+            key, value = "academies", obj
+        else:
+            continue
+        if changes is None:
+            changes = session.info.setdefault(_PENDING_CHANGES, {})
+        changes.setdefault(key, set()).add(value)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_catalog_before_commit(session: Session):
+    if session.info.get(_REFRESHING):
+        return
+
+    session.flush()
+    changes = session.info.pop(_PENDING_CHANGES, None)
+    if not changes:
+        return
+
+    session.info[_REFRESHING] = True
+    try:
+        course_catalog_service.apply_changes(session, changes)
+    finally:
+        session.info.pop(_REFRESHING, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_catalog_changes(session: Session):
+    written = session.info.pop(_WRITTEN_ROWS, None)
+    if written:
+        course_catalog_service.notify(
+            [row for row in written.values() if row is not None],
+            [course_id for course_id, row in written.items() if row is None]
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session: Session):
+    session.info.pop(_PENDING_CHANGES, None)
+    session.info.pop(_WRITTEN_ROWS, None)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        course_catalog_service.rebuild(db)
+    finally:
+        db.close()
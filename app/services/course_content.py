@@ -0,0 +1,286 @@
+"""
+Course Content Service
+======================
+
+Builds the chapter → lesson tree served by the chapter endpoints.
+
+- The tree is loaded in a fixed number of grouped queries (chapters,
+  lessons, videos, exams, questions, tools) whatever the lesson count,
+  and assembled in memory.
+- ``courses.content_version`` is bumped in the same flush as any change to
+  a chapter, lesson, video, exam, question or tool of the course.
+- Assembled trees are cached per course, audience and content version,
+  and the version doubles as the response ETag.
+"""
+
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from itertools import chain
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.chapter import Chapter
+from app.models.course import Course
+from app.models.exam import Exam, Question
+from app.models.interactive_tool import InteractiveTool
+from app.models.lesson import Lesson
+from app.models.video import Video
+from app.services.content_aggregates import chapter_statistics
+
+
+logger = logging.getLogger(__name__)
+
+ACADEMY = "academy"
+PUBLIC = "public"
+
+# Lesson columns that never show up in a cached tree version bump
+_UNVERSIONED_LESSON_FIELDS = {"views_count", "updated_at"}
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class CourseContentService:
+    """Loads, caches and versions course content trees"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._trees: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ----------------------------------------
+    # Cache
+    # ----------------------------------------
+
+    @staticmethod
+    def etag(course: Course, audience: str = ACADEMY) -> str:
+        return f'W/"course-{course.id}-{audience}-v{course.content_version or 0}"'
+
+    def get_tree(self, db: Session, course: Course, audience: str = ACADEMY) -> List[Dict[str, Any]]:
+        """Cached tree for the course's current content version"""
+        key, version = (course.id, audience), course.content_version or 0
+        with self._lock:
+            cached = self._trees.get(key)
+            if cached and cached[0] == version:
+                self._trees.move_to_end(key)
+                return cached[1]
+
+        tree = self.load_tree(db, course.id, public=audience == PUBLIC)
+        with self._lock:
+            self._trees[key] = (version, tree)
+            self._trees.move_to_end(key)
+            while len(self._trees) > self.max_entries:
+                self._trees.popitem(last=False)
+        return tree
+
+    def clear(self):
+        with self._lock:
+            self._trees.clear()
+
+    # ----------------------------------------
+    # Loading
+    # ----------------------------------------
+
+    def load_tree(self, db: Session, course_id: str, public: bool = False) -> List[Dict[str, Any]]:
+        """Chapters with their lessons in six queries"""
+        chapter_query = select(Chapter).where(Chapter.course_id == course_id)
+        lesson_query = select(Lesson).where(Lesson.course_id == course_id)
+        if public:
+            chapter_query = chapter_query.where(Chapter.is_published == True)
+            lesson_query = lesson_query.where(Lesson.status == True)
+        chapters = db.execute(chapter_query.order_by(Chapter.order_number, Chapter.id)).scalars().all()
+        lessons = db.execute(lesson_query.order_by(Lesson.order_number, Lesson.created_at)).scalars().all()
+
+        course_lessons = select(Lesson.id).where(Lesson.course_id == course_id).scalar_subquery()
+        videos = defaultdict(list)
+        for lesson_id, video_id in db.execute(
+            select(Video.lesson_id, Video.id).where(
+                Video.lesson_id.in_(course_lessons), Video.status == True, Video.deleted_at.is_(None)
+            ).order_by(Video.lesson_id, Video.order_number, Video.created_at)
+        ):
+            videos[lesson_id].append(video_id)
+
+        exams = defaultdict(list)
+        for lesson_id, duration in db.execute(
+            select(Exam.lesson_id, Exam.duration).where(Exam.lesson_id.in_(course_lessons), Exam.status == True)
+        ):
+            exams[lesson_id].append(duration or 0)
+
+        questions = dict(db.execute(
+            select(Exam.lesson_id, func.count(Question.id)).join(Question, Question.exam_id == Exam.id).where(
+                Exam.lesson_id.in_(course_lessons), Exam.status == True
+            ).group_by(Exam.lesson_id)
+        ).all())
+
+        tools = dict(db.execute(
+            select(InteractiveTool.lesson_id, func.count(InteractiveTool.id)).where(
+                InteractiveTool.lesson_id.in_(course_lessons)
+            ).group_by(InteractiveTool.lesson_id)
+        ).all())
+
+        lessons_by_chapter = defaultdict(list)
+        for lesson in lessons:
+            serialize = self._public_lesson if public else self._lesson
+            lessons_by_chapter[lesson.chapter_id].append(
+                serialize(lesson, videos.get(lesson.id, []), exams.get(lesson.id, []),
+                          questions.get(lesson.id, 0), tools.get(lesson.id, 0))
+            )
+
+        return [self._chapter(chapter, lessons_by_chapter.get(chapter.id, [])) for chapter in chapters]
+
+    @staticmethod
+    def _chapter(chapter: Chapter, lessons: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "id": chapter.id,
+            "title": chapter.title,
+            "description": chapter.description,
+            "order_number": chapter.order_number,
+            "is_published": chapter.is_published,
+            "created_at": _isoformat(chapter.created_at),
+            "updated_at": _isoformat(chapter.updated_at),
+            "statistics": chapter_statistics(chapter),
+            "lessons": lessons
+        }
+
+    @staticmethod
+    def _lesson(lesson: Lesson, video_ids: List[str], exam_durations: List[int],
+                questions_count: int, tools_count: int) -> Dict[str, Any]:
+        data = {
+            "id": lesson.id,
+            "title": lesson.title,
+            "description": lesson.description,
+            "type": lesson.type,
+            "order_number": lesson.order_number,
+            "status": lesson.status,
+            "is_free_preview": lesson.is_free_preview,
+            "created_at": _isoformat(lesson.created_at),
+            "updated_at": _isoformat(lesson.updated_at)
+        }
+        if lesson.type == "video":
+            data.update({
+                "video_duration": lesson.video_duration or 0,
+                "size_bytes": lesson.size_bytes or 0,
+                "duration_formatted": f"{lesson.video_duration}m" if lesson.video_duration else "0m",
+                "file_size_formatted": f"{round((lesson.size_bytes or 0) / (1024*1024), 2)} MB",
+                "views_count": lesson.views_count or 0,
+                "has_video": bool(lesson.video),
+                "video_count": len(video_ids),
+                "video_id": video_ids[0] if video_ids else None
+            })
+        elif lesson.type == "exam":
+            data.update({
+                "exam_count": len(exam_durations),
+                "questions_count": questions_count,
+                "duration_minutes": sum(duration // 60 for duration in exam_durations)
+            })
+        elif lesson.type == "tool":
+            data["tools_count"] = tools_count
+        return data
+
+    @staticmethod
+    def _public_lesson(lesson: Lesson, video_ids: List[str], exam_durations: List[int],
+                       questions_count: int, tools_count: int) -> Dict[str, Any]:
+        """Outline entry for visitors; no media ids or file details"""
+        data = {
+            "id": lesson.id,
+            "title": lesson.title,
+            "type": lesson.type,
+            "order_number": lesson.order_number,
+            "is_free_preview": lesson.is_free_preview
+        }
+        if lesson.type == "video":
+            data["video_duration"] = lesson.video_duration or 0
+            data["duration_formatted"] = lesson.duration_formatted
+        elif lesson.type == "exam":
+            data["questions_count"] = questions_count
+        elif lesson.type == "tool":
+            data["tools_count"] = tools_count
+        return data
+
+    # ----------------------------------------
+    # Versioning
+    # ----------------------------------------
+
+    def bump_versions(self, session: Session, affected: Dict[str, Set]):
+        connection = session.connection()
+        course_ids = set(affected.get("courses", ()))
+        lesson_ids = set(affected.get("lessons", ()))
+        exam_ids = affected.get("exams")
+        if exam_ids:
+            lesson_ids.update(connection.execute(
+                select(Exam.lesson_id).where(Exam.id.in_(exam_ids))
+            ).scalars())
+        if lesson_ids:
+            course_ids.update(connection.execute(
+                select(Lesson.course_id).where(Lesson.id.in_(lesson_ids))
+            ).scalars())
+        course_ids.discard(None)
+        if not course_ids:
+            return
+
+        connection.execute(
+            update(Course.__table__)
+            .where(Course.__table__.c.id.in_(course_ids))
+            .values(content_version=Course.__table__.c.content_version + 1)
+        )
+        for obj in list(session.identity_map.values()):
+            if isinstance(obj, Course) and obj.id in course_ids:
+                session.expire(obj, ["content_version", "updated_at"])
+
+
+course_content_service = CourseContentService(max_entries=settings.COURSE_CONTENT_CACHE_SIZE)
+
+
+# ----------------------------------------
+# Version bumps on ORM writes
+# ----------------------------------------
+
+_AFFECTED = "course_content_affected"
+
+
+def _history_values(obj, name: str) -> Set:
+    history = inspect(obj).attrs[name].history
+    return {value for value in chain(history.added, history.unchanged, history.deleted) if value is not None}
+
+
+def _versioned_change(obj) -> bool:
+    state = inspect(obj)
+    return any(
+        attr.history.has_changes() for attr in state.attrs if attr.key not in _UNVERSIONED_LESSON_FIELDS
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_content_changes(session: Session, flush_context):
+    affected = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Chapter, Lesson)):
+            if isinstance(obj, Lesson) and obj in session.dirty and not _versioned_change(obj):
+                continue
+            key, values = "courses", _history_values(obj, "course_id")
+        elif isinstance(obj, (Video, Exam, InteractiveTool)):
+            key, values = "lessons", _history_values(obj, "lesson_id")
+        elif isinstance(obj, Question):
+            key, values = "exams", _history_values(obj, "exam_id")
+        else:
+            continue
+        if affected is None:
+            affected = session.info.setdefault(_AFFECTED, {})
+        affected.setdefault(key, set()).update(values)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _bump_content_versions(session: Session, flush_context):
+    affected = session.info.pop(_AFFECTED, None)
+    if affected:
+        course_content_service.bump_versions(session, affected)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_content_changes(session: Session):
+    session.info.pop(_AFFECTED, None)
@@ -0,0 +1,788 @@
+"""
+Course Search Service
+=====================
+
+Arabic-aware full-text search and autocomplete over the course catalog.
+
+- Text is normalized (diacritics, tatweel, alef/yaa/taa marbuta variants,
+  Arabic-Indic digits) and lightly stemmed (Light10-style affix removal)
+  before it reaches the inverted index.
+- Title, category, trainer and description are indexed with field weights
+  and ranked with BM25; per-term impacts are cached so a query only sums
+  precomputed numbers.
+- Results carry level, price range, category and academy facets.
+- Autocomplete is a prefix trie whose nodes keep their top completions.
+- Both structures follow committed catalog changes in-process and catch
+  up with other workers from the catalog's ``refreshed_at`` watermark.
+  ``refreshed_at`` is read from the writer's clock before its commit and
+  MySQL ``DATETIME`` drops the microseconds, so a row can become visible
+  with a time at or before the watermark: every catch-up re-reads rows
+  from ``COURSE_SEARCH_SYNC_OVERLAP_SECONDS`` before it, and re-indexes
+  the ones whose ``refreshed_at`` differs from the indexed row.
+- The index is saved on shutdown and after a build, and loaded at
+  startup, so a worker starts without re-tokenizing every course.
+"""
+
+import bisect
+import heapq
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from datetime import datetime, timedelta
+from math import log
+from operator import itemgetter
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.course_catalog import CourseCatalog
+from app.services.course_catalog import course_catalog_service
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 2
+
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "category_title": 1.5,
+    "trainer_name": 1.5,
+    "short_content": 1.0,
+}
+
+PRICE_RANGES = (
+    ("free", 0.0),
+    ("1-100", 100.0),
+    ("100-300", 300.0),
+    ("300-600", 600.0),
+    ("600+", None),
+)
+
+EQUALITY_FILTERS = ("level", "type", "category_id", "category_title", "academy_id", "trainer_id", "featured")
+
+# Per-document values, stored column-wise by index slot
+COLUMNS = EQUALITY_FILTERS + ("course_id", "title", "price", "current_price", "current_price_range", "refreshed_at")
+
+STOPWORDS = frozenset({
+    "في", "من", "علي", "الي", "عن", "مع", "او", "ثم", "هذا", "هذه", "ذلك", "التي", "الذي", "كيف",
+    "ما", "ماذا", "هل", "كل", "بين", "و", "a", "an", "and", "the", "of", "in", "on", "for", "to", "with"
+})
+
+_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_TOKEN = re.compile(r"[0-9a-z\u0621-\u064a]+")
+_SPACES = re.compile(r"\s+")
+_CHARACTER_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي",
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+})
+
+# Light10 affixes, after normalization (ة -> ه, ى -> ي)
+_ARTICLE_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+_SUFFIXES = ("ها", "ان", "ات", "ون", "ين", "يه", "ه", "ي")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase and fold Arabic spelling variants so they compare equal"""
+    if not text:
+        return ""
+    return _DIACRITICS.sub("", text).lower().translate(_CHARACTER_MAP)
+
+
+@lru_cache(maxsize=65536)
+def light_stem(token: str) -> str:
+    """Strip the definite article and common suffixes from an Arabic token"""
+    if not token or not "\u0621" <= token[0] <= "\u064a":
+        return token
+
+    for prefix in _ARTICLE_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            token = token[len(prefix):]
+            break
+
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            token = token[:-len(suffix)]
+    return token
+
+
+def analyze(text: Optional[str]) -> List[str]:
+    """Normalized, stemmed index terms of a text, stopwords removed"""
+    return [
+        light_stem(token)
+        for token in _TOKEN.findall(normalize_text(text))
+        if token not in STOPWORDS
+    ]
+
+
+def price_range(price: float) -> str:
+    """Facet label of a price"""
+    for label, upper in PRICE_RANGES:
+        if upper is None or price <= upper:
+            return label
+
+
+def phrase_key(text: Optional[str]) -> str:
+    """Normalized autocomplete key of a phrase"""
+    return _SPACES.sub(" ", " ".join(_TOKEN.findall(normalize_text(text)))).strip()
+
+
+class InvertedIndex:
+    """
+    BM25 inverted index with numeric document slots
+
+    Postings keep weighted term frequencies; the length-normalized BM25 term
+    factor of each posting is computed once per term and reused until that
+    term changes or the average document length drifts.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_terms: List[Optional[Dict[str, float]]] = []
+        self.doc_lengths: List[float] = []
+        self.free_slots: List[int] = []
+        self.doc_count = 0
+        self.total_length = 0.0
+        self._impact_avgdl = 0.0
+        self._impacts: Dict[str, Dict[int, float]] = {}
+        self._ranked: Dict[str, List[int]] = {}
+        self._sorted_terms: Optional[List[str]] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_impacts"], state["_ranked"], state["_sorted_terms"] = {}, {}, None
+        return state
+
+    def add(self, terms: Dict[str, float]) -> int:
+        slot = self.free_slots.pop() if self.free_slots else len(self.doc_terms)
+        if slot == len(self.doc_terms):
+            self.doc_terms.append(None)
+            self.doc_lengths.append(0.0)
+
+        length = sum(terms.values())
+        self.doc_terms[slot] = terms
+        self.doc_lengths[slot] = length
+        self.doc_count += 1
+        self.total_length += length
+
+        for term, frequency in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._sorted_terms = None
+            postings[slot] = frequency
+            impacts = self._impacts.get(term)
+            if impacts is not None:
+                impacts[slot] = self._impact(frequency, length)
+            self._ranked.pop(term, None)
+        return slot
+
+    def remove(self, slot: int):
+        terms = self.doc_terms[slot]
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self.postings[term]
+            del postings[slot]
+            if not postings:
+                del self.postings[term]
+                self._sorted_terms = None
+            self._impacts.get(term, {}).pop(slot, None)
+            self._ranked.pop(term, None)
+
+        self.doc_count -= 1
+        self.total_length -= self.doc_lengths[slot]
+        self.doc_terms[slot] = None
+        self.doc_lengths[slot] = 0.0
+        self.free_slots.append(slot)
+
+    def _impact(self, frequency: float, length: float) -> float:
+        k1 = self.k1
+        return frequency * (k1 + 1) / (frequency + k1 * (1 - self.b + self.b * length / self._impact_avgdl))
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def impacts(self, term: str) -> Dict[int, float]:
+        """BM25 term-frequency factor per document, without idf"""
+        avgdl = self.total_length / self.doc_count if self.doc_count else 1.0
+        if not self._impact_avgdl or abs(avgdl - self._impact_avgdl) > 0.1 * self._impact_avgdl:
+            self._impacts.clear()
+            self._ranked.clear()
+            self._impact_avgdl = avgdl
+
+        impacts = self._impacts.get(term)
+        if impacts is None:
+            k1, b, lengths = self.k1, self.b, self.doc_lengths
+            k1_norm = k1 * (1 - b)
+            k1_length = k1 * b / self._impact_avgdl
+            impacts = {
+                slot: frequency * (k1 + 1) / (frequency + k1_norm + k1_length * lengths[slot])
+                for slot, frequency in self.postings.get(term, {}).items()
+            }
+            if term in self.postings:
+                self._impacts[term] = impacts
+        return impacts
+
+    def warm(self, min_documents: int = 500):
+        """Precompute impacts and rankings of frequent terms, the costly ones to build per query"""
+        for term, postings in self.postings.items():
+            if len(postings) >= min_documents:
+                self.ranked(term)
+
+    def ranked(self, term: str) -> List[int]:
+        """Documents of a term by descending impact"""
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            impacts = self.impacts(term)
+            ranked = self._ranked[term] = sorted(impacts, key=impacts.__getitem__, reverse=True)
+        return ranked
+
+    def expand_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """Indexed terms starting with ``prefix``, for partially typed words"""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        terms = self._sorted_terms
+        start = bisect.bisect_left(terms, prefix)
+        expanded = []
+        for term in terms[start:start + limit]:
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+        return expanded
+
+
+class AutocompleteTrie:
+    """
+    Prefix trie for autocomplete
+
+    The trie is flattened into a map from prefix to node, and only prefixes
+    shared by more than ``scan_limit`` phrases get a node: it keeps the
+    prefix's ``top_k`` completions ordered by score, so a broad prefix is a
+    single dictionary access. Narrower prefixes scan their short range of the
+    sorted phrase keys. Nodes invalidated by a removal or a score drop are
+    recomputed on their next lookup.
+    """
+
+    def __init__(self, top_k: int = 10, scan_limit: int = 64):
+        self.top_k = top_k
+        self.scan_limit = scan_limit
+        self.phrases: Dict[str, List] = {}  # key -> [display text, {source: weight}, score]
+        self.keys: List[str] = []
+        self.nodes: Dict[str, List[Tuple[float, str]]] = {}
+
+    def add(self, text: str, source: str, weight: float):
+        """Add ``weight`` from ``source`` to a phrase, creating it when new"""
+        key = phrase_key(text)
+        if not key:
+            return
+
+        phrase = self.phrases.get(key)
+        if phrase is None:
+            phrase = self.phrases[key] = [text, {}, 0.0]
+            bisect.insort(self.keys, key)
+        previous = phrase[2]
+        phrase[1][source] = weight
+        phrase[2] = score = sum(phrase[1].values())
+        if not self.nodes:
+            return
+
+        for depth in range(1, len(key) + 1):
+            prefix = key[:depth]
+            node = self.nodes.get(prefix)
+            if node is None:
+                continue
+            entries = [entry for entry in node if entry[1] != key]
+            if score < previous and len(entries) < len(node) and len(node) >= self.top_k:
+                # A lowered score may let a phrase outside the node overtake it
+                del self.nodes[prefix]
+                continue
+            bisect.insort(entries, (-score, key))
+            self.nodes[prefix] = entries[:self.top_k]
+
+    def discard(self, text: str, source: str):
+        """Remove the contribution of ``source``; the phrase goes once nothing contributes"""
+        key = phrase_key(text)
+        phrase = self.phrases.get(key)
+        if phrase is None or source not in phrase[1]:
+            return
+
+        del phrase[1][source]
+        phrase[2] = sum(phrase[1].values())
+        if not phrase[1]:
+            del self.phrases[key]
+            index = bisect.bisect_left(self.keys, key)
+            if index < len(self.keys) and self.keys[index] == key:
+                del self.keys[index]
+
+        for depth in range(1, len(key) + 1):
+            node = self.nodes.get(key[:depth])
+            if node is not None and any(entry[1] == key for entry in node):
+                del self.nodes[key[:depth]]
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect.bisect_left(self.keys, prefix)
+        return start, bisect.bisect_left(self.keys, prefix + "\uffff", start)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        prefix = phrase_key(prefix)
+        if not prefix:
+            return []
+
+        node = self.nodes.get(prefix)
+        if node is None:
+            start, end = self._range(prefix)
+            phrases = self.phrases
+            node = sorted(heapq.nsmallest(
+                self.top_k, ((-phrases[key][2], key) for key in self.keys[start:end])
+            ))
+            if end - start > self.scan_limit:
+                self.nodes[prefix] = node
+        return [self.phrases[key][0] for _, key in node[:limit]]
+
+    def warm(self):
+        """Materialize the node of every prefix broader than ``scan_limit`` phrases"""
+        keys, limit = self.keys, self.scan_limit
+        broad = set()
+        for index in range(len(keys) - limit):
+            shared = os.path.commonprefix((keys[index], keys[index + limit]))
+            while shared and shared not in broad:
+                broad.add(shared)
+                shared = shared[:-1]
+
+        nodes: Dict[str, List[Tuple[float, str]]] = {}
+        for key in sorted(keys, key=lambda k: -self.phrases[k][2]):
+            score = -self.phrases[key][2]
+            for depth in range(1, len(key) + 1):
+                prefix = key[:depth]
+                if prefix not in broad:
+                    break
+                node = nodes.setdefault(prefix, [])
+                if len(node) < self.top_k:
+                    node.append((score, key))
+        self.nodes = nodes
+
+
+class CourseSearchEngine:
+    """
+    In-process course search over the catalog read model
+
+    Args:
+        index_path: File the index is persisted to; ``None`` disables persistence
+        sync_seconds: Minimum interval between catch-up reads of the catalog
+        sync_overlap_seconds: How far before the watermark a catch-up starts reading
+        cache_size: Number of query results kept per index generation
+    """
+
+    def __init__(
+        self,
+        index_path: Optional[str] = None,
+        sync_seconds: int = 30,
+        sync_overlap_seconds: int = 300,
+        cache_size: int = 256
+    ):
+        self.index_path = Path(index_path) if index_path else None
+        self.sync_seconds = sync_seconds
+        self.sync_overlap_seconds = sync_overlap_seconds
+        self.cache_size = cache_size
+        self._lock = threading.RLock()
+        self._results: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._reset()
+
+    def _reset(self):
+        self.index = InvertedIndex()
+        self.trie = AutocompleteTrie()
+        self.slots: Dict[str, int] = {}
+        self.columns: Dict[str, List[Any]] = {column: [] for column in COLUMNS}
+        self.discounts: Dict[int, datetime] = {}
+        self._discount_heap: List[Tuple[datetime, int]] = []
+        self.category_names: Dict[Any, Optional[str]] = {}
+        self.academy_names: Dict[Any, Optional[str]] = {}
+        self.watermark: Optional[datetime] = None
+        self.generation = 0
+        self.loaded = False
+        self._last_sync = 0.0
+        self._results.clear()
+
+    # ----------------------------------------
+    # Maintenance
+    # ----------------------------------------
+
+    def upsert(self, rows: Iterable[Dict[str, Any]]):
+        """Index catalog rows (dicts with ``CourseCatalog`` columns)"""
+        with self._lock:
+            for row in rows:
+                self._remove(row["course_id"])
+
+                terms: Dict[str, float] = {}
+                for field, weight in FIELD_WEIGHTS.items():
+                    for term in analyze(row.get(field)):
+                        terms[term] = terms.get(term, 0.0) + weight
+                slot = self.index.add(terms)
+
+                values = {
+                    "course_id": row["course_id"],
+                    "title": row.get("title"),
+                    "level": getattr(row.get("level"), "value", row.get("level")),
+                    "type": getattr(row.get("type"), "value", row.get("type")),
+                    "category_id": row.get("category_id"),
+                    "category_title": row.get("category_title"),
+                    "academy_id": row.get("academy_id"),
+                    "trainer_id": row.get("trainer_id"),
+                    "featured": bool(row.get("featured")),
+                    "price": float(row.get("price") or 0),
+                    "current_price": float(row.get("effective_price") or 0),
+                    "refreshed_at": row.get("refreshed_at"),
+                }
+                values["current_price_range"] = price_range(values["current_price"])
+                if slot == len(self.columns["course_id"]):
+                    for column, cells in self.columns.items():
+                        cells.append(values[column])
+                else:
+                    for column, cells in self.columns.items():
+                        cells[slot] = values[column]
+                self.slots[row["course_id"]] = slot
+
+                discount_ends_at = row.get("discount_ends_at")
+                if discount_ends_at is not None and values["current_price"] != values["price"]:
+                    self.discounts[slot] = discount_ends_at
+                    heapq.heappush(self._discount_heap, (discount_ends_at, slot))
+
+                self.category_names[values["category_id"]] = values["category_title"]
+                self.academy_names[values["academy_id"]] = row.get("academy_name")
+                if values["title"]:
+                    self.trie.add(values["title"], values["course_id"], (row.get("students_count") or 0) + 1)
+                if values["category_title"]:
+                    self.trie.add(values["category_title"], values["course_id"], 1)
+
+                refreshed_at = row.get("refreshed_at")
+                if refreshed_at and (self.watermark is None or refreshed_at > self.watermark):
+                    self.watermark = refreshed_at
+            self._changed()
+
+    def remove(self, course_ids: Iterable[str]):
+        with self._lock:
+            for course_id in course_ids:
+                self._remove(course_id)
+            self._changed()
+
+    def _remove(self, course_id: str):
+        slot = self.slots.pop(course_id, None)
+        if slot is None:
+            return
+        title, category_title = self.columns["title"][slot], self.columns["category_title"][slot]
+        if title:
+            self.trie.discard(title, course_id)
+        if category_title:
+            self.trie.discard(category_title, course_id)
+        self.index.remove(slot)
+        self.discounts.pop(slot, None)
+        for cells in self.columns.values():
+            cells[slot] = None
+
+    def _changed(self):
+        self.generation += 1
+        self._results.clear()
+
+    def on_catalog_change(self, rows: List[Dict[str, Any]], removed_ids: List[str]):
+        """Catalog listener; only maintains an index that is already loaded"""
+        if not self.loaded:
+            return
+        if removed_ids:
+            self.remove(removed_ids)
+        if rows:
+            self.upsert(rows)
+
+    def build(self, db: Session, batch_size: int = 5000) -> int:
+        """Index the whole catalog and persist it"""
+        with self._lock:
+            self._reset()
+            last_id = ""
+            while True:
+                rows = db.execute(
+                    select(CourseCatalog.__table__).where(
+                        CourseCatalog.course_id > last_id
+                    ).order_by(CourseCatalog.course_id).limit(batch_size)
+                ).mappings().all()
+                if not rows:
+                    break
+                self.upsert(rows)
+                last_id = rows[-1]["course_id"]
+
+            self.trie.warm()
+            self.index.warm()
+            self.loaded = True
+            self._last_sync = time.monotonic()
+            logger.info(f"Course search index built with {len(self.slots)} courses")
+            self.save()
+            return len(self.slots)
+
+    def sync(self, db: Session):
+        """Catch up with catalog changes committed by other workers"""
+        with self._lock:
+            if self.watermark is not None:
+                since = self.watermark - timedelta(seconds=self.sync_overlap_seconds)
+                refreshed = self.columns["refreshed_at"]
+                rows = [
+                    row for row in db.execute(
+                        select(CourseCatalog.__table__).where(CourseCatalog.refreshed_at >= since)
+                    ).mappings()
+                    if row["course_id"] not in self.slots
+                    or refreshed[self.slots[row["course_id"]]] != row["refreshed_at"]
+                ]
+                if rows:
+                    self.upsert(rows)
+
+            if db.execute(select(func.count()).select_from(CourseCatalog)).scalar() != len(self.slots):
+                catalog_ids = set(db.execute(select(CourseCatalog.course_id)).scalars())
+                self.remove([course_id for course_id in self.slots if course_id not in catalog_ids])
+                missing = catalog_ids.difference(self.slots)
+                if missing:
+                    self.upsert(db.execute(
+                        select(CourseCatalog.__table__).where(CourseCatalog.course_id.in_(missing))
+                    ).mappings().all())
+            self._last_sync = time.monotonic()
+
+    def ensure_loaded(self, db: Session):
+        """Load the persisted index (or build it) and periodically catch up"""
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    if not self.load():
+                        self.build(db)
+                        return
+                    self.sync(db)
+                    return
+        if time.monotonic() - self._last_sync >= self.sync_seconds:
+            self.sync(db)
+
+    def save(self) -> bool:
+        if not self.index_path or not self.loaded:
+            return False
+        with self._lock:
+            state = {
+                "version": INDEX_FORMAT_VERSION,
+                "index": self.index,
+                "trie": self.trie,
+                "slots": self.slots,
+                "columns": self.columns,
+                "discounts": self.discounts,
+                "discount_heap": self._discount_heap,
+                "category_names": self.category_names,
+                "academy_names": self.academy_names,
+                "watermark": self.watermark,
+            }
+            try:
+                self.index_path.parent.mkdir(parents=True, exist_ok=True)
+                temporary_path = self.index_path.with_suffix(".tmp")
+                with open(temporary_path, "wb") as file:
+                    pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary_path, self.index_path)
+                return True
+            except OSError as e:
+                logger.warning(f"Could not persist course search index: {str(e)}")
+                return False
+
+    def load(self) -> bool:
+        if not self.index_path or not self.index_path.exists():
+            return False
+        try:
+            with open(self.index_path, "rb") as file:
+                state = pickle.load(file)
+        except Exception as e:
+            logger.warning(f"Could not load course search index: {str(e)}")
+            return False
+        if state.get("version") != INDEX_FORMAT_VERSION:
+            return False
+
+        with self._lock:
+            self._reset()
+            self.index = state["index"]
+            self.trie = state["trie"]
+            self.slots = state["slots"]
+            self.columns = state["columns"]
+            self.discounts = state["discounts"]
+            self._discount_heap = state["discount_heap"]
+            self.category_names = state["category_names"]
+            self.academy_names = state["academy_names"]
+            self.watermark = state["watermark"]
+            self.index.warm()
+            self.loaded = True
+        return True
+
+    # ----------------------------------------
+    # Queries
+    # ----------------------------------------
+
+    def _query_terms(self, query: str) -> List[List[str]]:
+        """Index terms per query word; an unknown last word is read as a prefix"""
+        words = [token for token in _TOKEN.findall(normalize_text(query)) if token not in STOPWORDS]
+        groups = []
+        for position, word in enumerate(words):
+            term = light_stem(word)
+            if term in self.index.postings:
+                groups.append([term])
+            elif position == len(words) - 1:
+                groups.append(self.index.expand_prefix(word) or self.index.expand_prefix(term))
+            else:
+                groups.append([])
+        return groups
+
+    def _scores(self, groups: List[List[str]]) -> Tuple[Optional[List[int]], Dict[int, float]]:
+        """Documents matching every query word with their BM25 score"""
+        per_word = []
+        for terms in groups:
+            if len(terms) == 1:
+                per_word.append((self.index.idf(terms[0]), self.index.impacts(terms[0]), terms[0]))
+            else:
+                merged: Dict[int, float] = {}
+                for term in terms:
+                    idf = self.index.idf(term)
+                    for slot, impact in self.index.impacts(term).items():
+                        weighted = idf * impact
+                        if weighted > merged.get(slot, 0.0):
+                            merged[slot] = weighted
+                per_word.append((1.0, merged, None))
+
+        if len(per_word) == 1:
+            if per_word[0][2] is not None:
+                return self.index.ranked(per_word[0][2]), per_word[0][1]
+            return None, per_word[0][1]
+
+        per_word.sort(key=lambda word: len(word[1]))
+        candidates = set(per_word[0][1])
+        for _, impacts, _ in per_word[1:]:
+            candidates.intersection_update(impacts.keys())
+        scores = {
+            slot: sum(idf * impacts[slot] for idf, impacts, _ in per_word)
+            for slot in candidates
+        }
+        return None, scores
+
+    def _expire_discounts(self, now: datetime):
+        """Fall back to the list price of documents whose discount has ended"""
+        heap, columns = self._discount_heap, self.columns
+        while heap and heap[0][0] <= now:
+            ends_at, slot = heapq.heappop(heap)
+            if self.discounts.get(slot) == ends_at:
+                del self.discounts[slot]
+                columns["current_price"][slot] = columns["price"][slot]
+                columns["current_price_range"][slot] = price_range(columns["price"][slot])
+
+    def _filtered(self, slots: List[int], filters: Dict[str, Any]) -> List[int]:
+        columns = self.columns
+        for field in EQUALITY_FILTERS:
+            if field in filters:
+                cells, value = columns[field], filters[field]
+                slots = [slot for slot in slots if cells[slot] == value]
+        prices = columns["current_price"]
+        if "price_from" in filters:
+            low = float(filters["price_from"])
+            slots = [slot for slot in slots if prices[slot] >= low]
+        if "price_to" in filters:
+            high = float(filters["price_to"])
+            slots = [slot for slot in slots if prices[slot] <= high]
+        return slots
+
+    def _facets(self, slots: List[int]) -> Dict[str, Any]:
+        columns = self.columns
+        price_ranges = Counter(map(columns["current_price_range"].__getitem__, slots))
+
+        return {
+            "level": dict(Counter(map(columns["level"].__getitem__, slots))),
+            "price_range": {label: price_ranges[label] for label, _ in PRICE_RANGES if price_ranges[label]},
+            "category": [
+                {"id": value, "name": self.category_names.get(value), "count": count}
+                for value, count in Counter(map(columns["category_id"].__getitem__, slots)).most_common(20)
+            ],
+            "academy": [
+                {"id": value, "name": self.academy_names.get(value), "count": count}
+                for value, count in Counter(map(columns["academy_id"].__getitem__, slots)).most_common(20)
+            ],
+        }
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        offset: int = 0,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Ranked course search with facets
+
+        Args:
+            db: Database session, used only to load or catch up the index
+            query: Free text in Arabic or English
+            filters: level, type, category_id, academy_id, trainer_id, featured, price_from, price_to
+            offset: Number of ranked results to skip
+            limit: Page size
+
+        Returns:
+            Dictionary with ranked ``course_ids``, ``total`` and ``facets``
+        """
+        self.ensure_loaded(db)
+        return self.search_loaded(query, filters, offset, limit)
+
+    def search_loaded(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                      offset: int = 0, limit: int = 20) -> Dict[str, Any]:
+        filters = {key: value for key, value in (filters or {}).items() if value is not None}
+        cache_key = (normalize_text(query), tuple(sorted((k, str(v)) for k, v in filters.items())), offset, limit)
+
+        with self._lock:
+            cached = self._results.get(cache_key)
+            if cached is not None:
+                self._results.move_to_end(cache_key)
+                return cached
+
+            self._expire_discounts(datetime.utcnow())
+            groups = self._query_terms(query)
+            if not groups or not all(groups):
+                result = {"course_ids": [], "total": 0, "facets": self._facets([])}
+            else:
+                ranked, scores = self._scores(groups)
+                if ranked is None:
+                    slots = self._filtered(list(scores), filters) if filters else list(scores)
+                    page = heapq.nlargest(offset + limit, slots, key=scores.__getitem__)[offset:]
+                else:
+                    slots = self._filtered(ranked, filters) if filters else ranked
+                    page = slots[offset:offset + limit]
+
+                course_ids = self.columns["course_id"]
+                result = {
+                    "course_ids": [course_ids[slot] for slot in page],
+                    "total": len(slots),
+                    "facets": self._facets(slots)
+                }
+
+            self._results[cache_key] = result
+            if len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+            return result
+
+    def suggest(self, db: Session, prefix: str, limit: int = 10) -> List[str]:
+        """Most popular course and category titles starting with ``prefix``"""
+        self.ensure_loaded(db)
+        with self._lock:
+            return self.trie.suggest(prefix, limit)
+
+
+course_search_engine = CourseSearchEngine(
+    index_path=settings.COURSE_SEARCH_INDEX_PATH,
+    sync_seconds=settings.COURSE_SEARCH_SYNC_SECONDS,
+    sync_overlap_seconds=settings.COURSE_SEARCH_SYNC_OVERLAP_SECONDS
+)
+course_catalog_service.add_listener(course_search_engine.on_catalog_change)
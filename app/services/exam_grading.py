@@ -0,0 +1,542 @@
+"""
+Exam Grading Engine
+===================
+
+Deterministic grading of exam submissions.
+
+- Every exam is compiled once into a compact answer key (question id ->
+  correct option ids, reference answer and marks) and cached per process.
+  The cache entry is dropped when an exam, question or option is changed
+  and committed through the ORM, and expires after a TTL as a safety net
+  for writes made by other processes.
+- Multiple-choice and true/false answers are graded locally against the key.
+- Only free-text answers that do not match the reference exactly go to the
+  AI corrector, in a single batched call per submission.
+- Results are written with one ``ExamCorrection`` insert and one bulk
+  ``QuestionCorrection`` insert.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, FrozenSet, Set
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.orm import Session
+
+from app.core.ai_config import AIServiceFactory
+from app.core.config import settings
+from app.models.ai_assistant import ExamCorrection, QuestionCorrection
+from app.models.exam import Exam, Question, QuestionOption, QuestionType
+from app.services.ai.question_generation import extract_json_payload, normalize_question_text
+
+
+logger = logging.getLogger(__name__)
+
+PASSING_PERCENTAGE = 60.0
+
+CORRECT_FEEDBACK = "إجابة صحيحة، أحسنت!"
+WRONG_FEEDBACK = "إجابة خاطئة، يرجى المراجعة"
+UNANSWERED_FEEDBACK = "لم تتم الإجابة على هذا السؤال"
+AI_UNAVAILABLE_FEEDBACK = "تعذر التصحيح الآلي لهذه الإجابة، ستتم مراجعتها يدوياً"
+
+BOOLEAN_OPTION_TEXTS = {
+    True: ("صحيح", "صح", "true"),
+    False: ("خطأ", "خطا", "false")
+}
+
+
+class QuestionKey:
+    """Answer key entry of a single question"""
+
+    __slots__ = (
+        "question_id", "type", "title", "max_score", "correct_option_ids",
+        "option_ids_by_text", "option_texts", "reference_answer", "normalized_reference"
+    )
+
+    def __init__(
+        self,
+        question_id: str,
+        question_type: QuestionType,
+        title: str,
+        max_score: float,
+        correct_option_ids: FrozenSet[str],
+        option_texts: Dict[str, str],
+        reference_answer: Optional[str]
+    ):
+        self.question_id = question_id
+        self.type = question_type
+        self.title = title
+        self.max_score = max_score
+        self.correct_option_ids = correct_option_ids
+        self.option_texts = option_texts
+        self.option_ids_by_text = {normalize_question_text(t): oid for oid, t in option_texts.items()}
+        self.reference_answer = reference_answer
+        self.normalized_reference = normalize_question_text(reference_answer or "")
+
+    @property
+    def is_free_text(self) -> bool:
+        return self.type == QuestionType.TEXT or not self.option_texts
+
+    @property
+    def correct_answer_text(self) -> str:
+        if self.correct_option_ids:
+            return "، ".join(self.option_texts[oid] for oid in sorted(self.correct_option_ids))
+        return self.reference_answer or ""
+
+
+class AnswerKey:
+    """Compiled answer key of an exam"""
+
+    __slots__ = ("exam_id", "academy_id", "questions", "max_score", "compiled_at")
+
+    def __init__(self, exam_id: str, academy_id: Optional[int], questions: List[QuestionKey]):
+        self.exam_id = exam_id
+        self.academy_id = academy_id
+        self.questions: Dict[str, QuestionKey] = {q.question_id: q for q in questions}
+        self.max_score = sum(q.max_score for q in questions)
+        self.compiled_at = time.monotonic()
+
+
+def _question_type(value: Any) -> QuestionType:
+    """Question types are stored both as enum names and values"""
+    if isinstance(value, QuestionType):
+        return value
+    normalized = str(value or "").lower()
+    try:
+        return QuestionType(normalized)
+    except ValueError:
+        return QuestionType.TEXT
+
+
+def compile_answer_key(db: Session, exam_id: str) -> Optional[AnswerKey]:
+    """Build the answer key of an exam with one query for questions and options"""
+    exam_row = db.execute(text("""
+        SELECT e.id, c.academy_id
+        FROM exams e
+        LEFT JOIN lessons l ON l.id = e.lesson_id
+        LEFT JOIN courses c ON c.id = l.course_id
+        WHERE e.id = :exam_id
+    """), {"exam_id": exam_id}).first()
+    if not exam_row:
+        return None
+
+    rows = db.execute(text("""
+        SELECT q.id, q.type, q.title, q.score, q.correct_answer,
+               o.id AS option_id, o.text AS option_text, o.is_correct
+        FROM questions q
+        LEFT JOIN question_options o ON o.question_id = q.id
+        WHERE q.exam_id = :exam_id
+        ORDER BY q.created_at, q.id
+    """), {"exam_id": exam_id}).fetchall()
+
+    questions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for row in rows:
+        entry = questions.setdefault(row.id, {
+            "type": _question_type(row.type),
+            "title": row.title,
+            "score": float(row.score or 0),
+            "correct_answer": row.correct_answer,
+            "options": {},
+            "correct": set()
+        })
+        if row.option_id is not None:
+            entry["options"][row.option_id] = row.option_text
+            if row.is_correct:
+                entry["correct"].add(row.option_id)
+
+    return AnswerKey(
+        exam_id=exam_id,
+        academy_id=exam_row.academy_id,
+        questions=[
+            QuestionKey(
+                question_id=question_id,
+                question_type=entry["type"],
+                title=entry["title"],
+                max_score=entry["score"],
+                correct_option_ids=frozenset(entry["correct"]),
+                option_texts=entry["options"],
+                reference_answer=entry["correct_answer"]
+            )
+            for question_id, entry in questions.items()
+        ]
+    )
+
+
+class AnswerKeyCache:
+    """
+    Process-local LRU of compiled answer keys
+
+    Args:
+        max_entries: Maximum number of cached exams
+        ttl_seconds: Age after which a key is recompiled
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._keys: "OrderedDict[str, AnswerKey]" = OrderedDict()
+        self._exam_by_question: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, exam_id: str) -> Optional[AnswerKey]:
+        with self._lock:
+            key = self._keys.get(exam_id)
+            if key and time.monotonic() - key.compiled_at < self.ttl_seconds:
+                self._keys.move_to_end(exam_id)
+                return key
+
+        key = compile_answer_key(db, exam_id)
+        if key is None:
+            return None
+
+        with self._lock:
+            self._drop(exam_id)
+            self._keys[exam_id] = key
+            for question_id in key.questions:
+                self._exam_by_question[question_id] = exam_id
+            while len(self._keys) > self.max_entries:
+                self._drop(next(iter(self._keys)))
+        return key
+
+    def exam_for_question(self, question_id: str) -> Optional[str]:
+        return self._exam_by_question.get(question_id)
+
+    def invalidate(self, exam_id: str):
+        with self._lock:
+            self._drop(exam_id)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._exam_by_question.clear()
+
+    def _drop(self, exam_id: str):
+        key = self._keys.pop(exam_id, None)
+        if key:
+            for question_id in key.questions:
+                self._exam_by_question.pop(question_id, None)
+
+
+answer_key_cache = AnswerKeyCache(ttl_seconds=settings.EXAM_ANSWER_KEY_TTL_SECONDS)
+
+
+# ----------------------------------------
+# Cache invalidation on ORM writes
+# ----------------------------------------
+
+_STALE_KEYS = "stale_answer_keys"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_answer_keys(session: Session, flush_context):
+    stale: Set[str] = session.info.setdefault(_STALE_KEYS, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Exam):
+            stale.add(obj.id)
+        elif isinstance(obj, Question):
+            stale.add(obj.exam_id)
+        elif isinstance(obj, QuestionOption):
+            exam_id = answer_key_cache.exam_for_question(obj.question_id)
+            if exam_id:
+                stale.add(exam_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_answer_keys(session: Session):
+    for exam_id in session.info.pop(_STALE_KEYS, ()):
+        if exam_id:
+            answer_key_cache.invalidate(exam_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_answer_keys(session: Session):
+    session.info.pop(_STALE_KEYS, None)
+
+
+# ----------------------------------------
+# Grading
+# ----------------------------------------
+
+def normalize_submission(answers: Any) -> Dict[str, Any]:
+    """
+    Accept the submission shapes used by the clients
+
+    - ``{"answers": [{"question_id": ..., "answer": ...}]}``
+    - ``[{"question_id": ..., "answer" | "option_id" | "option_ids": ...}]``
+    - ``{"<question_id>": <answer>}``
+    """
+    if isinstance(answers, dict) and isinstance(answers.get("answers"), (list, dict)):
+        answers = answers["answers"]
+
+    if isinstance(answers, dict):
+        return dict(answers)
+
+    normalized = {}
+    for item in answers or []:
+        if not isinstance(item, dict) or "question_id" not in item:
+            continue
+        for field in ("answer", "option_ids", "option_id", "selected_option_id"):
+            if field in item:
+                normalized[item["question_id"]] = item[field]
+                break
+    return normalized
+
+
+def _answer_as_text(answer: Any) -> str:
+    if answer is None:
+        return ""
+    if isinstance(answer, str):
+        return answer
+    return json.dumps(answer, ensure_ascii=False)
+
+
+def _selected_option_ids(question: QuestionKey, answer: Any) -> Set[str]:
+    values = answer if isinstance(answer, (list, tuple, set)) else [answer]
+    selected = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            candidates = BOOLEAN_OPTION_TEXTS[value]
+        else:
+            value = str(value)
+            if value in question.option_texts:
+                selected.add(value)
+                continue
+            candidates = (value,)
+        for candidate in candidates:
+            option_id = question.option_ids_by_text.get(normalize_question_text(candidate))
+            if option_id:
+                selected.add(option_id)
+                break
+    return selected
+
+
+def grade_objective(question: QuestionKey, answer: Any) -> Optional[Dict[str, Any]]:
+    """
+    Grade an answer locally against the key
+
+    Returns:
+        The question result, or None when the answer needs the AI corrector
+    """
+    if answer is None or answer == "" or answer == []:
+        return _result(question, answer, 0.0, False, UNANSWERED_FEEDBACK)
+
+    if not question.is_free_text:
+        is_correct = bool(question.correct_option_ids) and \
+            _selected_option_ids(question, answer) == question.correct_option_ids
+        return _result(question, answer, question.max_score if is_correct else 0.0, is_correct)
+
+    if question.normalized_reference and \
+            normalize_question_text(_answer_as_text(answer)) == question.normalized_reference:
+        return _result(question, answer, question.max_score, True)
+
+    if question.type != QuestionType.TEXT:
+        # Choice question without options: the stored answer is the only reference
+        return _result(question, answer, 0.0, False)
+
+    return None
+
+
+def _result(
+    question: QuestionKey,
+    answer: Any,
+    score: float,
+    is_correct: bool,
+    feedback: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "question_id": question.question_id,
+        "student_answer": _answer_as_text(answer),
+        "correct_answer": question.correct_answer_text,
+        "is_correct": is_correct,
+        "score_awarded": score,
+        "max_score": question.max_score,
+        "feedback": feedback or (CORRECT_FEEDBACK if is_correct else WRONG_FEEDBACK)
+    }
+
+
+class FreeTextCorrector:
+    """Grades all free-text answers of a submission with one chat completion"""
+
+    def __init__(self, chat_service):
+        self.chat_service = chat_service
+
+    async def grade(self, items: List[Dict[str, Any]], academy_id: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        payload = [
+            {
+                "id": item["question"].question_id,
+                "question": item["question"].title,
+                "reference_answer": item["question"].reference_answer or "",
+                "student_answer": _answer_as_text(item["answer"]),
+                "max_score": item["question"].max_score
+            }
+            for item in items
+        ]
+        prompt = f"""صحح إجابات الطالب التالية مقارنة بالإجابات المرجعية.
+        أعط كل إجابة درجة من 0 إلى max_score وتعليقاً قصيراً.
+
+        الإجابات:
+        {json.dumps(payload, ensure_ascii=False)}
+
+        أرجع النتيجة بصيغة JSON:
+        {{"results": [{{"id": "...", "score": 0, "feedback": "..."}}]}}
+        """
+        response = await self.chat_service.generate_completion(
+            messages=[{"role": "user", "content": prompt}],
+            system_prompt="أنت مصحح امتحانات دقيق ومنصف.",
+            academy_id=academy_id,
+            temperature=0.0
+        )
+        results = extract_json_payload(response["content"]).get("results", [])
+        return {str(result.get("id")): result for result in results if isinstance(result, dict)}
+
+
+def create_free_text_corrector() -> Optional[FreeTextCorrector]:
+    """Corrector backed by the configured chat service, if any"""
+    if not settings.AI_EXAM_CORRECTION_ENABLED:
+        return None
+    try:
+        return FreeTextCorrector(AIServiceFactory.create_chat_service())
+    except ValueError as e:
+        logger.warning(f"Free-text correction unavailable: {str(e)}")
+        return None
+
+
+class ExamGradingEngine:
+    """
+    Grades submissions against cached answer keys
+
+    Args:
+        db: Database session
+        corrector: Free-text corrector; without one, free-text answers that
+            do not match the reference are left at zero for manual review
+        cache: Answer key cache
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        corrector: Optional[FreeTextCorrector] = None,
+        cache: AnswerKeyCache = answer_key_cache
+    ):
+        self.db = db
+        self.corrector = corrector
+        self.cache = cache
+
+    def get_answer_key(self, exam_id: str) -> Optional[AnswerKey]:
+        return self.cache.get(self.db, exam_id)
+
+    async def grade(self, key: AnswerKey, answers: Any) -> Dict[str, Any]:
+        """
+        Grade a submission
+
+        Returns:
+            Totals and per-question results in question order
+        """
+        start_time = time.time()
+        submitted = normalize_submission(answers)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: List[Dict[str, Any]] = []
+        for question in key.questions.values():
+            answer = submitted.get(question.question_id)
+            result = grade_objective(question, answer)
+            if result is None:
+                pending.append({"question": question, "answer": answer})
+            else:
+                results[question.question_id] = result
+
+        if pending:
+            results.update(await self._grade_free_text(key, pending))
+
+        questions = [results[question_id] for question_id in key.questions]
+        total_score = sum(result["score_awarded"] for result in questions)
+        percentage = round(total_score / key.max_score * 100, 2) if key.max_score else 0.0
+
+        return {
+            "total_score": total_score,
+            "max_score": key.max_score,
+            "percentage": percentage,
+            "passed": percentage >= PASSING_PERCENTAGE,
+            "feedback": f"حصلت على {percentage}% في هذا الامتحان",
+            "recommendations": (
+                ["راجع المواضيع التي لم تجب عليها بشكل صحيح"]
+                if any(not result["is_correct"] for result in questions) else []
+            ),
+            "ai_graded": len(pending),
+            "processing_time": int((time.time() - start_time) * 1000),
+            "questions": questions
+        }
+
+    async def _grade_free_text(self, key: AnswerKey, pending: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        graded: Dict[str, Dict[str, Any]] = {}
+        if self.corrector:
+            try:
+                graded = await self.corrector.grade(pending, academy_id=key.academy_id)
+            except Exception as e:
+                logger.error(f"Free-text correction failed for exam {key.exam_id}: {str(e)}")
+
+        results = {}
+        for item in pending:
+            question = item["question"]
+            ai_result = graded.get(question.question_id)
+            if ai_result is None:
+                results[question.question_id] = _result(
+                    question, item["answer"], 0.0, False, AI_UNAVAILABLE_FEEDBACK
+                )
+                continue
+            try:
+                score = float(ai_result.get("score", 0))
+            except (TypeError, ValueError):
+                score = 0.0
+            score = max(0.0, min(question.max_score, score))
+            results[question.question_id] = _result(
+                question, item["answer"], score, score >= question.max_score,
+                ai_result.get("feedback") or None
+            )
+        return results
+
+    def persist(self, key: AnswerKey, student_id: int, grading: Dict[str, Any], academy_id: Optional[int] = None) -> str:
+        """
+        Write the correction with two statements in the current transaction
+
+        Returns:
+            The exam correction id
+        """
+        correction_id = str(uuid.uuid4())
+        self.db.execute(insert(ExamCorrection), [{
+            "id": correction_id,
+            "exam_id": key.exam_id,
+            "student_id": student_id,
+            "academy_id": academy_id if academy_id is not None else key.academy_id,
+            "submission_id": str(uuid.uuid4()),
+            "total_score": grading["total_score"],
+            "max_score": grading["max_score"],
+            "percentage": grading["percentage"],
+            "auto_feedback": grading["feedback"],
+            "recommendations": grading["recommendations"],
+            "correction_time_ms": grading["processing_time"]
+        }])
+
+        if grading["questions"]:
+            self.db.execute(insert(QuestionCorrection), [
+                {
+                    "id": str(uuid.uuid4()),
+                    "exam_correction_id": correction_id,
+                    "question_id": result["question_id"],
+                    "student_answer": result["student_answer"],
+                    "correct_answer": result["correct_answer"],
+                    "is_correct": result["is_correct"],
+                    "score_awarded": result["score_awarded"],
+                    "max_score": result["max_score"],
+                    "ai_feedback": result["feedback"]
+                }
+                for result in grading["questions"]
+            ])
+
+        return correction_id
@@ -3,12 +3,17 @@ import shutil
 from pathlib import Path
 from typing import Optional, List
 from fastapi import UploadFile, HTTPException, status
-from PIL import Image
 import uuid
 from datetime import datetime
 
+from app.services.image_variants import ImageVariantError, image_variants
+
 class FileService:
-    """File and image management service with video support"""
+    """File and image management service with video support
+
+    Uploaded images are encoded by ``image_variants`` into content-hashed
+    width and format variants; the returned path is the JPEG fallback.
+    """
     
     def __init__(self):
         self.upload_dir = Path("static/uploads")
@@ -32,11 +37,6 @@ class FileService:
         
         self.max_file_size = 5 * 1024 * 1024
         self.max_video_size = None  # بدون حد أقصى للفيديوهات
-        
-        self.logo_size = (400, 400)
-        self.cover_size = (1200, 300)
-        self.profile_size = (200, 200)
-        self.course_image_size = (800, 450)
     
     def _create_directories(self):
         """Create required directories"""
@@ -98,149 +98,56 @@ class FileService:
         
         return f"{timestamp}_{unique_id}{file_extension}"
     
-    def _resize_image(self, image_path: Path, target_size: tuple, crop: bool = False):
-        """Resize image"""
+    async def _store_variants(self, file: UploadFile, kind: str) -> dict:
+        """Encode an uploaded image into its responsive variants; returns the manifest"""
+        self._validate_file(file)
         try:
-            with Image.open(image_path) as img:
-                # Convert to RGB if needed
-                if img.mode in ("RGBA", "P"):
-                    img = img.convert("RGB")
-                
-                if crop:
-                    # Crop image while maintaining aspect ratio
-                    img.thumbnail(target_size, Image.Resampling.LANCZOS)
-                else:
-                    # Resize while maintaining aspect ratio
-                    img.thumbnail(target_size, Image.Resampling.LANCZOS)
-                
-                # Save optimized image
-                img.save(image_path, optimize=True, quality=85)
-                
-        except Exception as e:
+            await file.seek(0)
+            data = await file.read()
+            if len(data) > self.max_file_size:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"File too large. Maximum size: {self.max_file_size / (1024*1024):.1f} MB"
+                )
+            return await image_variants.create(data, kind)
+        except HTTPException:
+            raise
+        except ImageVariantError as e:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Image processing error: {str(e)}"
             )
-    
-    async def upload_academy_logo(self, file: UploadFile, academy_id: int) -> str:
-        """Upload academy logo"""
-        self._validate_file(file)
-        
-        # Generate filename
-        filename = self._generate_filename(file.filename)
-        file_path = self.academy_logos_dir / filename
-        
-        try:
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Resize image
-            self._resize_image(file_path, self.logo_size, crop=True)
-            
-            # Return relative path
-            return f"academy/logos/{filename}"
-            
         except Exception as e:
-            # Delete file on error
-            if file_path.exists():
-                file_path.unlink()
-            
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"File upload failed: {str(e)}"
             )
+
+    def _upload_relative(self, stored_path: str) -> str:
+        """A variant path relative to the upload directory, as academy images are stored"""
+        return Path(stored_path).relative_to(self.upload_dir).as_posix()
+
+    async def upload_academy_logo(self, file: UploadFile, academy_id: int) -> str:
+        """Upload academy logo"""
+        manifest = await self._store_variants(file, "logo")
+        return self._upload_relative(image_variants.stored_path(manifest))
     
     async def upload_academy_cover(self, file: UploadFile, academy_id: int) -> str:
         """Upload academy cover"""
-        self._validate_file(file)
-        
-        # Generate filename
-        filename = self._generate_filename(file.filename)
-        file_path = self.academy_covers_dir / filename
-        
-        try:
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Resize image
-            self._resize_image(file_path, self.cover_size, crop=False)
-            
-            # Return relative path
-            return f"academy/covers/{filename}"
-            
-        except Exception as e:
-            # Delete file on error
-            if file_path.exists():
-                file_path.unlink()
-            
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"File upload failed: {str(e)}"
-            )
+        manifest = await self._store_variants(file, "cover")
+        return self._upload_relative(image_variants.stored_path(manifest))
     
     async def upload_profile_image(self, file: UploadFile, user_id: int, user_type: str) -> str:
         """Upload user profile image"""
-        self._validate_file(file)
-        
-        # Generate filename
-        filename = self._generate_filename(file.filename)
-        file_path = self.profile_images_dir / filename
-        
-        try:
-            # Reset file cursor to beginning
-            await file.seek(0)
-            
-            # Save file
-            with open(file_path, "wb") as buffer:
-                contents = await file.read()
-                buffer.write(contents)
-            
-            # Resize image
-            self._resize_image(file_path, self.profile_size, crop=True)
-            
-            # Return relative path for static serving
-            return f"static/uploads/profiles/{filename}"
-            
-        except Exception as e:
-            # Delete file on error
-            if file_path.exists():
-                file_path.unlink()
-            
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"File upload failed: {str(e)}"
-            )
+        manifest = await self._store_variants(file, "profile")
+        # Relative path for static serving
+        return image_variants.stored_path(manifest)
     
     async def upload_course_image(self, file: UploadFile, course_id: int) -> str:
         """Upload course image"""
-        self._validate_file(file)
-        
-        # Generate filename
-        filename = self._generate_filename(file.filename)
-        file_path = self.courses_dir / filename
-        
-        try:
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Resize image
-            self._resize_image(file_path, self.course_image_size, crop=False)
-            
-            # Return relative path for static serving
-            return f"static/uploads/courses/{filename}"
-            
-        except Exception as e:
-            # Delete file on error
-            if file_path.exists():
-                file_path.unlink()
-            
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"File upload failed: {str(e)}"
-            )
+        manifest = await self._store_variants(file, "course")
+        # Relative path for static serving
+        return image_variants.stored_path(manifest)
     
     async def save_video_file(self, file: UploadFile, subfolder: str = "videos") -> str:
         """Save video file with validation and return relative path"""
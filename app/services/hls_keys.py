@@ -0,0 +1,199 @@
+"""
+HLS Key Store
+=============
+
+AES-128 keys of encrypted HLS encodes, kept in ``hls_keys`` instead of a
+``.key``/``.keyinfo``/``.json`` file triple per key.
+
+- A key is one row looked up by primary key. Each worker keeps hot keys in
+  an LRU for ``HLS_KEY_CACHE_SECONDS``, never past the key's own expiry, so
+  the key requests of every segment group of every viewer rarely reach the
+  database.
+- Key and keyinfo files exist only while ffmpeg encodes: ``write_keyinfo``
+  materialises them in a directory the caller removes afterwards.
+- Expired keys are purged with one DELETE on the ``expires_at`` index, and
+  the statistics come from one aggregate query.
+
+Purge expired keys with::
+
+    python -m app.services.hls_keys
+"""
+
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.hls_key import HLSKey
+
+
+logger = logging.getLogger(__name__)
+
+KEY_SIZE = 16  # 128 bits for AES-128
+
+
+class HLSKeyStore:
+    """Creates, caches and purges HLS encryption keys"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        expiry_hours: int = 24,
+        cache_size: int = 10000,
+        cache_seconds: float = 300
+    ):
+        self.session_factory = session_factory
+        self.expiry_hours = expiry_hours
+        self.cache_size = cache_size
+        self.cache_seconds = cache_seconds
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _run(self, db: Optional[Session], work: Callable[[Session], Any]) -> Any:
+        if db is not None:
+            return work(db)
+        with self.session_factory() as session:
+            return work(session)
+
+    # ----------------------------------------
+    # Keys
+    # ----------------------------------------
+
+    def create(
+        self,
+        session_id: str,
+        video_id: Optional[str] = None,
+        user_id: Optional[int] = None,
+        db: Optional[Session] = None
+    ) -> Dict[str, Any]:
+        """Generate and store a key; commits"""
+        key = secrets.token_bytes(KEY_SIZE)
+        now = datetime.utcnow()
+        row = {
+            "key_id": hashlib.sha256(f"{session_id}:{key.hex()}".encode()).hexdigest()[:16],
+            "key": key,
+            "session_id": session_id,
+            "video_id": str(video_id) if video_id is not None else None,
+            "user_id": int(user_id) if user_id is not None else None,
+            "created_at": now,
+            "expires_at": now + timedelta(hours=self.expiry_hours)
+        }
+
+        def work(session: Session):
+            session.execute(insert(HLSKey), [row])
+            session.commit()
+
+        self._run(db, work)
+        self._remember(row)
+        return dict(row)
+
+    def get(self, key_id: str, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+        """The key's row as a dict, or None when it is unknown or expired"""
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._cache.get(key_id)
+            if entry is not None:
+                row, cached_until = entry
+                if time.monotonic() < cached_until and now < row["expires_at"]:
+                    self._cache.move_to_end(key_id)
+                    return row
+                del self._cache[key_id]
+
+        def work(session: Session):
+            return session.execute(
+                select(HLSKey.__table__).where(HLSKey.key_id == key_id, HLSKey.expires_at > now)
+            ).mappings().first()
+
+        found = self._run(db, work)
+        if found is None:
+            return None
+        row = dict(found)
+        self._remember(row)
+        return row
+
+    def _remember(self, row: Dict[str, Any]):
+        with self._lock:
+            self._cache[row["key_id"]] = (row, time.monotonic() + self.cache_seconds)
+            self._cache.move_to_end(row["key_id"])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, key_id: Optional[str] = None):
+        """Drop a key from this worker's cache (all keys when ``key_id`` is None)"""
+        with self._lock:
+            if key_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key_id, None)
+
+    @staticmethod
+    def write_keyinfo(key: Dict[str, Any], directory: Path, key_uri: Optional[str] = None) -> Path:
+        """
+        Materialise the key and keyinfo files ffmpeg reads while encoding.
+
+        ``key_uri`` is what players are told to fetch and defaults to the
+        key file name. Remove ``directory`` once the encode finishes.
+        """
+        directory = Path(directory)
+        key_path = directory / f"{key['key_id']}.key"
+        keyinfo_path = directory / f"{key['key_id']}.keyinfo"
+        key_path.write_bytes(key["key"])
+        keyinfo_path.write_text(f"{key_uri or key_path.name}\n{key_path}\n")
+        return keyinfo_path
+
+    # ----------------------------------------
+    # Maintenance
+    # ----------------------------------------
+
+    def delete_expired(self, db: Optional[Session] = None, now: Optional[datetime] = None) -> int:
+        """Purge expired keys in one DELETE; commits and returns the number deleted"""
+        now = now or datetime.utcnow()
+
+        def work(session: Session):
+            deleted = session.execute(
+                delete(HLSKey).where(HLSKey.expires_at <= now).execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+            return deleted
+
+        deleted = self._run(db, work)
+        with self._lock:
+            for key_id in [key_id for key_id, (row, _) in self._cache.items() if row["expires_at"] <= now]:
+                del self._cache[key_id]
+        return deleted
+
+    def statistics(self, db: Optional[Session] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+        now = now or datetime.utcnow()
+
+        def work(session: Session):
+            return session.execute(
+                select(
+                    func.count(),
+                    func.coalesce(func.sum(case((HLSKey.expires_at > now, 1), else_=0)), 0)
+                ).select_from(HLSKey)
+            ).one()
+
+        total, active = self._run(db, work)
+        return {"total_keys": int(total), "active_keys": int(active), "expired_keys": int(total) - int(active)}
+
+
+hls_key_store = HLSKeyStore(
+    expiry_hours=settings.HLS_KEY_EXPIRY_HOURS,
+    cache_size=settings.HLS_KEY_CACHE_SIZE,
+    cache_seconds=settings.HLS_KEY_CACHE_SECONDS
+)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger.info("Deleted %d expired HLS keys", hls_key_store.delete_expired())
@@ -1,8 +1,6 @@
 import os
 import subprocess
 import tempfile
-import secrets
-import hashlib
 import jwt
 from typing import List, Dict, Optional, Tuple
 import m3u8
@@ -15,6 +13,7 @@ import re
 
 from app.core.config import settings
 from app.models.video import Video
+from app.services.hls_keys import hls_key_store
 
 
 class HLSStreamingService:
@@ -35,7 +34,6 @@ class HLSStreamingService:
         self.secret_key = settings.SECRET_KEY
         
         # Security settings
-        self.key_expiry_hours = 24  # Key expires after 24 hours
         self.max_playlist_age = 3600  # Playlist cache for 1 hour
         
     def create_encrypted_hls_playlist(
@@ -57,42 +55,43 @@ class HLSStreamingService:
             # Generate encryption key for this session
             encryption_key = self._generate_session_key(video_id, user_id, request)
             
-            # Create keyinfo file for this session
-            keyinfo_path = self._create_keyinfo_file(encryption_key, output_path)
-            
-            # Generate two quality levels only - جودتان فقط
-            qualities = [
-                {"name": "high", "height": 720, "bitrate": "2800k", "label": "جودة عالية"},
-                {"name": "low", "height": 480, "bitrate": "1400k", "label": "جودة منخفضة"}
-            ]
+            # Key files exist only while ffmpeg encodes; players fetch the key from the store
+            with tempfile.TemporaryDirectory(prefix="hls_key_") as key_dir:
+                keyinfo_path = hls_key_store.write_keyinfo(encryption_key, Path(key_dir))
+                
+                # Generate two quality levels only - جودتان فقط
+                qualities = [
+                    {"name": "high", "height": 720, "bitrate": "2800k", "label": "جودة عالية"},
+                    {"name": "low", "height": 480, "bitrate": "1400k", "label": "جودة منخفضة"}
+                ]
             
-            playlist_files = {}
+                playlist_files = {}
             
-            for quality in qualities:
-                quality_output = output_path / quality["name"]
-                quality_output.mkdir(exist_ok=True)
+                for quality in qualities:
+                    quality_output = output_path / quality["name"]
+                    quality_output.mkdir(exist_ok=True)
                 
-                # FFmpeg command for encrypted HLS
-                cmd = [
-                    self.ffmpeg_path,
-                    "-i", video_path,
-                    "-c:v", "libx264",
-                    "-c:a", "aac",
-                    "-b:v", quality["bitrate"],
-                    "-maxrate", quality["bitrate"],
-                    "-bufsize", str(int(quality["bitrate"].replace("k", "")) * 2) + "k",
-                    "-vf", f"scale=-2:{quality['height']}",
-                    "-hls_time", str(self.segment_duration),
-                    "-hls_list_size", "0",
-                    "-hls_segment_filename", str(quality_output / "segment_%03d.ts"),
-                    "-hls_key_info_file", str(keyinfo_path),
-                    "-hls_playlist_type", "vod",
-                    "-hls_flags", "independent_segments",
-                    str(quality_output / "playlist.m3u8")
-                ]
+                    # FFmpeg command for encrypted HLS
+                    cmd = [
+                        self.ffmpeg_path,
+                        "-i", video_path,
+                        "-c:v", "libx264",
+                        "-c:a", "aac",
+                        "-b:v", quality["bitrate"],
+                        "-maxrate", quality["bitrate"],
+                        "-bufsize", str(int(quality["bitrate"].replace("k", "")) * 2) + "k",
+                        "-vf", f"scale=-2:{quality['height']}",
+                        "-hls_time", str(self.segment_duration),
+                        "-hls_list_size", "0",
+                        "-hls_segment_filename", str(quality_output / "segment_%03d.ts"),
+                        "-hls_key_info_file", str(keyinfo_path),
+                        "-hls_playlist_type", "vod",
+                        "-hls_flags", "independent_segments",
+                        str(quality_output / "playlist.m3u8")
+                    ]
                 
-                subprocess.run(cmd, check=True, capture_output=True)
-                playlist_files[quality["name"]] = str(quality_output / "playlist.m3u8")
+                    subprocess.run(cmd, check=True, capture_output=True)
+                    playlist_files[quality["name"]] = str(quality_output / "playlist.m3u8")
             
             # Create master playlist with security headers
             master_playlist = self._create_secure_master_playlist(
@@ -120,51 +119,12 @@ class HLSStreamingService:
         video_id: str, 
         user_id: str, 
         request: Request
-    ) -> Dict[str, str]:
+    ) -> Dict:
         """
         Generate unique encryption key for this streaming session
         """
-        # Create session-specific key
-        session_data = f"{video_id}:{user_id}:{request.client.host}:{datetime.now().isoformat()}"
-        key_id = hashlib.sha256(session_data.encode()).hexdigest()[:16]
-        
-        # Generate random AES-128 key
-        key_bytes = secrets.token_bytes(16)
-        key_hex = key_bytes.hex()
-        
-        # Store key with expiry (in production, use Redis or database)
-        key_data = {
-            "key_id": key_id,
-            "key": key_hex,
-            "video_id": video_id,
-            "user_id": user_id,
-            "expires_at": datetime.now() + timedelta(hours=self.key_expiry_hours),
-            "ip_address": request.client.host,
-            "user_agent": request.headers.get("user-agent", "")
-        }
-        
-        # In production, store in Redis with expiry
-        # redis_client.setex(f"hls_key:{key_id}", self.key_expiry_hours * 3600, json.dumps(key_data))
-        
-        return key_data
-    
-    def _create_keyinfo_file(self, key_data: Dict, output_path: Path) -> Path:
-        """
-        Create keyinfo file for FFmpeg encryption
-        """
-        key_path = output_path / f"{key_data['key_id']}.key"
-        keyinfo_path = output_path / f"{key_data['key_id']}.keyinfo"
-        
-        # Write key file
-        with open(key_path, "wb") as f:
-            f.write(bytes.fromhex(key_data["key"]))
-        
-        # Write keyinfo file
-        keyinfo_content = f"{key_path.name}\n{key_path}\n"
-        with open(keyinfo_path, "w") as f:
-            f.write(keyinfo_content)
-        
-        return keyinfo_path
+        session_id = f"{video_id}:{user_id}:{request.client.host}:{datetime.now().isoformat()}"
+        return hls_key_store.create(session_id, video_id=video_id, user_id=user_id)
     
     def _create_secure_master_playlist(
         self, 
@@ -326,29 +286,19 @@ class HLSStreamingService:
         Serve encryption key with verification
         """
         try:
-            # Verify key access (in production, check Redis/database)
-            # key_data = redis_client.get(f"hls_key:{key_id}")
-            # if not key_data:
-            #     raise HTTPException(status_code=404, detail="Key not found")
-            
-            # For now, use simple verification
-            if not self._verify_key_access(key_id, video_id, user_id, request):
+            key = hls_key_store.get(key_id)
+            if not key:
                 raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Access denied to encryption key"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Key not found"
                 )
             
-            # Get key file path
-            key_path = Path(self.output_dir) / f"{key_id}.key"
-            if not key_path.exists():
+            if not self._verify_key_access(key, video_id, user_id, request):
                 raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Key file not found"
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied to encryption key"
                 )
-            
-            # Read key
-            with open(key_path, "rb") as f:
-                key_data = f.read()
+            key_data = key["key"]
             
             # Security headers
             headers = {
@@ -370,6 +320,8 @@ class HLSStreamingService:
                 media_type="application/octet-stream"
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -378,7 +330,7 @@ class HLSStreamingService:
     
     def _verify_key_access(
         self, 
-        key_id: str, 
+        key: Dict, 
         video_id: str, 
         user_id: str, 
         request: Request
@@ -386,9 +338,7 @@ class HLSStreamingService:
         """
         Verify user has access to this encryption key
         """
-        # Basic verification - in production, check database/Redis
-        expected_key_id = hashlib.sha256(f"{video_id}:{user_id}".encode()).hexdigest()[:16]
-        return key_id == expected_key_id
+        return key["video_id"] == str(video_id) and str(key["user_id"]) == str(user_id)
     
     def _get_bandwidth(self, quality: str) -> str:
         """Get bandwidth for quality level - جودتان فقط"""
@@ -0,0 +1,290 @@
+"""
+Responsive Image Variants
+=========================
+
+Uploaded logos, covers, profile pictures and course images are decoded
+once and written as a ladder of widths in AVIF and WebP with a JPEG
+fallback, so clients download the size and format they can show instead
+of one full-size JPEG.
+
+- Encoding runs on a process pool (``IMAGE_VARIANT_WORKERS`` per worker
+  process), off the event loop and outside the GIL. Each job decodes the
+  upload once (JPEGs at a reduced DCT scale when the box allows), fits it
+  to the kind's box and resizes down the ladder from the previous width.
+- Files are named after the SHA-256 of the upload and live under
+  ``IMAGE_VARIANT_STORAGE_PATH/<kind>/``; re-uploading the same image
+  reuses them. Their URLs never change content and are served with a
+  one-year immutable Cache-Control.
+- ``<hash>.json`` next to the variants is the manifest: intrinsic size,
+  the JPEG ``src``/``srcset`` and one ``<source>`` per modern format. It
+  is written last, so its presence means the set is complete.
+- ``manifest``/``manifests`` map stored image paths to manifests through
+  a per-worker LRU; paths from before the pipeline map to None.
+- AVIF is only emitted when Pillow was built with it.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageOps, features
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class ImageVariantError(Exception):
+    """The upload is not an image Pillow can decode"""
+
+
+@dataclass(frozen=True)
+class ImageKind:
+    """Bounding box and width ladder of one kind of image"""
+    box: Tuple[int, int]
+    widths: Tuple[int, ...]  # Ascending; the box width is always emitted
+
+
+IMAGE_KINDS: Dict[str, ImageKind] = {
+    "logo": ImageKind(box=(400, 400), widths=(100, 200, 400)),
+    "cover": ImageKind(box=(1200, 300), widths=(480, 800, 1200)),
+    "profile": ImageKind(box=(200, 200), widths=(96, 200)),
+    "course": ImageKind(box=(800, 450), widths=(320, 480, 800))
+}
+
+# Preferred first: the order of <source> elements
+IMAGE_FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 55, "speed": 8}),
+    "webp": ("WEBP", "image/webp", {"quality": 78, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True})
+}
+
+DIGEST_LENGTH = 32
+_VARIANT_NAME = re.compile(r"(?:^|/)(?P<kind>[a-z]+)/(?P<digest>[0-9a-f]{32})-\d+\.jpg$")
+
+
+def available_formats(avif: bool = True) -> List[str]:
+    """Formats this Pillow build can write, preferred first"""
+    return [name for name in IMAGE_FORMATS if name != "avif" or (avif and features.check("avif"))]
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+
+
+def _write(image: Image.Image, path: Path, image_format: str):
+    pil_format, _, options = IMAGE_FORMATS[image_format]
+    staged = path.with_name(f".{path.name}.tmp")
+    image.save(staged, pil_format, **options)
+    os.replace(staged, path)
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Transparent images on white, for JPEG"""
+    if image.mode != "RGBA":
+        return image
+    flat = Image.new("RGB", image.size, (255, 255, 255))
+    flat.paste(image, mask=image.getchannel("A"))
+    return flat
+
+
+def encode_variants(data: bytes, kind: str, directory: str, digest: str, formats: List[str]) -> Dict[str, Any]:
+    """
+    Decode an upload once and write every width and format of it
+
+    Runs in a pool process; returns the variant list for the manifest.
+    """
+    spec = IMAGE_KINDS[kind]
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEGs decode straight to a scale at least as large as the box
+        image.draft("RGB", (max(spec.box), max(spec.box)))
+        image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        raise ImageVariantError(str(e)) from e
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    image.thumbnail(spec.box, Image.Resampling.LANCZOS)
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    widths = sorted({width for width in spec.widths if width < image.width} | {image.width}, reverse=True)
+    variants = []
+    current = image
+    for width in widths:
+        if width != current.width:
+            size = (width, max(round(current.height * width / current.width), 1))
+            current = current.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        for image_format in formats:
+            path = directory / f"{digest}-{width}.{image_format}"
+            if not path.exists():
+                _write(_flatten(current) if image_format == "jpg" else current, path, image_format)
+            variants.append({
+                "format": image_format, "width": width, "height": current.height,
+                "name": path.name, "bytes": path.stat().st_size
+            })
+    return {"width": image.width, "height": image.height, "variants": variants}
+
+
+class ImageVariantService:
+    """Encodes uploads into variant sets and serves their manifests"""
+
+    def __init__(
+        self,
+        storage_path: str = "static/uploads/images",
+        url_prefix: str = "/static/uploads/images",
+        workers: int = 2,
+        avif: bool = True,
+        max_manifests: int = 4096
+    ):
+        self.storage_path = Path(storage_path)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.workers = workers
+        self.avif = avif
+        self.max_manifests = max_manifests
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manifests: "OrderedDict[Tuple[str, str], Optional[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def formats(self) -> List[str]:
+        return available_formats(self.avif)
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        """The process pool, started on first use; None encodes in a thread instead"""
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    # ----------------------------------------
+    # Encoding
+    # ----------------------------------------
+
+    async def create(self, data: bytes, kind: str) -> Dict[str, Any]:
+        """Encode an upload's variants, or reuse those of identical bytes; returns its manifest"""
+        if kind not in IMAGE_KINDS:
+            raise ValueError(f"Unknown image kind: {kind}")
+        digest = image_digest(data)
+        existing = self.manifest_for(kind, digest)
+        if existing is not None:
+            return existing
+
+        directory = self.storage_path / kind
+        pool = self._pool()
+        if pool is None:
+            encoded = await asyncio.to_thread(encode_variants, data, kind, str(directory), digest, self.formats)
+        else:
+            loop = asyncio.get_running_loop()
+            encoded = await loop.run_in_executor(pool, encode_variants, data, kind, str(directory), digest, self.formats)
+
+        manifest = self._build_manifest(kind, digest, encoded)
+        manifest_path = directory / f"{digest}.json"
+        staged = manifest_path.with_name(f".{manifest_path.name}.tmp")
+        staged.write_text(json.dumps(manifest))
+        os.replace(staged, manifest_path)
+        self._remember((kind, digest), manifest)
+        logger.info(f"Image {kind}/{digest}: {len(manifest['variants'])} variants, {encoded['width']}x{encoded['height']}")
+        return manifest
+
+    def _build_manifest(self, kind: str, digest: str, encoded: Dict[str, Any]) -> Dict[str, Any]:
+        base = f"{self.url_prefix}/{kind}"
+        by_format: Dict[str, List[Dict[str, Any]]] = {}
+        for variant in encoded["variants"]:
+            by_format.setdefault(variant["format"], []).append(variant)
+
+        def srcset(variants: List[Dict[str, Any]]) -> str:
+            return ", ".join(f"{base}/{variant['name']} {variant['width']}w" for variant in sorted(
+                variants, key=lambda variant: variant["width"]
+            ))
+
+        return {
+            "hash": digest,
+            "kind": kind,
+            "width": encoded["width"],
+            "height": encoded["height"],
+            "src": f"{base}/{digest}-{encoded['width']}.jpg",
+            "srcset": srcset(by_format["jpg"]),
+            "sources": [
+                {"type": IMAGE_FORMATS[image_format][1], "srcset": srcset(by_format[image_format])}
+                for image_format in IMAGE_FORMATS if image_format != "jpg" and image_format in by_format
+            ],
+            "variants": [
+                {key: variant[key] for key in ("format", "width", "height", "bytes")} | {"url": f"{base}/{variant['name']}"}
+                for variant in encoded["variants"]
+            ]
+        }
+
+    def stored_path(self, manifest: Dict[str, Any]) -> str:
+        """Path of the JPEG fallback relative to the working directory, as models store images"""
+        return f"{self.storage_path.as_posix()}/{manifest['kind']}/{manifest['hash']}-{manifest['width']}.jpg"
+
+    # ----------------------------------------
+    # Manifests
+    # ----------------------------------------
+
+    def manifest_for(self, kind: str, digest: str) -> Optional[Dict[str, Any]]:
+        key = (kind, digest)
+        with self._lock:
+            if key in self._manifests:
+                self._manifests.move_to_end(key)
+                return self._manifests[key]
+
+        manifest = None
+        try:
+            manifest = json.loads((self.storage_path / kind / f"{digest}.json").read_text())
+        except (OSError, ValueError):
+            pass
+        # Misses are not cached: the manifest appears once its upload finishes
+        if manifest is not None:
+            self._remember(key, manifest)
+        return manifest
+
+    def manifest(self, path: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Manifest of a stored image path or URL; None for images from before the pipeline"""
+        match = _VARIANT_NAME.search(path or "")
+        if not match or match.group("kind") not in IMAGE_KINDS:
+            return None
+        return self.manifest_for(match.group("kind"), match.group("digest"))
+
+    def manifests(self, paths: Iterable[Optional[str]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        return {path: self.manifest(path) for path in set(paths) if path}
+
+    def _remember(self, key: Tuple[str, str], manifest: Dict[str, Any]):
+        with self._lock:
+            self._manifests[key] = manifest
+            self._manifests.move_to_end(key)
+            while len(self._manifests) > self.max_manifests:
+                self._manifests.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._manifests.clear()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+
+
+image_variants = ImageVariantService(
+    storage_path=settings.IMAGE_VARIANT_STORAGE_PATH,
+    url_prefix=settings.IMAGE_VARIANT_URL_PREFIX,
+    workers=settings.IMAGE_VARIANT_WORKERS,
+    avif=settings.IMAGE_VARIANT_AVIF
+)
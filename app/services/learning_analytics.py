@@ -0,0 +1,308 @@
+"""
+Student Learning Analytics
+==========================
+
+Learning analytics built from an append-only stream of learning events.
+
+- The progress, exam and login endpoints append events to
+  ``learning_events`` in their own transaction. Each batch of events is
+  folded into ``student_daily_activity`` with one upsert that increments
+  the (student, UTC day) rows it touches.
+- Study time comes from progress heartbeats: the time since the previous
+  update of the same lesson is credited when it is shorter than
+  ``LEARNING_HEARTBEAT_MAX_GAP_SECONDS``; a longer gap counts as a break.
+- Events that must count once (a lesson started or completed, an exam
+  correction) carry a dedupe key, so replays and the backfill cannot
+  count them twice.
+- Week, month and year views sum at most 366 daily rows of one student.
+
+Backfill history from ``lesson_progress`` with::
+
+    python -m app.services.learning_analytics
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.upsert import upsert_increment
+from app.models.learning_analytics import LearningEvent, LearningEventType, StudentDailyActivity
+from app.models.lesson_progress import LessonProgress
+from app.models.student_course import StudentCourse
+
+
+logger = logging.getLogger(__name__)
+
+PERIOD_DAYS = {"week": 7, "month": 30, "year": 365}
+
+_COUNTERS = (
+    "study_seconds", "lessons_started", "lessons_completed",
+    "exams_submitted", "exams_passed", "score_total", "logins"
+)
+
+
+def _progress_key(progress_id: str, step: str) -> str:
+    return f"lesson_progress:{progress_id}:{step}"
+
+
+class LearningAnalyticsService:
+    """Appends learning events and serves analytics from daily buckets"""
+
+    # ----------------------------------------
+    # Events
+    # ----------------------------------------
+
+    def record_progress(
+        self,
+        db: Session,
+        progress: LessonProgress,
+        previous_watched_at: Optional[datetime],
+        was_completed: bool,
+        now: Optional[datetime] = None
+    ) -> None:
+        """
+        Emit the events of one progress update. ``progress`` must be flushed.
+
+        Pass the lesson's ``last_watched_at`` and ``completed`` as they were
+        before the update; ``None`` means the progress row is new.
+        """
+        now = now or datetime.now()
+        subject = {
+            "student_id": progress.student_id,
+            "course_id": str(progress.course_id),
+            "lesson_id": str(progress.lesson_id)
+        }
+        events = []
+        if previous_watched_at is None:
+            events.append({
+                **subject, "event_type": LearningEventType.LESSON_STARTED,
+                "dedupe_key": _progress_key(progress.id, "started")
+            })
+        else:
+            gap = (now - previous_watched_at).total_seconds()
+            events.append({
+                **subject, "event_type": LearningEventType.PROGRESS_HEARTBEAT,
+                "study_seconds": int(gap) if 0 < gap <= settings.LEARNING_HEARTBEAT_MAX_GAP_SECONDS else 0
+            })
+        if progress.completed and not was_completed:
+            events.append({
+                **subject, "event_type": LearningEventType.LESSON_COMPLETED,
+                "dedupe_key": _progress_key(progress.id, "completed")
+            })
+        self.append(db, events)
+
+    def record_exam(
+        self, db: Session, student_id: int, exam_id: str, correction_id: str, percentage: float, passed: bool
+    ) -> None:
+        self.append(db, [{
+            "student_id": student_id,
+            "event_type": LearningEventType.EXAM_SUBMITTED,
+            "exam_id": str(exam_id),
+            "score": round(percentage, 2),
+            "passed": bool(passed),
+            "dedupe_key": f"exam_correction:{correction_id}"
+        }])
+
+    def record_login(self, db: Session, student_id: int) -> None:
+        self.append(db, [{"student_id": student_id, "event_type": LearningEventType.LOGIN}])
+
+    def append(self, db: Session, events: List[Dict[str, Any]]) -> int:
+        """
+        Append events and fold them into the daily buckets.
+
+        Events whose dedupe key was already recorded are dropped. Returns
+        the number of events appended. The caller commits.
+        """
+        keys = [event["dedupe_key"] for event in events if event.get("dedupe_key")]
+        if keys:
+            seen = set(db.execute(
+                select(LearningEvent.dedupe_key).where(LearningEvent.dedupe_key.in_(keys))
+            ).scalars())
+            events = [event for event in events if event.get("dedupe_key") not in seen]
+        if not events:
+            return 0
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                "course_id": None,
+                "lesson_id": None,
+                "exam_id": None,
+                "study_seconds": 0,
+                "score": None,
+                "passed": None,
+                "dedupe_key": None,
+                "occurred_at": now,
+                **event
+            }
+            for event in events
+        ]
+        db.execute(insert(LearningEvent), rows)
+        self._fold(db, rows)
+        return len(rows)
+
+    def _fold(self, db: Session, events: Iterable[Dict[str, Any]]) -> None:
+        buckets = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+        for event in events:
+            bucket = buckets[(event["student_id"], event["occurred_at"].date())]
+            event_type = event["event_type"]
+            bucket["study_seconds"] += event["study_seconds"] or 0
+            if event_type == LearningEventType.LESSON_STARTED:
+                bucket["lessons_started"] += 1
+            elif event_type == LearningEventType.LESSON_COMPLETED:
+                bucket["lessons_completed"] += 1
+            elif event_type == LearningEventType.EXAM_SUBMITTED:
+                bucket["exams_submitted"] += 1
+                bucket["exams_passed"] += 1 if event["passed"] else 0
+                bucket["score_total"] += int(round(event["score"] or 0))
+            elif event_type == LearningEventType.LOGIN:
+                bucket["logins"] += 1
+
+        upsert_increment(
+            db, StudentDailyActivity,
+            [{"student_id": student_id, "day": day, **counters} for (student_id, day), counters in buckets.items()],
+            keys=["student_id", "day"], increments=_COUNTERS
+        )
+
+    # ----------------------------------------
+    # Backfill
+    # ----------------------------------------
+
+    def backfill(self, db: Session, batch_size: int = 1000) -> int:
+        """
+        Derive events from ``lesson_progress`` rows recorded before live tracking.
+
+        Rows whose start was already recorded live are skipped. For the rest
+        the start is dated at ``created_at``; the watched position is credited
+        as study time, and completion, at the last watch. Safe to rerun.
+        Commits per batch and returns the number of events appended.
+        """
+        appended, after = 0, ""
+        while True:
+            rows = db.execute(
+                select(
+                    LessonProgress.id, LessonProgress.student_id, LessonProgress.course_id,
+                    LessonProgress.lesson_id, LessonProgress.completed, LessonProgress.current_position_seconds,
+                    LessonProgress.created_at, LessonProgress.updated_at, LessonProgress.last_watched_at
+                )
+                .where(LessonProgress.id > after)
+                .order_by(LessonProgress.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return appended
+            after = rows[-1].id
+
+            started = set(db.execute(
+                select(LearningEvent.dedupe_key).where(
+                    LearningEvent.dedupe_key.in_([_progress_key(row.id, "started") for row in rows])
+                )
+            ).scalars())
+            events = []
+            for row in rows:
+                subject = {"student_id": row.student_id, "course_id": str(row.course_id), "lesson_id": str(row.lesson_id)}
+                last_seen = row.last_watched_at or row.updated_at or row.created_at
+                if _progress_key(row.id, "started") not in started:
+                    events.append({
+                        **subject, "event_type": LearningEventType.LESSON_STARTED,
+                        "dedupe_key": _progress_key(row.id, "started"), "occurred_at": row.created_at
+                    })
+                    if row.current_position_seconds:
+                        events.append({
+                            **subject, "event_type": LearningEventType.PROGRESS_HEARTBEAT,
+                            "study_seconds": row.current_position_seconds, "occurred_at": last_seen
+                        })
+                if row.completed:
+                    # Completion may predate live tracking even when the start does not
+                    events.append({
+                        **subject, "event_type": LearningEventType.LESSON_COMPLETED,
+                        "dedupe_key": _progress_key(row.id, "completed"), "occurred_at": last_seen
+                    })
+            appended += self.append(db, events)
+            db.commit()
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def get_analytics(self, db: Session, student_id: int, period: str, today: Optional[date] = None) -> Dict[str, Any]:
+        """Study time, progress and engagement over the last week, month or year"""
+        today = today or datetime.utcnow().date()
+        days = PERIOD_DAYS[period]
+        start = today - timedelta(days=days - 1)
+        in_window = (
+            StudentDailyActivity.student_id == student_id,
+            StudentDailyActivity.day >= start,
+            StudentDailyActivity.day <= today
+        )
+
+        totals = db.execute(
+            select(
+                *(func.coalesce(func.sum(getattr(StudentDailyActivity, name)), 0) for name in _COUNTERS),
+                func.coalesce(func.sum(case((StudentDailyActivity.logins > 0, 1), else_=0)), 0)
+            ).where(*in_window)
+        ).one()
+        totals = dict(zip(_COUNTERS + ("login_days",), (int(value) for value in totals)))
+
+        week_start = today - timedelta(days=6)
+        week = dict(db.execute(
+            select(StudentDailyActivity.day, StudentDailyActivity.study_seconds).where(
+                StudentDailyActivity.student_id == student_id,
+                StudentDailyActivity.day >= week_start,
+                StudentDailyActivity.day <= today
+            )
+        ).all())
+
+        certificates = db.scalar(
+            select(func.count(StudentCourse.id)).where(
+                StudentCourse.student_id == student_id,
+                StudentCourse.certificate_issued.is_(True),
+                StudentCourse.certificate_issued_at >= datetime.combine(start, datetime.min.time())
+            )
+        )
+
+        total_minutes = totals["study_seconds"] // 60
+        submitted = totals["exams_submitted"]
+        return {
+            "period": period,
+            "start_date": start.isoformat(),
+            "end_date": today.isoformat(),
+            "study_time": {
+                "total_minutes": total_minutes,
+                "daily_average": round(total_minutes / days),
+                "weekly_data": [
+                    {"day": day.isoformat(), "minutes": week.get(day, 0) // 60}
+                    for day in (week_start + timedelta(days=offset) for offset in range(7))
+                ]
+            },
+            "progress": {
+                "lessons_completed": totals["lessons_completed"],
+                "quizzes_passed": totals["exams_passed"],
+                "certificates_earned": certificates,
+                "average_quiz_score": round(totals["score_total"] / submitted) if submitted else 0
+            },
+            "engagement": {
+                "login_days": totals["login_days"],
+                "video_completion_rate": (
+                    min(100, round(totals["lessons_completed"] * 100 / totals["lessons_started"]))
+                    if totals["lessons_started"] else 0
+                ),
+                "quizzes_taken": submitted
+            }
+        }
+
+
+learning_analytics = LearningAnalyticsService()
+
+
+if __name__ == "__main__":
+    from app.db.session import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as session:
+        logger.info("Backfilled %d learning events", learning_analytics.backfill(session))
@@ -0,0 +1,303 @@
+"""
+Faststart Remux and Seek Index
+==============================
+
+Second post-upload stage: makes lesson MP4s start and seek cheaply when
+served through ``create_range_response``.
+
+- Videos whose codecs an MP4 can carry are remuxed, without re-encoding,
+  to fragmented MP4: an empty ``moov`` up front, then one ``moof``/``mdat``
+  fragment per keyframe. Playback needs only the head of the file, never
+  an extra request for a trailing ``moov``. Other codecs are left alone.
+- The remuxed file replaces the upload in place, next to a
+  ``.seek.json`` sidecar listing each fragment's start time and byte
+  offset, read from the ``tfdt`` boxes of the file itself.
+- The streaming endpoints load the sidecar once per worker. An open-ended
+  range (``bytes=N-``, what players send when they seek) is answered with
+  whole fragments from N up to ``VIDEO_SEEK_RANGE_BYTES`` instead of the
+  rest of the file; players ask for the next range as they need it.
+
+Keyframes are not moved: a file with sparse keyframes keeps large
+fragments, and fixing that takes a re-encode.
+"""
+
+import bisect
+import json
+import logging
+import os
+import struct
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.ffmpeg_config import FFmpegConfig
+from app.models.video import Video
+from app.services.media_probe import scan_mp4_boxes
+from app.services.playback_grants import playback_grants
+
+
+logger = logging.getLogger(__name__)
+
+# Codecs an MP4 carries that browsers play; anything else would need a re-encode
+REMUX_VIDEO_CODECS = {"h264", "hevc", "av1", "vp9"}
+REMUX_AUDIO_CODECS = {"aac", "mp3", "opus", "flac"}
+
+SEEK_INDEX_SUFFIX = ".seek.json"
+
+
+@dataclass(frozen=True)
+class SeekIndex:
+    """Start time and byte offset of every fragment of a fragmented MP4"""
+    size: int  # File size the index was built for
+    times: List[float]  # Seconds, ascending
+    offsets: List[int]  # Offset of each fragment's moof
+
+    @property
+    def init_size(self) -> int:
+        """Bytes before the first fragment (ftyp and moov)"""
+        return self.offsets[0] if self.offsets else self.size
+
+    def offset_at(self, seconds: float) -> int:
+        """Offset of the fragment playing at ``seconds``"""
+        position = max(bisect.bisect_right(self.times, seconds) - 1, 0)
+        return self.offsets[position] if self.offsets else 0
+
+    def range_end(self, start: int, min_bytes: int) -> int:
+        """Last byte of the whole fragments that cover at least ``min_bytes`` from ``start``"""
+        position = bisect.bisect_left(self.offsets, start + min_bytes)
+        if position >= len(self.offsets):
+            return self.size - 1
+        return self.offsets[position] - 1
+
+    def to_json(self) -> str:
+        return json.dumps({"size": self.size, "fragments": list(zip(self.times, self.offsets))})
+
+    @classmethod
+    def from_json(cls, data: str) -> "SeekIndex":
+        payload = json.loads(data)
+        fragments = payload["fragments"]
+        return cls(
+            size=payload["size"],
+            times=[time for time, _ in fragments],
+            offsets=[offset for _, offset in fragments]
+        )
+
+
+def seek_index_path(file_path: Path) -> Path:
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + SEEK_INDEX_SUFFIX)
+
+
+# ----------------------------------------
+# Reading fragmented MP4 boxes
+# ----------------------------------------
+
+def _children(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[str, int, int]]:
+    """Boxes inside ``data[start:end]`` as (type, payload start, box end)"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield box_type.decode("latin-1"), offset + header, offset + size
+        offset += size
+
+
+def _child(data: bytes, start: int, end: int, box_type: str) -> Optional[Tuple[int, int]]:
+    return next(((payload, box_end) for kind, payload, box_end in _children(data, start, end) if kind == box_type), None)
+
+
+def _video_track(moov: bytes) -> Optional[Tuple[int, int]]:
+    """(track id, timescale) of the first video track"""
+    for kind, start, end in _children(moov):
+        if kind != "trak":
+            continue
+        tkhd, mdia = _child(moov, start, end, "tkhd"), _child(moov, start, end, "mdia")
+        if not tkhd or not mdia:
+            continue
+        hdlr, mdhd = _child(moov, *mdia, "hdlr"), _child(moov, *mdia, "mdhd")
+        if not hdlr or not mdhd or moov[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        # Version 1 boxes carry 64-bit creation and modification times
+        track_id = struct.unpack_from(">I", moov, tkhd[0] + (20 if moov[tkhd[0]] == 1 else 12))[0]
+        timescale = struct.unpack_from(">I", moov, mdhd[0] + (20 if moov[mdhd[0]] == 1 else 12))[0]
+        return track_id, timescale
+    return None
+
+
+def _fragment_time(moof: bytes, track_id: int) -> Optional[int]:
+    """baseMediaDecodeTime of the track in a moof, in the track's timescale"""
+    for kind, start, end in _children(moof):
+        if kind != "traf":
+            continue
+        tfhd, tfdt = _child(moof, start, end, "tfhd"), _child(moof, start, end, "tfdt")
+        if not tfhd or not tfdt or struct.unpack_from(">I", moof, tfhd[0] + 4)[0] != track_id:
+            continue
+        if moof[tfdt[0]] == 1:
+            return struct.unpack_from(">Q", moof, tfdt[0] + 4)[0]
+        return struct.unpack_from(">I", moof, tfdt[0] + 4)[0]
+    return None
+
+
+def build_seek_index(file_path: Path) -> Optional[SeekIndex]:
+    """Index a fragmented MP4's video fragments; None for any other layout"""
+    boxes = scan_mp4_boxes(file_path)
+    moov = next(((offset, size) for box_type, offset, size in boxes if box_type == "moov"), None)
+    moofs = [(offset, size) for box_type, offset, size in boxes if box_type == "moof"]
+    if moov is None or not moofs or moov[0] > moofs[0][0]:
+        return None
+
+    with open(file_path, "rb") as media:
+        media.seek(moov[0])
+        track = _video_track(media.read(moov[1])[8:])
+        if track is None or not track[1]:
+            return None
+        track_id, timescale = track
+
+        times, offsets = [], []
+        for offset, size in moofs:
+            media.seek(offset)
+            decode_time = _fragment_time(media.read(size)[8:], track_id)
+            if decode_time is None:
+                continue  # Audio-only fragment
+            times.append(round(decode_time / timescale, 3))
+            offsets.append(offset)
+        size = os.fstat(media.fileno()).st_size
+    return SeekIndex(size=size, times=times, offsets=offsets) if offsets else None
+
+
+# ----------------------------------------
+# Remux stage
+# ----------------------------------------
+
+class FaststartRemuxer:
+    """Pipeline stage that remuxes probed videos to fragmented MP4"""
+
+    def __init__(self, ffmpeg_path: Optional[str] = None, timeout: int = 1800):
+        self._ffmpeg_path = ffmpeg_path
+        self.timeout = timeout
+
+    @property
+    def ffmpeg_path(self) -> str:
+        if self._ffmpeg_path is None:
+            self._ffmpeg_path = FFmpegConfig.get_ffmpeg_path()
+        return self._ffmpeg_path
+
+    @staticmethod
+    def can_remux(video: Video) -> bool:
+        """Whether the streams fit a browser-playable MP4 as they are"""
+        return (
+            video.probed_at is not None
+            and video.video_codec in REMUX_VIDEO_CODECS
+            and (video.audio_codec is None or video.audio_codec in REMUX_AUDIO_CODECS)
+        )
+
+    def remux(self, db: Session, video: Video, file_path: Path) -> Optional[SeekIndex]:
+        """Replace the file with its fragmented remux and write the seek index"""
+        file_path = Path(file_path)
+        index = build_seek_index(file_path)
+        if index is None:
+            if not self.can_remux(video):
+                logger.info(f"Video {video.id} ({video.video_codec}/{video.audio_codec}) kept as uploaded")
+                return None
+            index = self._remux(file_path)
+
+        index_path = seek_index_path(file_path)
+        staged_index = index_path.with_name(index_path.name + ".tmp")
+        staged_index.write_text(index.to_json())
+        os.replace(staged_index, index_path)
+
+        size_changed = video.file_size != index.size
+        video.file_size = index.size
+        video.format = "video/mp4"
+        video.needs_faststart = False
+        lesson = video.lesson
+        if lesson is not None and lesson.video == video.video:
+            lesson.size_bytes = index.size
+        if size_changed:
+            # Grants cached the old size on this worker
+            playback_grants.revoke(video_id=video.id)
+        return index
+
+    def _remux(self, file_path: Path) -> SeekIndex:
+        staged = file_path.with_name(f".{file_path.name}.remux.mp4")
+        command = [
+            self.ffmpeg_path, "-v", "error", "-y", "-i", str(file_path),
+            "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy",
+            "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+            "-f", "mp4", str(staged)
+        ]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+            index = build_seek_index(staged)
+            if index is None:
+                raise RuntimeError("remux did not produce a fragmented MP4")
+            os.replace(staged, file_path)
+            return index
+        finally:
+            staged.unlink(missing_ok=True)
+
+
+# ----------------------------------------
+# Per-worker index cache
+# ----------------------------------------
+
+class SeekIndexCache:
+    """
+    Process-local LRU of seek indexes keyed by file path and size
+
+    A size that differs from the sidecar's (an upload not remuxed yet, or
+    replaced since) caches a miss, so the request path reads a sidecar at
+    most once per file version.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[Tuple[str, int], Optional[SeekIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path: Path, file_size: Optional[int]) -> Optional[SeekIndex]:
+        if file_size is None:
+            return None
+        key = (str(file_path), file_size)
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+
+        index = None
+        try:
+            index = SeekIndex.from_json(seek_index_path(file_path).read_text())
+        except (OSError, ValueError, KeyError):
+            pass
+        if index is not None and index.size != file_size:
+            index = None
+
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+faststart_remuxer = FaststartRemuxer(timeout=settings.MEDIA_REMUX_TIMEOUT_SECONDS)
+seek_indexes = SeekIndexCache()
@@ -0,0 +1,97 @@
+"""
+Media Pipeline
+==============
+
+Post-upload processing of lesson videos, off the request path.
+
+- The upload endpoint saves the file, commits the ``Video`` row and hands
+  the video to ``media_pipeline.submit``; the response does not wait.
+- A small thread pool (``MEDIA_PROBE_WORKERS`` per worker process) runs the
+  stages of one video in order, in its own session, committing after each
+  stage so a failing later stage keeps the earlier results.
+- A stage is a callable ``(db, video, file_path)``. The media probe
+  measures the file and records it on the row, the faststart stage
+  remuxes it to fragmented MP4 and writes its seek index, and the
+  storyboard stage publishes seek-preview sprites.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.video import Video
+from app.services.media_faststart import faststart_remuxer
+from app.services.media_probe import media_prober
+from app.services.media_storyboard import storyboard_generator
+
+
+logger = logging.getLogger(__name__)
+
+Stage = Callable[[Session, Video, Path], object]
+
+
+class MediaPipeline:
+    """Runs the post-upload stages of videos on a thread pool"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        workers: int = 2,
+        stages: Optional[List[Stage]] = None
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        if stages is None:
+            stages = [media_prober.store, faststart_remuxer.remux, storyboard_generator.generate]
+        self.stages: List[Stage] = list(stages)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, video_id: str, file_path: Path) -> Future:
+        """Queue a video's stages; the pool starts with the first submission"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media-pipeline")
+            return self._executor.submit(self._run_logged, video_id, Path(file_path))
+
+    def _run_logged(self, video_id: str, file_path: Path) -> bool:
+        try:
+            return self.process(video_id, file_path)
+        except Exception as e:
+            logger.error(f"Media processing failed for video {video_id}: {e}")
+            return False
+
+    def process(self, video_id: str, file_path: Path, db: Optional[Session] = None) -> bool:
+        """Run every stage for one video; returns False when the video no longer exists"""
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            video = db.get(Video, video_id)
+            if video is None or video.deleted_at is not None:
+                return False
+            for stage in self.stages:
+                try:
+                    stage(db, video, Path(file_path))
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+            return True
+        finally:
+            if own_session:
+                db.close()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+
+
+media_pipeline = MediaPipeline(workers=settings.MEDIA_PROBE_WORKERS)
@@ -0,0 +1,263 @@
+"""
+Media Probe
+===========
+
+Measures an uploaded video once, when it is uploaded, instead of guessing
+on every request.
+
+- ``ffprobe`` reads the container and streams: duration, video and audio
+  codecs, resolution and bitrate. A second pass over the keyframes of the
+  first ``MEDIA_PROBE_KEYFRAME_SECONDS`` gives the keyframe interval.
+- The top-level MP4 boxes are walked in Python to find where ``moov`` sits.
+  A ``moov`` after ``mdat`` means a player must fetch the end of the file
+  before it can start; such videos are flagged ``needs_faststart``.
+- ``apply_probe`` writes the results to the ``Video`` row. ``duration``
+  feeds the lesson, chapter and course duration aggregates, and
+  ``file_size``/``format`` are what the streaming endpoints send as
+  Content-Length/Content-Type without a ``stat()`` or an extension guess.
+"""
+
+import json
+import logging
+import os
+import statistics
+import struct
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.ffmpeg_config import FFmpegConfig
+from app.models.video import Video
+
+
+logger = logging.getLogger(__name__)
+
+MP4_FORMAT = "mov,mp4,m4a,3gp,3g2,mj2"
+WEBM_CODECS = {"vp8", "vp9", "av1", "opus", "vorbis"}
+
+# ffprobe format_name -> MIME type; MP4 and Matroska are refined from the brand and codecs
+FORMAT_MIME_TYPES = {
+    MP4_FORMAT: "video/mp4",
+    "matroska,webm": "video/x-matroska",
+    "avi": "video/x-msvideo",
+    "flv": "video/x-flv",
+    "mpegts": "video/mp2t",
+    "mpeg": "video/mpeg",
+    "ogg": "video/ogg",
+    "asf": "video/x-ms-wmv"
+}
+
+
+class MediaProbeError(Exception):
+    """ffprobe could not read the file"""
+
+
+@dataclass(frozen=True)
+class MediaProbe:
+    """What the probe measured for one file"""
+    duration: float  # Seconds
+    file_size: int  # Bytes
+    mime_type: str
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bitrate: Optional[int] = None  # Bits per second
+    keyframe_interval: Optional[float] = None  # Seconds
+    moov_at_end: Optional[bool] = None  # None when the file is not an MP4/MOV
+
+    @property
+    def needs_faststart(self) -> bool:
+        return self.moov_at_end is True
+
+    @classmethod
+    def from_ffprobe(
+        cls,
+        info: Dict[str, Any],
+        keyframe_times: List[float],
+        file_size: int,
+        moov_at_end: Optional[bool] = None
+    ) -> "MediaProbe":
+        """Build a probe from ``ffprobe -show_format -show_streams`` JSON and keyframe timestamps"""
+        container = info.get("format", {})
+        streams = info.get("streams", [])
+        video = next((
+            stream for stream in streams
+            if stream.get("codec_type") == "video" and not stream.get("disposition", {}).get("attached_pic")
+        ), None)
+        audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+
+        duration = _number(container.get("duration"))
+        if duration is None:
+            duration = max((_number(stream.get("duration")) or 0.0 for stream in streams), default=0.0)
+        bitrate = _number(container.get("bit_rate"))
+        if bitrate is None and duration:
+            bitrate = file_size * 8 / duration
+
+        codecs = {stream.get("codec_name") for stream in (video, audio) if stream}
+        return cls(
+            duration=duration,
+            file_size=file_size,
+            mime_type=_mime_type(container, codecs),
+            video_codec=video.get("codec_name") if video else None,
+            audio_codec=audio.get("codec_name") if audio else None,
+            width=video.get("width") if video else None,
+            height=video.get("height") if video else None,
+            bitrate=int(bitrate) if bitrate is not None else None,
+            keyframe_interval=_keyframe_interval(keyframe_times),
+            moov_at_end=moov_at_end
+        )
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _mime_type(container: Dict[str, Any], codecs: set) -> str:
+    format_name = container.get("format_name", "")
+    if format_name == MP4_FORMAT:
+        brand = container.get("tags", {}).get("major_brand", "").strip()
+        return "video/quicktime" if brand == "qt" else "video/mp4"
+    if format_name == "matroska,webm" and codecs and codecs <= WEBM_CODECS:
+        return "video/webm"
+    return FORMAT_MIME_TYPES.get(format_name, "application/octet-stream")
+
+
+def _keyframe_interval(times: List[float]) -> Optional[float]:
+    times = sorted(set(times))
+    if len(times) < 2:
+        return None
+    return round(statistics.median(later - earlier for earlier, later in zip(times, times[1:])), 3)
+
+
+def scan_mp4_boxes(file_path: Path) -> List[Tuple[str, int, int]]:
+    """
+    Top-level boxes of an MP4/MOV file as (type, offset, size).
+
+    Reads only the box headers, a few dozen bytes for any file size, and
+    stops at the first header that is not a box.
+    """
+    boxes = []
+    with open(file_path, "rb") as media:
+        file_size = os.fstat(media.fileno()).st_size
+        offset = 0
+        while offset + 8 <= file_size:
+            media.seek(offset)
+            size, box_type = struct.unpack(">I4s", media.read(8))
+            header_size = 8
+            if size == 1:  # 64-bit size follows the type
+                size = struct.unpack(">Q", media.read(8))[0]
+                header_size = 16
+            elif size == 0:  # Box runs to the end of the file
+                size = file_size - offset
+            if size < header_size or not all(32 <= byte < 127 for byte in box_type):
+                break  # Not a box: another container or a truncated file
+            boxes.append((box_type.decode("ascii"), offset, size))
+            offset += size
+    return boxes
+
+
+def moov_at_end(file_path: Path) -> Optional[bool]:
+    """Whether ``moov`` comes after ``mdat``; None when the file has no MP4 box layout"""
+    order = [box_type for box_type, _, _ in scan_mp4_boxes(file_path)]
+    if "moov" not in order or "mdat" not in order:
+        return None
+    return order.index("moov") > order.index("mdat")
+
+
+class MediaProber:
+    """Runs ffprobe on uploaded files and stores what it finds"""
+
+    def __init__(self, ffprobe_path: Optional[str] = None, timeout: int = 120, keyframe_seconds: int = 60):
+        self._ffprobe_path = ffprobe_path
+        self.timeout = timeout
+        self.keyframe_seconds = keyframe_seconds
+
+    @property
+    def ffprobe_path(self) -> str:
+        if self._ffprobe_path is None:
+            self._ffprobe_path = FFmpegConfig.get_ffprobe_path()
+        return self._ffprobe_path
+
+    # ----------------------------------------
+    # Probing
+    # ----------------------------------------
+
+    def probe(self, file_path: Path) -> MediaProbe:
+        """Measure a file; raises MediaProbeError when ffprobe cannot read it"""
+        file_path = Path(file_path)
+        info = self._ffprobe(["-show_format", "-show_streams"], file_path)
+        frames = self._ffprobe([
+            "-select_streams", "v:0", "-skip_frame", "nokey",
+            "-read_intervals", f"%+{self.keyframe_seconds}",
+            "-show_entries", "frame=pts_time,best_effort_timestamp_time"
+        ], file_path).get("frames", [])
+        keyframe_times = [
+            time for time in (
+                _number(frame.get("pts_time", frame.get("best_effort_timestamp_time"))) for frame in frames
+            )
+            if time is not None
+        ]
+        return MediaProbe.from_ffprobe(info, keyframe_times, file_path.stat().st_size, moov_at_end(file_path))
+
+    def _ffprobe(self, arguments: List[str], file_path: Path) -> Dict[str, Any]:
+        command = [self.ffprobe_path, "-v", "error", "-print_format", "json", *arguments, str(file_path)]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired as e:
+            raise MediaProbeError(f"ffprobe timed out after {self.timeout}s") from e
+        if result.returncode != 0:
+            raise MediaProbeError(result.stderr.strip() or f"ffprobe exited with {result.returncode}")
+        return json.loads(result.stdout or "{}")
+
+    # ----------------------------------------
+    # Persistence
+    # ----------------------------------------
+
+    def store(self, db: Session, video: Video, file_path: Path) -> MediaProbe:
+        """Pipeline stage: probe the video's file and record the results on its row"""
+        probe = self.probe(file_path)
+        apply_probe(video, probe)
+        logger.info(
+            f"Probed video {video.id}: {probe.duration:.1f}s {probe.video_codec}/{probe.audio_codec} "
+            f"{probe.width}x{probe.height}, faststart needed: {probe.needs_faststart}"
+        )
+        return probe
+
+
+def apply_probe(video: Video, probe: MediaProbe) -> None:
+    """
+    Record a probe on a video row, and on its lesson when it is the lesson's main video.
+
+    Flushing the change updates the lesson, chapter and course duration aggregates.
+    """
+    video.duration = int(round(probe.duration))
+    video.file_size = probe.file_size
+    video.format = probe.mime_type
+    video.video_codec = probe.video_codec
+    video.audio_codec = probe.audio_codec
+    video.width = probe.width
+    video.height = probe.height
+    video.bitrate = probe.bitrate
+    video.keyframe_interval = probe.keyframe_interval
+    video.needs_faststart = probe.needs_faststart
+    video.probed_at = datetime.utcnow()
+
+    lesson = video.lesson
+    if lesson is not None and lesson.video == video.video:
+        lesson.video_duration = video.duration
+        lesson.size_bytes = probe.file_size
+
+
+media_prober = MediaProber(
+    timeout=settings.MEDIA_PROBE_TIMEOUT_SECONDS,
+    keyframe_seconds=settings.MEDIA_PROBE_KEYFRAME_SECONDS
+)
@@ -0,0 +1,272 @@
+"""
+Seek-Preview Storyboards
+========================
+
+Third post-upload stage: thumbnail sprites and a WebVTT thumbnail track
+per video, so scrubbing fetches a few small images instead of issuing
+range requests against ``/videos/watch``.
+
+- ffmpeg samples one frame every ``STORYBOARD_INTERVAL_SECONDS`` at
+  ``STORYBOARD_THUMB_WIDTH`` pixels wide. When the probed keyframe
+  interval is well under the sampling interval only keyframes are
+  decoded, which is much faster and at most one keyframe interval off.
+- The frames are packed into ``STORYBOARD_GRID`` x ``STORYBOARD_GRID``
+  sprite sheets (WebP or JPEG) and ``storyboard.vtt`` maps each interval
+  to its tile with ``#xywh=``; an hour at 10 seconds is four sheets.
+- Each generation gets a new random directory, so its URLs never change
+  content and are served with a one-year immutable Cache-Control. The
+  random name is the only protection of the thumbnails.
+- Generation time and sprite bytes are kept on the video row;
+  ``statistics`` reports them per video hour.
+"""
+
+import logging
+import math
+import os
+import secrets
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.ffmpeg_config import FFmpegConfig
+from app.models.video import Video
+
+
+logger = logging.getLogger(__name__)
+
+VTT_NAME = "storyboard.vtt"
+IMAGE_FORMATS = {"webp": ("WEBP", {"quality": 60, "method": 4}), "jpg": ("JPEG", {"quality": 70, "optimize": True})}
+
+
+@dataclass(frozen=True)
+class StoryboardLayout:
+    """Where each sampled frame goes in the sprite sheets"""
+    interval: int  # Seconds between frames
+    frames: int
+    thumb_width: int
+    thumb_height: int
+    columns: int
+    rows: int
+
+    @property
+    def per_sheet(self) -> int:
+        return self.columns * self.rows
+
+    @property
+    def sheets(self) -> int:
+        return math.ceil(self.frames / self.per_sheet)
+
+    def tile(self, frame: int) -> Tuple[int, int, int]:
+        """(sheet, x, y) of a frame"""
+        sheet, position = divmod(frame, self.per_sheet)
+        row, column = divmod(position, self.columns)
+        return sheet, column * self.thumb_width, row * self.thumb_height
+
+
+def plan_layout(
+    duration: float,
+    width: Optional[int],
+    height: Optional[int],
+    interval: int = 10,
+    thumb_width: int = 160,
+    grid: int = 10
+) -> StoryboardLayout:
+    """Layout for a video of ``duration`` seconds, thumbnails keeping the video's aspect ratio"""
+    thumb_height = 2 * round(thumb_width * height / width / 2) if width and height else thumb_width * 9 // 16
+    return StoryboardLayout(
+        interval=interval,
+        frames=max(math.ceil(duration / interval), 1),
+        thumb_width=thumb_width,
+        thumb_height=max(thumb_height, 2),
+        columns=grid,
+        rows=grid
+    )
+
+
+def _timestamp(seconds: float) -> str:
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    return f"{hours:02d}:{minutes:02d}:{milliseconds // 1000:02d}.{milliseconds % 1000:03d}"
+
+
+def build_vtt(layout: StoryboardLayout, duration: float, sprite_names: List[str]) -> str:
+    """WebVTT thumbnail track; sprite names are relative to the track's URL"""
+    cues = ["WEBVTT", ""]
+    for frame in range(layout.frames):
+        start = frame * layout.interval
+        if start >= duration and frame:
+            break
+        sheet, x, y = layout.tile(frame)
+        cues += [
+            f"{_timestamp(start)} --> {_timestamp(min(start + layout.interval, max(duration, start + 1)))}",
+            f"{sprite_names[sheet]}#xywh={x},{y},{layout.thumb_width},{layout.thumb_height}",
+            ""
+        ]
+    return "\n".join(cues)
+
+
+def pack_sprites(frame_paths: List[Path], layout: StoryboardLayout, directory: Path, image_format: str = "webp") -> List[Path]:
+    """Paste frames into sprite sheets; the last sheet is only as tall as its used rows"""
+    pil_format, options = IMAGE_FORMATS[image_format]
+    sprites = []
+    for sheet in range(layout.sheets):
+        frames = frame_paths[sheet * layout.per_sheet:(sheet + 1) * layout.per_sheet]
+        rows = math.ceil(len(frames) / layout.columns)
+        canvas = Image.new("RGB", (layout.columns * layout.thumb_width, rows * layout.thumb_height))
+        for offset, frame_path in enumerate(frames):
+            _, x, y = layout.tile(sheet * layout.per_sheet + offset)
+            with Image.open(frame_path) as frame:
+                if frame.size != (layout.thumb_width, layout.thumb_height):
+                    frame = frame.resize((layout.thumb_width, layout.thumb_height))
+                canvas.paste(frame.convert("RGB"), (x, y))
+        sprite_path = Path(directory) / f"sprite-{sheet:03d}.{image_format}"
+        canvas.save(sprite_path, pil_format, **options)
+        sprites.append(sprite_path)
+    return sprites
+
+
+class StoryboardGenerator:
+    """Pipeline stage that writes a video's sprites and thumbnail track"""
+
+    def __init__(
+        self,
+        storage_path: str = "static/storyboards",
+        url_prefix: str = "/static/storyboards",
+        interval: int = 10,
+        thumb_width: int = 160,
+        grid: int = 10,
+        image_format: str = "webp",
+        ffmpeg_path: Optional[str] = None,
+        timeout: int = 3600
+    ):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported storyboard format: {image_format}")
+        self.storage_path = Path(storage_path)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.interval = interval
+        self.thumb_width = thumb_width
+        self.grid = grid
+        self.image_format = image_format
+        self._ffmpeg_path = ffmpeg_path
+        self.timeout = timeout
+
+    @property
+    def ffmpeg_path(self) -> str:
+        if self._ffmpeg_path is None:
+            self._ffmpeg_path = FFmpegConfig.get_ffmpeg_path()
+        return self._ffmpeg_path
+
+    # ----------------------------------------
+    # Generation
+    # ----------------------------------------
+
+    def generate(self, db: Session, video: Video, file_path: Path) -> Optional[str]:
+        """Sample, pack and publish the storyboard; returns the track URL"""
+        if video.probed_at is None or not video.duration or not video.video_codec:
+            logger.info(f"Video {video.id} has no probed video stream, no storyboard")
+            return None
+        started = time.perf_counter()
+        layout = plan_layout(video.duration, video.width, video.height, self.interval, self.thumb_width, self.grid)
+        with tempfile.TemporaryDirectory() as frames_dir:
+            frames = self._extract_frames(Path(file_path), layout, Path(frames_dir), video.keyframe_interval)
+            if not frames:
+                raise RuntimeError("ffmpeg produced no frames")
+            url = self.publish(video, layout, frames)
+        video.storyboard_seconds = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"Storyboard for video {video.id}: {len(frames)} frames, {video.storyboard_bytes} bytes "
+            f"in {video.storyboard_seconds:.1f}s"
+        )
+        return url
+
+    def _extract_frames(
+        self, file_path: Path, layout: StoryboardLayout, directory: Path, keyframe_interval: Optional[float]
+    ) -> List[Path]:
+        command = [self.ffmpeg_path, "-v", "error"]
+        if keyframe_interval and keyframe_interval <= layout.interval / 2:
+            command += ["-skip_frame", "nokey"]
+        command += [
+            "-i", str(file_path), "-an", "-sn",
+            "-vf", f"fps=1/{layout.interval},scale={layout.thumb_width}:{layout.thumb_height}",
+            "-q:v", "3", str(directory / "frame-%05d.jpg")
+        ]
+        result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+        return sorted(directory.glob("frame-*.jpg"))[:layout.frames]
+
+    def publish(self, video: Video, layout: StoryboardLayout, frames: List[Path]) -> str:
+        """Pack sampled frames into a new storyboard directory and point the video at it"""
+        layout = StoryboardLayout(
+            interval=layout.interval, frames=len(frames), thumb_width=layout.thumb_width,
+            thumb_height=layout.thumb_height, columns=layout.columns, rows=layout.rows
+        )
+        token = secrets.token_hex(16)
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+        staged = self.storage_path / f".{token}"
+        staged.mkdir()
+        try:
+            sprites = pack_sprites(frames, layout, staged, self.image_format)
+            (staged / VTT_NAME).write_text(build_vtt(layout, video.duration, [sprite.name for sprite in sprites]))
+            sprite_bytes = sum(sprite.stat().st_size for sprite in sprites)
+            os.replace(staged, self.storage_path / token)
+        except Exception:
+            shutil.rmtree(staged, ignore_errors=True)
+            raise
+
+        previous = self._directory(video.storyboard_url)
+        video.storyboard_url = f"{self.url_prefix}/{token}/{VTT_NAME}"
+        video.storyboard_bytes = sprite_bytes
+        if previous is not None:
+            shutil.rmtree(previous, ignore_errors=True)
+        return video.storyboard_url
+
+    def _directory(self, storyboard_url: Optional[str]) -> Optional[Path]:
+        if not storyboard_url or not storyboard_url.startswith(f"{self.url_prefix}/"):
+            return None
+        token = storyboard_url[len(self.url_prefix) + 1:].split("/", 1)[0]
+        return self.storage_path / token if token else None
+
+    # ----------------------------------------
+    # Reporting
+    # ----------------------------------------
+
+    @staticmethod
+    def statistics(db: Session) -> Dict[str, float]:
+        """Generation time and sprite bytes per video hour across generated storyboards"""
+        videos, seconds_of_video, generation_seconds, sprite_bytes = db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(Video.duration), 0),
+                func.coalesce(func.sum(Video.storyboard_seconds), 0),
+                func.coalesce(func.sum(Video.storyboard_bytes), 0)
+            ).where(Video.storyboard_url.isnot(None))
+        ).one()
+        video_hours = seconds_of_video / 3600
+        return {
+            "videos": int(videos),
+            "video_hours": round(video_hours, 2),
+            "sprite_bytes": int(sprite_bytes),
+            "seconds_per_video_hour": round(generation_seconds / video_hours, 2) if video_hours else 0.0,
+            "bytes_per_video_hour": int(sprite_bytes / video_hours) if video_hours else 0
+        }
+
+
+storyboard_generator = StoryboardGenerator(
+    storage_path=settings.STORYBOARD_STORAGE_PATH,
+    url_prefix=settings.STORYBOARD_URL_PREFIX,
+    interval=settings.STORYBOARD_INTERVAL_SECONDS,
+    thumb_width=settings.STORYBOARD_THUMB_WIDTH,
+    grid=settings.STORYBOARD_GRID,
+    image_format=settings.STORYBOARD_FORMAT
+)
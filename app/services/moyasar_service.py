@@ -7,8 +7,6 @@ from sqlalchemy.orm import Session
 from decimal import Decimal
 import requests
 import json
-import hmac
-import hashlib
 from datetime import datetime
 import uuid
 import base64
@@ -189,159 +187,30 @@ class MoyasarService:
             }
     
     def process_webhook(self, payload: bytes, signature: str) -> Dict[str, Any]:
+        """
+        Verify a webhook and queue it in the inbox; the payment updates run
+        in the webhook workers (see app.services.payment_webhooks).
+        """
+        from app.services.payment_webhooks import WebhookRejected, ingest_webhook
+
         try:
-            if not self.webhook_secret:
-                return {
-                    "success": False,
-                    "error": "Webhook secret not configured",
-                    "error_code": "configuration_error"
-                }
-            
-            expected_signature = hmac.new(
-                self.webhook_secret.encode(),
-                payload,
-                hashlib.sha256
-            ).hexdigest()
-            
-            if not hmac.compare_digest(signature, expected_signature):
-                return {
-                    "success": False,
-                    "error": "Invalid webhook signature",
-                    "error_code": "invalid_signature"
-                }
-            
-            webhook_data = json.loads(payload.decode())
-            
-            log_entry = PaymentGatewayLog(
-                gateway=PaymentGateway.MOYASAR,
-                operation="process_webhook",
-                request_data=payload.decode(),
-                response_data=json.dumps(webhook_data),
-                http_status=200,
-                success=True
-            )
-            self.db.add(log_entry)
-            
-            event_type = webhook_data.get("type")
-            
-            if event_type == "invoice_paid":
-                result = self._handle_invoice_paid(webhook_data)
-            elif event_type == "invoice_failed":
-                result = self._handle_invoice_failed(webhook_data)
-            else:
-                result = {
-                    "success": True,
-                    "message": f"Webhook event '{event_type}' received but not processed",
-                    "event_type": event_type
-                }
-            
-            self.db.commit()
-            return result
-            
-        except json.JSONDecodeError:
-            return {
-                "success": False,
-                "error": "Invalid JSON payload",
-                "error_code": "invalid_json"
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"خطأ في معالجة الـ webhook: {str(e)}",
-                "error_code": "processing_error"
-            }
-    
-    def _handle_invoice_paid(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            invoice_data = webhook_data.get("data", {})
-            invoice_id = invoice_data.get("id")
-            
-            if not invoice_id:
-                return {
-                    "success": False,
-                    "error": "Invoice ID missing from webhook data",
-                    "error_code": "missing_invoice_id"
-                }
-            
-            payment = self.db.query(Payment).filter(
-                Payment.transaction_id == invoice_id
-            ).first()
-            
-            if not payment:
-                return {
-                    "success": False,
-                    "error": f"Payment not found for invoice {invoice_id}",
-                    "error_code": "payment_not_found"
-                }
-            
-            payment.payment_status = PaymentStatus.PAID
-            payment.confirmed_at = datetime.utcnow()
-            payment.gateway_response = json.dumps(webhook_data)
-            
-            if payment.invoice:
-                payment.invoice.status = PaymentStatus.PAID
-                payment.invoice.paid_at = datetime.utcnow()
-            
-            self.db.commit()
-            
+            result = ingest_webhook(self.db, payload, signature)
             return {
                 "success": True,
-                "message": "Payment confirmed successfully",
-                "payment_id": payment.id,
-                "invoice_id": payment.invoice_id
+                "message": "Webhook event already received" if result["duplicate"] else "Webhook event queued",
+                **result
             }
             
-        except Exception as e:
-            self.db.rollback()
+        except WebhookRejected as e:
             return {
                 "success": False,
-                "error": f"خطأ في معالجة دفع ناجح: {str(e)}",
-                "error_code": "processing_error"
+                "error": str(e),
+                "error_code": e.error_code
             }
-    
-    def _handle_invoice_failed(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            invoice_data = webhook_data.get("data", {})
-            invoice_id = invoice_data.get("id")
-            
-            if not invoice_id:
-                return {
-                    "success": False,
-                    "error": "Invoice ID missing from webhook data",
-                    "error_code": "missing_invoice_id"
-                }
-            
-            payment = self.db.query(Payment).filter(
-                Payment.transaction_id == invoice_id
-            ).first()
-            
-            if not payment:
-                return {
-                    "success": False,
-                    "error": f"Payment not found for invoice {invoice_id}",
-                    "error_code": "payment_not_found"
-                }
-            
-            payment.payment_status = PaymentStatus.FAILED
-            payment.gateway_response = json.dumps(webhook_data)
-            
-            if payment.invoice:
-                payment.invoice.status = PaymentStatus.FAILED
-            
-            self.db.commit()
-            
-            return {
-                "success": True,
-                "message": "Payment failure processed successfully",
-                "payment_id": payment.id,
-                "invoice_id": payment.invoice_id
-            }
-            
         except Exception as e:
-            self.db.rollback()
             return {
                 "success": False,
-                "error": f"خطأ في معالجة فشل الدفع: {str(e)}",
+                "error": f"خطأ في معالجة الـ webhook: {str(e)}",
                 "error_code": "processing_error"
             }
     
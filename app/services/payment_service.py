@@ -3,21 +3,25 @@ Payment service for managing invoices, payments, and enrollments.
 Student registration required for all payment operations.
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+from sqlalchemy import and_, or_, func, insert, select, update
 from sqlalchemy.orm import Session
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime, timedelta
 import uuid
 import json
 
+from app.db.upsert import upsert_increment
 from app.models.payment import Invoice, InvoiceProduct, Payment, PaymentStatus, PaymentGateway, CouponUsage
-from app.models.marketing import Coupon
+from app.models.marketing import Coupon, CouponType
 from app.models.cart import Cart
+from app.models.product import Product
 from app.models.student import Student
 from app.models.course import Course
 from app.models.student_course import StudentCourse
-from app.services.cart_service import CartService
+from app.services.course_catalog import mark_courses_changed
 from app.services.moyasar_service import MoyasarService
+from app.services.wallet_ledger import wallet_ledger
 from app.core.config import settings
 
 
@@ -25,7 +29,6 @@ class PaymentService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.cart_service = CartService(db)
         self.moyasar_service = MoyasarService(db)
     
     def create_invoice_from_cart(
@@ -37,6 +40,10 @@ class PaymentService:
     ) -> Dict[str, Any]:
         """
         Create invoice from student's cart - Student registration required
+        
+        Cart lines are resolved in one query and written with one bulk
+        insert. The coupon is redeemed with a conditional UPDATE in the
+        same transaction, so concurrent checkouts never exceed its limit.
         """
         try:
             # Verify student exists
@@ -44,16 +51,14 @@ class PaymentService:
             if not student:
                 raise ValueError("الطالب غير موجود")
             
-            # Get cart summary with student validation
-            cart_summary = self.cart_service.get_cart_summary(
-                student_id=student_id,
-                cookie_id=cookie_id,
-                coupon_code=coupon_code
-            )
-            
-            if cart_summary["items_count"] == 0:
+            lines = self._resolve_cart_lines(student_id, cookie_id)
+            if not lines:
                 raise ValueError("لا يمكن إتمام عملية الدفع، سلة المشتريات فارغة")
             
+            subtotal = sum((line["unit_price"] for line in lines), Decimal("0.00"))
+            coupon, discount_amount = self._price_coupon(coupon_code, lines) if coupon_code else (None, Decimal("0.00"))
+            tax_amount, total_amount = self._apply_tax(subtotal - discount_amount)
+            
             # Generate unique invoice number
             invoice_number = f"INV-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
             
@@ -66,13 +71,13 @@ class PaymentService:
             invoice = Invoice(
                 invoice_number=invoice_number,
                 student_id=student_id,
-                academy_id=None,  # Will be set from first course
-                subtotal=Decimal(str(cart_summary["subtotal"])),
-                tax_amount=Decimal(str(cart_summary["tax_amount"])),
-                discount_amount=Decimal(str(cart_summary["discount_amount"])),
-                total_amount=Decimal(str(cart_summary["total"])),
-                currency=cart_summary["currency"],
-                coupon_code=coupon_code,
+                academy_id=lines[0]["academy_id"],
+                subtotal=subtotal,
+                tax_amount=tax_amount,
+                discount_amount=discount_amount,
+                total_amount=total_amount,
+                currency=lines[0]["currency"],
+                coupon_code=coupon.code if coupon else None,
                 billing_name=billing_name,
                 billing_email=billing_email,
                 billing_phone=billing_phone,
@@ -80,7 +85,7 @@ class PaymentService:
                 status=PaymentStatus.PENDING,
                 extra_metadata=json.dumps({
                     "cookie_id": cookie_id,
-                    "cart_items_count": cart_summary["items_count"],
+                    "cart_items_count": len(lines),
                     "student_verification": "verified"
                 })
             )
@@ -88,51 +93,46 @@ class PaymentService:
             self.db.add(invoice)
             self.db.flush()
             
-            # Add invoice products
-            for item in cart_summary["items"]:
-                if item["item_type"] == "course":
-                    course = self.db.query(Course).filter(Course.id == item["item_id"]).first()
-                    if course:
-                        # Set academy_id from first course
-                        if not invoice.academy_id:
-                            invoice.academy_id = course.academy_id
-                        
-                        invoice_product = InvoiceProduct(
-                            invoice_id=invoice.id,
-                            course_id=item["item_id"],
-                            product_name=item["title"],
-                            product_description=getattr(course, 'description', ''),
-                            unit_price=Decimal(str(item["price"])),
-                            quantity=item["quantity"],
-                            total_price=Decimal(str(item["total_price"]))
-                        )
-                        self.db.add(invoice_product)
-            
-            # Handle coupon usage
-            if coupon_code and cart_summary["coupon_applied"]:
-                coupon = self.db.query(Coupon).filter(Coupon.code == coupon_code.upper()).first()
-                if coupon:
-                    coupon_usage = CouponUsage(
-                        coupon_id=coupon.id,
-                        student_id=student_id,
-                        invoice_id=invoice.id,
-                        discount_amount=Decimal(str(cart_summary["discount_amount"]))
-                    )
-                    self.db.add(coupon_usage)
-                    
-                    # Update coupon usage count
-                    coupon.used_count += 1
+            # Add invoice products in one statement
+            self.db.execute(insert(InvoiceProduct), [
+                {
+                    "invoice_id": invoice.id,
+                    "course_id": line["course_id"],
+                    "product_name": line["title"],
+                    "product_description": line["description"],
+                    "unit_price": line["unit_price"],
+                    "quantity": 1,
+                    "total_price": line["unit_price"],
+                    "discount_amount": line["original_price"] - line["unit_price"],
+                    "discount_percentage": self._percentage(line["original_price"] - line["unit_price"], line["original_price"])
+                }
+                for line in lines
+            ])
+            
+            # Redeem the coupon last so its row lock is held as briefly as possible
+            if coupon:
+                self._redeem_coupon(coupon, student_id, invoice.id, discount_amount)
             
             self.db.commit()
-            self.db.refresh(invoice)
             
             return {
                 "invoice_id": invoice.id,
                 "invoice_number": invoice.invoice_number,
-                "total_amount": float(invoice.total_amount),
+                "total_amount": float(total_amount),
                 "currency": invoice.currency,
-                "status": invoice.status.value,
-                "items": cart_summary["items"],
+                "status": PaymentStatus.PENDING.value,
+                "items": [
+                    {
+                        "cart_id": line["cart_id"],
+                        "item_type": "course",
+                        "item_id": line["course_id"],
+                        "title": line["title"],
+                        "price": float(line["unit_price"]),
+                        "original_price": float(line["original_price"]),
+                        "quantity": 1
+                    }
+                    for line in lines
+                ],
                 "student_verified": True,
                 "created_at": invoice.created_at.isoformat()
             }
@@ -141,6 +141,119 @@ class PaymentService:
             self.db.rollback()
             raise e
     
+    def _resolve_cart_lines(self, student_id: int, cookie_id: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        Priced course lines of the student's cart (and this browser's guest
+        cart) in one query; a product appears once whichever cart holds it.
+        """
+        owner = Cart.student_id == student_id
+        if cookie_id:
+            owner = or_(owner, and_(Cart.cookie_id == cookie_id, Cart.student_id.is_(None)))
+        
+        rows = self.db.execute(
+            select(Cart.id, Product, Course.id, Course.academy_id, Course.short_content)
+            .join(Product, Product.id == Cart.product_id)
+            .join(Course, Course.product_id == Product.id)
+            .where(owner, Cart.deleted_at.is_(None))
+            .order_by(Cart.created_at, Cart.id, Course.created_at)
+        ).all()
+        
+        now = datetime.utcnow()
+        lines = []
+        seen_products = set()
+        for cart_id, product, course_id, academy_id, short_content in rows:
+            if product.id in seen_products:
+                continue
+            seen_products.add(product.id)
+            
+            original_price = self._money(product.price or 0)
+            unit_price = original_price
+            if product.discount_price and product.discount_ends_at and now < product.discount_ends_at:
+                unit_price = self._money(product.discount_price)
+            
+            lines.append({
+                "cart_id": cart_id,
+                "course_id": course_id,
+                "academy_id": academy_id,
+                "title": product.title,
+                "description": product.description or short_content,
+                "currency": product.currency or "SAR",
+                "original_price": original_price,
+                "unit_price": unit_price
+            })
+        return lines
+    
+    def _price_coupon(self, coupon_code: str, lines: List[Dict[str, Any]]) -> Tuple[Coupon, Decimal]:
+        """Look up a coupon and its discount on the lines of its academy"""
+        coupon = self.db.query(Coupon).filter(Coupon.code == coupon_code.strip().upper()).first()
+        if not coupon or not coupon.is_active:
+            raise ValueError("كود الخصم غير صالح")
+        
+        eligible = sum(
+            (line["unit_price"] for line in lines if line["academy_id"] == coupon.academy_id), Decimal("0.00")
+        )
+        if not eligible:
+            raise ValueError("كود الخصم لا ينطبق على منتجات السلة")
+        if coupon.minimum_amount and eligible < self._money(coupon.minimum_amount):
+            raise ValueError("قيمة المشتريات أقل من الحد الأدنى لاستخدام كود الخصم")
+        
+        if coupon.type == CouponType.FIXED:
+            discount = self._money(coupon.value)
+        else:
+            discount = self._money(eligible * Decimal(str(coupon.value)) / 100)
+            if coupon.maximum_discount:
+                discount = min(discount, self._money(coupon.maximum_discount))
+        return coupon, min(discount, eligible)
+    
+    def _redeem_coupon(self, coupon: Coupon, student_id: int, invoice_id: int, discount_amount: Decimal) -> None:
+        """
+        Count one use of the coupon with a conditional UPDATE; the limit,
+        active flag and validity window are checked by the database.
+        """
+        now = datetime.utcnow()
+        used_count = func.coalesce(Coupon.used_count, 0)
+        redeemed = self.db.execute(
+            update(Coupon)
+            .where(
+                Coupon.id == coupon.id,
+                Coupon.is_active == True,
+                or_(Coupon.usage_limit.is_(None), used_count < Coupon.usage_limit),
+                or_(Coupon.start_date.is_(None), Coupon.start_date <= now),
+                or_(Coupon.end_date.is_(None), Coupon.end_date >= now)
+            )
+            .values(used_count=used_count + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not redeemed:
+            raise ValueError("كود الخصم منتهي الصلاحية أو تجاوز الحد الأقصى للاستخدام")
+        
+        self.db.expire(coupon, ["used_count"])
+        self.db.add(CouponUsage(
+            coupon_id=coupon.id,
+            student_id=student_id,
+            invoice_id=invoice_id,
+            discount_amount=discount_amount
+        ))
+    
+    @staticmethod
+    def _apply_tax(amount: Decimal) -> Tuple[Decimal, Decimal]:
+        """Tax and total for a discounted subtotal"""
+        if not settings.TAX_ENABLED:
+            return Decimal("0.00"), amount
+        rate = Decimal(str(settings.TAX_RATE))
+        if settings.TAX_INCLUSIVE:
+            return PaymentService._money(amount - amount / (1 + rate)), amount
+        tax_amount = PaymentService._money(amount * rate)
+        return tax_amount, amount + tax_amount
+    
+    @staticmethod
+    def _money(value) -> Decimal:
+        return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    
+    @staticmethod
+    def _percentage(part: Decimal, whole: Decimal) -> Decimal:
+        return PaymentService._money(part * 100 / whole) if whole else Decimal("0.00")
+    
     def process_payment(
         self,
         invoice_id: int,
@@ -276,11 +389,14 @@ class PaymentService:
                         invoice.status = PaymentStatus.PAID
                         invoice.paid_at = datetime.utcnow()
                         
+                        # Credit the academy wallet
+                        wallet_ledger.record_payment(self.db, payment)
+                        
                         # Process course enrollments
-                        enrollment_result = self._process_course_enrollments(payment.invoice_id)
+                        enrollment_result = self._process_course_enrollments(payment.invoice_id, commit=False)
                         
                         # Clear student's cart
-                        self._clear_student_cart(payment.student_id, invoice.extra_metadata)
+                        self._clear_student_cart(payment.student_id, invoice.extra_metadata, commit=False)
                         
                         self.db.commit()
                         
@@ -326,55 +442,61 @@ class PaymentService:
             self.db.rollback()
             raise e
     
-    def _process_course_enrollments(self, invoice_id: int) -> Dict[str, Any]:
+    def _process_course_enrollments(self, invoice_id: int, commit: bool = True) -> Dict[str, Any]:
         """
         Process course enrollments for paid invoice
+        
+        All courses of the invoice are enrolled with one multi-row upsert
+        into student_courses; existing enrollments are reactivated.
+        With ``commit=False`` the caller commits, together with its own changes.
         """
         try:
             invoice = self.db.query(Invoice).filter(Invoice.id == invoice_id).first()
             if not invoice:
                 raise ValueError("الفاتورة غير موجودة")
             
-            enrolled_courses = []
+            paid = dict(self.db.execute(
+                select(InvoiceProduct.course_id, InvoiceProduct.total_price)
+                .where(InvoiceProduct.invoice_id == invoice_id)
+            ).all())
+            if not paid:
+                return {"enrolled_courses": [], "total_courses": 0}
             
-            for invoice_product in invoice.invoice_products:
-                # Check for existing enrollment
-                existing_enrollment = self.db.query(StudentCourse).filter(
-                    StudentCourse.student_id == invoice.student_id,
-                    StudentCourse.course_id == invoice_product.course_id
-                ).first()
-                
-                if existing_enrollment:
-                    # Update existing enrollment
-                    existing_enrollment.status = "active"
-                    existing_enrollment.paid_amount = invoice_product.total_price
-                    existing_enrollment.last_accessed_at = datetime.utcnow()
-                    
-                    enrolled_courses.append({
-                        "course_id": invoice_product.course_id,
-                        "action": "updated",
-                        "enrollment_id": existing_enrollment.id
-                    })
-                else:
-                    # Create new enrollment
-                    enrollment = StudentCourse(
-                        student_id=invoice.student_id,
-                        course_id=invoice_product.course_id,
-                        status="active",
-                        paid_amount=invoice_product.total_price,
-                        enrolled_at=datetime.utcnow(),
-                        last_accessed_at=datetime.utcnow()
-                    )
-                    self.db.add(enrollment)
-                    self.db.flush()
-                    
-                    enrolled_courses.append({
-                        "course_id": invoice_product.course_id,
-                        "action": "enrolled",
-                        "enrollment_id": enrollment.id
-                    })
+            enrollment_filter = and_(
+                StudentCourse.student_id == invoice.student_id,
+                StudentCourse.course_id.in_(list(paid))
+            )
+            existing = set(self.db.execute(
+                select(StudentCourse.course_id).where(enrollment_filter)
+            ).scalars())
+            
+            now = datetime.utcnow()
+            self._upsert_enrollments([
+                {
+                    "student_id": invoice.student_id,
+                    "course_id": course_id,
+                    "status": "active",
+                    "paid_amount": total_price,
+                    "enrolled_at": now,
+                    "last_accessed_at": now
+                }
+                for course_id, total_price in paid.items()
+            ])
+            mark_courses_changed(self.db, paid)
+            
+            enrolled_courses = [
+                {
+                    "course_id": course_id,
+                    "action": "updated" if course_id in existing else "enrolled",
+                    "enrollment_id": enrollment_id
+                }
+                for enrollment_id, course_id in self.db.execute(
+                    select(StudentCourse.id, StudentCourse.course_id).where(enrollment_filter)
+                )
+            ]
             
-            self.db.commit()
+            if commit:
+                self.db.commit()
             
             return {
                 "enrolled_courses": enrolled_courses,
@@ -385,9 +507,23 @@ class PaymentService:
             self.db.rollback()
             raise e
     
-    def _clear_student_cart(self, student_id: int, extra_metadata: Optional[str]) -> None:
+    def _upsert_enrollments(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert enrollments, reactivating ones that already exist"""
+        upsert_increment(
+            self.db, StudentCourse, rows, keys=["student_id", "course_id"],
+            updates=["status", "paid_amount", "last_accessed_at"]
+        )
+        
+        # Loaded enrollments no longer match their rows
+        for obj in list(self.db.identity_map.values()):
+            if isinstance(obj, StudentCourse):
+                self.db.expire(obj)
+    
+    def _clear_student_cart(self, student_id: int, extra_metadata: Optional[str], commit: bool = True) -> None:
         """
         Clear student's cart after successful payment
+        
+        With ``commit=False`` the caller commits, together with its own changes.
         """
         try:
             # Extract cookie_id if available
@@ -417,7 +553,8 @@ class PaymentService:
             for item in cart_items:
                 item.soft_delete()
             
-            self.db.commit()
+            if commit:
+                self.db.commit()
             
         except Exception as e:
             self.db.rollback()
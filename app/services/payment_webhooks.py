@@ -0,0 +1,399 @@
+"""
+Payment Webhook Inbox
+=====================
+
+Acknowledges payment gateway webhooks as soon as they are stored and
+processes them in the background.
+
+- Ingest verifies the HMAC signature and inserts the raw body into
+  ``payment_webhook_events`` under a unique (gateway, event id). A repeated
+  delivery hits the unique key and is acknowledged without a new row.
+- Worker threads claim pending events with a conditional UPDATE, oldest
+  first. An event waits while an earlier event of the same invoice is
+  still pending or processing, so each invoice sees its events in order.
+- A failed event is retried with exponential backoff and moved to the
+  dead-letter state after ``PAYMENT_WEBHOOK_MAX_ATTEMPTS``. Events left in
+  processing by a stopped worker are reclaimed after a lease.
+- Handlers are idempotent, so a reclaimed event cannot apply its effects
+  twice, and commit nothing: the worker commits a handler's effects in one
+  transaction with the event's new status.
+
+Run the workers outside the API processes with::
+
+    python -m app.services.payment_webhooks
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, exists, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.payment import (
+    Payment, PaymentGateway, PaymentStatus, PaymentWebhookEvent, WebhookEventStatus
+)
+from app.services.wallet_ledger import wallet_ledger
+
+
+logger = logging.getLogger(__name__)
+
+MOYASAR = PaymentGateway.MOYASAR.value
+
+_UNFINISHED = (WebhookEventStatus.PENDING, WebhookEventStatus.PROCESSING)
+
+
+class WebhookRejected(Exception):
+    """A delivery that must not be stored (bad signature or body)"""
+
+    def __init__(self, message: str, error_code: str):
+        super().__init__(message)
+        self.error_code = error_code
+
+
+class PermanentWebhookError(Exception):
+    """A failure that retrying cannot fix; the event is dead-lettered at once"""
+
+
+# ----------------------------------------
+# Ingest
+# ----------------------------------------
+
+def verify_signature(payload: bytes, signature: str, secret: Optional[str] = None) -> bool:
+    """HMAC-SHA256 of the raw body, hex encoded"""
+    secret = secret if secret is not None else settings.MOYASAR_WEBHOOK_SECRET
+    if not secret:
+        raise WebhookRejected("Webhook secret not configured", "configuration_error")
+    expected = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature or "", expected)
+
+
+def ingest_webhook(db: Session, payload: bytes, signature: str, gateway: str = MOYASAR) -> Dict[str, Any]:
+    """
+    Store a verified delivery and return at once.
+
+    Returns the event id and whether it had already been received.
+    """
+    if not verify_signature(payload, signature):
+        raise WebhookRejected("Invalid webhook signature", "invalid_signature")
+    try:
+        event = json.loads(payload.decode())
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise WebhookRejected("Invalid JSON payload", "invalid_json")
+    if not isinstance(event, dict):
+        raise WebhookRejected("Invalid JSON payload", "invalid_json")
+
+    data = event.get("data") if isinstance(event.get("data"), dict) else {}
+    # Gateways that omit an event id still resend identical bodies
+    event_id = str(event.get("id") or hashlib.sha256(payload).hexdigest())
+    invoice_reference = data.get("invoice_id") or data.get("id")
+
+    duplicate = db.execute(
+        select(PaymentWebhookEvent.id).where(
+            PaymentWebhookEvent.gateway == gateway, PaymentWebhookEvent.event_id == event_id
+        )
+    ).first() is not None
+    if not duplicate:
+        try:
+            db.execute(insert(PaymentWebhookEvent).values(
+                gateway=gateway,
+                event_id=event_id,
+                event_type=event.get("type"),
+                invoice_reference=str(invoice_reference) if invoice_reference else None,
+                payload=payload.decode(),
+                status=WebhookEventStatus.PENDING,
+                attempts=0,
+                received_at=datetime.utcnow()
+            ))
+            db.commit()
+        except IntegrityError:
+            # A concurrent delivery of the same event stored it first
+            db.rollback()
+            duplicate = True
+
+    if not duplicate:
+        payment_webhook_workers.wake()
+    return {"event_id": event_id, "event_type": event.get("type"), "duplicate": duplicate}
+
+
+# ----------------------------------------
+# Handlers
+# ----------------------------------------
+
+def _find_payment(db: Session, event: PaymentWebhookEvent) -> Payment:
+    if not event.invoice_reference:
+        raise PermanentWebhookError("Invoice ID missing from webhook data")
+    payment = db.query(Payment).filter(Payment.transaction_id == event.invoice_reference).first()
+    if not payment:
+        # The checkout that created the payment may not have committed yet
+        raise LookupError(f"Payment not found for invoice {event.invoice_reference}")
+    return payment
+
+
+def handle_invoice_paid(db: Session, event: PaymentWebhookEvent, body: Dict[str, Any]):
+    """
+    Mark the payment and invoice paid, enroll the student and clear the cart
+
+    Nothing is committed here: the worker commits every step together with
+    the event's status, so a failure part way leaves the payment unpaid for
+    the retry.
+    """
+    from app.services.payment_service import PaymentService
+
+    payment = _find_payment(db, event)
+    if payment.payment_status == PaymentStatus.PAID:
+        return
+
+    now = datetime.utcnow()
+    payment.payment_status = PaymentStatus.PAID
+    payment.confirmed_at = now
+    payment.gateway_response = body
+    invoice = payment.invoice
+    if invoice:
+        invoice.status = PaymentStatus.PAID
+        invoice.paid_at = now
+    db.flush()
+    wallet_ledger.record_payment(db, payment)
+
+    if invoice:
+        service = PaymentService(db)
+        service._process_course_enrollments(invoice.id, commit=False)
+        service._clear_student_cart(payment.student_id, invoice.extra_metadata, commit=False)
+
+
+def handle_invoice_failed(db: Session, event: PaymentWebhookEvent, body: Dict[str, Any]):
+    """Mark the payment and invoice failed unless already paid"""
+    payment = _find_payment(db, event)
+    if payment.payment_status in (PaymentStatus.PAID, PaymentStatus.FAILED):
+        return
+
+    payment.payment_status = PaymentStatus.FAILED
+    payment.gateway_response = body
+    if payment.invoice and payment.invoice.status != PaymentStatus.PAID:
+        payment.invoice.status = PaymentStatus.FAILED
+
+
+WEBHOOK_HANDLERS: Dict[str, Callable[[Session, PaymentWebhookEvent, Dict[str, Any]], None]] = {
+    "invoice_paid": handle_invoice_paid,
+    "invoice_failed": handle_invoice_failed,
+}
+
+
+# ----------------------------------------
+# Workers
+# ----------------------------------------
+
+class WebhookWorkerPool:
+    """Threads that drain the webhook inbox"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        workers: int = 2,
+        handlers: Optional[Dict[str, Callable]] = None,
+        max_attempts: int = 8,
+        retry_seconds: float = 5,
+        lease_seconds: int = 300,
+        poll_seconds: float = 2,
+        claim_batch: int = 20
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.handlers = handlers if handlers is not None else WEBHOOK_HANDLERS
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.claim_batch = claim_batch
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._work = threading.Event()
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    # ----------------------------------------
+    # Lifecycle
+    # ----------------------------------------
+
+    def start(self):
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(f"{self._prefix}:{index}",),
+                name=f"payment-webhooks-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._work.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        """Start on new events now instead of at the next poll"""
+        self._work.set()
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                processed = self.drain(worker_id)
+            except Exception as e:
+                logger.warning(f"Payment webhook worker {worker_id} failed to poll the inbox: {e}")
+                processed = 0
+            if not processed:
+                self._work.wait(self.poll_seconds)
+                self._work.clear()
+
+    # ----------------------------------------
+    # Processing
+    # ----------------------------------------
+
+    def drain(self, worker_id: Optional[str] = None, limit: Optional[int] = None) -> int:
+        """Process claimable events until none are left; returns how many ran"""
+        worker_id = worker_id or f"{self._prefix}:{uuid.uuid4().hex[:8]}"
+        processed = 0
+        db = self.session_factory()
+        try:
+            while limit is None or processed < limit:
+                if self._stop.is_set():
+                    break
+                event_id = self._claim(db, worker_id)
+                if event_id is None:
+                    break
+                self._process(db, event_id, worker_id)
+                processed += 1
+        finally:
+            db.close()
+        return processed
+
+    def _claimable(self, now: datetime):
+        event = PaymentWebhookEvent
+        return or_(
+            and_(
+                event.status == WebhookEventStatus.PENDING,
+                or_(event.next_attempt_at.is_(None), event.next_attempt_at <= now)
+            ),
+            and_(
+                event.status == WebhookEventStatus.PROCESSING,
+                event.locked_at < now - timedelta(seconds=self.lease_seconds)
+            )
+        )
+
+    def _claim(self, db: Session, worker_id: str) -> Optional[int]:
+        """Take the oldest runnable event whose invoice has nothing earlier unfinished"""
+        now = datetime.utcnow()
+        event, earlier = PaymentWebhookEvent, aliased(PaymentWebhookEvent)
+        blocked = exists().where(
+            earlier.invoice_reference == event.invoice_reference,
+            earlier.id < event.id,
+            earlier.status.in_(_UNFINISHED)
+        )
+        candidates = db.execute(
+            select(event.id).where(self._claimable(now), ~blocked).order_by(event.id).limit(self.claim_batch)
+        ).scalars().all()
+        db.commit()
+
+        for event_id in candidates:
+            claimed = db.execute(
+                update(event)
+                .where(event.id == event_id, self._claimable(now))
+                .values(
+                    status=WebhookEventStatus.PROCESSING, locked_by=worker_id, locked_at=now,
+                    attempts=event.attempts + 1
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if claimed:
+                return event_id
+        return None
+
+    def _process(self, db: Session, event_id: int, worker_id: str):
+        event = db.get(PaymentWebhookEvent, event_id, populate_existing=True)
+        try:
+            handler = self.handlers.get(event.event_type)
+            if handler is not None:
+                handler(db, event, json.loads(event.payload))
+            self._finish(db, event_id, worker_id, {
+                "status": WebhookEventStatus.PROCESSED,
+                "processed_at": datetime.utcnow(),
+                "last_error": None
+            })
+        except Exception as e:
+            db.rollback()
+            attempts = db.get(PaymentWebhookEvent, event_id, populate_existing=True).attempts
+            if isinstance(e, PermanentWebhookError) or attempts >= self.max_attempts:
+                logger.error(f"Payment webhook event {event_id} moved to dead letter: {e}")
+                values = {"status": WebhookEventStatus.DEAD}
+            else:
+                delay = self.retry_seconds * 2 ** (attempts - 1)
+                values = {
+                    "status": WebhookEventStatus.PENDING,
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)
+                }
+            self._finish(db, event_id, worker_id, {**values, "last_error": str(e)[:2000]})
+
+    @staticmethod
+    def _finish(db: Session, event_id: int, worker_id: str, values: Dict[str, Any]):
+        # A worker whose lease was taken over leaves the event to the new owner
+        db.execute(
+            update(PaymentWebhookEvent)
+            .where(
+                PaymentWebhookEvent.id == event_id,
+                PaymentWebhookEvent.locked_by == worker_id,
+                PaymentWebhookEvent.status == WebhookEventStatus.PROCESSING
+            )
+            .values(locked_by=None, locked_at=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    # ----------------------------------------
+    # Dead letters
+    # ----------------------------------------
+
+    @staticmethod
+    def requeue(db: Session, event_ids: List[int]) -> int:
+        """Give dead-lettered events a fresh set of attempts"""
+        requeued = db.execute(
+            update(PaymentWebhookEvent)
+            .where(PaymentWebhookEvent.id.in_(event_ids), PaymentWebhookEvent.status == WebhookEventStatus.DEAD)
+            .values(status=WebhookEventStatus.PENDING, attempts=0, next_attempt_at=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return requeued
+
+
+payment_webhook_workers = WebhookWorkerPool(
+    workers=settings.PAYMENT_WEBHOOK_WORKERS,
+    max_attempts=settings.PAYMENT_WEBHOOK_MAX_ATTEMPTS,
+    retry_seconds=settings.PAYMENT_WEBHOOK_RETRY_SECONDS,
+    lease_seconds=settings.PAYMENT_WEBHOOK_LEASE_SECONDS,
+    poll_seconds=settings.PAYMENT_WEBHOOK_POLL_SECONDS
+)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    payment_webhook_workers.workers = max(payment_webhook_workers.workers, 1)
+    payment_webhook_workers.start()
+    logger.info(f"Processing payment webhooks with {payment_webhook_workers.workers} workers")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        payment_webhook_workers.stop()
@@ -0,0 +1,177 @@
+"""
+Video Playback Grants
+=====================
+
+Authorize a video once per playback session instead of once per range request.
+
+- After the full access check, ``/videos/watch/{video_id}`` issues a compact
+  HMAC-signed grant bound to the video, the user, an expiry and a hash of
+  the resolved file path. It is set as a cookie scoped to the watch path and
+  returned in ``X-Playback-Grant`` for players that append ``?grant=``.
+- Later range and segment requests verify the grant with one HMAC and a few
+  dict lookups: no token decode, no user lookup and no database access.
+- The file path is never sent to the client. Each worker keeps the paths it
+  authorized keyed by their hash, with the probed size and MIME type of the
+  file so grant requests need no ``stat()``; a worker that does not know
+  the hash falls back to the full check and issues a fresh grant.
+- Revocations go to a small in-memory deny set keyed by user, video or
+  both. Grants issued before a revocation are refused; entries are dropped
+  once every grant they could match has expired. The deny set is per
+  worker, so ``PLAYBACK_GRANT_TTL_SECONDS`` bounds how long another worker
+  may keep serving a revoked grant.
+- Deleting or unpublishing content revokes every video under it:
+  ``content_video_ids`` collects them before the change, and the caller
+  revokes each one after the commit.
+"""
+
+import base64
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.lesson import Lesson
+from app.models.video import Video
+
+
+# Most recently authorized file paths kept per worker
+MAX_CACHED_PATHS = 4096
+
+
+@dataclass(frozen=True)
+class PlaybackGrant:
+    """A verified playback grant"""
+    video_id: str
+    user_id: int
+    expires_at: int
+    file_path: Path
+    file_size: Optional[int] = None
+    mime_type: Optional[str] = None
+
+
+def _path_hash(file_path: Path) -> str:
+    return hashlib.sha256(str(file_path).encode()).hexdigest()[:16]
+
+
+class PlaybackGrantService:
+    """Issues and verifies signed playback grants"""
+
+    def __init__(self, secret_key: Optional[str] = None):
+        secret = (secret_key or settings.SECRET_KEY).encode()
+        self._key = hashlib.sha256(b"playback-grant:" + secret).digest()
+        # path hash -> (path, probed size, probed MIME type)
+        self._paths: "OrderedDict[str, Tuple[Path, Optional[int], Optional[str]]]" = OrderedDict()
+        # (user_id or None, video_id or None) -> unix time of the revocation
+        self._denied: Dict[Tuple[Optional[int], Optional[str]], int] = {}
+
+    # ----------------------------------------
+    # Grants
+    # ----------------------------------------
+
+    def issue(
+        self,
+        video_id: str,
+        user_id: int,
+        file_path: Path,
+        file_size: Optional[int] = None,
+        mime_type: Optional[str] = None,
+        now: Optional[int] = None
+    ) -> str:
+        """Sign a grant for a user whose access to the video was just checked"""
+        now = int(time.time()) if now is None else now
+        path_hash = _path_hash(file_path)
+        self._paths[path_hash] = (file_path, file_size, mime_type)
+        self._paths.move_to_end(path_hash)
+        while len(self._paths) > MAX_CACHED_PATHS:
+            self._paths.popitem(last=False)
+
+        payload = f"{video_id}.{user_id}.{now + settings.PLAYBACK_GRANT_TTL_SECONDS}.{path_hash}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, grant: Optional[str], video_id: str, now: Optional[int] = None) -> Optional[PlaybackGrant]:
+        """
+        Return the grant if it is authentic, unexpired, for this video and not revoked.
+
+        Any other grant gives ``None`` and the caller runs the full access check.
+        """
+        if not grant:
+            return None
+        payload, _, signature = grant.rpartition(".")
+        parts = payload.split(".")
+        if len(parts) != 4 or not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        grant_video_id, user_id, expires_at, path_hash = parts
+        if grant_video_id != video_id:
+            return None
+
+        now = int(time.time()) if now is None else now
+        user_id, expires_at = int(user_id), int(expires_at)
+        if expires_at <= now or self._is_revoked(user_id, video_id, expires_at):
+            return None
+        cached = self._paths.get(path_hash)
+        if cached is None:
+            return None
+        file_path, file_size, mime_type = cached
+        return PlaybackGrant(
+            video_id=video_id, user_id=user_id, expires_at=expires_at,
+            file_path=file_path, file_size=file_size, mime_type=mime_type
+        )
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._key, payload.encode(), hashlib.sha256).digest()[:16]
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    # ----------------------------------------
+    # Revocation
+    # ----------------------------------------
+
+    def revoke(self, user_id: Optional[int] = None, video_id: Optional[str] = None, now: Optional[int] = None) -> None:
+        """
+        Refuse grants issued so far for a user, a video, or one user's video.
+
+        Call after the entitlement change is committed; grants issued later
+        (after a fresh access check) are honoured.
+        """
+        if user_id is None and video_id is None:
+            raise ValueError("revoke needs a user or a video")
+        now = int(time.time()) if now is None else now
+        self._prune(now)
+        self._denied[(user_id, str(video_id) if video_id is not None else None)] = now
+
+    def _is_revoked(self, user_id: int, video_id: str, expires_at: int) -> bool:
+        if not self._denied:
+            return False
+        # A grant issued at or before the revocation expires by revoked_at + TTL
+        issued_before = expires_at - settings.PLAYBACK_GRANT_TTL_SECONDS
+        for key in ((user_id, video_id), (user_id, None), (None, video_id)):
+            revoked_at = self._denied.get(key)
+            if revoked_at is not None and issued_before <= revoked_at:
+                return True
+        return False
+
+    def _prune(self, now: int) -> None:
+        horizon = now - settings.PLAYBACK_GRANT_TTL_SECONDS
+        for key in [key for key, revoked_at in self._denied.items() if revoked_at < horizon]:
+            del self._denied[key]
+
+
+def content_video_ids(db: Session, course_id: Optional[str] = None, chapter_id: Optional[int] = None) -> List[str]:
+    """Ids of the videos under a course or a chapter, read before it is deleted or unpublished"""
+    if course_id is None and chapter_id is None:
+        raise ValueError("content_video_ids needs a course or a chapter")
+    query = select(Video.id).join(Lesson, Video.lesson_id == Lesson.id)
+    if course_id is not None:
+        query = query.where(Lesson.course_id == course_id)
+    if chapter_id is not None:
+        query = query.where(Lesson.chapter_id == chapter_id)
+    return list(db.scalars(query))
+
+
+playback_grants = PlaybackGrantService()
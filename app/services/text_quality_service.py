@@ -3,395 +3,523 @@ Text Quality Enhancement Service
 
 This service provides tools for improving transcription quality,
 validating accuracy, and enhancing text readability.
+
+All rewrite rules are compiled once at import into a single combined
+pattern per language, so a transcript is cleaned in one left-to-right
+pass instead of a chain of ``re.sub`` calls. Literal word tables are
+compiled into trie-shaped alternations inside the same pattern.
+Sentence starts are matched zero-width and marked, then capitalized
+after the pass, so the repeated-word rules still see the first word.
+Low-confidence short-word removal runs as a second pass over the
+result, after the quality metrics are taken, as it always has.
 """
 
 import re
 import logging
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional, Iterable, Iterator, Callable, Union
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+
+LOW_CONFIDENCE_THRESHOLD = 0.7
+
+# Joins segments for batch processing; no rule matches across it
+SEGMENT_SEPARATOR = "\ue000"
+
+# Left before a letter to capitalize once the single pass is done
+_CAPITALIZE_MARK = "\ue001"
+
+ARABIC_PUNCTUATION = {
+    '،': ',',
+    '؛': ';',
+    '؟': '?',
+    '!': '!',
+    '...': '...',
+    '..': '..',
+    '.': '.'
+}
+
+COMMON_ARABIC_FIXES = {
+    'اللغة العربية': 'اللغة العربية',
+    'البرمجة': 'البرمجة',
+    'التطوير': 'التطوير',
+    'الويب': 'الويب',
+    'المواقع': 'المواقع',
+    'التطبيقات': 'التطبيقات',
+    'قاعدة البيانات': 'قاعدة البيانات',
+    'الخوارزميات': 'الخوارزميات',
+    'الذكاء الاصطناعي': 'الذكاء الاصطناعي',
+    'التعلم الآلي': 'التعلم الآلي'
+}
+
+ARABIC_WORD_FIXES = {
+    'في هذا': 'في هذا',
+    'من أجل': 'من أجل',
+    'على سبيل': 'على سبيل',
+    'بالإضافة إلى': 'بالإضافة إلى',
+    'على الرغم من': 'على الرغم من'
+}
+
+ENGLISH_FIXES = {
+    'programming': 'programming',
+    'development': 'development',
+    'application': 'application',
+    'database': 'database',
+    'algorithm': 'algorithm',
+    'artificial intelligence': 'artificial intelligence',
+    'machine learning': 'machine learning'
+}
+
+ARABIC_NUMBER_WORDS = {
+    'صفر': '0',
+    'واحد': '1',
+    'اثنين': '2',
+    'ثلاثة': '3',
+    'أربعة': '4',
+    'خمسة': '5',
+    'ستة': '6',
+    'سبعة': '7',
+    'ثمانية': '8',
+    'تسعة': '9',
+    'عشرة': '10'
+}
+
+ARABIC_DEMONSTRATIVES = ['هذا', 'هذه', 'هؤلاء']
+ARABIC_PREPOSITIONS = ['في', 'من', 'إلى', 'على']
+ENGLISH_ARTICLES = ['the', 'a', 'an']
+ENGLISH_BE_VERBS = ['is', 'are', 'was', 'were']
+
+_PUNCTUATION_CHARS = '،؛؟!.,?;:'
+_PUNCTUATION_PATTERN = re.compile(rf'[{_PUNCTUATION_CHARS}]')
+_DOUBLE_SPACE_PATTERN = re.compile(r'\s{2,}')
+_CAPITAL_PATTERN = re.compile(r'[A-Z]')
+_CAPITALIZE_PATTERN = re.compile(rf'{_CAPITALIZE_MARK}(?P<letter>[a-z]?)')
+
+Handler = Callable[["re.Match"], str]
+
+
+def _literal_pattern(words: Iterable[str]) -> str:
+    """
+    Compile literal words into a trie-shaped alternation
+
+    Shared prefixes are factored out, so the regex engine walks the
+    literals like an Aho-Corasick goto function instead of retrying
+    every alternative at each position. Longest match wins.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            body = "(?:" + body + ")?"
+        return body
+
+    return render(trie)
+
+
+def _effective_fixes(*tables: Dict[str, str]) -> Dict[str, str]:
+    """Merge fix tables, dropping identity entries that would only cost scan time"""
+    fixes: Dict[str, str] = {}
+    for table in tables:
+        fixes.update({wrong: correct for wrong, correct in table.items() if wrong != correct})
+    return fixes
+
+
+class CompiledRuleSet:
+    """
+    A set of rewrite rules compiled into one pattern
+
+    Each rule is a named alternative; ``rewrite`` runs a single ``sub``
+    over the text and dispatches every match to its rule's handler,
+    then applies ``finish`` to the result.
+    """
+
+    def __init__(self, rules: List[Tuple[str, str, Handler]], finish: Optional[Callable[[str], str]] = None):
+        self.pattern = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in rules))
+        self.handlers = {name: handler for name, _, handler in rules}
+        self.finish = finish
+
+    def rewrite(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """Rewrite ``text`` in one pass, returning the result and per-rule match counts"""
+        counts: Dict[str, int] = {}
+        handlers = self.handlers
+
+        def replace(match: "re.Match") -> str:
+            name = match.lastgroup
+            counts[name] = counts.get(name, 0) + 1
+            return handlers[name](match)
+
+        text = self.pattern.sub(replace, text)
+        return (self.finish(text) if self.finish else text), counts
+
+
+def _capitalize_marked(text: str) -> str:
+    return _CAPITALIZE_PATTERN.sub(lambda m: m.group("letter").upper(), text)
+
+
+def _build_rule_set(language: str) -> CompiledRuleSet:
+    """Compile the rules for a language, in the precedence of the former pass chain"""
+    rules: List[Tuple[str, str, Handler]] = [
+        ("control", r'[\x00-\x08\x0E-\x1B\x7F]', lambda m: ''),
+    ]
+
+    if language == "ar":
+        number_words = _literal_pattern(ARABIC_NUMBER_WORDS)
+        rules += [
+            ("punctuation", r'\s*(?P<ar_mark>[،؛؟!])(?P=ar_mark)*\s*', lambda m: m.group("ar_mark") + ' '),
+            ("repeated_punctuation", r'(?P<ar_repeat>[.,?;:])(?P=ar_repeat)+', lambda m: m.group("ar_repeat")),
+            (
+                "repeated_demonstrative",
+                rf'\b(?P<ar_demonstrative>{_literal_pattern(ARABIC_DEMONSTRATIVES)})\s+'
+                rf'{_literal_pattern(ARABIC_DEMONSTRATIVES)}\b',
+                lambda m: m.group("ar_demonstrative")
+            ),
+        ]
+        rules += [
+            (
+                "repeated_preposition",
+                rf'\b(?P<ar_preposition>{_literal_pattern(ARABIC_PREPOSITIONS)})\s+'
+                rf'{_literal_pattern(ARABIC_PREPOSITIONS)}\b',
+                lambda m: m.group("ar_preposition")
+            ),
+            ("number", rf'\b{number_words}\b', lambda m: ARABIC_NUMBER_WORDS[m.group()]),
+        ]
+        fixes = _effective_fixes(COMMON_ARABIC_FIXES, ARABIC_WORD_FIXES)
+    else:
+        rules += [
+            # Both leave the next word alone and mark it for capitalization
+            (
+                "sentence_start",
+                rf'(?<![^{SEGMENT_SEPARATOR}])\s*(?=[a-z])',
+                lambda m: _CAPITALIZE_MARK
+            ),
+            (
+                "punctuation",
+                r'\s*(?P<en_mark>[,.!?;:])(?P=en_mark)*(?P<en_gap>\s*)(?P<en_next>(?=[a-z]))?',
+                lambda m: m.group("en_mark") + ' ' + (
+                    _CAPITALIZE_MARK if m.group("en_mark") == '.' and m.group("en_gap")
+                    and m.group("en_next") is not None else ''
+                )
+            ),
+            (
+                "repeated_article",
+                rf'(?i:\b(?P<en_article>{_literal_pattern(ENGLISH_ARTICLES)})\s+{_literal_pattern(ENGLISH_ARTICLES)}\b)',
+                lambda m: m.group("en_article")
+            ),
+            (
+                "repeated_verb",
+                rf'(?i:\b(?P<en_verb>{_literal_pattern(ENGLISH_BE_VERBS)})\s+{_literal_pattern(ENGLISH_BE_VERBS)}\b)',
+                lambda m: m.group("en_verb")
+            ),
+        ]
+        fixes = _effective_fixes(ENGLISH_FIXES)
+
+    if fixes:
+        rules.append(("literal_fix", _literal_pattern(fixes), lambda m: fixes[m.group()]))
+
+    rules.append(("whitespace", r'\s{2,}|[^\S ]', lambda m: ' '))
+    return CompiledRuleSet(rules, finish=_capitalize_marked if language == "en" else None)
+
+
+_RULE_SETS = {language: _build_rule_set(language) for language in ("ar", "en")}
+
+# Applied to the finished text of low-confidence transcriptions
+_LOW_CONFIDENCE_RULES = CompiledRuleSet([
+    ("short_word", r'\b\w{1,2}\b\s*', lambda m: ''),
+    ("whitespace", r'\s{2,}|[^\S ]', lambda m: ' '),
+])
+
+
+def _finalize(text: str) -> str:
+    """Trim a rewritten segment and terminate its last sentence"""
+    text = text.strip()
+    if text and text[-1] not in '.!?':
+        text += '.'
+    return text
+
+
+def _text_stats(text: str) -> Dict[str, Any]:
+    """Collect everything the quality report needs from a text, once per text"""
+    words = text.split()
+    return {
+        "length": len(text),
+        "stripped_length": len(text.strip()),
+        "words": len(words),
+        "word_chars": sum(len(word) for word in words),
+        "sentences": text.count('.') + 1,
+        "chars": set(text.lower()),
+        "has_punctuation": bool(_PUNCTUATION_PATTERN.search(text)),
+        "has_double_space": bool(_DOUBLE_SPACE_PATTERN.search(text)),
+        "has_capital": bool(_CAPITAL_PATTERN.search(text))
+    }
+
+
 class TextQualityService:
     """
     Service for enhancing transcription text quality and accuracy
     """
-    
+
     def __init__(self):
-        self.arabic_punctuation = {
-            '،': ',',
-            '؛': ';',
-            '؟': '?',
-            '!': '!',
-            '...': '...',
-            '..': '..',
-            '.': '.'
-        }
-        
-        self.common_arabic_fixes = {
-            'اللغة العربية': 'اللغة العربية',
-            'البرمجة': 'البرمجة',
-            'التطوير': 'التطوير',
-            'الويب': 'الويب',
-            'المواقع': 'المواقع',
-            'التطبيقات': 'التطبيقات',
-            'قاعدة البيانات': 'قاعدة البيانات',
-            'الخوارزميات': 'الخوارزميات',
-            'الذكاء الاصطناعي': 'الذكاء الاصطناعي',
-            'التعلم الآلي': 'التعلم الآلي'
-        }
-    
+        self.arabic_punctuation = ARABIC_PUNCTUATION
+        self.common_arabic_fixes = COMMON_ARABIC_FIXES
+
+    def _rewrite(
+        self,
+        texts: List[str],
+        language: str,
+        confidence_score: float
+    ) -> Tuple[List[str], List[str], Dict[str, int]]:
+        """
+        Rewrite texts in one pass, joined by the segment separator
+
+        Returns:
+            The enhanced texts the quality metrics are taken from, the final
+            texts after low-confidence fixes, and per-rule match counts
+        """
+        rewritten, rule_counts = _RULE_SETS["ar" if language == "ar" else "en"].rewrite(
+            SEGMENT_SEPARATOR.join(texts)
+        )
+        enhanced = [_finalize(part) for part in rewritten.split(SEGMENT_SEPARATOR)]
+        if confidence_score >= LOW_CONFIDENCE_THRESHOLD:
+            return enhanced, enhanced, rule_counts
+
+        rewritten, low_confidence_counts = _LOW_CONFIDENCE_RULES.rewrite(SEGMENT_SEPARATOR.join(enhanced))
+        for name, count in low_confidence_counts.items():
+            rule_counts[name] = rule_counts.get(name, 0) + count
+        return enhanced, [part.strip() for part in rewritten.split(SEGMENT_SEPARATOR)], rule_counts
+
     def enhance_transcription_quality(
-        self, 
-        text: str, 
+        self,
+        text: str,
         language: str = "ar",
         confidence_score: float = 0.0
     ) -> Dict[str, Any]:
         """
         Enhance transcription text quality with multiple improvements
-        
+
         Process Flow:
-        1. Clean and normalize text
-        2. Fix common transcription errors
-        3. Improve punctuation and formatting
-        4. Calculate quality metrics
-        5. Apply confidence-based corrections
-        6. Return enhanced text with quality report
+        1. Rewrite the text in one pass of the compiled rule set
+           (cleaning, language fixes, punctuation)
+        2. Calculate quality metrics from one scan of each text
+        3. Apply confidence-based corrections
+        4. Return enhanced text with quality report
         """
         try:
-            original_text = text
-            enhanced_text = text
-            
-            # Step 1: Basic text cleaning
-            enhanced_text = self._clean_text(enhanced_text)
-            
-            # Step 2: Language-specific enhancements
-            if language == "ar":
-                enhanced_text = self._enhance_arabic_text(enhanced_text)
-            else:
-                enhanced_text = self._enhance_english_text(enhanced_text)
-            
-            # Step 3: Fix common transcription errors
-            enhanced_text = self._fix_common_errors(enhanced_text, language)
-            
-            # Step 4: Improve punctuation and formatting
-            enhanced_text = self._improve_punctuation(enhanced_text, language)
-            
-            # Step 5: Calculate quality metrics
-            quality_metrics = self._calculate_quality_metrics(
-                original_text, 
-                enhanced_text, 
-                confidence_score
+            (measured_text,), (enhanced_text,), rule_counts = self._rewrite(
+                [(text or "").replace(SEGMENT_SEPARATOR, "")], language, confidence_score
             )
-            
-            # Step 6: Apply confidence-based corrections
-            if confidence_score < 0.7:
-                enhanced_text = self._apply_low_confidence_fixes(enhanced_text, language)
-            
+
+            return self._build_report(text, measured_text, enhanced_text, rule_counts, confidence_score, language)
+
+        except Exception as e:
+            logger.error(f"Error enhancing transcription quality: {e}")
             return {
-                "original_text": original_text,
-                "enhanced_text": enhanced_text,
-                "quality_metrics": quality_metrics,
-                "improvements_applied": self._get_applied_improvements(original_text, enhanced_text),
+                "original_text": text,
+                "enhanced_text": text,
+                "quality_metrics": {"error": str(e)},
+                "improvements_applied": [],
                 "confidence_score": confidence_score,
                 "language": language
             }
-            
+
+    def enhance_segment(
+        self,
+        segment: Union[str, Dict[str, Any]],
+        language: str = "ar",
+        confidence_score: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        Enhance one transcription segment without building a quality report
+
+        Args:
+            segment: Segment text, or a segment dict with a ``text`` key
+            language: Language of the text
+            confidence_score: Transcription confidence (0-1)
+
+        Returns:
+            The segment (timing keys preserved) with enhanced ``text`` and ``original_text``
+        """
+        if isinstance(segment, str):
+            segment = {"text": segment}
+        original = (segment.get("text") or "").replace(SEGMENT_SEPARATOR, "")
+        _, (enhanced,), _ = self._rewrite([original], language, confidence_score)
+        return {**segment, "text": enhanced, "original_text": original}
+
+    def iter_enhanced_segments(
+        self,
+        segments: Iterable[Union[str, Dict[str, Any]]],
+        language: str = "ar",
+        confidence_score: float = 0.0
+    ) -> Iterator[Dict[str, Any]]:
+        """Enhance segments lazily, so results can be streamed as they are produced"""
+        for segment in segments:
+            yield self.enhance_segment(segment, language, confidence_score)
+
+    def enhance_segments(
+        self,
+        segments: List[Union[str, Dict[str, Any]]],
+        language: str = "ar",
+        confidence_score: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        Enhance all segments of a transcription in one call
+
+        Segments are joined with a separator no rule matches across and
+        rewritten in a single pass, then split back. The output of every
+        segment is identical to ``enhance_segment``.
+
+        Returns:
+            Quality report for the whole transcription with per-segment results
+        """
+        try:
+            segment_dicts = [{"text": s} if isinstance(s, str) else s for s in segments]
+            originals = [(s.get("text") or "").replace(SEGMENT_SEPARATOR, "") for s in segment_dicts]
+
+            measured, enhanced, rule_counts = self._rewrite(originals, language, confidence_score)
+
+            report = self._build_report(
+                " ".join(originals), " ".join(measured), " ".join(enhanced), rule_counts, confidence_score, language
+            )
+            report["segments"] = [
+                {**segment, "text": text, "original_text": original}
+                for segment, text, original in zip(segment_dicts, enhanced, originals)
+            ]
+            return report
+
         except Exception as e:
-            logger.error(f"Error enhancing transcription quality: {e}")
+            logger.error(f"Error enhancing transcription segments: {e}")
             return {
-                "original_text": text,
-                "enhanced_text": text,
+                "segments": [{"text": s} if isinstance(s, str) else s for s in segments],
                 "quality_metrics": {"error": str(e)},
                 "improvements_applied": [],
                 "confidence_score": confidence_score,
                 "language": language
             }
-    
-    def _clean_text(self, text: str) -> str:
-        """Clean and normalize text"""
-        if not text:
-            return text
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
-        
-        # Remove control characters
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
-        
-        # Normalize line breaks
-        text = re.sub(r'\n+', '\n', text)
-        
-        return text
-    
-    def _enhance_arabic_text(self, text: str) -> str:
-        """Enhance Arabic text specifically"""
-        if not text:
-            return text
-        
-        # Fix common Arabic transcription issues
-        for wrong, correct in self.common_arabic_fixes.items():
-            text = text.replace(wrong, correct)
-        
-        # Fix Arabic numbers
-        text = self._fix_arabic_numbers(text)
-        
-        # Fix Arabic punctuation
-        text = self._fix_arabic_punctuation(text)
-        
-        # Fix common Arabic word combinations
-        text = self._fix_arabic_word_combinations(text)
-        
-        return text
-    
-    def _enhance_english_text(self, text: str) -> str:
-        """Enhance English text specifically"""
-        if not text:
-            return text
-        
-        # Fix common English transcription issues
-        text = self._fix_english_common_errors(text)
-        
-        # Improve capitalization
-        text = self._improve_english_capitalization(text)
-        
-        return text
-    
-    def _fix_arabic_numbers(self, text: str) -> str:
-        """Fix Arabic number transcription"""
-        # Common number fixes
-        number_fixes = {
-            'صفر': '0',
-            'واحد': '1',
-            'اثنين': '2',
-            'ثلاثة': '3',
-            'أربعة': '4',
-            'خمسة': '5',
-            'ستة': '6',
-            'سبعة': '7',
-            'ثمانية': '8',
-            'تسعة': '9',
-            'عشرة': '10'
-        }
-        
-        for arabic, number in number_fixes.items():
-            text = re.sub(rf'\b{arabic}\b', number, text)
-        
-        return text
-    
-    def _fix_arabic_punctuation(self, text: str) -> str:
-        """Fix Arabic punctuation marks"""
-        # Fix spacing around punctuation
-        text = re.sub(r'\s*([،؛؟!])\s*', r'\1 ', text)
-        
-        # Fix multiple punctuation marks
-        text = re.sub(r'([،؛؟!])\1+', r'\1', text)
-        
-        return text
-    
-    def _fix_arabic_word_combinations(self, text: str) -> str:
-        """Fix common Arabic word combination errors"""
-        # Fix common word separations
-        word_fixes = {
-            'في هذا': 'في هذا',
-            'من أجل': 'من أجل',
-            'على سبيل': 'على سبيل',
-            'بالإضافة إلى': 'بالإضافة إلى',
-            'على الرغم من': 'على الرغم من'
-        }
-        
-        for wrong, correct in word_fixes.items():
-            text = text.replace(wrong, correct)
-        
-        return text
-    
-    def _fix_english_common_errors(self, text: str) -> str:
-        """Fix common English transcription errors"""
-        # Common English fixes
-        english_fixes = {
-            'programming': 'programming',
-            'development': 'development',
-            'application': 'application',
-            'database': 'database',
-            'algorithm': 'algorithm',
-            'artificial intelligence': 'artificial intelligence',
-            'machine learning': 'machine learning'
+
+    def _build_report(
+        self,
+        original_text: str,
+        measured_text: str,
+        enhanced_text: str,
+        rule_counts: Dict[str, int],
+        confidence_score: float,
+        language: str
+    ) -> Dict[str, Any]:
+        # Metrics describe the text before low-confidence fixes, improvements the final text
+        original_stats = _text_stats(original_text or "")
+        measured_stats = _text_stats(measured_text)
+        enhanced_stats = measured_stats if enhanced_text == measured_text else _text_stats(enhanced_text)
+
+        quality_metrics = self._calculate_quality_metrics(original_stats, measured_stats, confidence_score)
+        quality_metrics["rules_applied"] = rule_counts
+
+        return {
+            "original_text": original_text,
+            "enhanced_text": enhanced_text,
+            "quality_metrics": quality_metrics,
+            "improvements_applied": self._get_applied_improvements(original_stats, enhanced_stats),
+            "confidence_score": confidence_score,
+            "language": language
         }
-        
-        for wrong, correct in english_fixes.items():
-            text = text.replace(wrong, correct)
-        
-        return text
-    
-    def _improve_english_capitalization(self, text: str) -> str:
-        """Improve English text capitalization"""
-        # Capitalize first letter of sentences
-        sentences = text.split('. ')
-        capitalized_sentences = []
-        
-        for sentence in sentences:
-            if sentence:
-                sentence = sentence.strip()
-                if sentence and sentence[0].isalpha():
-                    sentence = sentence[0].upper() + sentence[1:]
-                capitalized_sentences.append(sentence)
-        
-        return '. '.join(capitalized_sentences)
-    
-    def _fix_common_errors(self, text: str, language: str) -> str:
-        """Fix common transcription errors"""
-        if language == "ar":
-            # Arabic-specific fixes
-            text = re.sub(r'\b(هذا|هذه|هؤلاء)\s+(هذا|هذه|هؤلاء)\b', r'\1', text)
-            text = re.sub(r'\b(في|من|إلى|على)\s+(في|من|إلى|على)\b', r'\1', text)
-        else:
-            # English-specific fixes
-            text = re.sub(r'\b(the|a|an)\s+(the|a|an)\b', r'\1', text, flags=re.IGNORECASE)
-            text = re.sub(r'\b(is|are|was|were)\s+(is|are|was|were)\b', r'\1', text, flags=re.IGNORECASE)
-        
-        return text
-    
-    def _improve_punctuation(self, text: str, language: str) -> str:
-        """Improve punctuation and formatting"""
-        # Fix spacing around punctuation
-        if language == "ar":
-            text = re.sub(r'\s*([،؛؟!])\s*', r'\1 ', text)
-        else:
-            text = re.sub(r'\s*([,.!?;:])\s*', r'\1 ', text)
-        
-        # Fix multiple punctuation marks
-        text = re.sub(r'([،؛؟!.,!?;:])\1+', r'\1', text)
-        
-        # Fix sentence endings
-        text = re.sub(r'([^.!?])\s*$', r'\1.', text)
-        
-        return text
-    
+
     def _calculate_quality_metrics(
-        self, 
-        original_text: str, 
-        enhanced_text: str, 
+        self,
+        original_stats: Dict[str, Any],
+        enhanced_stats: Dict[str, Any],
         confidence_score: float
     ) -> Dict[str, Any]:
         """Calculate text quality metrics"""
         try:
-            # Basic metrics
-            original_length = len(original_text)
-            enhanced_length = len(enhanced_text)
-            
-            # Word count
-            original_words = len(original_text.split())
-            enhanced_words = len(enhanced_text.split())
-            
-            # Character-level similarity
-            similarity = self._calculate_similarity(original_text, enhanced_text)
-            
-            # Readability score (simple implementation)
-            readability_score = self._calculate_readability(enhanced_text)
-            
-            # Quality indicators
-            has_punctuation = bool(re.search(r'[،؛؟!.,!?;:]', enhanced_text))
-            has_proper_spacing = not bool(re.search(r'\s{2,}', enhanced_text))
-            has_proper_capitalization = bool(re.search(r'[A-Z]', enhanced_text)) if enhanced_text else False
-            
             return {
-                "original_length": original_length,
-                "enhanced_length": enhanced_length,
-                "original_words": original_words,
-                "enhanced_words": enhanced_words,
-                "similarity_score": similarity,
-                "readability_score": readability_score,
+                "original_length": original_stats["length"],
+                "enhanced_length": enhanced_stats["length"],
+                "original_words": original_stats["words"],
+                "enhanced_words": enhanced_stats["words"],
+                "similarity_score": self._calculate_similarity(original_stats, enhanced_stats),
+                "readability_score": self._calculate_readability(enhanced_stats),
                 "confidence_score": confidence_score,
                 "quality_indicators": {
-                    "has_punctuation": has_punctuation,
-                    "has_proper_spacing": has_proper_spacing,
-                    "has_proper_capitalization": has_proper_capitalization
+                    "has_punctuation": enhanced_stats["has_punctuation"],
+                    "has_proper_spacing": not enhanced_stats["has_double_space"],
+                    "has_proper_capitalization": enhanced_stats["has_capital"]
                 },
                 "improvement_percentage": self._calculate_improvement_percentage(
-                    original_text, enhanced_text
+                    original_stats, enhanced_stats
                 )
             }
-            
+
         except Exception as e:
             logger.error(f"Error calculating quality metrics: {e}")
             return {"error": str(e)}
-    
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
+
+    def _calculate_similarity(self, stats1: Dict[str, Any], stats2: Dict[str, Any]) -> float:
         """Calculate similarity between two texts"""
-        if not text1 or not text2:
+        if not stats1["length"] or not stats2["length"]:
             return 0.0
-        
+
         # Simple character-based similarity
-        set1 = set(text1.lower())
-        set2 = set(text2.lower())
-        
-        intersection = len(set1.intersection(set2))
-        union = len(set1.union(set2))
-        
+        intersection = len(stats1["chars"] & stats2["chars"])
+        union = len(stats1["chars"] | stats2["chars"])
+
         return intersection / union if union > 0 else 0.0
-    
-    def _calculate_readability(self, text: str) -> float:
+
+    def _calculate_readability(self, stats: Dict[str, Any]) -> float:
         """Calculate simple readability score"""
-        if not text:
+        if not stats["words"]:
             return 0.0
-        
+
         # Simple readability based on sentence and word length
-        sentences = text.split('.')
-        words = text.split()
-        
-        if not sentences or not words:
-            return 0.0
-        
-        avg_sentence_length = len(words) / len(sentences)
-        avg_word_length = sum(len(word) for word in words) / len(words)
-        
+        avg_sentence_length = stats["words"] / stats["sentences"]
+        avg_word_length = stats["word_chars"] / stats["words"]
+
         # Higher score for moderate sentence and word lengths
         sentence_score = max(0, 1 - abs(avg_sentence_length - 15) / 15)
         word_score = max(0, 1 - abs(avg_word_length - 5) / 5)
-        
+
         return (sentence_score + word_score) / 2
-    
-    def _calculate_improvement_percentage(self, original: str, enhanced: str) -> float:
+
+    def _calculate_improvement_percentage(self, original: Dict[str, Any], enhanced: Dict[str, Any]) -> float:
         """Calculate improvement percentage"""
-        if not original:
+        if not original["length"]:
             return 0.0
-        
+
         # Simple improvement calculation
-        original_quality = len(original.strip()) / max(len(original), 1)
-        enhanced_quality = len(enhanced.strip()) / max(len(enhanced), 1)
-        
+        original_quality = original["stripped_length"] / max(original["length"], 1)
+        enhanced_quality = enhanced["stripped_length"] / max(enhanced["length"], 1)
+
         if original_quality == 0:
             return 100.0
-        
+
         improvement = ((enhanced_quality - original_quality) / original_quality) * 100
         return max(0, min(100, improvement))
-    
-    def _apply_low_confidence_fixes(self, text: str, language: str) -> str:
-        """Apply additional fixes for low confidence transcriptions"""
-        # More aggressive cleaning for low confidence
-        text = re.sub(r'\b\w{1,2}\b', '', text)  # Remove very short words
-        text = re.sub(r'\s+', ' ', text)  # Normalize spaces
-        
-        return text.strip()
-    
-    def _get_applied_improvements(self, original: str, enhanced: str) -> List[str]:
+
+    def _get_applied_improvements(self, original: Dict[str, Any], enhanced: Dict[str, Any]) -> List[str]:
         """Get list of applied improvements"""
         improvements = []
-        
-        if len(enhanced.strip()) > len(original.strip()):
+
+        if enhanced["stripped_length"] > original["stripped_length"]:
             improvements.append("Text length increased")
-        
-        if re.search(r'[،؛؟!.,!?;:]', enhanced) and not re.search(r'[،؛؟!.,!?;:]', original):
+
+        if enhanced["has_punctuation"] and not original["has_punctuation"]:
             improvements.append("Punctuation added")
-        
-        if not re.search(r'\s{2,}', enhanced) and re.search(r'\s{2,}', original):
+
+        if not enhanced["has_double_space"] and original["has_double_space"]:
             improvements.append("Spacing normalized")
-        
-        if len(enhanced.split()) > len(original.split()):
+
+        if enhanced["words"] > original["words"]:
             improvements.append("Word count increased")
-        
+
         return improvements
-    
+
     def validate_transcription_accuracy(
         self, 
         transcription_text: str, 
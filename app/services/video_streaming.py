@@ -14,6 +14,8 @@ from app.models.video import Video
 from app.models.lesson import Lesson
 from app.models.student import Student
 from app.models.student_course import StudentCourse
+from app.services.media_faststart import SeekIndex
+from app.services.view_counter import view_counter
 
 
 class VideoStreamingService:
@@ -321,13 +323,22 @@ class VideoStreamingService:
     def create_range_response(
         self, 
         file_path: Path, 
-        range_header: Optional[str] = None
+        range_header: Optional[str] = None,
+        file_size: Optional[int] = None,
+        mime_type: Optional[str] = None,
+        seek_index: Optional[SeekIndex] = None
     ) -> StreamingResponse:
         """
         إنشاء استجابة بث محمية مع Range support
+
+        The size and MIME type recorded by the media probe spare a stat() and
+        an extension guess; without them the file is inspected. With a seek
+        index, an open-ended range gets whole fragments instead of the rest
+        of the file.
         """
-        video_info = self.get_video_info(file_path)
-        file_size = video_info["size"]
+        if file_size is None or mime_type is None:
+            video_info = self.get_video_info(file_path)
+            file_size, mime_type = video_info["size"], video_info["mime_type"]
         
         # تحليل Range header
         start = 0
@@ -340,6 +351,8 @@ class VideoStreamingService:
                     start = int(range_match[0])
                 if range_match[1]:
                     end = int(range_match[1])
+                elif seek_index:
+                    end = seek_index.range_end(start, settings.VIDEO_SEEK_RANGE_BYTES)
         
         # التأكد من صحة النطاق
         start = max(0, start)
@@ -370,7 +383,7 @@ class VideoStreamingService:
             "Content-Range": f"bytes {start}-{end}/{file_size}",
             "Accept-Ranges": "bytes",
             "Content-Length": str(content_length),
-            "Content-Type": video_info["mime_type"],
+            "Content-Type": mime_type,
             
             # حماية إضافية
             "Cache-Control": "private, no-cache, no-store, must-revalidate",
@@ -392,7 +405,7 @@ class VideoStreamingService:
             protected_file_generator(),
             status_code=status_code,
             headers=headers,
-            media_type=video_info["mime_type"]
+            media_type=mime_type
         )
     
     def log_video_access(
@@ -403,37 +416,15 @@ class VideoStreamingService:
         request: Request
     ) -> None:
         """
-        تسجيل الوصول للفيديو مع معلومات الحماية
+        تسجيل مشاهدة للفيديو مرة واحدة لكل جلسة تشغيل
+
+        العدادات تُكتب على دفعات بواسطة view_counter دون الوصول لقاعدة البيانات هنا
         """
-        try:
-            # تحديث عداد المشاهدات
-            db.query(Video).filter(Video.id == video_id).update({
-                "views_count": Video.views_count + 1
-            })
-            
-            # تحديث عداد مشاهدات الدرس
-            lesson = db.query(Lesson).join(Video).filter(Video.id == video_id).first()
-            if lesson:
-                lesson.views_count += 1
-            
-            # تسجيل معلومات إضافية للحماية (اختياري)
-            access_info = {
-                'student_id': student_id,
-                'video_id': video_id,
-                'ip': request.client.host,
-                'user_agent': request.headers.get('user-agent'),
-                'timestamp': datetime.utcnow(),
-                'referer': request.headers.get('referer')
-            }
-            
-            # يمكن حفظ هذه المعلومات في جدول منفصل للتحليل
-            
-            db.commit()
-            
-        except Exception as e:
-            # عدم السماح لأخطاء التسجيل بإيقاف البث
-            db.rollback()
-            print(f"خطأ في تسجيل الوصول للفيديو: {e}")
+        session_key = self._generate_client_fingerprint({
+            'user_agent': request.headers.get('user-agent', ''),
+            'ip': request.client.host if request.client else ''
+        })
+        view_counter.record(video_id, student_id, session_key)
     
     def _generate_checksum(self, video_id: str, student_id: int, client_fingerprint: str = "") -> str:
         """
@@ -0,0 +1,207 @@
+"""
+Video View Counter
+==================
+
+Counts video views without writing to ``videos`` and ``lessons`` on every
+streaming request.
+
+- A view is counted once per (user, video, playback session) within
+  ``VIDEO_VIEW_DEDUPE_SECONDS``; range chunks, seeks and re-authorizations
+  of the same session inside the window are not views.
+- Counted views accumulate in per-worker counters. A background thread
+  flushes them every ``VIDEO_VIEW_FLUSH_SECONDS`` in one transaction:
+  videos and lessons that gained the same number of views share one
+  ``UPDATE ... SET views_count = views_count + n`` statement, rows are
+  updated in id order so concurrent flushes take their locks in the same
+  order, and the per-day rollups in ``video_daily_views`` are upserted.
+- A failed flush puts its views back for the next one. Views still pending
+  when a worker dies are lost; the counters are approximate by design.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.upsert import upsert_increment
+from app.models.course import Course
+from app.models.lesson import Lesson
+from app.models.video import Video, VideoDailyViews
+
+
+logger = logging.getLogger(__name__)
+
+
+def _group_by_increment(counts: Dict[str, int]) -> Dict[int, List[str]]:
+    groups = defaultdict(list)
+    for row_id in sorted(counts):
+        groups[counts[row_id]].append(row_id)
+    return groups
+
+
+class ViewCounter:
+    """Deduplicates views in memory and flushes them in batches"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        dedupe_seconds: int = 1800,
+        flush_seconds: float = 10
+    ):
+        self.session_factory = session_factory
+        self.dedupe_seconds = dedupe_seconds
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._seen: Dict[Tuple[int, str, str], float] = {}
+        self._pending: Counter = Counter()  # (video_id, day) -> views
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ----------------------------------------
+    # Recording
+    # ----------------------------------------
+
+    def record(self, video_id: str, user_id: int, session_key: str = "", now: Optional[float] = None) -> bool:
+        """Count a view unless this session was counted within the window; no database access"""
+        now = time.time() if now is None else now
+        key = (user_id, str(video_id), session_key)
+        with self._lock:
+            expires_at = self._seen.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._seen[key] = now + self.dedupe_seconds
+            self._pending[(str(video_id), datetime.utcfromtimestamp(now).date())] += 1
+        return True
+
+    @property
+    def pending(self) -> int:
+        return sum(self._pending.values())
+
+    # ----------------------------------------
+    # Flushing
+    # ----------------------------------------
+
+    def flush(self, db: Optional[Session] = None, now: Optional[float] = None) -> int:
+        """Write pending views; returns how many were flushed"""
+        now = time.time() if now is None else now
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._seen = {key: expires_at for key, expires_at in self._seen.items() if expires_at > now}
+        if not pending:
+            return 0
+
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            flushed = self._write(db, pending)
+            db.commit()
+            return flushed
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        finally:
+            if own_session:
+                db.close()
+
+    def _write(self, db: Session, pending: Counter) -> int:
+        video_ids = sorted({video_id for video_id, _ in pending})
+        owners = {
+            row.id: row for row in db.execute(
+                select(Video.id, Video.lesson_id, Lesson.course_id, Course.academy_id)
+                .join(Lesson, Lesson.id == Video.lesson_id)
+                .join(Course, Course.id == Lesson.course_id)
+                .where(Video.id.in_(video_ids))
+            )
+        }
+
+        video_views, lesson_views, rollups = Counter(), Counter(), []
+        for (video_id, day), views in pending.items():
+            owner = owners.get(video_id)
+            if owner is None:
+                continue  # Deleted since the view
+            video_views[video_id] += views
+            lesson_views[owner.lesson_id] += views
+            rollups.append({
+                "video_id": video_id, "day": day, "lesson_id": owner.lesson_id,
+                "course_id": owner.course_id, "academy_id": owner.academy_id, "views": views
+            })
+        if not rollups:
+            return 0
+
+        for model, counts in ((Video, video_views), (Lesson, lesson_views)):
+            for views, ids in sorted(_group_by_increment(counts).items()):
+                db.execute(
+                    update(model)
+                    .where(model.id.in_(ids))
+                    .values(views_count=func.coalesce(model.views_count, 0) + views)
+                    .execution_options(synchronize_session=False)
+                )
+        rollups.sort(key=lambda row: (row["video_id"], row["day"]))
+        upsert_increment(db, VideoDailyViews, rollups, keys=["video_id", "day"], increments=["views"])
+        return sum(video_views.values())
+
+    # ----------------------------------------
+    # Lifecycle
+    # ----------------------------------------
+
+    def start(self):
+        if self._thread or self.flush_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="video-view-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"Dropping {self.pending} unflushed video views: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Video view flush failed, retrying with the next batch: {e}")
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    @staticmethod
+    def get_daily_views(db: Session, academy_id: int, days: int = 30, today: Optional[date] = None) -> List[Dict]:
+        """Views per day across an academy's videos, oldest first, zero-filled"""
+        today = today or datetime.utcnow().date()
+        start = today - timedelta(days=days - 1)
+        views = dict(db.execute(
+            select(VideoDailyViews.day, func.sum(VideoDailyViews.views))
+            .where(
+                VideoDailyViews.academy_id == academy_id,
+                VideoDailyViews.day >= start,
+                VideoDailyViews.day <= today
+            )
+            .group_by(VideoDailyViews.day)
+        ).all())
+        return [
+            {"day": day.isoformat(), "views": int(views.get(day, 0))}
+            for day in (start + timedelta(days=offset) for offset in range(days))
+        ]
+
+
+view_counter = ViewCounter(
+    dedupe_seconds=settings.VIDEO_VIEW_DEDUPE_SECONDS,
+    flush_seconds=settings.VIDEO_VIEW_FLUSH_SECONDS
+)
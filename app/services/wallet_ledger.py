@@ -0,0 +1,476 @@
+"""
+Academy Wallet Ledger
+=====================
+
+Academy wallet balances and revenue statistics kept from an append-only,
+double-entry ledger.
+
+- Settling a payment posts one journal: the gateway clearing account is
+  debited with the amount paid and the academy wallet credited with it;
+  the platform commission is then moved from the wallet to the platform
+  commission account. Debits always equal credits.
+- The academy's row in ``academy_finances`` is locked and moved in the
+  same transaction as the journal, so every wallet entry records the
+  balance after it and the running balance never needs a SUM.
+- Day, week, month and year buckets in ``academy_revenue_rollups`` are
+  incremented by one upsert per journal, so statistics read a handful of
+  rows whatever the size of the ledger. Buckets use UTC dates; weeks
+  start on Monday.
+- Wallet transactions are paged by entry id (keyset), never by offset.
+"""
+
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.upsert import upsert_increment
+from app.models.course import Course, CourseStatus
+from app.models.finance import (
+    AcademyFinance, AcademyRevenueRollup, LedgerAccount, LedgerEntry, RollupPeriod, TransactionType
+)
+from app.models.payment import Payment, PaymentStatus
+from app.models.student import Student
+from app.models.student_course import StudentCourse
+from app.models.user import User
+
+
+CENT = Decimal("0.01")
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def period_start(period: RollupPeriod, day: date) -> date:
+    """First day of the bucket containing ``day``"""
+    if period == RollupPeriod.DAY:
+        return day
+    if period == RollupPeriod.WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == RollupPeriod.MONTH:
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def previous_period_start(period: RollupPeriod, start: date) -> date:
+    """First day of the bucket before the one starting on ``start``"""
+    if period == RollupPeriod.DAY:
+        return start - timedelta(days=1)
+    if period == RollupPeriod.WEEK:
+        return start - timedelta(days=7)
+    if period == RollupPeriod.MONTH:
+        return (start - timedelta(days=1)).replace(day=1)
+    return start.replace(year=start.year - 1)
+
+
+class WalletLedgerService:
+    """Posts wallet journals and serves wallet reads from running balances and rollups"""
+
+    CHART_BUCKETS = 7
+
+    # ----------------------------------------
+    # Postings
+    # ----------------------------------------
+
+    def record_payment(self, db: Session, payment: Payment) -> bool:
+        """
+        Post a settled payment to its academy's wallet.
+
+        Returns False when the payment was already posted. The caller commits.
+        """
+        posted = db.execute(
+            select(LedgerEntry.id).where(LedgerEntry.payment_id == payment.id).limit(1)
+        ).first()
+        if posted:
+            return False
+
+        amount = _money(payment.amount)
+        wallet = self._lock_wallet(db, payment.academy_id)
+        commission = _money(amount * Decimal(str(wallet.commission_rate)))
+        balance = _money(wallet.balance)
+
+        entries = [
+            {"account": LedgerAccount.GATEWAY_CLEARING, "entry_type": TransactionType.PAYMENT, "debit": amount},
+            {
+                "account": LedgerAccount.ACADEMY_WALLET, "entry_type": TransactionType.PAYMENT,
+                "credit": amount, "balance_after": balance + amount
+            },
+        ]
+        if commission:
+            entries += [
+                {
+                    "account": LedgerAccount.ACADEMY_WALLET, "entry_type": TransactionType.COMMISSION,
+                    "debit": commission, "balance_after": balance + amount - commission
+                },
+                {
+                    "account": LedgerAccount.PLATFORM_COMMISSION, "entry_type": TransactionType.COMMISSION,
+                    "credit": commission
+                },
+            ]
+        settled_at = payment.confirmed_at or datetime.utcnow()
+        self._post(
+            db, payment.academy_id, entries, settled_at,
+            payment_id=payment.id, description=f"Payment {payment.payment_id}"
+        )
+
+        db.execute(
+            update(AcademyFinance)
+            .where(AcademyFinance.academy_id == payment.academy_id)
+            .values(
+                balance=AcademyFinance.balance + (amount - commission),
+                total_revenue=func.coalesce(AcademyFinance.total_revenue, 0) + float(amount),
+                total_commission=AcademyFinance.total_commission + commission,
+                payments_count=AcademyFinance.payments_count + 1,
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self._bump_rollups(
+            db, payment.academy_id, settled_at.date(), revenue=amount, commission=commission, payments_count=1
+        )
+
+        payment.platform_fee = commission
+        payment.net_amount = amount - _money(payment.gateway_fee) - commission
+        return True
+
+    def record_withdrawal(
+        self, db: Session, academy_id: int, amount, withdrawal_id: Optional[int] = None
+    ) -> Decimal:
+        """
+        Pay out part of an academy's balance. Returns the new balance.
+
+        Raises ValueError when the balance does not cover the amount. The caller commits.
+        """
+        amount = _money(amount)
+        if amount <= 0:
+            raise ValueError("مبلغ السحب غير صالح")
+        wallet = self._lock_wallet(db, academy_id)
+        balance = _money(wallet.balance)
+        if amount > balance:
+            raise ValueError("الرصيد غير كافٍ")
+
+        now = datetime.utcnow()
+        self._post(db, academy_id, [
+            {
+                "account": LedgerAccount.ACADEMY_WALLET, "entry_type": TransactionType.WITHDRAWAL,
+                "debit": amount, "balance_after": balance - amount
+            },
+            {"account": LedgerAccount.BANK_PAYOUT, "entry_type": TransactionType.WITHDRAWAL, "credit": amount},
+        ], now, withdrawal_id=withdrawal_id, description="Withdrawal")
+
+        db.execute(
+            update(AcademyFinance)
+            .where(AcademyFinance.academy_id == academy_id)
+            .values(
+                balance=AcademyFinance.balance - amount,
+                total_withdrawals=func.coalesce(AcademyFinance.total_withdrawals, 0) + float(amount),
+                updated_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self._bump_rollups(db, academy_id, now.date(), withdrawals=amount)
+        return balance - amount
+
+    def _lock_wallet(self, db: Session, academy_id: int):
+        """The academy's wallet row, created on first use and locked until commit"""
+        query = (
+            select(AcademyFinance.balance, AcademyFinance.commission_rate)
+            .where(AcademyFinance.academy_id == academy_id)
+            .with_for_update()
+        )
+        wallet = db.execute(query).first()
+        if wallet is None:
+            upsert_increment(db, AcademyFinance, [{
+                "academy_id": academy_id,
+                "commission_rate": settings.PLATFORM_COMMISSION_RATE,
+                "balance": 0,
+                "total_commission": 0,
+                "payments_count": 0,
+                "total_revenue": 0.0,
+                "total_withdrawals": 0.0,
+                "pending_withdrawals": 0.0
+            }], keys=["academy_id"])
+            wallet = db.execute(query).one()
+        return wallet
+
+    def _post(
+        self, db: Session, academy_id: int, entries: List[Dict[str, Any]], created_at: datetime, **common
+    ) -> str:
+        """Append one balanced journal"""
+        debits = sum(entry.get("debit", 0) for entry in entries)
+        credits = sum(entry.get("credit", 0) for entry in entries)
+        if debits != credits:
+            raise ValueError(f"Unbalanced journal: debits {debits} != credits {credits}")
+
+        journal_id = str(uuid.uuid4())
+        db.execute(insert(LedgerEntry), [
+            {
+                "journal_id": journal_id,
+                "academy_id": academy_id,
+                "debit": 0,
+                "credit": 0,
+                "balance_after": None,
+                "payment_id": None,
+                "withdrawal_id": None,
+                "description": None,
+                "created_at": created_at,
+                **common,
+                **entry
+            }
+            for entry in entries
+        ])
+        return journal_id
+
+    def _bump_rollups(
+        self, db: Session, academy_id: int, day: date,
+        revenue=0, commission=0, withdrawals=0, payments_count: int = 0
+    ) -> None:
+        now = datetime.utcnow()
+        upsert_increment(db, AcademyRevenueRollup, [
+            {
+                "academy_id": academy_id,
+                "period": period,
+                "period_start": period_start(period, day),
+                "revenue": _money(revenue),
+                "commission": _money(commission),
+                "withdrawals": _money(withdrawals),
+                "payments_count": payments_count,
+                "updated_at": now
+            }
+            for period in RollupPeriod
+        ], keys=["academy_id", "period", "period_start"],
+            increments=["revenue", "commission", "withdrawals", "payments_count"])
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def get_wallet(self, db: Session, academy_id: int, today: Optional[date] = None) -> Dict[str, Any]:
+        """Balance, lifetime totals and current day, week and month earnings"""
+        today = today or datetime.utcnow().date()
+        wallet = db.execute(
+            select(AcademyFinance).where(AcademyFinance.academy_id == academy_id)
+        ).scalar_one_or_none()
+
+        buckets = {RollupPeriod.DAY: 0.0, RollupPeriod.WEEK: 0.0, RollupPeriod.MONTH: 0.0}
+        rows = db.execute(
+            select(AcademyRevenueRollup.period, AcademyRevenueRollup.revenue, AcademyRevenueRollup.commission)
+            .where(
+                AcademyRevenueRollup.academy_id == academy_id,
+                or_(*(
+                    and_(AcademyRevenueRollup.period == period,
+                         AcademyRevenueRollup.period_start == period_start(period, today))
+                    for period in buckets
+                ))
+            )
+        )
+        for period, revenue, commission in rows:
+            buckets[period] = float(_money(revenue) - _money(commission))
+
+        pending_payments = db.scalar(
+            select(func.count(Payment.id)).where(
+                Payment.academy_id == academy_id, Payment.payment_status == PaymentStatus.PENDING
+            )
+        )
+        active_courses, total_students = db.execute(
+            select(func.count(func.distinct(Course.id)), func.count(func.distinct(StudentCourse.student_id)))
+            .select_from(Course)
+            .outerjoin(StudentCourse, StudentCourse.course_id == Course.id)
+            .where(Course.academy_id == academy_id, Course.course_state == CourseStatus.published)
+        ).one()
+
+        if wallet is None:
+            wallet = AcademyFinance(academy_id=academy_id)
+        total_revenue, total_commission = _money(wallet.total_revenue), _money(wallet.total_commission)
+        updated_at = wallet.updated_at or wallet.created_at
+        return {
+            "academy_id": academy_id,
+            "balance": float(_money(wallet.balance)),
+            "total_earned": float(total_revenue - total_commission),
+            "total_withdrawn": float(_money(wallet.total_withdrawals)),
+            "pending_withdrawals": float(_money(wallet.pending_withdrawals)),
+            "currency": "SAR",
+            "updated_at": updated_at.isoformat() if updated_at else None,
+            "statistics": {
+                "today_earnings": buckets[RollupPeriod.DAY],
+                "week_earnings": buckets[RollupPeriod.WEEK],
+                "month_earnings": buckets[RollupPeriod.MONTH],
+                "pending_payments": pending_payments,
+                "total_students": total_students,
+                "active_courses": active_courses
+            }
+        }
+
+    def get_statistics(
+        self, db: Session, academy_id: int, period: RollupPeriod, today: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """Totals of the current bucket, growth on the previous one and the last buckets for a chart"""
+        today = today or datetime.utcnow().date()
+        starts = [period_start(period, today)]
+        for _ in range(self.CHART_BUCKETS - 1):
+            starts.insert(0, previous_period_start(period, starts[0]))
+
+        rows = {
+            row.period_start: row
+            for row in db.execute(
+                select(AcademyRevenueRollup).where(
+                    AcademyRevenueRollup.academy_id == academy_id,
+                    AcademyRevenueRollup.period == period,
+                    AcademyRevenueRollup.period_start >= starts[0]
+                )
+            ).scalars()
+        }
+        commission_rate = db.scalar(
+            select(AcademyFinance.commission_rate).where(AcademyFinance.academy_id == academy_id)
+        )
+        if commission_rate is None:
+            commission_rate = settings.PLATFORM_COMMISSION_RATE
+
+        def total(start, field):
+            row = rows.get(start)
+            return _money(getattr(row, field)) if row else _money(0)
+
+        current, previous = starts[-1], starts[-2]
+        revenue, commission = total(current, "revenue"), total(current, "commission")
+        payments_count = rows[current].payments_count if current in rows else 0
+        previous_revenue = total(previous, "revenue")
+        growth_rate = (
+            float(((revenue - previous_revenue) / previous_revenue * 100).quantize(CENT))
+            if previous_revenue else 0.0
+        )
+
+        return {
+            "period": period.value,
+            "start_date": current.isoformat(),
+            "end_date": datetime.utcnow().isoformat(),
+            "total_revenue": float(revenue),
+            "total_withdrawals": float(total(current, "withdrawals")),
+            "net_earnings": float(revenue - commission),
+            "commission_rate": round(commission_rate * 100, 2),
+            "commission_paid": float(commission),
+            "transactions_count": payments_count,
+            "average_transaction": float(_money(revenue / payments_count)) if payments_count else 0.0,
+            "growth_rate": growth_rate,
+            "chart_data": {
+                "labels": [self._label(period, start) for start in starts],
+                "revenue": [float(total(start, "revenue")) for start in starts],
+                "withdrawals": [float(total(start, "withdrawals")) for start in starts]
+            }
+        }
+
+    def get_transactions(
+        self,
+        db: Session,
+        academy_id: int,
+        limit: int = 10,
+        cursor: Optional[int] = None,
+        entry_type: Optional[TransactionType] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Wallet entries newest first; pass ``next_cursor`` back to get the following page"""
+        query = select(LedgerEntry).where(
+            LedgerEntry.academy_id == academy_id, LedgerEntry.account == LedgerAccount.ACADEMY_WALLET
+        )
+        if cursor is not None:
+            query = query.where(LedgerEntry.id < cursor)
+        if entry_type is not None:
+            query = query.where(LedgerEntry.entry_type == entry_type)
+        if date_from is not None:
+            query = query.where(LedgerEntry.created_at >= date_from)
+        if date_to is not None:
+            query = query.where(LedgerEntry.created_at <= date_to)
+
+        entries = db.execute(query.order_by(LedgerEntry.id.desc()).limit(limit + 1)).scalars().all()
+        page = entries[:limit]
+        return {
+            "data": [self._transaction(entry) for entry in page],
+            "next_cursor": page[-1].id if len(entries) > limit else None,
+            "limit": limit
+        }
+
+    def get_completed_payments(
+        self, db: Session, academy_id: int, limit: int = 10, cursor: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Paid payments newest first, with lifetime totals from the wallet"""
+        query = (
+            select(Payment, User.id, User.fname, User.lname, User.email)
+            .join(Student, Student.id == Payment.student_id)
+            .join(User, User.id == Student.user_id)
+            .where(Payment.academy_id == academy_id, Payment.payment_status == PaymentStatus.PAID)
+        )
+        if cursor is not None:
+            query = query.where(Payment.id < cursor)
+        rows = db.execute(query.order_by(Payment.id.desc()).limit(limit + 1)).all()
+        page = rows[:limit]
+
+        wallet = db.execute(
+            select(AcademyFinance.total_revenue, AcademyFinance.total_commission, AcademyFinance.payments_count)
+            .where(AcademyFinance.academy_id == academy_id)
+        ).first()
+        total_amount = _money(wallet.total_revenue) if wallet else _money(0)
+        total_commission = _money(wallet.total_commission) if wallet else _money(0)
+
+        data = []
+        for payment, user_id, fname, lname, email in page:
+            amount, commission = _money(payment.amount), _money(payment.platform_fee)
+            data.append({
+                "id": payment.payment_id,
+                "invoice_id": payment.invoice_id,
+                "student": {"id": user_id, "name": f"{fname} {lname}", "email": email},
+                "amount": float(amount),
+                "commission_rate": float((commission / amount * 100).quantize(CENT)) if amount else 0.0,
+                "commission_amount": float(commission),
+                "net_amount": float(_money(payment.net_amount)),
+                "payment_method": payment.payment_method,
+                "status": "completed",
+                "paid_at": (payment.confirmed_at or payment.processed_at or payment.created_at).isoformat()
+            })
+
+        return {
+            "data": data,
+            "next_cursor": page[-1][0].id if len(rows) > limit else None,
+            "summary": {
+                "total_payments": wallet.payments_count if wallet else 0,
+                "total_amount": float(total_amount),
+                "total_commission": float(total_commission),
+                "total_net": float(total_amount - total_commission)
+            },
+            "limit": limit
+        }
+
+    @staticmethod
+    def _transaction(entry: LedgerEntry) -> Dict[str, Any]:
+        credit, debit = _money(entry.credit), _money(entry.debit)
+        balance_after = _money(entry.balance_after)
+        return {
+            "id": entry.id,
+            "academy_id": entry.academy_id,
+            "type": entry.entry_type.value,
+            "direction": "credit" if credit else "debit",
+            "amount": float(credit or debit),
+            "balance_before": float(balance_after - credit + debit),
+            "balance_after": float(balance_after),
+            "description": entry.description,
+            "reference_id": entry.journal_id,
+            "payment_id": entry.payment_id,
+            "withdrawal_id": entry.withdrawal_id,
+            "status": "completed",
+            "created_at": entry.created_at.isoformat()
+        }
+
+    @staticmethod
+    def _label(period: RollupPeriod, start: date) -> str:
+        if period == RollupPeriod.MONTH:
+            return start.strftime("%Y-%m")
+        if period == RollupPeriod.YEAR:
+            return str(start.year)
+        return start.isoformat()
+
+
+wallet_ledger = WalletLedgerService()
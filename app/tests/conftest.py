@@ -6,22 +6,25 @@ This module provides all necessary fixtures for testing including:
 - Test client configuration
 - Authentication fixtures
 - Mock data creation
+- Query counting
 - Cleanup utilities
 """
 
 import pytest
 import tempfile
 import os
+from contextlib import contextmanager
 from typing import Generator, Dict, Any
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.core.config import settings
 from app.db.base import Base
-from app.deps.database import get_db
+from app.deps.database import get_async_db, get_async_read_db, get_db, get_read_db
 from app.models.user import User
 from app.models.student import Student
 from app.models.academy import Academy
@@ -33,6 +36,13 @@ from app.models.exam import Exam, Question, QuestionOption, QuestionType
 from app.models.interactive_tool import InteractiveTool
 from app.models.lesson_progress import LessonProgress
 from app.services.auth_service import auth_service
+from app.tests import query_budget
+
+
+def pytest_configure(config):
+    # Fails tests whose requests run more queries than their route's budget
+    if not config.pluginmanager.has_plugin("query_budget"):
+        config.pluginmanager.register(query_budget, "query_budget")
 
 
 # Test database configuration
@@ -44,6 +54,49 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+try:
+    import aiosqlite
+except ImportError:  # Async endpoints then need a real database
+    aiosqlite = None
+
+
+class SharedSQLiteConnection:
+    """
+    The test connection handed to aiosqlite. Its transaction belongs to
+    db_session and is rolled back after the test, so the async side never
+    commits, rolls back or closes it.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def create_shared_async_engine(db_session: Session):
+    """
+    Async engine over db_session's own connection
+
+    Async endpoints see the rows a test added without committing them,
+    like sync endpoints do through override_get_db.
+    """
+    shared = SharedSQLiteConnection(db_session.connection().connection.driver_connection)
+
+    async def connect():
+        return await aiosqlite.Connection(lambda: shared, iter_chunk_size=64)
+
+    return create_async_engine("sqlite+aiosqlite://", async_creator=connect, poolclass=StaticPool)
+
 
 @pytest.fixture(scope="session")
 def db_engine():
@@ -67,6 +120,29 @@ def db_session(db_engine) -> Generator[Session, None, None]:
     connection.close()
 
 
+@pytest.fixture
+def count_queries(db_engine):
+    """
+    Collect the SQL statements run on the test database
+
+    Usage: ``with count_queries() as statements: ...``
+    """
+    @contextmanager
+    def count():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db_engine, "before_cursor_execute", before_cursor_execute)
+
+    return count
+
+
 @pytest.fixture(scope="function")
 def client(db_session: Session) -> Generator[TestClient, None, None]:
     """Create a test client with database session override"""
@@ -78,9 +154,22 @@ def client(db_session: Session) -> Generator[TestClient, None, None]:
             pass
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+
+    async_engine = create_shared_async_engine(db_session) if aiosqlite else None
+
+    async def override_get_async_db():
+        async with AsyncSession(bind=async_engine, autoflush=False, expire_on_commit=False) as session:
+            yield session
+
+    if async_engine is not None:
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_async_read_db] = override_get_async_db
     
     with TestClient(app) as test_client:
         yield test_client
+        if async_engine is not None:
+            test_client.portal.call(async_engine.dispose)
     
     app.dependency_overrides.clear()
 
@@ -0,0 +1,63 @@
+"""
+Query budgets for the test suite.
+
+A pytest plugin, registered from conftest.py: every request a test makes
+through the app is checked against the budget of its route, and the test
+fails if a route ran more queries than declared. A budget that holds for
+a course with one chapter but not for one with five is an N+1.
+
+- ``ROUTE_BUDGETS`` declares budgets by ``METHOD /path/{template}``.
+- ``@pytest.mark.query_budget("GET /api/v1/...", 4)`` sets or overrides
+  one for a single test.
+"""
+
+from typing import Dict, List
+
+import pytest
+
+from app.db.instrumentation import RequestQueries, query_stats
+
+
+ROUTE_BUDGETS: Dict[str, int] = {
+    # Lessons: authentication, then the lesson with its videos
+    "GET /api/v1/lessons/{lesson_id}": 5,
+    # Chapters: the content tree is a fixed set of queries whatever the lesson count
+    "GET /api/v1/public/courses/{course_id}/chapters": 7,
+    "GET /api/v1/chapters/{chapter_id}": 10,
+    # Cart: one joined query, none when the summary is cached
+    "GET /api/v1/cart/": 1,
+    "GET /api/v1/cart/summary": 1,
+}
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "query_budget(route, queries): fail the test if a request to route runs more queries"
+    )
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    budgets = dict(ROUTE_BUDGETS)
+    # Closest marker last, so a test's own budget wins over its class's
+    for marker in reversed(list(item.iter_markers("query_budget"))):
+        route, queries = marker.args
+        budgets[route] = queries
+    exceeded: List[str] = []
+
+    def check(route: str, queries: RequestQueries):
+        budget = budgets.get(route)
+        if budget is not None and queries.count > budget:
+            repeats = "".join(
+                f"\n    {times}x {statement[:200]}" for statement, times in queries.repeated(2)[:3]
+            )
+            exceeded.append(f"{route}: {queries.count} queries, budget {budget}{repeats}")
+
+    query_stats.listeners.append(check)
+    try:
+        result = yield
+    finally:
+        query_stats.listeners.remove(check)
+    if exceeded:
+        pytest.fail("Query budget exceeded:\n  " + "\n  ".join(exceeded), pytrace=False)
+    return result
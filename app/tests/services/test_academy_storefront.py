@@ -0,0 +1,140 @@
+"""
+Tests for the academy storefront cache.
+
+This module covers:
+- Content versions bumped by CRUDAcademyContent mutations and settings changes
+- Byte-budgeted LRU eviction
+- Public profile served with strong ETags, 304 without queries, and refreshed after edits
+- Section limits, and the path and timestamp written per response around cached data
+"""
+
+import json
+
+from app.crud.academy_content import academy_content
+from app.models.academy import Academy
+from app.models.settings import Settings
+from app.models.template import Faq, Slider
+from app.services.academy_storefront import (
+    AcademyStorefrontService, StorefrontCache, StorefrontEntry, academy_storefront_service
+)
+
+
+def _create_academy(db_session, academy_id=9101, slug="storefront-academy"):
+    academy = Academy(id=academy_id, name="أكاديمية الواجهة", slug=slug, status="active")
+    db_session.add(academy)
+    db_session.commit()
+    return academy
+
+
+def _version(db_session, academy_id):
+    db_session.expire_all()
+    return db_session.get(Academy, academy_id).content_version
+
+
+class TestAcademyStorefront:
+    """Test suite for AcademyStorefrontService"""
+
+    def test_content_mutations_bump_version(self, db_session):
+        """Every CRUDAcademyContent write moves the academy to a new version"""
+        academy = _create_academy(db_session)
+        other = _create_academy(db_session, 9102, "storefront-other")
+        versions = [_version(db_session, academy.id)]
+
+        slider = academy_content.create_slider(db_session, academy.id, {"image": "s.jpg", "title": "عرض"})
+        versions.append(_version(db_session, academy.id))
+        faq = academy_content.create_faq(db_session, academy.id, {"question": "سؤال؟", "answer": "جواب"})
+        versions.append(_version(db_session, academy.id))
+        academy_content.update_faq(db_session, faq.id, academy.id, {"answer": "جواب محدث"})
+        versions.append(_version(db_session, academy.id))
+        academy_content.delete_slider(db_session, slider.id, academy.id)
+        versions.append(_version(db_session, academy.id))
+
+        assert versions == sorted(set(versions))
+        assert _version(db_session, other.id) == 1
+
+        db_session.add(Settings(title="المنصة"))
+        db_session.commit()
+        assert _version(db_session, other.id) == 2
+
+    def test_byte_budget_eviction(self):
+        """The least recently used bodies go first once the budget is exceeded"""
+        cache = StorefrontCache(max_bytes=250)
+        for academy_id in range(3):
+            cache.put(("profile", academy_id), StorefrontEntry(1, f'"{academy_id}"', b"x" * 100, None))
+
+        assert len(cache) == 2 and cache.bytes_used == 200
+        assert cache.get(("profile", 0), 1) is None
+        assert cache.get(("profile", 2), 1) is not None
+        assert cache.get(("profile", 2), 2) is None
+
+        cache.put(("profile", 9), StorefrontEntry(1, '"big"', b"x" * 300, None))
+        assert cache.get(("profile", 9), 1) is None
+
+    def test_public_profile_etag_and_304(self, client, count_queries, db_session):
+        """Repeat visits get 304 without a query; edits change the ETag"""
+        academy = _create_academy(db_session)
+        academy_content.create_faq(db_session, academy.id, {"question": "كم المدة؟", "answer": "شهر"})
+        academy_storefront_service.cache.clear()
+        url = "/api/v1/academy/profile/public/storefront-academy"
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "public, no-cache"
+        etag = response.headers["etag"]
+        assert not etag.startswith("W/")
+        assert response.json()["data"]["faqs"][0]["answer"] == "شهر"
+
+        with count_queries() as statements:
+            assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        assert statements == []
+
+        academy_content.create_slider(db_session, academy.id, {"image": "hero.jpg", "title": "جديد"})
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["data"]["sliders"][0]["title"] == "جديد"
+
+        assert client.get("/api/v1/academy/profile/public/missing-academy").status_code == 404
+
+    def test_remembered_version_expires(self, db_session):
+        """Without a local commit, a version is re-read after the TTL"""
+        academy = _create_academy(db_session)
+        service = AcademyStorefrontService(version_ttl_seconds=0)
+        first = service.public_profile(db_session, academy.slug)
+
+        db_session.query(Academy).filter(Academy.id == academy.id).update({"name": "اسم جديد"})
+        db_session.query(Academy).filter(Academy.id == academy.id).update(
+            {"content_version": Academy.content_version + 1}
+        )
+        second = service.public_profile(db_session, "storefront-academy")
+
+        assert second.etag != first.etag
+        assert second.data["academy"]["name"] == "اسم جديد"
+
+    def test_section_limits_and_per_response_envelope(self, client, db_session):
+        """The profile shows ten rows per section and the content page a hundred; each response has its own path"""
+        academy = _create_academy(db_session)
+        db_session.add_all([
+            Slider(academy_id=academy.id, image=f"{n}.jpg", order=n, is_active=n % 2 == 0) for n in range(210)
+        ])
+        db_session.add_all([Faq(academy_id=academy.id, question=f"{n}؟", answer="نعم", order=n) for n in range(12)])
+        db_session.commit()
+        academy_storefront_service.cache.clear()
+
+        profile = academy_storefront_service.public_profile(db_session, academy.slug).data
+        assert [slider["order"] for slider in profile["sliders"]] == list(range(0, 20, 2))
+        assert len(profile["faqs"]) == 10
+        content = academy_storefront_service.academy_content(db_session, academy.id)
+        assert [slider["order"] for slider in content.data["sliders"]] == list(range(100))
+        assert len(content.data["faqs"]) == 12
+
+        first = content.response("/api/v1/academy/9101/content")
+        second = academy_storefront_service.academy_content(db_session, academy.id).response("/elsewhere")
+        assert first.headers["etag"] == second.headers["etag"]
+        assert json.loads(first.body)["path"] == "/api/v1/academy/9101/content"
+        assert json.loads(second.body)["path"] == "/elsewhere"
+        assert json.loads(second.body)["data"] == content.data
+
+        response = client.get(f"/api/v1/academy/profile/public/{academy.slug}")
+        assert response.json()["path"] == f"/api/v1/academy/profile/public/{academy.slug}"
+        assert response.json()["message"] == "تم جلب بروفايل الأكاديمية العام بنجاح"
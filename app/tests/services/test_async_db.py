@@ -0,0 +1,157 @@
+"""
+Tests for the async database path.
+
+This module covers:
+- Async driver URLs derived from the sync DATABASE_URL
+- Migrated endpoints (public catalog, course content tree, cart, /me) reading through get_async_db
+- Throughput vs concurrent clients benchmark for the sync and async sessions
+"""
+
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, event, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.api.v1.courses.public import get_featured_courses
+from app.core.security import create_access_token
+from app.db.session import async_database_url
+from app.models.academy import Academy
+from app.models.cart import Cart
+from app.models.course import Category, Course, CourseStatus
+from app.models.product import Product, ProductType
+from app.models.student import Student
+from app.models.user import User
+from app.tests.conftest import create_shared_async_engine
+
+
+def _create_course(db, featured=False):
+    academy = db.get(Academy, 9481) or Academy(id=9481, name="أكاديمية غير متزامنة", slug="async-academy")
+    category = Category(title="عام", slug=f"async-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=academy.id, title="دورة", price=Decimal("150.00"), product_type=ProductType.course)
+    db.add_all([academy, category, product])
+    db.flush()
+    course = Course(
+        product_id=product.id, academy_id=academy.id, category_id=category.id, trainer_id=1,
+        slug=f"async-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s",
+        course_state=CourseStatus.published, featured=featured
+    )
+    db.add(course)
+    db.commit()
+    return course
+
+
+class TestAsyncDatabase:
+    """Test suite for get_async_db and the endpoints on it"""
+
+    def test_async_database_url(self):
+        """The sync URL's driver is swapped; credentials and query are kept"""
+        assert async_database_url("mysql+pymysql://app:p%40ss@db:3306/sayan?charset=utf8mb4") == (
+            "mysql+aiomysql://app:p%40ss@db:3306/sayan?charset=utf8mb4"
+        )
+        assert async_database_url("mysql://app@db/sayan") == "mysql+aiomysql://app@db/sayan"
+        assert async_database_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+        assert async_database_url("postgresql+asyncpg://db/sayan") == "postgresql+asyncpg://db/sayan"
+
+    def test_migrated_endpoints(self, client, db_session):
+        """Rows the test added are read back through the async session"""
+        featured = _create_course(db_session, featured=True)
+        other = _create_course(db_session)
+
+        # /public/courses/featured is matched by /public/courses/{course_id} first; call the handler
+        async def featured_courses():
+            async_engine = create_shared_async_engine(db_session)
+            try:
+                async with AsyncSession(async_engine) as db:
+                    return await get_featured_courses(limit=8, current_user=None, db=db)
+            finally:
+                await async_engine.dispose()
+
+        assert [course["id"] for course in asyncio.run(featured_courses())["data"]] == [featured.id]
+
+        response = client.get("/api/v1/public/courses", params={"academy_id": 9481})
+        assert response.status_code == 200, response.text
+        assert {course["id"] for course in response.json()["data"]["courses"]} == {featured.id, other.id}
+
+        response = client.get(f"/api/v1/public/courses/{featured.id}/chapters")
+        assert response.status_code == 200 and response.json()["data"]["total"] == 0
+
+        db_session.add(Cart(id=str(uuid.uuid4()), cookie_id="async-cart", product_id=featured.product_id))
+        db_session.commit()
+        response = client.get("/api/v1/cart/summary", headers={"TheCookie": "async-cart"})
+        assert response.status_code == 200
+        assert response.json()["data"]["count"] == 1
+
+        db_session.add(User(id=9482, fname="طالب", lname="غير متزامن", email="async9482@example.com", user_type="student"))
+        db_session.add(Student(id=9482, user_id=9482))
+        db_session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(subject=9482, user_type='student')}"}
+        response = client.get("/api/v1/me", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["data"]["student_profile"]["id"] == 9482
+
+    @pytest.mark.slow
+    def test_benchmark_throughput_vs_concurrency(self, tmp_path):
+        """Requests per second of an async handler on a sync Session vs an AsyncSession"""
+        round_trip = 0.004  # Emulated network round trip to the database, spent in the driver
+        path = tmp_path / "bench.db"
+        metadata = MetaData()
+        courses = Table("courses", metadata, Column("id", Integer, primary_key=True), Column("title", String(100)))
+
+        def register_round_trip(dbapi_connection, connection_record):
+            dbapi_connection.create_function("round_trip", 0, lambda: time.sleep(round_trip) or 1)
+
+        sync_engine = create_engine(f"sqlite:///{path}", pool_size=5, max_overflow=10)
+        event.listen(sync_engine, "connect", register_round_trip)
+        metadata.create_all(sync_engine)
+        with sync_engine.begin() as connection:
+            connection.execute(insert(courses), [{"id": n, "title": f"دورة {n}"} for n in range(200)])
+        async_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool, pool_size=10, max_overflow=10
+        )
+        event.listen(async_engine.sync_engine, "connect", register_round_trip)
+
+        query = select(func.count(courses.c.id), func.round_trip()).where(courses.c.id < 100)
+
+        async def sync_handler():
+            # What the handlers did before: a sync Session inside async def
+            with Session(sync_engine) as db:
+                return db.execute(query).one()
+
+        async def async_handler():
+            async with AsyncSession(async_engine) as db:
+                return (await db.execute(query)).one()
+
+        async def throughput(handler, clients, requests=200):
+            async def client():
+                for _ in range(requests // clients):
+                    assert (await handler())[0] == 100
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(clients)))
+            return requests // clients * clients / (time.perf_counter() - start)
+
+        async def run():
+            results = {}
+            for clients in (1, 4, 16, 50):
+                results[clients] = (await throughput(sync_handler, clients), await throughput(async_handler, clients))
+            await async_engine.dispose()
+            return results
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            sync_engine.dispose()
+
+        print(f"\nRequests per second with a {round_trip * 1000:.0f}ms database round trip:")
+        print(f"  {'clients':>8} {'sync Session':>14} {'AsyncSession':>14}")
+        for clients, (sync_rps, async_rps) in results.items():
+            print(f"  {clients:>8} {sync_rps:>14.0f} {async_rps:>14.0f}")
+
+        assert results[16][1] > 3 * results[16][0]
+        assert results[50][0] < 1.5 * results[1][0]  # The sync path does not scale with clients
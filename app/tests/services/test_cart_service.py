@@ -0,0 +1,154 @@
+"""
+Tests for the cart read model and cached cart summaries.
+
+This module covers:
+- Cart rows, products and courses loaded in one query with effective prices
+- Guest carts merged into the student's cart once, not on every read
+- Every token-issuing path merging the guest cart of the TheCookie header
+- Badge summaries served from cache and dropped on add, remove, clear and price changes
+- Cached summaries expiring with the earliest discount in the cart
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.api.v1.auth.auth_utils import generate_user_tokens
+from app.models.cart import Cart
+from app.models.course import Course, Category, CourseStatus
+from app.models.product import Product, ProductType
+from app.models.student import Student
+from app.models.user import User
+from app.services.cart_service import CartService, CartSummaryCache, cart_summary_cache
+
+
+def _create_course(db_session, price="100.00", discount_price=None, discount_days=None):
+    category = Category(title="عام", slug=f"cart-{uuid.uuid4().hex[:8]}")
+    product = Product(
+        academy_id=1, title=f"دورة {price}", price=Decimal(price), product_type=ProductType.course,
+        discount_price=Decimal(discount_price) if discount_price else None,
+        discount_ends_at=datetime.utcnow() + timedelta(days=discount_days) if discount_days else None
+    )
+    db_session.add_all([category, product])
+    db_session.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"cart-{uuid.uuid4().hex[:8]}", image="course.jpg", content="c", short_content="ملخص",
+        course_state=CourseStatus.published
+    )
+    db_session.add(course)
+    db_session.commit()
+    return course
+
+
+def _add(db_session, course, student_id=None, cookie_id=None):
+    result = CartService.add_to_cart(db_session, "course", course.id, student_id, cookie_id)
+    assert result["success"], result
+    return result["data"]["cart_id"]
+
+
+class TestCartService:
+    """Test suite for CartService"""
+
+    def test_items_loaded_in_one_query(self, count_queries, db_session):
+        """Items keep their shape and prices; the read is a single query"""
+        discounted = _create_course(db_session, "200.00", "150.00", discount_days=3)
+        expired = _create_course(db_session, "80.00", "40.00", discount_days=-1)
+        for course in (discounted, expired):
+            _add(db_session, course, student_id=7001)
+        # A second course on the same product must not duplicate the cart line
+        db_session.add(Course(
+            product_id=discounted.product_id, academy_id=1, category_id=discounted.category_id, trainer_id=1,
+            slug=f"cart-{uuid.uuid4().hex[:8]}", image="other.jpg", content="c", short_content="s",
+            course_state=CourseStatus.published
+        ))
+        db_session.commit()
+
+        with count_queries() as queries:
+            result = CartService.get_cart_summary(db_session, student_id=7001)
+        assert len(queries) == 1
+
+        data = result["data"]
+        first, second = data["items"]
+        assert (first["price"], first["original_price"], first["discount_amount"]) == (150.0, 200.0, 50.0)
+        assert first["has_discount"] and first["image"] == "course.jpg" and first["description"] == "ملخص"
+        assert (second["price"], second["has_discount"]) == (80.0, False)
+        assert "_discount_ends_at" not in first
+        assert (data["count"], data["subtotal"], data["total_discount"]) == (2, 230.0, 50.0)
+
+        cart = db_session.query(Cart).filter(Cart.id == first["cart_id"]).one()
+        assert {key: first[key] for key in cart.get_item_details()} == cart.get_item_details()
+
+    def test_guest_cart_merged_once(self, db_session):
+        """Login moves guest rows and drops duplicates; reads leave guest rows alone"""
+        owned, shared, new = (_create_course(db_session) for _ in range(3))
+        _add(db_session, owned, student_id=7002)
+        _add(db_session, shared, student_id=7002)
+        _add(db_session, shared, cookie_id="guest-cookie")
+        _add(db_session, new, cookie_id="guest-cookie")
+
+        CartService.get_cart_items(db_session, student_id=7002, cookie_id="guest-cookie")
+        assert db_session.query(Cart).filter(Cart.cookie_id == "guest-cookie", Cart.student_id.is_(None)).count() == 2
+
+        assert CartService.migrate_guest_cart(db_session, 7002, "guest-cookie") == 1
+        items = CartService.get_cart_items(db_session, student_id=7002)["data"]["items"]
+        assert sorted(item["id"] for item in items) == sorted(str(c.product_id) for c in (owned, shared, new))
+        assert CartService.get_cart_items(db_session, cookie_id="guest-cookie")["data"]["count"] == 0
+        assert CartService.migrate_guest_cart(db_session, 7002, "guest-cookie") == 0
+
+    def test_issuing_tokens_merges_guest_cart(self, db_session):
+        """Registration, OTP and refresh share generate_user_tokens, which merges the header's guest cart"""
+        user = User(id=7003, fname="طالب", lname="جديد", email="tokens7003@example.com", user_type="student")
+        db_session.add_all([user, Student(id=7003, user_id=7003)])
+        db_session.commit()
+        _add(db_session, _create_course(db_session), cookie_id="token-cookie")
+
+        generate_user_tokens(user, db_session)
+        assert CartService.get_cart_items(db_session, student_id=7003)["data"]["count"] == 0
+
+        tokens = generate_user_tokens(user, db_session, " token-cookie ")
+        assert tokens.access_token
+        assert CartService.get_cart_items(db_session, student_id=7003)["data"]["count"] == 1
+        assert CartService.get_cart_items(db_session, cookie_id="token-cookie")["data"]["count"] == 0
+
+    def test_badge_cached_until_cart_changes(self, count_queries, db_session):
+        """Repeat badge calls run no query; writes and price changes refresh it"""
+        cart_summary_cache.invalidate()
+        first, second = _create_course(db_session, "100.00"), _create_course(db_session, "50.00")
+        _add(db_session, first, cookie_id="badge-cookie")
+        assert CartService.get_cart_badge(db_session, cookie_id="badge-cookie")["data"]["count"] == 1
+
+        with count_queries() as queries:
+            badge = CartService.get_cart_badge(db_session, cookie_id="badge-cookie")["data"]
+        assert queries == []
+        assert (badge["count"], badge["subtotal"]) == (1, 100.0)
+
+        cart_id = _add(db_session, second, cookie_id="badge-cookie")
+        assert CartService.get_cart_badge(db_session, cookie_id="badge-cookie")["data"]["subtotal"] == 150.0
+
+        product = db_session.get(Product, second.product_id)
+        product.price = Decimal("70.00")
+        db_session.commit()
+        assert CartService.get_cart_badge(db_session, cookie_id="badge-cookie")["data"]["subtotal"] == 170.0
+
+        CartService.remove_from_cart(db_session, cart_id, cookie_id="badge-cookie")
+        assert CartService.get_cart_badge(db_session, cookie_id="badge-cookie")["data"]["count"] == 1
+
+        CartService.clear_cart(db_session, cookie_id="badge-cookie")
+        assert CartService.get_cart_badge(db_session, cookie_id="badge-cookie")["data"]["count"] == 0
+
+    def test_summary_expires_with_discount(self):
+        """A summary priced with a discount is not served after the discount ends"""
+        cache = CartSummaryCache(max_entries=2, ttl_seconds=60)
+        cache.put(("guest", "a"), {"count": 1}, datetime.utcnow() - timedelta(seconds=1))
+        cache.put(("guest", "b"), {"count": 2}, datetime.utcnow() + timedelta(days=1))
+        assert cache.get(("guest", "a")) is None
+        assert cache.get(("guest", "b")) == {"count": 2}
+
+        cache.put(("guest", "c"), {"count": 3})
+        cache.put(("guest", "d"), {"count": 4})
+        assert len(cache) == 2 and cache.get(("guest", "b")) is None
+
+        expired = CartSummaryCache(ttl_seconds=0)
+        expired.put(("guest", "e"), {"count": 5})
+        assert expired.get(("guest", "e")) is None
@@ -0,0 +1,217 @@
+"""
+Tests for streamed AI chat replies.
+
+This module covers:
+- SSE framing of token deltas
+- Persisting the assembled reply once at the end
+- Cancelling upstream generation on client disconnect
+- Time-to-first-byte against a local streaming stub
+"""
+
+import asyncio
+import json
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app.core.ai_config import AIServiceConfig, AIProvider, AIServiceType
+from app.models.ai_assistant import SenderType
+from app.services.ai.openai_service import OpenAIChatService
+from app.services.ai.chat_streaming import format_sse, stream_conversation_reply
+
+
+def _chunk(content=None, finish_reason=None, usage=None):
+    choices = []
+    if content is not None or finish_reason is not None:
+        choices = [SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class StubStream:
+    """Async iterator mimicking openai's AsyncStream"""
+
+    def __init__(self, tokens, delay=0.0):
+        self.tokens = tokens
+        self.delay = delay
+        self.closed = False
+        self.sent = 0
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for token in self.tokens:
+            if self.closed:
+                return
+            await asyncio.sleep(self.delay)
+            self.sent += 1
+            yield _chunk(content=token)
+        yield _chunk(finish_reason="stop")
+        yield _chunk(usage=SimpleNamespace(prompt_tokens=12, completion_tokens=len(self.tokens), total_tokens=12 + len(self.tokens)))
+
+    async def close(self):
+        self.closed = True
+
+
+class StubCompletions:
+    """Stands in for ``async_client.chat.completions``"""
+
+    def __init__(self, tokens, delay=0.0):
+        self.tokens = tokens
+        self.delay = delay
+        self.streams = []
+
+    async def create(self, stream=False, **kwargs):
+        if stream:
+            upstream = StubStream(self.tokens, self.delay)
+            self.streams.append(upstream)
+            return upstream
+        # Non-streaming path waits for the whole generation
+        await asyncio.sleep(self.delay * len(self.tokens))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(
+                message=SimpleNamespace(content="".join(self.tokens), role="assistant"),
+                finish_reason="stop"
+            )],
+            usage=SimpleNamespace(prompt_tokens=12, completion_tokens=len(self.tokens), total_tokens=12 + len(self.tokens))
+        )
+
+
+def _make_service(tokens, delay=0.0):
+    config = AIServiceConfig(
+        provider=AIProvider.OPENAI,
+        service_type=AIServiceType.CHAT_COMPLETION,
+        api_key="test-key",
+        model_name="gpt-4",
+        rate_limit_per_minute=10000
+    )
+    service = OpenAIChatService(config)
+    completions = StubCompletions(tokens, delay)
+    service.async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service, completions
+
+
+def _parse_frames(frames):
+    events = []
+    for frame in frames:
+        lines = frame.strip().split("\n")
+        event = lines[0].split(": ", 1)[1]
+        data = json.loads(lines[1].split(": ", 1)[1])
+        events.append((event, data))
+    return events
+
+
+async def _collect(generator, limit=None):
+    frames = []
+    async for frame in generator:
+        frames.append(frame)
+        if limit and len(frames) >= limit:
+            break
+    await generator.aclose()
+    return frames
+
+
+@patch.object(OpenAIChatService, "_log_metric")
+class TestChatStreaming:
+    """Test suite for SSE chat streaming"""
+
+    def test_format_sse(self, mock_log):
+        """Frames carry the event name and UTF-8 JSON payload"""
+        frame = format_sse({"content": "مرحبا"}, event="delta")
+
+        assert frame == 'event: delta\ndata: {"content": "مرحبا"}\n\n'
+
+    def test_stream_emits_deltas_and_persists_once(self, mock_log):
+        """Every token is proxied and the reply is saved in one commit"""
+        service, _ = _make_service(["مر", "حبا", " بك"])
+        session = MagicMock()
+        session_factory = MagicMock(return_value=session)
+        session.__enter__.return_value = session
+
+        frames = asyncio.run(_collect(stream_conversation_reply(
+            service=service,
+            conversation_id="conv-1",
+            messages=[{"role": "user", "content": "سلام"}],
+            session_factory=session_factory
+        )))
+        events = _parse_frames(frames)
+
+        assert [e for e, _ in events] == ["start", "delta", "delta", "delta", "done"]
+        assert "".join(d["content"] for e, d in events if e == "delta") == "مرحبا بك"
+        assert events[-1][1]["usage"]["total_tokens"] == 15
+
+        session_factory.assert_called_once()
+        session.commit.assert_called_once()
+        saved = session.add.call_args[0][0]
+        assert saved.message == "مرحبا بك"
+        assert saved.sender_type == SenderType.AI
+        assert saved.id == events[0][1]["message_id"]
+
+        logged = mock_log.call_args.kwargs
+        assert logged["success"] is True
+        assert logged["tokens_used"] == 15
+
+    def test_disconnect_cancels_upstream(self, mock_log):
+        """Client disconnect closes the upstream stream and keeps the partial reply"""
+        service, completions = _make_service(["a", "b", "c", "d", "e"])
+        session = MagicMock()
+        session.__enter__.return_value = session
+
+        calls = {"count": 0}
+
+        async def is_disconnected():
+            calls["count"] += 1
+            return calls["count"] > 2
+
+        request = SimpleNamespace(is_disconnected=is_disconnected)
+
+        frames = asyncio.run(_collect(stream_conversation_reply(
+            service=service,
+            conversation_id="conv-1",
+            messages=[{"role": "user", "content": "hi"}],
+            request=request,
+            session_factory=MagicMock(return_value=session)
+        )))
+        events = _parse_frames(frames)
+
+        assert [e for e, _ in events] == ["start", "delta", "delta"]
+        assert completions.streams[0].closed is True
+        assert completions.streams[0].sent < 5
+        assert session.add.call_args[0][0].message == "ab"
+        assert mock_log.call_args.kwargs["success"] is False
+
+    @pytest.mark.slow
+    def test_benchmark_time_to_first_byte(self, mock_log):
+        """Streaming delivers the first token long before the full completion"""
+        tokens = [f"token{i} " for i in range(40)]
+        delay = 0.01
+        service, _ = _make_service(tokens, delay)
+
+        async def measure_streaming():
+            start = time.perf_counter()
+            generator = stream_conversation_reply(
+                service=service,
+                conversation_id="conv-1",
+                messages=[{"role": "user", "content": "hi"}],
+                session_factory=MagicMock()
+            )
+            first_delta = None
+            async for frame in generator:
+                if first_delta is None and frame.startswith("event: delta"):
+                    first_delta = time.perf_counter() - start
+            return first_delta, time.perf_counter() - start
+
+        async def measure_blocking():
+            start = time.perf_counter()
+            await service.generate_completion(messages=[{"role": "user", "content": "hi"}])
+            return time.perf_counter() - start
+
+        ttfb_stream, total_stream = asyncio.run(measure_streaming())
+        ttfb_blocking = asyncio.run(measure_blocking())
+
+        print(
+            f"\nTTFB streaming: {ttfb_stream * 1000:.1f}ms "
+            f"(total {total_stream * 1000:.1f}ms), blocking: {ttfb_blocking * 1000:.1f}ms"
+        )
+        assert ttfb_stream < ttfb_blocking / 5
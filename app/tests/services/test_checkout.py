@@ -0,0 +1,233 @@
+"""
+Tests for the batched checkout pipeline in PaymentService.
+
+This module covers:
+- Invoices and lines written in a fixed number of queries whatever the cart size
+- Coupon discount, tax and totals
+- Conditional coupon redemption refusing coupons exhausted by another checkout
+- One enrollment upsert that reactivates existing enrollments
+- 500 parallel checkouts racing for one limited coupon
+- Checkout latency benchmark
+"""
+
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.base import Base
+from app.models.cart import Cart
+from app.models.course import Course, Category, CourseStatus
+from app.models.marketing import Coupon, CouponType
+from app.models.payment import Invoice, InvoiceProduct, CouponUsage
+from app.models.product import Product, ProductType
+from app.models.student import Student
+from app.models.student_course import StudentCourse
+from app.models.user import User
+from app.services.payment_service import PaymentService
+
+
+def _create_student(db, student_id):
+    db.add(User(
+        id=student_id, fname="طالب", lname=str(student_id), email=f"student{student_id}@example.com",
+        phone_number=f"+9665{student_id:08d}", user_type="student"
+    ))
+    db.add(Student(id=student_id, user_id=student_id))
+    db.flush()
+    return student_id
+
+
+def _create_courses(db, count, academy_id=1, price="100.00"):
+    category = Category(title="عام", slug=f"checkout-{uuid.uuid4().hex[:8]}")
+    db.add(category)
+    db.flush()
+    products = [
+        Product(academy_id=academy_id, title=f"دورة {i}", price=Decimal(price), product_type=ProductType.course)
+        for i in range(count)
+    ]
+    db.add_all(products)
+    db.flush()
+    courses = [
+        Course(
+            product_id=product.id, academy_id=academy_id, category_id=category.id, trainer_id=1,
+            slug=f"checkout-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s",
+            course_state=CourseStatus.published
+        )
+        for product in products
+    ]
+    db.add_all(courses)
+    db.flush()
+    return courses
+
+
+def _fill_cart(db, student_id, courses):
+    db.add_all([
+        Cart(id=str(uuid.uuid4()), student_id=student_id, product_id=course.product_id) for course in courses
+    ])
+    db.flush()
+
+
+def _coupon(db, code="SAVE10", **values):
+    coupon = Coupon(academy_id=1, code=code, type=CouponType.PERCENTAGE, value=10, used_count=0, **values)
+    db.add(coupon)
+    db.flush()
+    return coupon
+
+
+@pytest.fixture
+def checkout_settings(monkeypatch):
+    monkeypatch.setattr(settings, "TAX_ENABLED", True)
+    monkeypatch.setattr(settings, "TAX_RATE", 0.15)
+    monkeypatch.setattr(settings, "TAX_INCLUSIVE", False)
+    monkeypatch.setattr(settings, "MOYASAR_API_KEY", "sk_test_checkout")
+
+
+class TestCheckout:
+    """Test suite for PaymentService checkout"""
+
+    def test_fixed_query_count(self, count_queries, db_session, checkout_settings):
+        """A 20-item cart checks out in as many queries as a 1-item cart"""
+        counts = []
+        for student_id, size in ((8101, 1), (8102, 20)):
+            _create_student(db_session, student_id)
+            _fill_cart(db_session, student_id, _create_courses(db_session, size))
+            db_session.commit()
+            with count_queries() as queries:
+                result = PaymentService(db_session).create_invoice_from_cart(student_id)
+            counts.append(len(queries))
+            assert len(result["items"]) == size
+
+        assert counts[0] == counts[1]
+        lines = db_session.query(InvoiceProduct).filter(InvoiceProduct.invoice_id == result["invoice_id"]).count()
+        assert lines == 20
+
+    def test_totals_with_coupon_and_tax(self, db_session, checkout_settings):
+        """Percentage coupons apply to their academy's lines, capped by maximum_discount"""
+        student_id = _create_student(db_session, 8103)
+        courses = _create_courses(db_session, 2) + _create_courses(db_session, 1, academy_id=2, price="50.00")
+        _fill_cart(db_session, student_id, courses)
+        coupon = _coupon(db_session, maximum_discount=15)
+        db_session.commit()
+
+        result = PaymentService(db_session).create_invoice_from_cart(student_id, coupon_code="save10")
+        invoice = db_session.get(Invoice, result["invoice_id"])
+
+        assert (invoice.subtotal, invoice.discount_amount) == (Decimal("250.00"), Decimal("15.00"))
+        assert (invoice.tax_amount, invoice.total_amount) == (Decimal("35.25"), Decimal("270.25"))
+        assert invoice.academy_id == 1 and invoice.coupon_code == "SAVE10"
+        db_session.refresh(coupon)
+        assert coupon.used_count == 1
+        assert db_session.query(CouponUsage).filter(CouponUsage.invoice_id == invoice.id).count() == 1
+
+    def test_exhausted_coupon_refused(self, db_session, checkout_settings):
+        """The limit is checked by the UPDATE, not by the coupon the session loaded"""
+        student_id = _create_student(db_session, 8104)
+        _fill_cart(db_session, student_id, _create_courses(db_session, 1))
+        coupon = _coupon(db_session, code="ONCE", usage_limit=1)
+        db_session.commit()
+        assert coupon.used_count == 0
+
+        # Another checkout takes the last use behind this session's back
+        db_session.query(Coupon).filter(Coupon.id == coupon.id).update(
+            {"used_count": 1}, synchronize_session=False
+        )
+        db_session.commit()
+
+        with pytest.raises(ValueError, match="الحد الأقصى"):
+            PaymentService(db_session).create_invoice_from_cart(student_id, coupon_code="ONCE")
+
+    def test_enrollment_upsert(self, db_session, checkout_settings):
+        """Paid courses are enrolled in one statement; existing enrollments are reactivated"""
+        student_id = _create_student(db_session, 8105)
+        courses = _create_courses(db_session, 3)
+        _fill_cart(db_session, student_id, courses)
+        db_session.add(StudentCourse(student_id=student_id, course_id=courses[0].id, status="cancelled"))
+        db_session.commit()
+
+        service = PaymentService(db_session)
+        invoice_id = service.create_invoice_from_cart(student_id)["invoice_id"]
+        result = service._process_course_enrollments(invoice_id)
+
+        actions = {row["course_id"]: row["action"] for row in result["enrolled_courses"]}
+        assert actions == {courses[0].id: "updated", courses[1].id: "enrolled", courses[2].id: "enrolled"}
+        enrollments = db_session.query(StudentCourse).filter(StudentCourse.student_id == student_id).all()
+        assert len(enrollments) == 3
+        assert {enrollment.status for enrollment in enrollments} == {"active"}
+        assert {enrollment.paid_amount for enrollment in enrollments} == {Decimal("100.00")}
+
+        service._process_course_enrollments(invoice_id)
+        assert db_session.query(StudentCourse).filter(StudentCourse.student_id == student_id).count() == 3
+
+    def test_parallel_checkouts_respect_coupon_limit(self, tmp_path, checkout_settings):
+        """500 students check out at once; exactly usage_limit of them get the coupon"""
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'checkout.db'}",
+            connect_args={"check_same_thread": False, "timeout": 60, "isolation_level": None}
+        )
+
+        # SQLite has one writer; take its lock when the transaction begins rather than upgrading mid-way
+        @event.listens_for(engine, "begin")
+        def begin_immediate(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine, autoflush=False)
+        students = range(9000, 9500)
+        with SessionLocal() as db:
+            course = _create_courses(db, 1)[0]
+            for student_id in students:
+                _create_student(db, student_id)
+            db.add_all([
+                Cart(id=str(uuid.uuid4()), student_id=student_id, product_id=course.product_id)
+                for student_id in students
+            ])
+            coupon_id = _coupon(db, code="LIMITED", usage_limit=50).id
+            db.commit()
+
+        def checkout(student_id):
+            with SessionLocal() as db:
+                try:
+                    PaymentService(db).create_invoice_from_cart(student_id, coupon_code="LIMITED")
+                    return True
+                except ValueError:
+                    return False
+
+        try:
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                outcomes = list(pool.map(checkout, students))
+
+            with SessionLocal() as db:
+                used_count = db.get(Coupon, coupon_id).used_count
+                usages = db.scalar(select(func.count(CouponUsage.id)).where(CouponUsage.coupon_id == coupon_id))
+                invoices = db.scalar(select(func.count(Invoice.id)).where(Invoice.coupon_code == "LIMITED"))
+        finally:
+            engine.dispose()
+
+        assert sum(outcomes) == used_count == usages == invoices == 50
+
+    @pytest.mark.slow
+    def test_benchmark_checkout_latency(self, db_session, checkout_settings):
+        """Checkout latency for 200 carts of 10 courses"""
+        courses = _create_courses(db_session, 10)
+        students = [_create_student(db_session, 8200 + i) for i in range(200)]
+        for student_id in students:
+            _fill_cart(db_session, student_id, courses)
+        db_session.commit()
+
+        service = PaymentService(db_session)
+        timings = []
+        for student_id in students:
+            start = time.perf_counter()
+            service.create_invoice_from_cart(student_id)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p50, p95 = statistics.median(timings), timings[int(len(timings) * 0.95)]
+        print(f"\nCheckout bench (200 carts x 10 courses): p50 {p50:.2f}ms, p95 {p95:.2f}ms")
+        assert p95 < 100
@@ -0,0 +1,138 @@
+"""
+Tests for the maintained course and chapter content aggregates.
+
+This module covers:
+- Lesson create, update and delete recomputing chapter and course aggregates
+- Moving a lesson between chapters
+- Video uploads and soft deletes counted through their lesson
+- Catalog rows picking up the course lesson count
+- Backfill of drifted aggregates with recompute_all
+"""
+
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from app.models.chapter import Chapter
+from app.models.course import Course, Category, CourseStatus
+from app.models.course_catalog import CourseCatalog
+from app.models.lesson import Lesson
+from app.models.product import Product
+from app.models.video import Video
+from app.services.content_aggregates import ContentAggregateService, chapter_statistics
+
+
+def _create_course(db_session):
+    category = Category(title="عام", slug=f"aggregates-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=1, title="دورة المحتوى", price=Decimal("100.00"))
+    db_session.add_all([category, product])
+    db_session.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"aggregates-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s",
+        course_state=CourseStatus.published
+    )
+    db_session.add(course)
+    db_session.flush()
+    chapters = [
+        Chapter(course_id=course.id, title=f"الفصل {i}", order_number=i) for i in range(2)
+    ]
+    db_session.add_all(chapters)
+    db_session.commit()
+    return course, chapters
+
+
+def _lesson(chapter, lesson_type="video", duration=0, size=0, free=False):
+    return Lesson(
+        chapter_id=chapter.id, course_id=chapter.course_id, title="درس", type=lesson_type,
+        video_duration=duration, size_bytes=size, is_free_preview=free
+    )
+
+
+class TestContentAggregates:
+    """Test suite for ContentAggregateService"""
+
+    def test_lesson_writes_recompute_aggregates(self, db_session):
+        """Create, update and delete keep chapter and course totals exact"""
+        course, (first, second) = _create_course(db_session)
+        video = _lesson(first, duration=600, size=2048, free=True)
+        db_session.add_all([video, _lesson(first, duration=300), _lesson(first, "exam"), _lesson(second, "tool")])
+        db_session.commit()
+
+        assert (first.lessons_count, first.video_lessons_count, first.exam_lessons_count) == (3, 2, 1)
+        assert (first.total_duration_seconds, first.total_video_bytes, first.free_preview_lessons_count) == (900, 2048, 1)
+        assert (course.lessons_count, course.tool_lessons_count, course.total_duration_seconds) == (4, 1, 900)
+        assert course.duration_formatted == "15m"
+
+        video.video_duration = 3600
+        video.is_free_preview = False
+        db_session.commit()
+        assert first.total_duration_seconds == 3900
+        assert first.free_preview_lessons_count == 0
+        assert course.duration_formatted == "1h 5m"
+
+        db_session.delete(video)
+        db_session.commit()
+        assert (first.lessons_count, first.total_duration_seconds, first.total_video_bytes) == (2, 300, 0)
+        assert chapter_statistics(first)["total_lessons"] == 2
+        assert course.lessons_count == 3
+
+    def test_moving_lesson_updates_both_chapters(self, db_session):
+        """The old chapter loses what the new chapter gains; the course is unchanged"""
+        course, (first, second) = _create_course(db_session)
+        lesson = _lesson(first, duration=120)
+        db_session.add(lesson)
+        db_session.commit()
+
+        lesson.chapter_id = second.id
+        db_session.commit()
+
+        assert (first.lessons_count, first.total_duration_seconds) == (0, 0)
+        assert (second.lessons_count, second.total_duration_seconds) == (1, 120)
+        assert course.lessons_count == 1
+
+    def test_videos_count_through_their_lesson(self, db_session):
+        """Active video files raise the lesson's duration and bytes; soft deletes drop them"""
+        course, (first, _) = _create_course(db_session)
+        lesson = _lesson(first)
+        db_session.add(lesson)
+        db_session.commit()
+
+        upload = Video(lesson_id=lesson.id, title="الفيديو", duration=480, file_size=10 * 1024 * 1024)
+        db_session.add(upload)
+        db_session.commit()
+        assert first.total_duration_seconds == 480
+        assert chapter_statistics(first)["total_size_mb"] == 10.0
+        assert course.total_video_bytes == 10 * 1024 * 1024
+
+        upload.deleted_at = datetime.utcnow()
+        db_session.commit()
+        assert (first.total_duration_seconds, course.total_video_bytes) == (0, 0)
+
+    def test_catalog_lessons_count_follows_course(self, db_session):
+        """Published courses show the maintained lesson count in the catalog"""
+        course, (first, _) = _create_course(db_session)
+        db_session.add_all([_lesson(first), _lesson(first, "exam")])
+        db_session.commit()
+
+        db_session.expire_all()
+        assert db_session.get(CourseCatalog, course.id).lessons_count == 2
+
+    def test_recompute_all_repairs_drift(self, db_session):
+        """The backfill rebuilds aggregates written around the ORM"""
+        course, (first, second) = _create_course(db_session)
+        db_session.add_all([_lesson(first, duration=60), _lesson(second, duration=90)])
+        db_session.commit()
+        db_session.query(Chapter).filter(Chapter.course_id == course.id).update(
+            {"lessons_count": 0, "total_duration_seconds": 0}
+        )
+        db_session.query(Course).filter(Course.id == course.id).update({"lessons_count": 99})
+        db_session.commit()
+
+        chapters, courses = ContentAggregateService(batch_size=1).recompute_all(db_session)
+        db_session.commit()
+        db_session.expire_all()
+
+        assert chapters >= 2 and courses >= 1
+        assert [c.total_duration_seconds for c in (first, second)] == [60, 90]
+        assert db_session.get(Course, course.id).lessons_count == 2
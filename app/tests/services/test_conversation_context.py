@@ -0,0 +1,149 @@
+"""
+Tests for the token-budgeted conversation context manager.
+
+This module covers:
+- Newest-first history selection within the token budget
+- Cached per-message token counts
+- Folding overflowing turns into the rolling summary
+- Prompt tokens per turn before/after on a replayed conversation set
+"""
+
+import asyncio
+import random
+import uuid
+import pytest
+from datetime import datetime, timedelta
+
+from app.models.ai_assistant import (
+    AIConversation, AIConversationMessage, ConversationType, SenderType
+)
+from app.services.ai.conversation_context import ConversationContextManager, SUMMARY_PREFIX
+from app.services.ai.token_counter import count_message_tokens
+
+
+BASE_TIME = datetime(2026, 1, 1, 10, 0, 0)
+
+
+def _conversation(db_session):
+    conversation = AIConversation(
+        id=str(uuid.uuid4()),
+        user_id=1,
+        conversation_type=ConversationType.LESSON_HELP
+    )
+    db_session.add(conversation)
+    db_session.flush()
+    return conversation
+
+
+def _add_message(db_session, conversation, index, text):
+    message = AIConversationMessage(
+        conversation_id=conversation.id,
+        sender_type=SenderType.USER if index % 2 == 0 else SenderType.AI,
+        message=text,
+        created_at=BASE_TIME + timedelta(seconds=index)
+    )
+    db_session.add(message)
+    return message
+
+
+async def _stub_summarizer(previous_summary, messages, max_tokens):
+    parts = [previous_summary] if previous_summary else []
+    parts.extend(m["content"][:40] for m in messages)
+    return " | ".join(parts)[-max_tokens * 2:]
+
+
+class TestConversationContextManager:
+    """Test suite for ConversationContextManager"""
+
+    def test_build_context_fills_newest_first(self, db_session):
+        """Only the newest messages that fit the budget are sent"""
+        conversation = _conversation(db_session)
+        for i in range(10):
+            _add_message(db_session, conversation, i, f"رسالة رقم {i} " + "كلمة " * 40)
+        db_session.flush()
+
+        manager = ConversationContextManager(db_session, token_budget=300, summary_token_budget=50)
+        context = manager.build_context(conversation, "سؤال جديد")
+
+        assert context["prompt_tokens"] <= 300
+        assert 0 < context["history_messages"] < 10
+        assert context["overflow_messages"] == 10 - context["history_messages"]
+        assert context["messages"][-1] == {"role": "user", "content": "سؤال جديد"}
+        assert context["messages"][-2]["content"].startswith("رسالة رقم 9")
+
+        rows = db_session.query(AIConversationMessage).filter(
+            AIConversationMessage.conversation_id == conversation.id
+        ).all()
+        assert all(row.token_count == count_message_tokens(row.message) for row in rows if row.token_count)
+
+    def test_refresh_summary_folds_overflow(self, db_session):
+        """Old turns move into the summary and are no longer loaded"""
+        conversation = _conversation(db_session)
+        for i in range(12):
+            _add_message(db_session, conversation, i, f"رسالة رقم {i} " + "كلمة " * 40)
+        db_session.flush()
+
+        manager = ConversationContextManager(db_session, token_budget=400, summary_token_budget=100)
+        folded = asyncio.run(manager.refresh_summary(conversation, _stub_summarizer))
+
+        assert folded > 0
+        assert conversation.summarized_message_count == folded
+        assert f"رسالة رقم {folded - 1} " in conversation.summary
+        assert len(manager.load_unsummarized(conversation)) == 12 - folded
+
+        context = manager.build_context(conversation, "سؤال جديد")
+        assert context["messages"][0]["content"].startswith(SUMMARY_PREFIX)
+        assert context["overflow_messages"] == 0
+
+    def test_refresh_summary_noop_when_within_budget(self, db_session):
+        """Short conversations are not summarized"""
+        conversation = _conversation(db_session)
+        for i in range(4):
+            _add_message(db_session, conversation, i, "مرحبا")
+        db_session.flush()
+
+        manager = ConversationContextManager(db_session, token_budget=400, summary_token_budget=100)
+
+        assert asyncio.run(manager.refresh_summary(conversation, _stub_summarizer)) == 0
+        assert conversation.summary is None
+
+    @pytest.mark.slow
+    def test_report_prompt_tokens_on_replayed_conversations(self, db_session):
+        """Replay conversations and compare the old last-5 strategy to the budgeted one"""
+        rng = random.Random(42)
+        budget = 1500
+        old_tokens = []
+        new_tokens = []
+        lost_context_turns = 0
+
+        for _ in range(20):
+            conversation = _conversation(db_session)
+            manager = ConversationContextManager(db_session, token_budget=budget, summary_token_budget=200)
+            history = []
+
+            for turn in range(rng.randint(4, 30)):
+                user_text = "سؤال " + "كلمة " * rng.choice([3, 10, 60])
+                ai_text = "جواب " + "شرح " * rng.choice([20, 150, 600])
+
+                # Old handler: last 5 raw messages regardless of length
+                old_tokens.append(sum(count_message_tokens(m) for m in history[-5:]) + count_message_tokens(user_text))
+                if len(history) > 5:
+                    lost_context_turns += 1
+
+                context = manager.build_context(conversation, user_text)
+                new_tokens.append(context["prompt_tokens"])
+
+                for text in (user_text, ai_text):
+                    _add_message(db_session, conversation, len(history), text)
+                    history.append(text)
+                db_session.flush()
+                asyncio.run(manager.refresh_summary(conversation, _stub_summarizer))
+
+        print(
+            f"\nPrompt tokens per turn over {len(old_tokens)} turns: "
+            f"old mean {sum(old_tokens) / len(old_tokens):.0f} / max {max(old_tokens)}, "
+            f"budgeted mean {sum(new_tokens) / len(new_tokens):.0f} / max {max(new_tokens)}; "
+            f"{lost_context_turns} old turns dropped history without a summary"
+        )
+        assert max(new_tokens) <= budget
+        assert max(new_tokens) < max(old_tokens)
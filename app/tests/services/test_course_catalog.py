@@ -0,0 +1,242 @@
+"""
+Tests for the course catalog read model.
+
+This module covers:
+- Catalog rows refreshed on publish, unpublish and price changes at commit
+- Denormalized academy, category and trainer names
+- Keyset pages without duplicates or gaps, and cursor validation
+- Cached approximate totals
+- Rebuilding the whole catalog, as the post-migration backfill does
+- Page 1 vs page 500 benchmark at 100,000 courses
+"""
+
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+from app.models.academy import Academy
+from app.models.course import Course, Category, CourseStatus, CourseLevel, CourseType
+from app.models.course_catalog import CourseCatalog
+from app.models.product import Product
+from app.models.user import User
+from app.services.course_catalog import CourseCatalogService, InvalidCursorError
+
+
+def _create_owner(db_session):
+    trainer = User(id=9001, fname="سارة", lname="أحمد", email="trainer@catalog.test", user_type="academy")
+    academy = Academy(id=9001, name="أكاديمية الكتالوج", slug="catalog-academy")
+    category = Category(title="البرمجة", slug="catalog-programming")
+    db_session.add_all([trainer, academy, category])
+    db_session.flush()
+    return trainer, academy, category
+
+
+def _create_course(db_session, owner, title="دورة", price="100.00", published=True, **product_fields):
+    trainer, academy, category = owner
+    product = Product(academy_id=academy.id, title=title, price=Decimal(price), **product_fields)
+    db_session.add(product)
+    db_session.flush()
+    course = Course(
+        product_id=product.id, academy_id=academy.id, category_id=category.id, trainer_id=trainer.id,
+        slug=f"course-{uuid.uuid4().hex[:12]}", image="image.jpg", content="محتوى", short_content="ملخص",
+        course_state=CourseStatus.published if published else CourseStatus.draft
+    )
+    db_session.add(course)
+    db_session.flush()
+    return course
+
+
+def _catalog_row(db_session, course_id):
+    db_session.expire_all()
+    return db_session.get(CourseCatalog, course_id)
+
+
+class TestCourseCatalogService:
+    """Test suite for CourseCatalogService"""
+
+    def test_publish_and_unpublish_refresh_on_commit(self, db_session):
+        """Publishing adds the row, unpublishing removes it"""
+        owner = _create_owner(db_session)
+        course = _create_course(db_session, owner, title="مقدمة في بايثون", published=False)
+        db_session.commit()
+        assert _catalog_row(db_session, course.id) is None
+
+        course.course_state = CourseStatus.published
+        db_session.commit()
+
+        row = _catalog_row(db_session, course.id)
+        assert row.title == "مقدمة في بايثون"
+        assert row.academy_name == "أكاديمية الكتالوج"
+        assert row.category_title == "البرمجة"
+        assert row.trainer_name == "سارة أحمد"
+
+        course.course_state = CourseStatus.archived
+        db_session.commit()
+        assert _catalog_row(db_session, course.id) is None
+
+    def test_price_and_name_changes_refresh_on_commit(self, db_session):
+        """Product, discount and category edits reach the catalog"""
+        owner = _create_owner(db_session)
+        course = _create_course(db_session, owner)
+        db_session.commit()
+
+        product = db_session.get(Product, course.product_id)
+        product.price = Decimal("250.00")
+        product.discount_price = Decimal("199.00")
+        product.discount_ends_at = datetime.utcnow() + timedelta(days=2)
+        owner[2].title = "علوم الحاسب"
+        db_session.commit()
+
+        row = _catalog_row(db_session, course.id)
+        assert row.price == Decimal("250.00")
+        assert row.effective_price == Decimal("199.00")
+        assert row.category_title == "علوم الحاسب"
+
+    def test_expired_discounts_reset_effective_price(self, db_session, count_queries):
+        """Listings show the list price once a discount ends without writing; the sweep updates the row"""
+        owner = _create_owner(db_session)
+        course = _create_course(
+            db_session, owner, price="80.00", discount_price=Decimal("40.00"),
+            discount_ends_at=datetime.utcnow() + timedelta(days=1)
+        )
+        db_session.commit()
+        db_session.query(CourseCatalog).filter(CourseCatalog.course_id == course.id).update(
+            {"discount_ends_at": datetime.utcnow() - timedelta(minutes=1)}
+        )
+        db_session.commit()
+        service = CourseCatalogService()
+
+        with count_queries() as statements:
+            items = service.list_courses(db_session, {"academy_id": 9001})["items"]
+        assert not [statement for statement in statements if not statement.lstrip().upper().startswith("SELECT")]
+        assert service.serialize(items[0])["final_price"] == 80.0
+        assert items[0].effective_price == Decimal("40.00")
+
+        assert service.expire_discounts(db_session) == 1
+        assert _catalog_row(db_session, course.id).effective_price == Decimal("80.00")
+
+    def test_keyset_pages_have_no_duplicates_or_gaps(self, db_session):
+        """Walking every sort by cursor returns each course exactly once, in order"""
+        owner = _create_owner(db_session)
+        courses = [
+            _create_course(db_session, owner, title=f"دورة {i}", price=str(50 * (i % 4)))
+            for i in range(23)
+        ]
+        db_session.commit()
+        expected = {course.id for course in courses}
+        service = CourseCatalogService()
+
+        for sort in ("newest", "price", "rating", "title"):
+            for descending in (True, False):
+                seen, cursor = [], None
+                while True:
+                    page = service.list_courses(
+                        db_session, {"academy_id": 9001}, sort=sort, descending=descending, cursor=cursor, limit=5
+                    )
+                    seen.extend(page["items"])
+                    cursor = page["next_cursor"]
+                    if not cursor:
+                        break
+
+                assert [row.course_id for row in seen] == [row.course_id for row in service.list_courses(
+                    db_session, {"academy_id": 9001}, sort=sort, descending=descending, limit=100
+                )["items"]]
+                assert {row.course_id for row in seen} == expected
+                assert len(seen) == len(expected)
+
+    def test_filters_and_cached_total(self, db_session):
+        """Totals are served from cache until the TTL expires"""
+        owner = _create_owner(db_session)
+        for i in range(4):
+            _create_course(db_session, owner, price="0.00" if i % 2 else "120.00")
+        db_session.commit()
+        service = CourseCatalogService(count_ttl_seconds=60)
+
+        page = service.list_courses(db_session, {"academy_id": 9001, "is_free": True}, limit=10)
+        assert page["total"] == 2
+        assert page["total_is_estimate"]
+        assert all(row.effective_price == 0 for row in page["items"])
+
+        _create_course(db_session, owner, price="0.00")
+        db_session.commit()
+        assert service.list_courses(db_session, {"academy_id": 9001, "is_free": True})["total"] == 2
+        service.clear_counts()
+        assert service.list_courses(db_session, {"academy_id": 9001, "is_free": True})["total"] == 3
+
+    def test_rebuild_backfills_published_courses(self, db_session):
+        """A rebuild fills an empty catalog with the published courses only"""
+        owner = _create_owner(db_session)
+        published = [_create_course(db_session, owner, title=f"دورة {n}") for n in range(5)]
+        _create_course(db_session, owner, title="مسودة", published=False)
+        db_session.commit()
+        db_session.execute(delete(CourseCatalog))
+        db_session.commit()
+
+        assert CourseCatalogService().rebuild(db_session, batch_size=2) == 5
+        stored = db_session.scalars(select(CourseCatalog.course_id)).all()
+        assert sorted(stored) == sorted(course.id for course in published)
+
+    def test_invalid_cursor_rejected(self, db_session):
+        """Garbage or a cursor from another sort is refused"""
+        service = CourseCatalogService()
+        cursor = service.encode_cursor("price", True, [Decimal("10.00"), "abc"])
+
+        with pytest.raises(InvalidCursorError):
+            service.list_courses(db_session, cursor="not-a-cursor")
+        with pytest.raises(InvalidCursorError):
+            service.list_courses(db_session, sort="newest", cursor=cursor)
+        assert service.decode_cursor(cursor, "price", True) == [Decimal("10.00"), "abc"]
+
+    @pytest.mark.slow
+    def test_benchmark_deep_pages(self, db_session):
+        """Page 1 vs page 500 at 100,000 catalog rows, keyset vs OFFSET"""
+        base = datetime(2024, 1, 1)
+        rows = [
+            {
+                "course_id": str(uuid.UUID(int=i)), "product_id": i, "academy_id": 1 + i % 50,
+                "category_id": 1 + i % 12, "title": f"دورة {i}", "slug": f"bench-{i}",
+                "level": CourseLevel.beginner, "type": CourseType.recorded, "featured": i % 97 == 0,
+                "price": Decimal(i % 500), "effective_price": Decimal(i % 500), "currency": "SAR",
+                "avg_rating": Decimal("4.50"), "ratings_count": 0, "students_count": i % 1000,
+                "lessons_count": 10, "created_at": base + timedelta(minutes=i), "refreshed_at": base
+            }
+            for i in range(100000)
+        ]
+        for start in range(0, len(rows), 10000):
+            db_session.execute(insert(CourseCatalog), rows[start:start + 10000])
+        service = CourseCatalogService()
+        per_page, page_number = 20, 500
+
+        def timed(fn, repeat=20):
+            fn()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            return (time.perf_counter() - start) / repeat * 1000
+
+        anchor = db_session.execute(
+            select(CourseCatalog).order_by(
+                CourseCatalog.featured.desc(), CourseCatalog.created_at.desc(), CourseCatalog.course_id.desc()
+            ).offset((page_number - 1) * per_page - 1).limit(1)
+        ).scalar_one()
+        cursor = service.encode_cursor("newest", True, [anchor.featured, anchor.created_at, anchor.course_id])
+
+        first_ms = timed(lambda: service.list_courses(db_session, limit=per_page))
+        keyset_ms = timed(lambda: service.list_courses(db_session, cursor=cursor, limit=per_page))
+        offset_ms = timed(lambda: service.list_courses(
+            db_session, limit=per_page, offset=(page_number - 1) * per_page
+        ))
+
+        offset_page = service.list_courses(db_session, limit=per_page, offset=(page_number - 1) * per_page)
+        keyset_page = service.list_courses(db_session, cursor=cursor, limit=per_page)
+        assert [r.course_id for r in keyset_page["items"]] == [r.course_id for r in offset_page["items"]]
+
+        print(
+            f"\nCourse catalog bench (100k rows, {per_page}/page): page 1 {first_ms:.2f}ms, "
+            f"page {page_number} keyset {keyset_ms:.2f}ms vs OFFSET {offset_ms:.2f}ms"
+        )
+        assert keyset_ms < 50
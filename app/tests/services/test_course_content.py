@@ -0,0 +1,184 @@
+"""
+Tests for the course content tree.
+
+This module covers:
+- A fixed number of queries regardless of lesson count
+- Tree shape: videos, exams with question counts, tools
+- Cached trees reused until a content change bumps the course version
+- Public chapters endpoint with ETag and 304 Not Modified
+- Exam deletion through the raw-SQL fallback still bumping the course version
+"""
+
+import asyncio
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1.exams import delete_exam
+from app.db.base import Base
+from app.models.chapter import Chapter
+from app.models.course import Course, Category, CourseStatus
+from app.models.exam import Exam, Question, QuestionType
+from app.models.interactive_tool import InteractiveTool
+from app.models.lesson import Lesson
+from app.models.product import Product
+from app.models.video import Video
+from app.services.course_content import CourseContentService, PUBLIC
+
+
+def _question(exam, title):
+    return Question(exam_id=exam.id, title=title, type=QuestionType.MULTIPLE_CHOICE, score=1)
+
+
+def _create_course(db_session, lessons_per_chapter=2):
+    category = Category(title="عام", slug=f"content-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=1, title="دورة الشجرة", price=Decimal("100.00"))
+    db_session.add_all([category, product])
+    db_session.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"content-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s",
+        course_state=CourseStatus.published
+    )
+    db_session.add(course)
+    db_session.flush()
+
+    chapters = [Chapter(course_id=course.id, title=f"الفصل {i}", order_number=i) for i in range(2)]
+    chapters.append(Chapter(course_id=course.id, title="مسودة", order_number=9, is_published=False))
+    db_session.add_all(chapters)
+    db_session.flush()
+
+    for chapter in chapters:
+        for i in range(lessons_per_chapter):
+            lesson_type = ("video", "exam", "tool")[i % 3]
+            lesson = Lesson(
+                chapter_id=chapter.id, course_id=course.id, title=f"درس {i}", type=lesson_type,
+                order_number=i, video_duration=300 if lesson_type == "video" else 0, video="v.mp4"
+            )
+            db_session.add(lesson)
+            db_session.flush()
+            if lesson_type == "video":
+                db_session.add(Video(lesson_id=lesson.id, title="فيديو", order_number=0, duration=300))
+            elif lesson_type == "exam":
+                exam = Exam(lesson_id=lesson.id, title="اختبار", duration=600)
+                db_session.add(exam)
+                db_session.flush()
+                db_session.add_all([_question(exam, f"سؤال {q}") for q in range(3)])
+            else:
+                db_session.add(InteractiveTool(lesson_id=lesson.id, title="أداة"))
+    db_session.commit()
+    return course
+
+
+def _questions_count(tree):
+    return sum(lesson.get("questions_count", 0) for chapter in tree for lesson in chapter["lessons"])
+
+
+class TestCourseContentService:
+    """Test suite for CourseContentService"""
+
+    def test_fixed_query_count(self, count_queries, db_session):
+        """Six queries whether a course has six lessons or sixty"""
+        service = CourseContentService()
+        small_id = _create_course(db_session, lessons_per_chapter=2).id
+        large_id = _create_course(db_session, lessons_per_chapter=20).id
+
+        with count_queries() as small_queries:
+            service.load_tree(db_session, small_id)
+        with count_queries() as large_queries:
+            tree = service.load_tree(db_session, large_id)
+
+        assert len(small_queries) == len(large_queries) == 6
+        assert sum(len(chapter["lessons"]) for chapter in tree) == 60
+
+    def test_tree_shape(self, db_session):
+        """Lessons carry their video, exam and tool details in order"""
+        course = _create_course(db_session, lessons_per_chapter=3)
+        tree = CourseContentService().load_tree(db_session, course.id)
+
+        assert [chapter["title"] for chapter in tree] == ["الفصل 0", "الفصل 1", "مسودة"]
+        video, exam, tool = tree[0]["lessons"]
+        assert video["video_count"] == 1 and video["video_id"] is not None
+        assert (exam["exam_count"], exam["questions_count"], exam["duration_minutes"]) == (1, 3, 10)
+        assert tool["tools_count"] == 1
+        assert tree[0]["statistics"]["total_lessons"] == 3
+
+        public = CourseContentService().load_tree(db_session, course.id, public=True)
+        assert [chapter["title"] for chapter in public] == ["الفصل 0", "الفصل 1"]
+        assert "video_id" not in public[0]["lessons"][0]
+
+    def test_cached_until_content_changes(self, count_queries, db_session):
+        """Cache hits run no tree queries; edits bump the version, view counts do not"""
+        service = CourseContentService()
+        course = _create_course(db_session)
+        first_etag = service.etag(course)
+        service.get_tree(db_session, course)
+
+        with count_queries() as queries:
+            service.get_tree(db_session, course)
+        assert queries == []
+
+        lesson = db_session.query(Lesson).filter(Lesson.course_id == course.id, Lesson.type == "video").first()
+        lesson.views_count = 42
+        db_session.commit()
+        assert service.etag(course) == first_etag
+
+        exam = db_session.query(Exam).join(Lesson).filter(Lesson.course_id == course.id).first()
+        db_session.add(_question(exam, "سؤال إضافي"))
+        db_session.commit()
+        assert service.etag(course) != first_etag
+
+        tree = service.get_tree(db_session, course)
+        exams = [l for chapter in tree for l in chapter["lessons"] if l["type"] == "exam" and l["id"] == exam.lesson_id]
+        assert exams[0]["questions_count"] == 4
+
+        lesson.title = "عنوان جديد"
+        db_session.commit()
+        assert any(l["title"] == "عنوان جديد" for l in service.get_tree(db_session, course)[0]["lessons"])
+
+    def test_public_endpoint_etag(self, client, db_session):
+        """A matching If-None-Match gets 304 until the course content changes"""
+        course = _create_course(db_session)
+        url = f"/api/v1/public/courses/{course.id}/chapters"
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json()["data"]["total"] == 2
+        etag = response.headers["etag"]
+        assert etag == CourseContentService.etag(course, PUBLIC)
+
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        db_session.query(Chapter).filter(Chapter.title == "مسودة").one().is_published = True
+        db_session.commit()
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["data"]["total"] == 3
+
+    def test_raw_exam_delete_bumps_version(self, tmp_path):
+        """An exam deleted with raw SQL, after the ORM delete fails, still moves the course to a new version"""
+        # The endpoint rolls back before the fallback, so it needs a database of its own
+        engine = create_engine(f"sqlite:///{tmp_path / 'content.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        course = _create_course(db, lessons_per_chapter=2)
+        service = CourseContentService()
+        questions = _questions_count(service.get_tree(db, course))
+        version = course.content_version
+        exam_id = db.query(Exam.id).join(Lesson).filter(Lesson.course_id == course.id).limit(1).scalar()
+
+        # A value outside QuestionType makes the ORM delete fail and the endpoint fall back to raw SQL
+        db.execute(text("UPDATE questions SET type = 'legacy' WHERE exam_id = :exam_id"), {"exam_id": exam_id})
+        db.commit()
+        owner = SimpleNamespace(academy=SimpleNamespace(id=course.academy_id))
+        assert asyncio.run(delete_exam(exam_id, db=db, current_user=owner)).status_code == 200
+
+        db.expire_all()
+        assert db.get(Exam, exam_id) is None
+        assert course.content_version == version + 1
+        assert _questions_count(service.get_tree(db, course)) == questions - 3
+        db.close()
+        engine.dispose()
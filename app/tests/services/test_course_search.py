@@ -0,0 +1,257 @@
+"""
+Tests for the Arabic course search engine.
+
+This module covers:
+- Arabic normalization and light stemming
+- BM25 ranking with field weights, filters and facets
+- Incremental updates from committed catalog changes
+- Catching up with rows committed behind the watermark by other workers
+- Prefix-trie autocomplete and its incremental maintenance
+- Persisting and reloading the index
+- p99 latency of search and suggestions at 100,000 courses
+"""
+
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.models.course import Course, Category, CourseStatus, CourseLevel
+from app.models.course_catalog import CourseCatalog
+from app.models.product import Product
+from app.services.course_catalog import course_catalog_service
+from app.services.course_search import CourseSearchEngine, analyze, normalize_text, light_stem
+
+
+def _row(course_id, title, **fields):
+    row = {
+        "course_id": course_id, "title": title, "level": CourseLevel.beginner, "category_id": 1,
+        "category_title": "عام", "academy_id": 1, "academy_name": "أكاديمية", "trainer_id": 1,
+        "trainer_name": "مدرب", "short_content": "", "featured": False, "price": Decimal("100.00"),
+        "effective_price": Decimal("100.00"), "discount_ends_at": None, "students_count": 0,
+        "refreshed_at": datetime(2026, 1, 1)
+    }
+    row.update(fields)
+    return row
+
+
+def _publish_course(db_session, title):
+    category = Category(title="عام", slug=f"search-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=1, title=title, price=Decimal("150.00"))
+    db_session.add_all([category, product])
+    db_session.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"search-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s",
+        course_state=CourseStatus.published
+    )
+    db_session.add(course)
+    db_session.commit()
+    return course
+
+
+def _loaded_engine(rows):
+    engine = CourseSearchEngine()
+    engine.upsert(rows)
+    engine.loaded = True
+    engine._last_sync = float("inf")
+    return engine
+
+
+class TestCourseSearchEngine:
+    """Test suite for CourseSearchEngine"""
+
+    def test_arabic_normalization_and_stemming(self):
+        """Spelling variants, diacritics and affixes reduce to one term"""
+        assert normalize_text("إدارةُ المَشاريع") == "اداره المشاريع"
+        assert analyze("البرمجة") == analyze("برمجيات") == analyze("بالبرمجة") == ["برمج"]
+        assert analyze("دورة في الأمن السيبراني") == ["دور", "امن", "سيبران"]
+        assert light_stem("python") == "python"
+        assert analyze("الدرس ١٢") == ["درس", "12"]
+
+    def test_bm25_ranks_title_above_description(self):
+        """Field weights put title matches first; spelling variants still match"""
+        engine = _loaded_engine([
+            _row("a", "مقدمة في التسويق", short_content="نتعلم أساسيات البرمجة"),
+            _row("b", "أساسيات البرمجة بلغة بايثون"),
+            _row("c", "التصميم الجرافيكي"),
+        ])
+
+        result = engine.search_loaded("برمجه")
+
+        assert result["course_ids"] == ["b", "a"]
+        assert result["total"] == 2
+        assert engine.search_loaded("اساسيات البرمجة")["course_ids"][0] == "b"
+        assert engine.search_loaded("برمجة التصميم")["total"] == 0
+        assert engine.search_loaded("بايث")["course_ids"] == ["b"]
+
+    def test_filters_and_facets(self):
+        """Filters narrow the ranked list and facets describe the matches"""
+        engine = _loaded_engine([
+            _row("a", "تطوير الويب", level=CourseLevel.advanced, price=Decimal("0"), effective_price=Decimal("0")),
+            _row("b", "تطوير تطبيقات الويب", academy_id=2, academy_name="أكاديمية الويب"),
+            _row("c", "تطوير الألعاب", price=Decimal("450.00"), effective_price=Decimal("350.00"),
+                 discount_price=Decimal("350.00"), discount_ends_at=datetime.utcnow() - timedelta(days=1)),
+        ])
+
+        facets = engine.search_loaded("تطوير")["facets"]
+        assert facets["level"] == {"beginner": 2, "advanced": 1}
+        assert facets["price_range"] == {"free": 1, "1-100": 1, "300-600": 1}
+        assert {entry["id"]: entry["count"] for entry in facets["academy"]} == {1: 2, 2: 1}
+
+        assert engine.search_loaded("تطوير", {"academy_id": 2})["course_ids"] == ["b"]
+        assert engine.search_loaded("تطوير", {"level": "advanced"})["course_ids"] == ["a"]
+        # The expired discount no longer counts
+        assert engine.search_loaded("تطوير", {"price_to": 400})["total"] == 2
+
+    def test_committed_catalog_changes_update_index(self, db_session):
+        """Publishing, renaming and unpublishing reach a loaded index on commit"""
+        engine = _loaded_engine([])
+        course_catalog_service.add_listener(engine.on_catalog_change)
+        try:
+            category = Category(title="الذكاء الاصطناعي", slug=f"ai-{uuid.uuid4().hex[:8]}")
+            product = Product(academy_id=1, title="تعلم الآلة للمبتدئين", price=Decimal("150.00"))
+            db_session.add_all([category, product])
+            db_session.flush()
+            course = Course(
+                product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+                slug=f"ml-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s",
+                course_state=CourseStatus.published
+            )
+            db_session.add(course)
+            db_session.commit()
+
+            assert engine.search_loaded("الالة")["course_ids"] == [course.id]
+            assert engine.suggest(db_session, "تعلم ال") == ["تعلم الآلة للمبتدئين"]
+
+            product.title = "التعلم العميق"
+            db_session.commit()
+            assert engine.search_loaded("الآلة")["total"] == 0
+            assert engine.search_loaded("العميق")["course_ids"] == [course.id]
+
+            course.course_state = CourseStatus.draft
+            db_session.commit()
+            assert engine.search_loaded("العميق")["total"] == 0
+            assert engine.suggest(db_session, "التعلم") == []
+        finally:
+            course_catalog_service._listeners.remove(engine.on_catalog_change)
+
+    def test_sync_reads_rows_committed_behind_the_watermark(self, db_session):
+        """An edit stamped before the watermark but committed after it is indexed; unchanged rows are skipped"""
+        course = _publish_course(db_session, "أساسيات الشبكات")
+        engine = CourseSearchEngine()
+        engine.build(db_session)
+        watermark = engine.watermark
+
+        # Another worker read its clock before this worker's commit and committed after it
+        course.product.title = "أمن الشبكات اللاسلكية"
+        db_session.commit()
+        db_session.query(CourseCatalog).filter(CourseCatalog.course_id == course.id).update(
+            {"refreshed_at": watermark.replace(microsecond=0) - timedelta(seconds=1)}
+        )
+        db_session.commit()
+        assert engine.search_loaded("اللاسلكية")["total"] == 0
+
+        engine.sync(db_session)
+        assert engine.search_loaded("اللاسلكية")["course_ids"] == [course.id]
+        assert engine.search_loaded("أساسيات")["total"] == 0
+
+        generation = engine.generation
+        engine.sync(db_session)
+        assert engine.generation == generation
+
+    def test_autocomplete_by_popularity(self):
+        """Suggestions follow the prefix and are ordered by enrollments"""
+        engine = _loaded_engine([
+            _row("a", "البرمجة بلغة بايثون", students_count=50),
+            _row("b", "البرمجة الكائنية", students_count=500),
+            _row("c", "البرمجة للأطفال", students_count=5),
+        ])
+        engine.trie.warm()
+
+        assert engine.trie.suggest("البرمجة", 10) == [
+            "البرمجة الكائنية", "البرمجة بلغة بايثون", "البرمجة للأطفال"
+        ]
+        assert engine.trie.suggest("البرمجه ب", 10) == ["البرمجة بلغة بايثون"]
+
+        engine.remove(["b"])
+        engine.upsert([_row("c", "البرمجة للأطفال", students_count=900)])
+        assert engine.trie.suggest("البرم", 2) == ["البرمجة للأطفال", "البرمجة بلغة بايثون"]
+
+    def test_persist_and_reload(self, tmp_path):
+        """A saved index answers queries after reload without rebuilding"""
+        engine = _loaded_engine([_row("a", "أمن المعلومات"), _row("b", "تحليل البيانات")])
+        engine.index_path = tmp_path / "course_index.pkl"
+        assert engine.save()
+
+        reloaded = CourseSearchEngine(index_path=str(engine.index_path))
+        assert reloaded.load()
+        assert reloaded.search_loaded("البيانات")["course_ids"] == ["b"]
+        assert reloaded.trie.suggest("امن", 5) == ["أمن المعلومات"]
+        assert reloaded.watermark == datetime(2026, 1, 1)
+
+    @pytest.mark.slow
+    def test_benchmark_latency_100k(self, tmp_path):
+        """p99 search and suggestion latency over 100,000 courses"""
+        rng = random.Random(11)
+        openings = ["مقدمة في", "أساسيات", "احتراف", "دورة", "تعلم", "دليل", "ورشة", "مهارات"]
+        topics = [f"موضوع{i}" for i in range(2000)] + [
+            "البرمجة", "التسويق", "التصميم", "المحاسبة", "الإدارة", "الأمن", "البيانات", "الشبكات"
+        ]
+        endings = ["للمبتدئين", "المتقدمة", "العملية", "الشاملة", "خطوة بخطوة", ""]
+        rows = [
+            _row(
+                f"course-{i}",
+                f"{rng.choice(openings)} {rng.choice(topics)} {rng.choice(topics)} {rng.choice(endings)}".strip(),
+                short_content=" ".join(rng.choice(topics) for _ in range(8)),
+                category_id=1 + i % 40, category_title=f"تصنيف{i % 40}", academy_id=1 + i % 300,
+                level=rng.choice(list(CourseLevel)), price=Decimal(rng.choice([0, 49, 149, 399, 799])),
+                effective_price=Decimal(0), students_count=rng.randint(0, 5000)
+            )
+            for i in range(100000)
+        ]
+        for row in rows:
+            row["effective_price"] = row["price"]
+
+        start = time.perf_counter()
+        engine = _loaded_engine(rows)
+        engine.trie.warm()
+        engine.index.warm()
+        build_seconds = time.perf_counter() - start
+        engine.index_path = tmp_path / "course_index.pkl"
+        engine.save()
+        start = time.perf_counter()
+        CourseSearchEngine(index_path=str(engine.index_path)).load()
+        load_seconds = time.perf_counter() - start
+
+        queries = [rng.choice(topics) for _ in range(300)] + [
+            f"{rng.choice(openings)} {rng.choice(topics)}" for _ in range(150)
+        ] + [rng.choice(topics)[:4] for _ in range(50)]
+        filters = [None, {"level": "beginner"}, {"price_to": 150}, {"category_id": 3}]
+        search_ms = []
+        for i, query in enumerate(queries):
+            engine._results.clear()
+            started = time.perf_counter()
+            engine.search_loaded(query, filters[i % len(filters)], limit=20)
+            search_ms.append((time.perf_counter() - started) * 1000)
+
+        prefixes = [rng.choice(rows)["title"][:rng.randint(2, 16)] for _ in range(2000)]
+        suggest_ms = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            engine.trie.suggest(prefix, 10)
+            suggest_ms.append((time.perf_counter() - started) * 1000)
+
+        def p99(samples):
+            return sorted(samples)[int(len(samples) * 0.99) - 1]
+
+        print(
+            f"\nCourse search bench (100k courses): build {build_seconds:.1f}s, load {load_seconds:.1f}s, "
+            f"search p50 {sorted(search_ms)[len(search_ms) // 2]:.2f}ms p99 {p99(search_ms):.2f}ms, "
+            f"suggest p99 {p99(suggest_ms):.3f}ms"
+        )
+        assert p99(search_ms) < 10
+        assert p99(suggest_ms) < 2
@@ -0,0 +1,236 @@
+"""
+Tests for read/write session routing.
+
+This module covers:
+- Round robin over healthy replicas; lagging, stopped and unreachable replicas left out
+- Read-your-writes: the write cookie keeps a client off replicas behind its write
+- Read sessions refusing ORM flushes and Core or textual DML, sync and async
+- The write cookie set by the middleware and honoured by get_read_db
+- Read throughput with and without replicas benchmark
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.routing import WRITTEN_AT_COOKIE, ReadOnlySessionError, ReplicaRouter
+from app.db.session import async_database_url
+from app.deps.database import get_read_db
+from app.models.academy import Academy
+
+
+def _database(path, name):
+    """A stand-in server that answers which database it is"""
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE server (name VARCHAR(20))")
+        connection.execute(text("INSERT INTO server VALUES (:name)"), {"name": name})
+    engine.dispose()
+    return url
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _router(tmp_path, lags, **options):
+    """A primary and two replicas; ``lags`` maps replica names to what the probe reports"""
+    primary = create_engine(_database(tmp_path / "primary.db", "primary"))
+    urls = [_database(tmp_path / f"{name}.db", name) for name in ("replica-1", "replica-2")]
+
+    def lag_probe(connection):
+        lag = lags[connection.exec_driver_sql("SELECT name FROM server").scalar()]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    return ReplicaRouter(primary, urls, lag_probe=lag_probe, **options)
+
+
+def _served_by(router, written_at=None):
+    db = router.read_session(written_at)
+    try:
+        name = db.execute(text("SELECT name FROM server")).scalar()
+        assert db.info["replica"] == (None if name == "primary" else name)
+        return name
+    finally:
+        db.close()
+
+
+class TestReplicaRouting:
+    """Test suite for ReplicaRouter and get_read_db"""
+
+    def test_health_and_read_your_writes(self, tmp_path):
+        """Only healthy replicas within the lag budget serve, and only once past the client's write"""
+        lags = {"replica-1": 1.0, "replica-2": 3.0}
+        clock = FakeClock()
+        router = _router(tmp_path, lags, max_lag_seconds=5, clock=clock)
+        assert router.sticky_seconds == 11
+
+        # The first read checks the replicas when the health thread is not running
+        assert {_served_by(router) for _ in range(4)} == {"replica-1", "replica-2"}
+        assert [replica["lag_seconds"] for replica in router.status()] == [1.0, 3.0]
+
+        # As of the check at t=1000 replica-1 has everything before 999, replica-2 before 997
+        assert {_served_by(router, written_at=998.5) for _ in range(4)} == {"replica-1"}
+        assert _served_by(router, written_at=999.5) == "primary"
+        clock.now = 1004
+        router.check()
+        assert {_served_by(router, written_at=999.5) for _ in range(4)} == {"replica-1", "replica-2"}
+
+        lags["replica-1"] = 8.0  # Over the budget
+        router.check()
+        assert {_served_by(router) for _ in range(4)} == {"replica-2"}
+
+        lags["replica-1"], lags["replica-2"] = None, RuntimeError("Connection refused")
+        router.check()
+        assert [(replica["healthy"], replica["error"]) for replica in router.status()] == [
+            (False, "Replication is stopped"), (False, "Connection refused")
+        ]
+        assert _served_by(router) == "primary"
+
+        lags["replica-2"] = 0.0
+        router.check()
+        assert _served_by(router) == "replica-2"
+        router.dispose()
+
+    def test_read_sessions_do_not_write(self, tmp_path):
+        """Pending changes fail to flush, DML fails to execute; async reads use the replica's async driver"""
+        router = _router(
+            tmp_path, {"replica-1": 0.0, "replica-2": 9.0},
+            primary_async=lambda: pytest.fail("The replica is healthy"),
+            async_engine_factory=lambda url: create_async_engine(async_database_url(url))
+        )
+        db = router.read_session()
+        db.add(Academy(name="أكاديمية", slug="read-only"))
+        with pytest.raises(ReadOnlySessionError):
+            db.flush()
+        db.close()
+
+        db = router.read_session()
+        assert db.execute(text("SELECT name FROM server")).scalar() == "replica-1"
+        with pytest.raises(ReadOnlySessionError):
+            db.execute(update(Academy).values(name="أكاديمية"))
+        with pytest.raises(ReadOnlySessionError):
+            db.execute(text("  update server SET name = 'primary'"))
+        db.rollback()
+        assert db.execute(text("SELECT name FROM server")).scalar() == "replica-1"
+        db.close()
+
+        async def read():
+            try:
+                async with router.async_read_session() as db:
+                    assert db.sync_session.info["replica"] == "replica-1"
+                    with pytest.raises(ReadOnlySessionError):
+                        await db.execute(text("DELETE FROM server"))
+                    await db.rollback()
+                    return (await db.execute(text("SELECT name FROM server"))).scalar()
+            finally:
+                await router.dispose_async()
+
+        assert asyncio.run(read()) == "replica-1"
+        router.dispose()
+
+    def test_write_cookie_routes_reads_to_primary(self, tmp_path, monkeypatch):
+        """A successful write sets the cookie; reads carrying it skip replicas until they catch up"""
+        import app.deps.database
+        import app.main
+        from app.main import ReadYourWritesMiddleware
+
+        clock = FakeClock()
+        router = _router(tmp_path, {"replica-1": 2.0, "replica-2": 2.0}, clock=clock)
+        monkeypatch.setattr(app.main, "replica_router", router)
+        monkeypatch.setattr(app.deps.database, "replica_router", router)
+
+        api = FastAPI()
+        api.add_middleware(ReadYourWritesMiddleware)
+
+        @api.post("/write")
+        def write():
+            return {}
+
+        @api.get("/read")
+        def read(db=Depends(get_read_db)):
+            return {"server": db.execute(text("SELECT name FROM server")).scalar()}
+
+        with TestClient(api) as client:
+            assert client.get("/read").json()["server"].startswith("replica")
+            assert WRITTEN_AT_COOKIE not in client.get("/read").cookies
+
+            response = client.post("/write")
+            assert response.cookies[WRITTEN_AT_COOKIE] == "1000.000"
+            assert "Max-Age=11" in response.headers["set-cookie"]
+            assert client.get("/read").json()["server"] == "primary"
+
+            clock.now = 1005
+            router.check()
+            assert client.get("/read").json()["server"].startswith("replica")
+            client.cookies.set(WRITTEN_AT_COOKIE, "not a time")
+            assert client.get("/read").json()["server"].startswith("replica")
+        router.dispose()
+
+    @pytest.mark.slow
+    def test_benchmark_read_throughput(self, tmp_path):
+        """Reads per second when every database serves one query at a time, with and without replicas"""
+        service_time = 0.004  # Emulated query time on a database server
+        servers = {}
+
+        def serve(dbapi_connection, connection_record):
+            path = dbapi_connection.execute("PRAGMA database_list").fetchone()[2]
+            busy = servers.setdefault(path, threading.Lock())
+
+            def query():
+                with busy:
+                    time.sleep(service_time)
+                return 1
+
+            dbapi_connection.create_function("serve", 0, query)
+
+        def engine_factory(url):
+            engine = create_engine(url, pool_size=8)
+            event.listen(engine, "connect", serve)
+            return engine
+
+        primary = engine_factory(_database(tmp_path / "primary.db", "primary"))
+        urls = [_database(tmp_path / f"replica-{n}.db", f"replica-{n}") for n in (1, 2)]
+        routers = {
+            "primary only": ReplicaRouter(primary),
+            "two replicas": ReplicaRouter(primary, urls, engine_factory=engine_factory)
+        }
+
+        def read(router):
+            db = router.read_session()
+            try:
+                return db.execute(text("SELECT name, serve() FROM server")).one()[0]
+            finally:
+                db.close()
+
+        results = {}
+        for label, router in routers.items():
+            router.check()
+            with ThreadPoolExecutor(8) as pool:
+                start = time.perf_counter()
+                served = list(pool.map(lambda _: read(router), range(240)))
+                elapsed = time.perf_counter() - start
+            results[label] = (len(served) / elapsed, served.count("primary") / len(served))
+
+        print(f"\nReads per second at {service_time * 1000:.0f}ms per query, 8 clients:")
+        for label, (rps, primary_share) in results.items():
+            print(f"  {label:>12}: {rps:>6.0f} reads/s, {primary_share:.0%} on the primary")
+        for router in routers.values():
+            router.dispose()
+
+        assert results["two replicas"][1] == 0
+        assert results["two replicas"][0] > 1.5 * results["primary only"][0]
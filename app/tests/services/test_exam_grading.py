@@ -0,0 +1,201 @@
+"""
+Tests for the deterministic exam grading engine.
+
+This module covers:
+- Compiling and caching answer keys
+- Local grading of multiple-choice, true/false and exact text answers
+- One batched corrector call for free-text answers
+- Cache invalidation on committed question edits
+- Bulk persistence and a submissions-per-minute benchmark
+"""
+
+import asyncio
+import time
+import pytest
+
+from app.models.ai_assistant import ExamCorrection, QuestionCorrection
+from app.models.exam import Exam, Question, QuestionOption, QuestionType
+from app.services.exam_grading import (
+    AnswerKeyCache, ExamGradingEngine, answer_key_cache
+)
+
+
+class StubCorrector:
+    """Free-text corrector that awards half marks and records its calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def grade(self, items, academy_id=None):
+        self.calls.append(items)
+        return {
+            item["question"].question_id: {"score": item["question"].max_score / 2, "feedback": "جيد"}
+            for item in items
+        }
+
+
+def _create_exam(db_session, choice_questions=2, text_questions=1):
+    exam = Exam(lesson_id="lesson-1", title="Exam")
+    db_session.add(exam)
+    db_session.flush()
+
+    questions = []
+    for i in range(choice_questions):
+        question = Question(exam_id=exam.id, title=f"سؤال {i}", type=QuestionType.MULTIPLE_CHOICE, score=10)
+        question.options = [
+            QuestionOption(text="الرياض", is_correct=True),
+            QuestionOption(text="جدة", is_correct=False)
+        ]
+        questions.append(question)
+
+    true_false = Question(exam_id=exam.id, title="الشمس نجم", type=QuestionType.TRUE_FALSE, score=5)
+    true_false.options = [QuestionOption(text="صحيح", is_correct=True), QuestionOption(text="خطأ", is_correct=False)]
+    questions.append(true_false)
+
+    for i in range(text_questions):
+        questions.append(Question(
+            exam_id=exam.id, title=f"اشرح المفهوم {i}", type=QuestionType.TEXT, score=20,
+            correct_answer="البرمجة هي كتابة التعليمات"
+        ))
+
+    db_session.add_all(questions)
+    db_session.flush()
+    return exam, questions
+
+
+def _option_id(question, text):
+    return next(option.id for option in question.options if option.text == text)
+
+
+class TestExamGradingEngine:
+    """Test suite for ExamGradingEngine"""
+
+    def test_answer_key_is_compiled_once(self, db_session):
+        """The cache returns the compiled key until it is invalidated"""
+        exam, questions = _create_exam(db_session)
+        cache = AnswerKeyCache()
+
+        key = cache.get(db_session, exam.id)
+
+        assert cache.get(db_session, exam.id) is key
+        assert key.max_score == 45
+        assert key.questions[questions[0].id].correct_option_ids == {_option_id(questions[0], "الرياض")}
+        cache.invalidate(exam.id)
+        assert cache.get(db_session, exam.id) is not key
+        assert cache.get(db_session, "missing") is None
+
+    def test_objective_answers_graded_locally(self, db_session):
+        """Choice, true/false and exact text answers never reach the corrector"""
+        exam, questions = _create_exam(db_session)
+        corrector = StubCorrector()
+        engine = ExamGradingEngine(db_session, corrector=corrector, cache=AnswerKeyCache())
+
+        grading = asyncio.run(engine.grade(engine.get_answer_key(exam.id), [
+            {"question_id": questions[0].id, "option_id": _option_id(questions[0], "الرياض")},
+            {"question_id": questions[1].id, "answer": "جدة"},
+            {"question_id": questions[2].id, "answer": True},
+            {"question_id": questions[3].id, "answer": "البرمجة هِيَ كتابة التعليمات."}
+        ]))
+
+        results = {r["question_id"]: r for r in grading["questions"]}
+        assert corrector.calls == []
+        assert [results[q.id]["is_correct"] for q in questions] == [True, False, True, True]
+        assert grading["total_score"] == 35
+        assert grading["percentage"] == pytest.approx(77.78)
+        assert grading["passed"]
+
+    def test_free_text_batched_in_one_call(self, db_session):
+        """All free-text answers of a submission share one corrector call"""
+        exam, questions = _create_exam(db_session, choice_questions=1, text_questions=3)
+        corrector = StubCorrector()
+        engine = ExamGradingEngine(db_session, corrector=corrector, cache=AnswerKeyCache())
+
+        grading = asyncio.run(engine.grade(engine.get_answer_key(exam.id), {
+            question.id: "إجابة مختلفة عن المرجع" for question in questions[2:]
+        }))
+
+        results = {r["question_id"]: r for r in grading["questions"]}
+        assert len(corrector.calls) == 1
+        assert len(corrector.calls[0]) == 3
+        assert grading["ai_graded"] == 3
+        assert [results[q.id]["score_awarded"] for q in questions[2:]] == [10, 10, 10]
+        assert results[questions[0].id]["score_awarded"] == 0
+
+    def test_free_text_without_corrector_scores_zero(self, db_session):
+        """Without a corrector, unmatched free-text answers wait for manual review"""
+        exam, questions = _create_exam(db_session, choice_questions=0, text_questions=1)
+        engine = ExamGradingEngine(db_session, cache=AnswerKeyCache())
+
+        grading = asyncio.run(engine.grade(engine.get_answer_key(exam.id), {questions[1].id: "شيء آخر"}))
+
+        result = next(r for r in grading["questions"] if r["question_id"] == questions[1].id)
+        assert result["score_awarded"] == 0
+        assert "يدوياً" in result["feedback"]
+
+    def test_committed_edit_invalidates_key(self, db_session):
+        """Changing the correct option drops the cached key on commit"""
+        answer_key_cache.clear()
+        exam, questions = _create_exam(db_session)
+        db_session.commit()
+        key = answer_key_cache.get(db_session, exam.id)
+
+        for option in questions[0].options:
+            option.is_correct = option.text == "جدة"
+        db_session.commit()
+
+        new_key = answer_key_cache.get(db_session, exam.id)
+        assert new_key is not key
+        assert new_key.questions[questions[0].id].correct_option_ids == {_option_id(questions[0], "جدة")}
+
+    def test_persist_bulk_inserts(self, db_session):
+        """One exam correction and one row per question are written"""
+        exam, questions = _create_exam(db_session)
+        engine = ExamGradingEngine(db_session, cache=AnswerKeyCache())
+        key = engine.get_answer_key(exam.id)
+        grading = asyncio.run(engine.grade(key, {questions[0].id: _option_id(questions[0], "الرياض")}))
+
+        correction_id = engine.persist(key, student_id=1, grading=grading, academy_id=1)
+
+        correction = db_session.query(ExamCorrection).filter(ExamCorrection.id == correction_id).one()
+        assert float(correction.total_score) == 10
+        assert float(correction.max_score) == 45
+        rows = db_session.query(QuestionCorrection).filter(
+            QuestionCorrection.exam_correction_id == correction_id
+        ).all()
+        assert len(rows) == len(questions)
+        assert sum(row.is_correct for row in rows) == 1
+
+    @pytest.mark.slow
+    def test_benchmark_submissions_per_minute(self, db_session):
+        """Grade and persist 10,000 objective submissions"""
+        exam, questions = _create_exam(db_session, choice_questions=19, text_questions=0)
+        engine = ExamGradingEngine(db_session, cache=AnswerKeyCache())
+        submissions = [
+            {
+                question.id: _option_id(question, "الرياض" if (i + j) % 3 else "جدة")
+                for j, question in enumerate(questions[:-1])
+            }
+            for i in range(10000)
+        ]
+
+        async def run():
+            grade_seconds = 0.0
+            for answers in submissions:
+                key = engine.get_answer_key(exam.id)
+                grade_start = time.perf_counter()
+                grading = await engine.grade(key, answers)
+                grade_seconds += time.perf_counter() - grade_start
+                engine.persist(key, student_id=1, grading=grading, academy_id=1)
+            return grade_seconds
+
+        start = time.perf_counter()
+        grade_seconds = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+        rate = len(submissions) / elapsed * 60
+        print(
+            f"\nExam grading bench: {len(submissions)} submissions x {len(questions)} questions in "
+            f"{elapsed:.2f}s ({rate:.0f}/min), grading {grade_seconds / len(submissions) * 1e6:.0f}us/submission"
+        )
+        assert db_session.query(QuestionCorrection).count() == len(submissions) * len(questions)
+        assert rate >= 10000
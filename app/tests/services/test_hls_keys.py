@@ -0,0 +1,134 @@
+"""
+Tests for the database-backed HLS key store.
+
+This module covers:
+- Keys stored as rows and served from the per-worker cache
+- Expiry honoured by lookups, purged in one DELETE, and reflected in statistics
+- Key and keyinfo files materialised only for an encode
+- Key lookup latency with 1M keys benchmark
+"""
+
+import os
+import random
+import statistics as stats
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.hls_key import HLSKey
+from app.services.hls_keys import HLSKeyStore
+
+
+class TestHLSKeyStore:
+    """Test suite for HLSKeyStore"""
+
+    def test_keys_served_from_cache(self, count_queries, db_session):
+        """A hot key costs no query; an expired or evicted key goes back to the table"""
+        store = HLSKeyStore(cache_size=2)
+        key = store.create("session-1", video_id="video-1", user_id=7, db=db_session)
+        assert len(key["key"]) == 16 and len(key["key_id"]) == 16
+
+        with count_queries() as queries:
+            assert store.get(key["key_id"], db=db_session)["key"] == key["key"]
+        assert queries == []
+
+        store.invalidate()
+        with count_queries() as queries:
+            found = store.get(key["key_id"], db=db_session)
+            store.get(key["key_id"], db=db_session)
+        assert len(queries) == 1
+        assert (found["video_id"], found["user_id"], found["session_id"]) == ("video-1", 7, "session-1")
+
+        for n in range(2, 4):
+            store.create(f"session-{n}", db=db_session)
+        assert key["key_id"] not in store._cache
+        assert store.get("unknown", db=db_session) is None
+
+        db_session.execute(insert(HLSKey), [{
+            "key_id": "expired", "key": bytes(16), "session_id": "s",
+            "created_at": datetime.utcnow(), "expires_at": datetime.utcnow() - timedelta(seconds=1)
+        }])
+        assert store.get("expired", db=db_session) is None
+
+    def test_expiry_is_one_delete(self, count_queries, db_session):
+        """Expired keys go in a single DELETE and leave the cache with it"""
+        store = HLSKeyStore()
+        now = datetime.utcnow()
+        db_session.execute(insert(HLSKey), [
+            {"key_id": f"old{n}", "key": bytes(16), "session_id": "s", "created_at": now,
+             "expires_at": now - timedelta(hours=1)}
+            for n in range(50)
+        ])
+        live = store.create("live", db=db_session)
+        assert store.statistics(db=db_session, now=now) == {"total_keys": 51, "active_keys": 1, "expired_keys": 50}
+
+        with count_queries() as queries:
+            assert store.delete_expired(db=db_session, now=now) == 50
+        assert [statement.split()[0] for statement in queries] == ["DELETE"]
+        assert db_session.scalar(select(func.count()).select_from(HLSKey)) == 1
+        assert store.get(live["key_id"], db=db_session) is not None
+
+        assert store.delete_expired(db=db_session, now=live["expires_at"]) == 1
+        assert store._cache == {}
+
+    def test_keyinfo_written_for_encode(self, db_session, tmp_path):
+        """ffmpeg gets a key file and a keyinfo pointing players at the key URI"""
+        store = HLSKeyStore()
+        key = store.create("encode", db=db_session)
+        keyinfo = store.write_keyinfo(key, tmp_path, key_uri=f"/api/v1/hls/key/{key['key_id']}")
+        uri, key_path = keyinfo.read_text().splitlines()
+        assert uri == f"/api/v1/hls/key/{key['key_id']}"
+        assert open(key_path, "rb").read() == key["key"]
+        assert sorted(path.name for path in tmp_path.iterdir()) == [f"{key['key_id']}.key", f"{key['key_id']}.keyinfo"]
+
+    @pytest.mark.slow
+    def test_benchmark_lookup_at_one_million_keys(self, tmp_path):
+        """Cold and cached key lookups and the expiry purge with 1M keys stored"""
+        total = int(os.environ.get("HLS_BENCH_KEYS", 1_000_000))
+        engine = create_engine(f"sqlite:///{tmp_path / 'keys.db'}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        now = datetime.utcnow()
+
+        with Session() as db:
+            for start in range(0, total, 50_000):
+                db.execute(insert(HLSKey), [
+                    {"key_id": f"{n:016x}", "key": n.to_bytes(16, "big"), "session_id": f"s{n}",
+                     "created_at": now, "expires_at": now + timedelta(hours=1 if n % 10 else -1)}
+                    for n in range(start, min(start + 50_000, total))
+                ])
+            db.commit()
+
+        store = HLSKeyStore(session_factory=Session, cache_size=10_000)
+        rng = random.Random(43)
+        hot = [f"{n:016x}" for n in rng.sample(range(total), 1000) if n % 10]
+
+        def timed(key_ids):
+            timings = []
+            with Session() as db:
+                for key_id in key_ids:
+                    start = time.perf_counter()
+                    assert store.get(key_id, db=db) is not None
+                    timings.append((time.perf_counter() - start) * 1_000_000)
+            timings.sort()
+            return stats.median(timings), timings[int(len(timings) * 0.95)]
+
+        cold = timed(hot)
+        cached = timed(hot)
+        with Session() as db:
+            start = time.perf_counter()
+            deleted = store.delete_expired(db=db, now=now)
+            purge_ms = (time.perf_counter() - start) * 1000
+        engine.dispose()
+
+        print(f"\nHLS key store ({total:,} keys):")
+        print(f"  table lookup: p50 {cold[0]:.1f}us, p95 {cold[1]:.1f}us")
+        print(f"  cached:       p50 {cached[0]:.1f}us, p95 {cached[1]:.1f}us")
+        print(f"  purge {deleted:,} expired: {purge_ms:.0f}ms")
+        assert deleted == total // 10
+        assert cached[1] < cold[0]
+        assert cold[1] < 5000
@@ -0,0 +1,194 @@
+"""
+Tests for responsive image variants.
+
+This module covers:
+- Width ladders in every available format, named by content hash, and their manifest
+- Identical uploads reusing their variants; orientation and transparency handling
+- Encoding on the process pool
+- Uploads through FileService served with immutable cache headers, and manifests in catalog items
+- Upload latency and bytes per catalog page benchmark
+"""
+
+import asyncio
+import io
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image, ImageFilter
+from starlette.datastructures import Headers
+
+from app.api.v1.courses.public import _with_image_variants
+from app.core.config import settings
+from app.services.file_service import file_service
+from app.services.image_variants import ImageVariantService, available_formats, image_digest, image_variants
+
+
+def _photo(size=(1600, 1000), mode="RGB", image_format="JPEG", seed=47, **save_options) -> bytes:
+    """A photo-like picture: smooth gradients with some grain"""
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 30 + seed % 7).filter(ImageFilter.GaussianBlur(2))
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    if mode == "RGBA":
+        image.putalpha(gradient)
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **save_options)
+    return buffer.getvalue()
+
+
+def _upload(data: bytes, content_type="image/jpeg", filename="photo.jpg") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), size=len(data), filename=filename, headers=Headers({"content-type": content_type}))
+
+
+class TestImageVariants:
+    """Test suite for ImageVariantService"""
+
+    def test_ladder_and_manifest(self, tmp_path):
+        """A course image becomes three widths per format, listed smallest first"""
+        service = ImageVariantService(storage_path=tmp_path / "images", url_prefix="/img", workers=0)
+        data = _photo()
+        manifest = asyncio.run(service.create(data, "course"))
+        digest = image_digest(data)
+
+        formats = available_formats()
+        assert formats[-2:] == ["webp", "jpg"]
+        assert (manifest["hash"], manifest["width"], manifest["height"]) == (digest, 720, 450)
+        assert manifest["src"] == f"/img/course/{digest}-720.jpg"
+        assert manifest["srcset"] == f"/img/course/{digest}-320.jpg 320w, /img/course/{digest}-480.jpg 480w, /img/course/{digest}-720.jpg 720w"
+        assert [source["type"] for source in manifest["sources"]] == [f"image/{name}" for name in formats[:-1]]
+        assert len(manifest["variants"]) == 3 * len(formats)
+        assert service.stored_path(manifest) == f"{(tmp_path / 'images').as_posix()}/course/{digest}-720.jpg"
+
+        with Image.open(tmp_path / "images" / "course" / f"{digest}-320.webp") as variant:
+            assert variant.size == (320, 200)
+        with Image.open(tmp_path / "images" / "course" / f"{digest}-720.jpg") as variant:
+            assert (variant.format, variant.size) == ("JPEG", (720, 450))
+
+        # Identical bytes reuse the files, even from another worker's cache
+        modified = (tmp_path / "images" / "course" / f"{digest}-720.jpg").stat().st_mtime_ns
+        fresh = ImageVariantService(storage_path=tmp_path / "images", url_prefix="/img", workers=0)
+        assert asyncio.run(fresh.create(data, "course")) == manifest
+        assert (tmp_path / "images" / "course" / f"{digest}-720.jpg").stat().st_mtime_ns == modified
+        assert fresh.manifest(f"/img/course/{digest}-480.jpg") == manifest
+        assert fresh.manifests(["static/uploads/courses/old.jpg", None]) == {"static/uploads/courses/old.jpg": None}
+
+    def test_orientation_and_transparency_on_process_pool(self, tmp_path):
+        """Pool-encoded logos keep alpha in modern formats and sit on white in JPEG; EXIF rotation applies"""
+        service = ImageVariantService(storage_path=tmp_path / "images", workers=1)
+        try:
+            logo = asyncio.run(service.create(_photo((300, 150), mode="RGBA", image_format="PNG"), "logo"))
+            assert [variant["width"] for variant in logo["variants"] if variant["format"] == "jpg"] == [300, 200, 100]
+            directory = tmp_path / "images" / "logo"
+            with Image.open(directory / f"{logo['hash']}-300.webp") as webp:
+                assert webp.mode == "RGBA"
+            with Image.open(directory / f"{logo['hash']}-300.jpg") as jpeg:
+                assert jpeg.mode == "RGB"
+
+            exif = Image.Exif()
+            exif[0x0112] = 6  # Rotated 90 degrees clockwise
+            portrait = asyncio.run(service.create(_photo((1200, 800), exif=exif.tobytes()), "course"))
+            assert (portrait["width"], portrait["height"]) == (300, 450)
+
+            with pytest.raises(Exception):
+                asyncio.run(service.create(b"not an image", "profile"))
+        finally:
+            service.shutdown()
+
+    def test_upload_served_immutable_with_catalog_manifest(self, client):
+        """FileService stores the JPEG fallback path; its variants are cacheable and reach catalog items"""
+        storage = Path(settings.IMAGE_VARIANT_STORAGE_PATH)
+        created = not storage.exists()
+        try:
+            path = asyncio.run(file_service.upload_course_image(_upload(_photo(seed=48)), None))
+            assert path.startswith("static/uploads/images/course/") and path.endswith("-720.jpg")
+
+            courses = _with_image_variants([{"image": path}, {"image": "static/uploads/courses/legacy.jpg"}])
+            manifest = courses[0]["image_variants"]
+            assert manifest["src"] == f"/{path}" and courses[1]["image_variants"] is None
+
+            for variant in manifest["variants"]:
+                response = client.get(variant["url"])
+                assert response.status_code == 200
+                assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+                assert response.headers["content-type"] == f"image/{'jpeg' if variant['format'] == 'jpg' else variant['format']}"
+                assert int(response.headers["content-length"]) == variant["bytes"]
+
+            response = client.get("/api/v1/public/images/manifest", params={"path": path})
+            assert response.status_code == 200 and response.json()["hash"] == manifest["hash"]
+            assert client.get("/api/v1/public/images/manifest", params={"path": "legacy.jpg"}).status_code == 404
+
+            with pytest.raises(HTTPException) as error:
+                asyncio.run(file_service.upload_profile_image(_upload(b"\x00" * 64), 1, "student"))
+            assert error.value.status_code == 400
+        finally:
+            image_variants.shutdown()
+            image_variants.clear()
+            if created:
+                shutil.rmtree(storage, ignore_errors=True)
+            else:
+                for stored in storage.glob(f"*/{image_digest(_photo(seed=48))}*"):
+                    stored.unlink()
+
+    @pytest.mark.slow
+    def test_benchmark_upload_latency_and_catalog_bytes(self, tmp_path):
+        """Upload latency and event-loop stalls vs resizing in the handler; bytes of a 20-course page"""
+        uploads = [_photo((3000, 2000), seed=seed, quality=92) for seed in range(8)]
+
+        def single_jpeg(data: bytes, path: Path):
+            # What the upload handlers did before: one thumbnail, one JPEG, on the event loop
+            with Image.open(io.BytesIO(data)) as image:
+                image.thumbnail((800, 450), Image.Resampling.LANCZOS)
+                image.save(path, "JPEG", optimize=True, quality=85)
+
+        async def measure(upload):
+            stalls, done = [0.0], asyncio.Event()
+
+            async def ticker():
+                last = time.perf_counter()
+                while not done.is_set():
+                    await asyncio.sleep(0.005)
+                    now = time.perf_counter()
+                    stalls[0] = max(stalls[0], now - last - 0.005)
+                    last = now
+
+            watcher = asyncio.create_task(ticker())
+            start = time.perf_counter()
+            await asyncio.gather(*(upload(n, data) for n, data in enumerate(uploads)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await watcher
+            return elapsed, stalls[0]
+
+        async def inline(n, data):
+            single_jpeg(data, tmp_path / f"inline-{n}.jpg")
+
+        service = ImageVariantService(storage_path=tmp_path / "images", workers=2)
+        try:
+            inline_elapsed, inline_stall = asyncio.run(measure(inline))
+            pooled_elapsed, pooled_stall = asyncio.run(measure(lambda n, data: service.create(data, "course")))
+        finally:
+            service.shutdown()
+
+        print(f"\n{len(uploads)} concurrent 3000x2000 uploads:")
+        print(f"  single JPEG in the handler: {inline_elapsed * 1000:.0f}ms, event loop stalled up to {inline_stall * 1000:.0f}ms")
+        print(f"  variants on 2 processes:    {pooled_elapsed * 1000:.0f}ms, event loop stalled up to {pooled_stall * 1000:.0f}ms")
+
+        # A catalog page of 20 course cards drawn 360 CSS pixels wide at 1x
+        manifests = [service.manifest_for("course", image_digest(data)) for data in uploads]
+        legacy_bytes = sum((tmp_path / f"inline-{n}.jpg").stat().st_size for n in range(len(uploads)))
+        page_legacy = legacy_bytes / len(uploads) * 20
+        pages = {}
+        for image_format in available_formats():
+            chosen = [
+                min((v for v in manifest["variants"] if v["format"] == image_format and v["width"] >= 360), key=lambda v: v["width"])
+                for manifest in manifests
+            ]
+            pages[image_format] = sum(v["bytes"] for v in chosen) / len(chosen) * 20
+        print(f"  catalog page of 20 cards: single JPEG {page_legacy / 1024:.0f} KiB, " + ", ".join(
+            f"{name} {size / 1024:.0f} KiB" for name, size in pages.items()
+        ))
+
+        assert pooled_stall < inline_stall
+        assert min(pages.values()) < page_legacy / 2
@@ -0,0 +1,153 @@
+"""
+Tests for event-sourced student learning analytics.
+
+This module covers:
+- Progress, exam and login events folded into daily buckets, once per dedupe key
+- Week, month and year views read in a fixed number of queries
+- Backfill from lesson_progress that skips rows already tracked live and can rerun
+- Analytics latency for a student with three years of activity benchmark
+"""
+
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.core.config import settings
+from app.models.learning_analytics import LearningEvent, LearningEventType, StudentDailyActivity
+from app.models.lesson_progress import LessonProgress
+from app.services.learning_analytics import learning_analytics
+
+
+STUDENT_ID = 9401
+
+
+def _progress(db, student_id=STUDENT_ID, **values):
+    progress = LessonProgress(student_id=student_id, lesson_id=str(uuid.uuid4()), course_id="7", **values)
+    db.add(progress)
+    db.flush()
+    return progress
+
+
+def _bucket(db, student_id=STUDENT_ID, day=None):
+    db.expire_all()
+    return db.get(StudentDailyActivity, (student_id, day or datetime.utcnow().date()))
+
+
+class TestLearningAnalytics:
+    """Test suite for LearningAnalyticsService"""
+
+    def test_events_fold_into_daily_buckets(self, db_session, monkeypatch):
+        """Heartbeats credit short gaps only; completions and exams count once"""
+        monkeypatch.setattr(settings, "LEARNING_HEARTBEAT_MAX_GAP_SECONDS", 120)
+        now = datetime.now()
+        progress = _progress(db_session, last_watched_at=now)
+        learning_analytics.record_progress(db_session, progress, None, False, now=now)
+        learning_analytics.record_progress(db_session, progress, now, False, now=now + timedelta(seconds=45))
+        learning_analytics.record_progress(
+            db_session, progress, now + timedelta(seconds=45), False, now=now + timedelta(minutes=30)
+        )
+        progress.completed = True
+        learning_analytics.record_progress(db_session, progress, now, False, now=now + timedelta(seconds=90))
+        # A client that resends the completing update
+        learning_analytics.record_progress(db_session, progress, now, False, now=now + timedelta(seconds=95))
+
+        learning_analytics.record_exam(db_session, STUDENT_ID, "exam-1", "corr-1", 93, True)
+        learning_analytics.record_exam(db_session, STUDENT_ID, "exam-1", "corr-1", 93, True)
+        learning_analytics.record_exam(db_session, STUDENT_ID, "exam-2", "corr-2", 40, False)
+        learning_analytics.record_login(db_session, STUDENT_ID)
+        db_session.commit()
+
+        bucket = _bucket(db_session)
+        assert (bucket.study_seconds, bucket.lessons_started, bucket.lessons_completed) == (45 + 90 + 95, 1, 1)
+        assert (bucket.exams_submitted, bucket.exams_passed, bucket.score_total, bucket.logins) == (2, 1, 133, 1)
+        types = db_session.execute(
+            select(LearningEvent.event_type, func.count()).where(LearningEvent.student_id == STUDENT_ID)
+            .group_by(LearningEvent.event_type)
+        ).all()
+        assert dict(types) == {
+            LearningEventType.LESSON_STARTED: 1, LearningEventType.PROGRESS_HEARTBEAT: 4,
+            LearningEventType.LESSON_COMPLETED: 1, LearningEventType.EXAM_SUBMITTED: 2, LearningEventType.LOGIN: 1
+        }
+
+    def test_period_views_read_buckets(self, count_queries, db_session):
+        """Week, month and year views sum daily rows in three queries"""
+        today = date(2026, 5, 20)
+        rows = [
+            {"student_id": STUDENT_ID, "day": today - timedelta(days=offset), "study_seconds": 3600,
+             "lessons_started": 2, "lessons_completed": 1, "exams_submitted": 1, "exams_passed": 1,
+             "score_total": 80, "logins": 1 if offset % 2 == 0 else 0}
+            for offset in range(400)
+        ]
+        db_session.execute(insert(StudentDailyActivity), rows)
+        db_session.commit()
+
+        with count_queries() as queries:
+            week = learning_analytics.get_analytics(db_session, STUDENT_ID, "week", today=today)
+        assert len(queries) == 3
+        assert week["study_time"]["total_minutes"] == 7 * 60
+        assert week["study_time"]["daily_average"] == 60
+        assert [point["minutes"] for point in week["study_time"]["weekly_data"]] == [60] * 7
+        assert week["study_time"]["weekly_data"][-1]["day"] == "2026-05-20"
+        assert week["engagement"] == {"login_days": 4, "video_completion_rate": 50, "quizzes_taken": 7}
+
+        month = learning_analytics.get_analytics(db_session, STUDENT_ID, "month", today=today)
+        assert (month["progress"]["lessons_completed"], month["progress"]["average_quiz_score"]) == (30, 80)
+        year = learning_analytics.get_analytics(db_session, STUDENT_ID, "year", today=today)
+        assert (year["start_date"], year["progress"]["quizzes_passed"]) == ("2025-05-21", 365)
+
+        empty = learning_analytics.get_analytics(db_session, STUDENT_ID + 1, "month", today=today)
+        assert empty["study_time"]["total_minutes"] == 0 and empty["progress"]["average_quiz_score"] == 0
+
+    def test_backfill_from_lesson_progress(self, db_session):
+        """History is derived once; rows tracked live are left to the live events"""
+        day = datetime(2025, 11, 3, 9, 0)
+        _progress(
+            db_session, completed=True, progress_percentage=100, current_position_seconds=600,
+            created_at=day, updated_at=day + timedelta(days=2), last_watched_at=day + timedelta(days=2)
+        )
+        _progress(db_session, current_position_seconds=120, created_at=day, updated_at=day)
+        live = _progress(db_session, current_position_seconds=300, last_watched_at=datetime.now())
+        learning_analytics.record_progress(db_session, live, None, False)
+        db_session.commit()
+
+        assert learning_analytics.backfill(db_session, batch_size=2) == 5
+        assert learning_analytics.backfill(db_session) == 0
+
+        started = _bucket(db_session, day=day.date())
+        assert (started.lessons_started, started.study_seconds) == (2, 120)
+        finished = _bucket(db_session, day=(day + timedelta(days=2)).date())
+        assert (finished.study_seconds, finished.lessons_completed) == (600, 1)
+        assert _bucket(db_session).study_seconds == 0
+
+    @pytest.mark.slow
+    def test_benchmark_three_years_of_activity(self, db_session):
+        """Analytics latency for a student with 3 years of daily activity among 200 students"""
+        today = date(2026, 6, 30)
+        rows = [
+            {"student_id": student_id, "day": today - timedelta(days=offset), "study_seconds": 1800 + offset,
+             "lessons_started": 1, "lessons_completed": offset % 2, "exams_submitted": int(offset % 3 == 0),
+             "exams_passed": int(offset % 6 == 0), "score_total": 70 if offset % 3 == 0 else 0, "logins": 1}
+            for student_id in range(STUDENT_ID, STUDENT_ID + 200)
+            for offset in range(3 * 365)
+        ]
+        db_session.execute(insert(StudentDailyActivity), rows)
+        db_session.commit()
+
+        results = {}
+        for period in ("week", "month", "year"):
+            timings = []
+            for _ in range(100):
+                start = time.perf_counter()
+                learning_analytics.get_analytics(db_session, STUDENT_ID + 100, period, today=today)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[period] = (statistics.median(timings), timings[94])
+
+        print(f"\nAnalytics bench ({len(rows):,} daily rows):")
+        for period, (p50, p95) in results.items():
+            print(f"  {period}: p50 {p50:.2f}ms, p95 {p95:.2f}ms")
+        assert results["year"][1] < 50
@@ -0,0 +1,255 @@
+"""
+Tests for the faststart remux stage and seek indexes.
+
+This module covers:
+- Seek indexes read from the fragments of a fragmented MP4
+- The remux stage writing the sidecar index and updating the video row
+- Open-ended ranges answered with whole fragments through /videos/watch
+- A real remux of a trailing-moov clip, where ffmpeg is installed
+- Time-to-first-frame and bytes served per seek on a sample corpus benchmark
+"""
+
+import random
+import shutil
+import struct
+import subprocess
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.models.chapter import Chapter
+from app.models.course import Category, Course
+from app.models.lesson import Lesson
+from app.models.product import Product
+from app.models.user import User
+from app.models.video import Video
+from app.services.media_faststart import (
+    FaststartRemuxer, SeekIndexCache, build_seek_index, seek_index_path, seek_indexes
+)
+from app.services.media_probe import MediaProbe, apply_probe, moov_at_end
+from app.services.video_streaming import video_streaming_service
+
+
+TIMESCALE = 12800
+
+
+def _box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _full_box(box_type: bytes, version: int, payload: bytes) -> bytes:
+    return _box(box_type, bytes([version, 0, 0, 0]) + payload)
+
+
+def _trak(track_id: int, handler: bytes, timescale: int) -> bytes:
+    tkhd = _full_box(b"tkhd", 0, struct.pack(">III", 0, 0, track_id) + bytes(68))
+    mdhd = _full_box(b"mdhd", 0, struct.pack(">III", 0, 0, timescale) + bytes(8))
+    hdlr = _full_box(b"hdlr", 0, struct.pack(">I4s", 0, handler) + bytes(12))
+    return _box(b"trak", tkhd + _box(b"mdia", mdhd + hdlr))
+
+
+def _write(path, parts):
+    """Write boxes; an int is an mdat of that many (sparse) payload bytes"""
+    with open(path, "wb") as media:
+        for part in parts:
+            if isinstance(part, int):
+                media.write(struct.pack(">I4s", 8 + part, b"mdat"))
+                media.seek(part, 1)
+            else:
+                media.write(part)
+        media.truncate()
+    return path
+
+
+def _fragmented_mp4(path, gop_bytes, gop_seconds=2.0):
+    """ftyp, an empty moov, then one moof/mdat per keyframe"""
+    parts = [_box(b"ftyp", b"isom" + bytes(4)), _box(b"moov", _trak(1, b"vide", TIMESCALE) + _trak(2, b"soun", 48000))]
+    for sequence, size in enumerate(gop_bytes):
+        video_traf = _box(b"traf", _full_box(b"tfhd", 0, struct.pack(">I", 1))
+                          + _full_box(b"tfdt", 1, struct.pack(">Q", int(sequence * gop_seconds * TIMESCALE))))
+        audio_traf = _box(b"traf", _full_box(b"tfhd", 0, struct.pack(">I", 2))
+                          + _full_box(b"tfdt", 0, struct.pack(">I", int(sequence * gop_seconds * 48000))))
+        parts += [_box(b"moof", _full_box(b"mfhd", 0, struct.pack(">I", sequence + 1)) + video_traf + audio_traf), size]
+    return _write(path, parts)
+
+
+def _uploaded_mp4(path, gop_bytes, table_bytes=4096):
+    """The layout most encoders write: media first, sample tables in a trailing moov"""
+    moov = _box(b"moov", _trak(1, b"vide", TIMESCALE) + _box(b"free", bytes(table_bytes)))
+    return _write(path, [_box(b"ftyp", b"isom" + bytes(4)), sum(gop_bytes), moov])
+
+
+def _create_video(db, video_path, probe: MediaProbe):
+    """A probed free-preview lesson video stored at ``video_path``"""
+    category = Category(title="عام", slug=f"faststart-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=1, title="دورة التشغيل السريع", price=Decimal("100.00"))
+    db.add_all([category, product])
+    db.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"faststart-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s"
+    )
+    db.add(course)
+    db.flush()
+    chapter = Chapter(course_id=course.id, title="الفصل", order_number=0)
+    db.add(chapter)
+    db.flush()
+    stored_path = video_streaming_service._encrypt_file_path(str(video_path))
+    lesson = Lesson(
+        chapter_id=chapter.id, course_id=course.id, title="درس", type="video",
+        is_free_preview=True, video=stored_path
+    )
+    db.add(lesson)
+    db.flush()
+    video = Video(lesson_id=lesson.id, title="فيديو", video=stored_path)
+    db.add(video)
+    db.flush()
+    apply_probe(video, probe)
+    db.commit()
+    return video
+
+
+def _probe(file_path, video_codec="h264", moov_last=False, duration=60.0):
+    return MediaProbe(
+        duration=duration, file_size=file_path.stat().st_size, mime_type="video/mp4",
+        video_codec=video_codec, audio_codec="aac", moov_at_end=moov_last
+    )
+
+
+class TestMediaFaststart:
+    """Test suite for the faststart stage and seek indexes"""
+
+    def test_seek_index_from_fragments(self, tmp_path):
+        """Fragment times come from tfdt of the video track; other layouts have no index"""
+        clip = _fragmented_mp4(tmp_path / "clip.mp4", [3000, 5000, 4000, 2000])
+        index = build_seek_index(clip)
+        assert index.times == [0.0, 2.0, 4.0, 6.0]
+        assert index.size == clip.stat().st_size
+        first, second, third, fourth = index.offsets
+        assert index.init_size == first and third - second > 5000
+        assert (index.offset_at(0), index.offset_at(5.9), index.offset_at(99)) == (first, third, fourth)
+        # Whole fragments, at least the requested bytes
+        assert index.range_end(second, 1) == third - 1
+        assert index.range_end(second, third - second + 1) == fourth - 1
+        assert index.range_end(third, 10_000) == index.size - 1
+        assert not moov_at_end(clip)
+
+        assert build_seek_index(_uploaded_mp4(tmp_path / "uploaded.mp4", [3000, 5000])) is None
+
+    def test_stage_writes_index_and_updates_row(self, db_session, tmp_path):
+        """An uploaded fragmented file is indexed as is; unplayable codecs are left alone"""
+        clip = _fragmented_mp4(tmp_path / "clip.mp4", [3000] * 5)
+        video = _create_video(db_session, clip, _probe(clip))
+        video.file_size, video.format = 0, "video/quicktime"
+
+        index = FaststartRemuxer(ffmpeg_path="missing-ffmpeg").remux(db_session, video, clip)
+        db_session.commit()
+        assert seek_index_path(clip).read_text() == index.to_json()
+        assert (video.file_size, video.format, video.lesson.size_bytes) == (index.size, "video/mp4", index.size)
+        assert index.size == clip.stat().st_size
+        assert SeekIndexCache().get(clip, video.file_size) == index
+        assert SeekIndexCache().get(clip, video.file_size + 1) is None
+
+        prores = _uploaded_mp4(tmp_path / "master.mov", [3000] * 5)
+        other = _create_video(db_session, prores, _probe(prores, video_codec="prores", moov_last=True))
+        assert FaststartRemuxer(ffmpeg_path="missing-ffmpeg").remux(db_session, other, prores) is None
+        assert other.needs_faststart and not seek_index_path(prores).exists()
+
+    def test_open_ended_ranges_get_whole_fragments(self, client, db_session, tmp_path, monkeypatch):
+        """Seeks to an open-ended range stop at a fragment boundary; explicit ranges are honoured"""
+        clip = _fragmented_mp4(tmp_path / "clip.mp4", [40_000] * 10)
+        video = _create_video(db_session, clip, _probe(clip))
+        index = FaststartRemuxer().remux(db_session, video, clip)
+        db_session.commit()
+        db_session.add(User(id=9801, fname="طالب", lname="التقديم", email="seek9801@example.com", user_type="student"))
+        db_session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(subject=9801, user_type='student')}"}
+        monkeypatch.setattr(settings, "VIDEO_SEEK_RANGE_BYTES", 50_000)
+        seek_indexes.clear()
+
+        url = f"/api/v1/videos/watch/{video.id}"
+        first = client.get(url, headers={**headers, "Range": "bytes=0-"})
+        assert first.headers["content-range"] == f"bytes 0-{index.offsets[2] - 1}/{index.size}"
+        seek = client.get(url, headers={"Range": f"bytes={index.offset_at(11)}-"})
+        assert seek.headers["content-range"] == f"bytes {index.offsets[5]}-{index.offsets[7] - 1}/{index.size}"
+        assert len(seek.content) == index.offsets[7] - index.offsets[5]
+        explicit = client.get(url, headers={"Range": "bytes=100-199"})
+        assert explicit.headers["content-range"] == f"bytes 100-199/{index.size}"
+
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+    def test_real_remux(self, db_session, tmp_path):
+        """A trailing-moov clip is remuxed in place to an indexed fragmented MP4"""
+        clip = tmp_path / "clip.mp4"
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=25:duration=6",
+            "-f", "lavfi", "-i", "sine=duration=6", "-c:v", "libx264", "-g", "50", "-c:a", "aac",
+            "-shortest", str(clip)
+        ], check=True)
+        assert moov_at_end(clip)
+        video = _create_video(db_session, clip, _probe(clip, moov_last=True, duration=6.0))
+        index = FaststartRemuxer().remux(db_session, video, clip)
+        assert not moov_at_end(clip)
+        assert index.times == [0.0, 2.0, 4.0]
+        assert video.file_size == clip.stat().st_size and not video.needs_faststart
+
+    @pytest.mark.slow
+    def test_benchmark_first_frame_and_seek_bytes(self, tmp_path):
+        """Modelled time-to-first-frame and bytes served per seek, as uploaded versus remuxed"""
+        rtt, bandwidth = 0.08, 10_000_000 / 8  # 80 ms round trip, 10 Mbit/s
+        range_bytes = settings.VIDEO_SEEK_RANGE_BYTES
+        rng = random.Random(45)
+        # (minutes, kbit/s, seconds between keyframes)
+        corpus = [(2, 800, 2), (10, 1200, 2), (30, 600, 4), (45, 1500, 10)]
+
+        print(f"\nFaststart corpus (RTT {rtt * 1000:.0f}ms, {bandwidth * 8 / 1e6:.0f} Mbit/s, "
+              f"seek ranges >= {range_bytes // 1024} KiB):")
+        seek_totals = {"uploaded": 0.0, "remuxed": 0.0}
+        for minutes, kbps, gop_seconds in corpus:
+            gops = [
+                int(kbps * 1000 / 8 * gop_seconds * rng.uniform(0.6, 1.4))
+                for _ in range(int(minutes * 60 / gop_seconds))
+            ]
+            # Sample tables take roughly 16 bytes per frame at 25 fps
+            uploaded = _uploaded_mp4(tmp_path / f"{minutes}.mp4", gops, table_bytes=minutes * 60 * 25 * 16)
+            remuxed = _fragmented_mp4(tmp_path / f"{minutes}-frag.mp4", gops, gop_seconds)
+            index = build_seek_index(remuxed)
+            mdat_start = 16  # after ftyp
+            keyframes = [mdat_start + 8 + sum(gops[:n]) for n in range(len(gops))]
+            uploaded_size = uploaded.stat().st_size
+            moov_start = mdat_start + 8 + sum(gops)
+
+            def served(file_path, size, range_header, seek_index=None):
+                response = video_streaming_service.create_range_response(
+                    file_path, range_header, size, "video/mp4", seek_index
+                )
+                return int(response.headers["Content-Length"])
+
+            # Uploaded: read the head, fetch the trailing moov, then the first keyframe
+            needed = [64 * 1024, uploaded_size - moov_start, gops[0]]
+            uploaded_ttff = sum(rtt + bytes_ / bandwidth for bytes_ in needed)
+            # Remuxed: the first response carries the moov and whole first fragments
+            first_response = served(remuxed, index.size, "bytes=0-", index)
+            assert first_response >= index.offsets[1]
+            remuxed_ttff = rtt + index.offsets[1] / bandwidth
+
+            seeks = [rng.randrange(len(gops)) for _ in range(200)]
+            uploaded_seek = sum(served(uploaded, uploaded_size, f"bytes={keyframes[n]}-") for n in seeks) / len(seeks)
+            remuxed_seek = sum(
+                served(remuxed, index.size, f"bytes={index.offset_at(n * gop_seconds)}-", index) for n in seeks
+            ) / len(seeks)
+
+            print(f"  {minutes:>2} min {kbps} kbit/s, keyframe every {gop_seconds}s "
+                  f"({uploaded_size / 1e6:.0f} MB):")
+            print(f"    first frame: uploaded {uploaded_ttff * 1000:.0f}ms over 3 requests, "
+                  f"remuxed {remuxed_ttff * 1000:.0f}ms over 1")
+            print(f"    served per seek: uploaded {uploaded_seek / 1e6:.1f} MB, remuxed {remuxed_seek / 1e6:.2f} MB")
+            seek_totals["uploaded"] += uploaded_seek
+            seek_totals["remuxed"] += remuxed_seek
+            assert remuxed_ttff < uploaded_ttff
+            assert remuxed_seek < uploaded_seek
+            assert remuxed_seek <= range_bytes + max(gops) + 4096
+
+        assert seek_totals["remuxed"] * 10 < seek_totals["uploaded"]
@@ -0,0 +1,188 @@
+"""
+Tests for the upload-time media probe.
+
+This module covers:
+- moov position found from the top-level MP4 boxes
+- ffprobe output turned into codecs, resolution, bitrate, keyframe interval and MIME type
+- Probe results stored by the pipeline and fed into the duration aggregates
+- Streaming headers taken from the probed row instead of the file
+- A real ffprobe run, where ffmpeg is installed
+"""
+
+import shutil
+import struct
+import subprocess
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.core.security import create_access_token
+from app.models.chapter import Chapter
+from app.models.course import Category, Course
+from app.models.lesson import Lesson
+from app.models.product import Product
+from app.models.user import User
+from app.models.video import Video
+from app.services.media_pipeline import MediaPipeline
+from app.services.media_probe import MediaProbe, MediaProber, apply_probe, moov_at_end, scan_mp4_boxes
+from app.services.video_streaming import video_streaming_service
+
+
+FFPROBE_OUTPUT = {
+    "streams": [
+        {"codec_type": "video", "codec_name": "h264", "width": 1280, "height": 720, "duration": "615.2"},
+        {"codec_type": "audio", "codec_name": "aac", "duration": "615.4"},
+        {"codec_type": "video", "codec_name": "mjpeg", "width": 600, "height": 600,
+         "disposition": {"attached_pic": 1}}
+    ],
+    "format": {
+        "format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": "615.466000", "bit_rate": "1250000",
+        "tags": {"major_brand": "isom"}
+    }
+}
+
+
+def _box(box_type: bytes, payload_size: int = 8, large: bool = False) -> bytes:
+    if large:
+        return struct.pack(">I4sQ", 1, box_type, 16 + payload_size) + bytes(payload_size)
+    return struct.pack(">I4s", 8 + payload_size, box_type) + bytes(payload_size)
+
+
+def _create_lesson(db, video_path):
+    """A free preview lesson whose main video is ``video_path``; returns (course, lesson, video)"""
+    category = Category(title="عام", slug=f"probe-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=1, title="دورة الفحص", price=Decimal("100.00"))
+    db.add_all([category, product])
+    db.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"probe-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s"
+    )
+    db.add(course)
+    db.flush()
+    chapter = Chapter(course_id=course.id, title="الفصل", order_number=0)
+    db.add(chapter)
+    db.flush()
+    stored_path = video_streaming_service._encrypt_file_path(str(video_path))
+    lesson = Lesson(
+        chapter_id=chapter.id, course_id=course.id, title="درس", type="video",
+        is_free_preview=True, video=stored_path
+    )
+    db.add(lesson)
+    db.flush()
+    video = Video(lesson_id=lesson.id, title="فيديو", video=stored_path)
+    db.add(video)
+    db.commit()
+    return course, lesson, video
+
+
+class TestMediaProbe:
+    """Test suite for the media probe and pipeline"""
+
+    def test_moov_position(self, tmp_path):
+        """A moov after mdat needs faststart; non-MP4 files have no answer"""
+        faststart = tmp_path / "faststart.mp4"
+        faststart.write_bytes(_box(b"ftyp") + _box(b"moov", 64) + _box(b"mdat", 4096))
+        trailing = tmp_path / "trailing.mp4"
+        trailing.write_bytes(_box(b"ftyp") + _box(b"free", 0) + _box(b"mdat", 4096, large=True) + _box(b"moov", 64))
+        webm = tmp_path / "clip.webm"
+        webm.write_bytes(bytes.fromhex("1a45dfa39f4286810142f7810142f2") + bytes(64))
+
+        assert moov_at_end(faststart) is False
+        assert moov_at_end(trailing) is True
+        assert [(box, offset) for box, offset, _ in scan_mp4_boxes(trailing)] == [
+            ("ftyp", 0), ("free", 16), ("mdat", 24), ("moov", 4136)
+        ]
+        assert moov_at_end(webm) is None
+
+        # A truncated upload keeps the boxes before the damage
+        truncated = tmp_path / "truncated.mp4"
+        truncated.write_bytes(_box(b"ftyp") + _box(b"mdat", 4096)[:100])
+        assert moov_at_end(truncated) is None
+
+    def test_ffprobe_output_parsed(self):
+        """Cover art is not the video stream; the keyframe interval is the median gap"""
+        probe = MediaProbe.from_ffprobe(
+            FFPROBE_OUTPUT, [0.0, 2.0, 4.0, 4.0, 6.0, 7.5, 10.0], file_size=96_000_000, moov_at_end=True
+        )
+        assert (probe.video_codec, probe.audio_codec, probe.width, probe.height) == ("h264", "aac", 1280, 720)
+        assert (probe.duration, probe.bitrate, probe.keyframe_interval) == (615.466, 1_250_000, 2.0)
+        assert probe.mime_type == "video/mp4" and probe.needs_faststart
+
+        quicktime = {"format": {"format_name": "mov,mp4,m4a,3gp,3g2,mj2", "tags": {"major_brand": "qt  "}},
+                     "streams": [{"codec_type": "video", "codec_name": "prores", "duration": "10.0"}]}
+        probe = MediaProbe.from_ffprobe(quicktime, [0.0], file_size=5_000_000)
+        assert (probe.mime_type, probe.duration, probe.bitrate, probe.keyframe_interval) == (
+            "video/quicktime", 10.0, 4_000_000, None
+        )
+        assert not probe.needs_faststart
+
+        webm = {"format": {"format_name": "matroska,webm", "duration": "3"},
+                "streams": [{"codec_type": "video", "codec_name": "vp9"}, {"codec_type": "audio", "codec_name": "opus"}]}
+        assert MediaProbe.from_ffprobe(webm, [], file_size=1).mime_type == "video/webm"
+
+    def test_pipeline_stores_probe_and_feeds_aggregates(self, db_session, tmp_path):
+        """The stored duration reaches the lesson, chapter and course aggregates"""
+        video_path = tmp_path / "lesson.mp4"
+        video_path.write_bytes(bytes(2048))
+        course, lesson, video = _create_lesson(db_session, video_path)
+        probe = MediaProbe.from_ffprobe(FFPROBE_OUTPUT, [0.0, 2.0, 4.0], file_size=2048, moov_at_end=True)
+        stages = []
+
+        def probe_stage(db, video, file_path):
+            stages.append(file_path)
+            apply_probe(video, probe)
+
+        pipeline = MediaPipeline(stages=[probe_stage])
+        assert pipeline.process(video.id, video_path, db=db_session)
+        assert stages == [video_path]
+        assert not pipeline.process("missing-video", video_path, db=db_session)
+
+        db_session.refresh(video)
+        db_session.refresh(lesson)
+        db_session.refresh(course)
+        assert (video.duration, video.width, video.height, video.video_codec) == (615, 1280, 720, "h264")
+        assert (video.format, video.file_size, video.keyframe_interval) == ("video/mp4", 2048, 2.0)
+        assert video.needs_faststart and video.probed_at is not None
+        assert (lesson.video_duration, lesson.size_bytes) == (615, 2048)
+        assert course.total_duration_seconds == 615
+
+    def test_streaming_headers_from_probed_row(self, client, db_session, tmp_path, monkeypatch):
+        """Authorized and grant requests of a probed video never inspect the file"""
+        video_path = tmp_path / "lesson.mp4"
+        video_path.write_bytes(bytes(range(256)) * 16)
+        _, _, video = _create_lesson(db_session, video_path)
+        apply_probe(video, MediaProbe(duration=12.0, file_size=4096, mime_type="video/quicktime"))
+        db_session.commit()
+        db_session.add(User(id=9701, fname="طالب", lname="الفحص", email="probe9701@example.com", user_type="student"))
+        db_session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(subject=9701, user_type='student')}"}
+
+        def inspected(file_path):
+            raise AssertionError("file metadata read on the request path")
+
+        monkeypatch.setattr(video_streaming_service, "get_video_info", inspected)
+        url = f"/api/v1/videos/watch/{video.id}"
+        first = client.get(url, headers={**headers, "Range": "bytes=0-255"})
+        seek = client.get(url, headers={"Range": "bytes=3840-"})
+        for response in (first, seek):
+            assert response.status_code == 206
+            assert response.headers["content-type"] == "video/quicktime"
+        assert first.headers["content-range"] == "bytes 0-255/4096"
+        assert (seek.headers["content-range"], seek.content) == ("bytes 3840-4095/4096", bytes(range(256)))
+
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+    def test_real_ffprobe(self, tmp_path):
+        """A clip written by ffmpeg without faststart is measured and flagged"""
+        clip = tmp_path / "clip.mp4"
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=25:duration=4",
+            "-f", "lavfi", "-i", "sine=duration=4", "-c:v", "libx264", "-g", "50", "-c:a", "aac",
+            "-shortest", str(clip)
+        ], check=True)
+        probe = MediaProber(ffprobe_path=shutil.which("ffprobe") or "ffprobe").probe(clip)
+        assert (probe.video_codec, probe.audio_codec, probe.width, probe.height) == ("h264", "aac", 320, 240)
+        assert probe.duration == pytest.approx(4, abs=0.2)
+        assert probe.keyframe_interval == pytest.approx(2.0)
+        assert probe.file_size == clip.stat().st_size and probe.needs_faststart
@@ -0,0 +1,183 @@
+"""
+Tests for seek-preview storyboards.
+
+This module covers:
+- Sprite layout and WebVTT cues for a video's duration and aspect ratio
+- Sprites packed, published under a fresh directory and the previous one removed
+- Storyboards served with immutable cache headers
+- Storyboard generation with ffmpeg, where it is installed
+- Generation time per video hour and sprite bytes benchmark
+"""
+
+import random
+import shutil
+import subprocess
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.models.chapter import Chapter
+from app.models.course import Category, Course
+from app.models.lesson import Lesson
+from app.models.product import Product
+from app.models.video import Video
+from app.services.media_storyboard import StoryboardGenerator, build_vtt, plan_layout
+
+
+def _frames(directory: Path, count: int, size=(160, 90), seed: int = 46):
+    """Sampled frames as ffmpeg writes them: a distinct picture per interval"""
+    rng = random.Random(seed)
+    paths = []
+    for n in range(count):
+        frame = Image.effect_noise(size, 40).convert("RGB")
+        frame.paste((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (0, 0, size[0] // 2, size[1]))
+        path = directory / f"frame-{n + 1:05d}.jpg"
+        frame.save(path, "JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def _create_video(db, duration=250):
+    category = Category(title="عام", slug=f"storyboard-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=1, title="دورة المعاينة", price=Decimal("100.00"))
+    db.add_all([category, product])
+    db.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"storyboard-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s"
+    )
+    db.add(course)
+    db.flush()
+    chapter = Chapter(course_id=course.id, title="الفصل", order_number=0)
+    db.add(chapter)
+    db.flush()
+    lesson = Lesson(chapter_id=chapter.id, course_id=course.id, title="درس", type="video")
+    db.add(lesson)
+    db.flush()
+    video = Video(
+        lesson_id=lesson.id, title="فيديو", duration=duration, width=1280, height=720,
+        video_codec="h264", probed_at=datetime.utcnow()
+    )
+    db.add(video)
+    db.commit()
+    return video
+
+
+class TestMediaStoryboard:
+    """Test suite for StoryboardGenerator"""
+
+    def test_layout_and_vtt(self):
+        """An hour at 10 seconds is four 10x10 sheets; cues point at their tiles"""
+        layout = plan_layout(3605, 1280, 720)
+        assert (layout.frames, layout.sheets, layout.thumb_width, layout.thumb_height) == (361, 4, 160, 90)
+        assert plan_layout(60, 720, 1280).thumb_height == 284
+        assert plan_layout(0.5, None, None).frames == 1
+
+        vtt = build_vtt(layout, 3605, [f"sprite-{n:03d}.webp" for n in range(4)])
+        lines = vtt.splitlines()
+        assert lines[:5] == ["WEBVTT", "", "00:00:00.000 --> 00:00:10.000", "sprite-000.webp#xywh=0,0,160,90", ""]
+        cues = vtt.split("\n\n")[1:]
+        assert len([cue for cue in cues if cue]) == 361
+        assert cues[11].splitlines()[1] == "sprite-000.webp#xywh=160,90,160,90"
+        assert cues[100].splitlines()[1] == "sprite-001.webp#xywh=0,0,160,90"
+        assert cues[360].splitlines() == ["01:00:00.000 --> 01:00:05.000", "sprite-003.webp#xywh=0,540,160,90"]
+
+    def test_publish_replaces_previous_storyboard(self, db_session, tmp_path):
+        """Each generation gets a new directory; the last sheet is only as tall as its rows"""
+        video = _create_video(db_session)
+        generator = StoryboardGenerator(storage_path=tmp_path / "boards", url_prefix="/static/storyboards", grid=4)
+        layout = plan_layout(video.duration, video.width, video.height, grid=4)
+        frames_dir = tmp_path / "frames"
+        frames_dir.mkdir()
+        frames = _frames(frames_dir, layout.frames)
+
+        first_url = generator.publish(video, layout, frames)
+        first_dir = tmp_path / "boards" / first_url.split("/")[3]
+        assert sorted(path.name for path in first_dir.iterdir()) == [
+            "sprite-000.webp", "sprite-001.webp", "storyboard.vtt"
+        ]
+        with Image.open(first_dir / "sprite-001.webp") as sprite:
+            assert sprite.size == (640, 3 * 90)  # 25 frames: 16 on the first sheet, 9 in three rows
+        assert video.storyboard_bytes == sum(
+            (first_dir / name).stat().st_size for name in ("sprite-000.webp", "sprite-001.webp")
+        )
+        assert "sprite-001.webp#xywh=0,180,160,90" in (first_dir / "storyboard.vtt").read_text()
+
+        video.storyboard_seconds = 2.5
+        second_url = generator.publish(video, layout, frames)
+        db_session.commit()
+        assert second_url != first_url and video.storyboard_url == second_url
+        assert not first_dir.exists()
+        assert [path.name for path in (tmp_path / "boards").iterdir()] == [second_url.split("/")[3]]
+
+        stats = StoryboardGenerator.statistics(db_session)
+        assert stats["videos"] == 1 and stats["sprite_bytes"] == video.storyboard_bytes
+        assert stats["seconds_per_video_hour"] == round(2.5 / (250 / 3600), 2)
+
+    def test_served_immutable(self, client, db_session, tmp_path):
+        """Storyboard files are static and cacheable for a year"""
+        video = _create_video(db_session)
+        generator = StoryboardGenerator(
+            storage_path=settings.STORYBOARD_STORAGE_PATH, url_prefix=settings.STORYBOARD_URL_PREFIX
+        )
+        layout = plan_layout(video.duration, video.width, video.height)
+        frames_dir = tmp_path / "frames"
+        frames_dir.mkdir()
+        url = generator.publish(video, layout, _frames(frames_dir, layout.frames))
+        try:
+            track = client.get(url)
+            assert track.status_code == 200
+            assert track.headers["cache-control"] == "public, max-age=31536000, immutable"
+            assert track.headers["content-type"].startswith("text/vtt")
+            sprite = client.get(url.replace("storyboard.vtt", "sprite-000.webp"))
+            assert (sprite.status_code, sprite.headers["content-type"]) == (200, "image/webp")
+        finally:
+            storage = Path(settings.STORYBOARD_STORAGE_PATH)
+            shutil.rmtree(storage / url.split("/")[3], ignore_errors=True)
+            if not any(storage.iterdir()):
+                storage.rmdir()
+
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+    def test_generate_with_ffmpeg(self, db_session, tmp_path):
+        """ffmpeg samples a clip into one sheet and a track covering its duration"""
+        clip = tmp_path / "clip.mp4"
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=320x180:rate=25:duration=45",
+            "-c:v", "libx264", "-g", "50", str(clip)
+        ], check=True)
+        video = _create_video(db_session, duration=45)
+        video.keyframe_interval = 2.0
+        url = StoryboardGenerator(storage_path=tmp_path / "boards").generate(db_session, video, clip)
+        track = (tmp_path / "boards" / url.split("/")[3] / "storyboard.vtt").read_text()
+        assert track.count("#xywh=") == 5
+        assert video.storyboard_bytes > 0 and video.storyboard_seconds > 0
+
+    @pytest.mark.slow
+    def test_benchmark_generation_per_video_hour(self, tmp_path):
+        """Packing time and sprite bytes for one video hour, against scrubbing with range requests"""
+        layout = plan_layout(3600, 1280, 720)
+        frames_dir = tmp_path / "frames"
+        frames_dir.mkdir()
+        frames = _frames(frames_dir, layout.frames)
+
+        print(f"\nStoryboard for one video hour ({layout.frames} frames, {layout.sheets} sheets):")
+        results = {}
+        for image_format in ("webp", "jpg"):
+            video = Video(id=str(uuid.uuid4()), duration=3600)
+            generator = StoryboardGenerator(storage_path=tmp_path / image_format, image_format=image_format)
+            start = time.perf_counter()
+            generator.publish(video, layout, frames)
+            elapsed = time.perf_counter() - start
+            results[image_format] = video.storyboard_bytes
+            print(f"  {image_format}: packed in {elapsed * 1000:.0f}ms, {video.storyboard_bytes / 1024:.0f} KiB of sprites")
+
+        scrub_positions = 30
+        range_bytes = scrub_positions * settings.VIDEO_SEEK_RANGE_BYTES
+        print(f"  scrubbing {scrub_positions} positions with range requests: {range_bytes / 1024 / 1024:.0f} MiB")
+        assert max(results.values()) < range_bytes / 10
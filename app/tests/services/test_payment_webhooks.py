@@ -0,0 +1,278 @@
+"""
+Tests for the payment webhook inbox.
+
+This module covers:
+- Signature checks and duplicate deliveries acknowledged without a second row
+- Paid events enrolling the student and clearing the cart exactly once, in one transaction
+- Retry with backoff, dead-lettering and per-invoice ordering behind a failing event
+- Parallel workers processing every event once, in order per invoice
+- Acknowledgements per second benchmark
+"""
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.base import Base
+from app.models.cart import Cart
+from app.models.course import Course, Category, CourseStatus
+from app.models.payment import Payment, PaymentGateway, PaymentStatus, PaymentWebhookEvent, WebhookEventStatus
+from app.models.product import Product, ProductType
+from app.models.student import Student
+from app.models.student_course import StudentCourse
+from app.models.user import User
+from app.services.payment_service import PaymentService
+from app.services.payment_webhooks import WebhookWorkerPool, ingest_webhook
+
+
+SECRET = "whsec_test"
+
+
+def _sign(body: bytes) -> str:
+    return hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def _body(event_id, event_type="invoice_paid", invoice_id="moyasar-inv-1"):
+    return json.dumps({"id": event_id, "type": event_type, "data": {"id": invoice_id}}).encode()
+
+
+@pytest.fixture(autouse=True)
+def webhook_settings(monkeypatch):
+    monkeypatch.setattr(settings, "MOYASAR_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(settings, "MOYASAR_API_KEY", "sk_test_webhooks")
+    monkeypatch.setattr(settings, "TAX_ENABLED", False)
+
+
+@pytest.fixture
+def inbox_sessions(tmp_path):
+    """Sessions on their own SQLite file, safe to use from worker threads"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'inbox.db'}",
+        connect_args={"check_same_thread": False, "timeout": 60, "isolation_level": None}
+    )
+
+    # SQLite has one writer; take its lock when the transaction begins rather than upgrading mid-way
+    @event.listens_for(engine, "begin")
+    def begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+def _create_paid_checkout(db, transaction_id):
+    """A student with one course in the cart, an invoice and a pending gateway payment"""
+    db.add(User(id=9701, fname="طالب", lname="الدفع", email="webhook@example.com", user_type="student"))
+    db.add(Student(id=9701, user_id=9701))
+    category = Category(title="عام", slug=f"webhook-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=1, title="دورة", price=Decimal("120.00"), product_type=ProductType.course)
+    db.add_all([category, product])
+    db.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"webhook-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s",
+        course_state=CourseStatus.published
+    )
+    db.add(course)
+    db.add(Cart(id=str(uuid.uuid4()), student_id=9701, product_id=product.id))
+    db.commit()
+
+    invoice = PaymentService(db).create_invoice_from_cart(9701)
+    db.add(Payment(
+        payment_id=f"PAY-{uuid.uuid4().hex[:8]}", transaction_id=transaction_id, invoice_id=invoice["invoice_id"],
+        student_id=9701, academy_id=1, amount=Decimal("120.00"), payment_method="moyasar",
+        payment_gateway=PaymentGateway.MOYASAR, net_amount=Decimal("120.00")
+    ))
+    db.commit()
+    return course.id
+
+
+class TestPaymentWebhooks:
+    """Test suite for the payment webhook inbox"""
+
+    def test_duplicate_delivery_acknowledged_once(self, client, db_session):
+        """Retries of one event are acknowledged but stored once; bad signatures are refused"""
+        url = "/api/v1/webhook/moyasar"
+        body = _body("evt_duplicate")
+
+        first = client.post(url, content=body, headers={"x-moyasar-signature": _sign(body)})
+        second = client.post(url, content=body, headers={"x-moyasar-signature": _sign(body)})
+        forged = client.post(url, content=_body("evt_forged"), headers={"x-moyasar-signature": _sign(body)})
+
+        assert first.status_code == second.status_code == 200
+        assert (first.json()["data"]["duplicate"], second.json()["data"]["duplicate"]) == (False, True)
+        assert forged.status_code == 400
+        events = db_session.query(PaymentWebhookEvent).all()
+        assert [(e.event_id, e.status, e.invoice_reference) for e in events] == [
+            ("evt_duplicate", WebhookEventStatus.PENDING, "moyasar-inv-1")
+        ]
+
+    def test_paid_event_processed_once(self, inbox_sessions):
+        """The paid handler enrolls and clears the cart; redelivery changes nothing"""
+        with inbox_sessions() as db:
+            course_id = _create_paid_checkout(db, "moyasar-inv-1")
+            ingest_webhook(db, _body("evt_paid"), _sign(_body("evt_paid")))
+            ingest_webhook(db, _body("evt_paid"), _sign(_body("evt_paid")))
+            # The gateway may also resend the same outcome under a new event id
+            ingest_webhook(db, _body("evt_paid_again"), _sign(_body("evt_paid_again")))
+
+        pool = WebhookWorkerPool(session_factory=inbox_sessions, workers=0)
+        assert pool.drain() == 2
+        assert pool.drain() == 0
+
+        with inbox_sessions() as db:
+            payment = db.query(Payment).one()
+            assert payment.payment_status == PaymentStatus.PAID
+            assert payment.invoice.status == PaymentStatus.PAID
+            enrollments = db.query(StudentCourse).filter(StudentCourse.student_id == 9701).all()
+            assert [(e.course_id, e.status) for e in enrollments] == [(course_id, "active")]
+            assert db.query(Cart).filter(Cart.deleted_at.is_(None)).count() == 0
+            statuses = db.scalars(select(PaymentWebhookEvent.status)).all()
+            assert statuses == [WebhookEventStatus.PROCESSED] * 2
+
+    def test_paid_event_failure_leaves_nothing_for_the_retry_to_skip(self, inbox_sessions, monkeypatch):
+        """A failure after enrolling rolls the whole event back; the retry enrolls and clears the cart"""
+        clear_cart = PaymentService._clear_student_cart
+        failures = [RuntimeError("cart table locked")]
+
+        def flaky_clear_cart(self, *args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return clear_cart(self, *args, **kwargs)
+
+        monkeypatch.setattr(PaymentService, "_clear_student_cart", flaky_clear_cart)
+        with inbox_sessions() as db:
+            _create_paid_checkout(db, "moyasar-inv-1")
+            ingest_webhook(db, _body("evt_paid"), _sign(_body("evt_paid")))
+
+        pool = WebhookWorkerPool(session_factory=inbox_sessions, workers=0, retry_seconds=60)
+        pool.drain()
+        with inbox_sessions() as db:
+            assert db.query(Payment).one().payment_status != PaymentStatus.PAID
+            assert db.query(StudentCourse).count() == 0
+            event = db.query(PaymentWebhookEvent).one()
+            assert (event.status, event.last_error) == (WebhookEventStatus.PENDING, "cart table locked")
+            # Skip the backoff wait
+            event.next_attempt_at = None
+            db.commit()
+
+        pool.drain()
+        with inbox_sessions() as db:
+            assert db.query(Payment).one().payment_status == PaymentStatus.PAID
+            assert db.query(StudentCourse).count() == 1
+            assert db.query(Cart).filter(Cart.deleted_at.is_(None)).count() == 0
+            assert db.query(PaymentWebhookEvent).one().status == WebhookEventStatus.PROCESSED
+
+    def test_retry_dead_letter_and_invoice_order(self, inbox_sessions):
+        """Later events of an invoice wait for a failing one until it is dead-lettered"""
+        handled = []
+
+        def record(db, event, body):
+            handled.append(event.event_id)
+
+        def fail(db, event, body):
+            raise RuntimeError("gateway data not ready")
+
+        with inbox_sessions() as db:
+            for event_id, event_type, invoice_id in (
+                ("a1", "broken", "inv-a"), ("a2", "record", "inv-a"), ("b1", "record", "inv-b")
+            ):
+                body = _body(event_id, event_type, invoice_id)
+                ingest_webhook(db, body, _sign(body))
+
+        pool = WebhookWorkerPool(
+            session_factory=inbox_sessions, workers=0, handlers={"record": record, "broken": fail},
+            max_attempts=3, retry_seconds=60
+        )
+        pool.drain()
+        assert handled == ["b1"]
+
+        for attempt in (1, 2, 3):
+            with inbox_sessions() as db:
+                failing = db.query(PaymentWebhookEvent).filter(PaymentWebhookEvent.event_id == "a1").one()
+                assert failing.attempts == attempt and failing.last_error == "gateway data not ready"
+                if attempt < 3:
+                    assert failing.status == WebhookEventStatus.PENDING
+                    assert failing.next_attempt_at > failing.received_at
+                    # Skip the backoff wait
+                    failing.next_attempt_at = None
+                    db.commit()
+            pool.drain()
+
+        assert handled == ["b1", "a2"]
+        with inbox_sessions() as db:
+            failing = db.query(PaymentWebhookEvent).filter(PaymentWebhookEvent.event_id == "a1").one()
+            assert failing.status == WebhookEventStatus.DEAD
+            assert WebhookWorkerPool.requeue(db, [failing.id]) == 1
+
+        pool.handlers["broken"] = record
+        pool.drain()
+        assert handled == ["b1", "a2", "a1"]
+
+    def test_parallel_workers_keep_invoice_order(self, inbox_sessions):
+        """Four workers handle 300 events exactly once each, in order within every invoice"""
+        handled, failed_once = [], set()
+        lock = threading.Lock()
+
+        def record(db, event, body):
+            # Every seventh event fails on its first attempt
+            if int(event.event_id) % 7 == 0 and event.event_id not in failed_once:
+                failed_once.add(event.event_id)
+                raise RuntimeError("transient")
+            with lock:
+                handled.append((event.invoice_reference, int(event.event_id)))
+
+        with inbox_sessions() as db:
+            for number in range(300):
+                body = _body(str(number), "record", f"inv-{number % 10}")
+                ingest_webhook(db, body, _sign(body))
+
+        pool = WebhookWorkerPool(
+            session_factory=inbox_sessions, workers=4, handlers={"record": record},
+            retry_seconds=0, poll_seconds=0.05
+        )
+        pool.start()
+        try:
+            deadline = time.monotonic() + 120
+            while time.monotonic() < deadline:
+                with inbox_sessions() as db:
+                    remaining = db.scalar(select(func.count(PaymentWebhookEvent.id)).where(
+                        PaymentWebhookEvent.status != WebhookEventStatus.PROCESSED
+                    ))
+                if not remaining:
+                    break
+                time.sleep(0.05)
+        finally:
+            pool.stop()
+
+        assert remaining == 0
+        assert sorted(number for _, number in handled) == list(range(300))
+        for invoice in {invoice for invoice, _ in handled}:
+            sequence = [number for ref, number in handled if ref == invoice]
+            assert sequence == sorted(sequence)
+
+    @pytest.mark.slow
+    def test_benchmark_acknowledgements_per_second(self, db_session):
+        """Verify, store and acknowledge 2,000 deliveries"""
+        bodies = [_body(f"evt_{i}", invoice_id=f"inv-{i % 100}") for i in range(2000)]
+        signed = [(body, _sign(body)) for body in bodies]
+
+        start = time.perf_counter()
+        for body, signature in signed:
+            ingest_webhook(db_session, body, signature)
+        elapsed = time.perf_counter() - start
+
+        rate = len(signed) / elapsed
+        print(f"\nWebhook ingest bench: {rate:.0f} acknowledgements/s ({elapsed * 1000 / len(signed):.2f}ms each)")
+        assert db_session.query(PaymentWebhookEvent).filter(PaymentWebhookEvent.event_id.like("evt_%")).count() == 2000
+        assert rate > 200
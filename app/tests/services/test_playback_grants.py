@@ -0,0 +1,218 @@
+"""
+Tests for video playback grants.
+
+This module covers:
+- Signed grants bound to video, user, expiry and file path
+- In-memory revocation by user, video or both
+- Grants revoked when their chapter or course is deleted or unpublished
+- Range requests served from a grant without database access
+- Requests per second of a seek-heavy session benchmark
+"""
+
+import random
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.models.academy import Academy, AcademyUser
+from app.models.chapter import Chapter
+from app.models.course import Category, Course
+from app.models.lesson import Lesson
+from app.models.product import Product
+from app.models.user import User
+from app.models.video import Video
+from app.services.playback_grants import PlaybackGrantService, content_video_ids, playback_grants
+from app.services.video_streaming import video_streaming_service
+
+
+VIDEO_ID = "3f0b6a52-0d6e-4d0a-9a57-7c1f4f0e2a10"
+NOW = 1_800_000_000
+
+
+@pytest.fixture
+def grants(monkeypatch):
+    monkeypatch.setattr(settings, "PLAYBACK_GRANT_TTL_SECONDS", 600)
+    return PlaybackGrantService(secret_key="test-secret")
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = tmp_path / "lesson.mp4"
+    path.write_bytes(bytes(range(256)) * 32 * 1024)  # 8 MiB
+    return path
+
+
+@pytest.fixture
+def auth_headers(db_session):
+    db_session.add(User(id=9501, fname="طالب", lname="المشاهدة", email="playback9501@example.com", user_type="student"))
+    db_session.commit()
+    return {"Authorization": f"Bearer {create_access_token(subject=9501, user_type='student')}"}
+
+
+@pytest.fixture
+def playable_video(db_session, video_file):
+    category = Category(title="عام", slug=f"playback-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=1, title="دورة المشاهدة", price=Decimal("100.00"))
+    db_session.add_all([category, product])
+    db_session.flush()
+    course = Course(
+        product_id=product.id, academy_id=1, category_id=category.id, trainer_id=1,
+        slug=f"playback-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s"
+    )
+    db_session.add(course)
+    db_session.flush()
+    chapter = Chapter(course_id=course.id, title="الفصل", order_number=0)
+    db_session.add(chapter)
+    db_session.flush()
+    lesson = Lesson(
+        chapter_id=chapter.id, course_id=course.id, title="درس مجاني", type="video", is_free_preview=True
+    )
+    db_session.add(lesson)
+    db_session.flush()
+    video = Video(
+        lesson_id=lesson.id, title="فيديو",
+        video=video_streaming_service._encrypt_file_path(str(video_file))
+    )
+    db_session.add(video)
+    db_session.commit()
+    return video.id
+
+
+class TestPlaybackGrants:
+    """Test suite for PlaybackGrantService"""
+
+    def test_grant_round_trip(self, grants, video_file):
+        """A grant verifies for its own video until it expires; tampering breaks it"""
+        grant = grants.issue(VIDEO_ID, 7, video_file, now=NOW)
+        playback = grants.verify(grant, VIDEO_ID, now=NOW + 599)
+        assert (playback.user_id, playback.file_path, playback.expires_at) == (7, video_file, NOW + 600)
+        assert str(video_file) not in grant
+
+        assert grants.verify(grant, VIDEO_ID, now=NOW + 600) is None
+        assert grants.verify(grant, "another-video", now=NOW) is None
+        assert grants.verify(grant.replace(".7.", ".8.", 1), VIDEO_ID, now=NOW) is None
+        assert grants.verify(grant[:-2] + "AA", VIDEO_ID, now=NOW) is None
+        assert grants.verify("garbage", VIDEO_ID, now=NOW) is None
+        assert grants.verify(None, VIDEO_ID, now=NOW) is None
+
+        # Another key, or a worker that never authorized the path, falls back to the full check
+        assert PlaybackGrantService(secret_key="other").verify(grant, VIDEO_ID, now=NOW) is None
+        assert PlaybackGrantService(secret_key="test-secret").verify(grant, VIDEO_ID, now=NOW) is None
+
+    def test_revocation(self, grants, video_file):
+        """Revocations refuse earlier grants only and are pruned once those expire"""
+        own = grants.issue(VIDEO_ID, 7, video_file, now=NOW)
+        other = grants.issue(VIDEO_ID, 8, video_file, now=NOW)
+
+        grants.revoke(user_id=7, video_id=VIDEO_ID, now=NOW + 10)
+        assert grants.verify(own, VIDEO_ID, now=NOW + 11) is None
+        assert grants.verify(other, VIDEO_ID, now=NOW + 11) is not None
+        assert grants.verify(grants.issue(VIDEO_ID, 7, video_file, now=NOW + 11), VIDEO_ID, now=NOW + 12)
+
+        grants.revoke(video_id=VIDEO_ID, now=NOW + 20)
+        assert grants.verify(other, VIDEO_ID, now=NOW + 21) is None
+        grants.revoke(user_id=9, now=NOW + 20)
+        assert grants.verify(grants.issue(VIDEO_ID, 9, video_file, now=NOW + 5), VIDEO_ID, now=NOW + 21) is None
+
+        grants.revoke(user_id=1, now=NOW + 700)
+        assert list(grants._denied) == [(1, None)]
+        with pytest.raises(ValueError):
+            grants.revoke()
+
+    def test_range_requests_skip_database(self, client, count_queries, auth_headers, playable_video):
+        """Only the first request is authorized against the database"""
+        url = f"/api/v1/videos/watch/{playable_video}"
+        first = client.get(url, headers={**auth_headers, "Range": "bytes=0-1023"})
+        assert first.status_code == 206
+        assert first.content == bytes(range(256)) * 4
+        grant = first.headers["X-Playback-Grant"]
+        assert client.cookies.get(settings.PLAYBACK_GRANT_COOKIE) == grant
+
+        with count_queries() as queries:
+            seek = client.get(url, headers={"Range": "bytes=4096-4351"})
+            client.cookies.clear()
+            by_query = client.get(url, params={"grant": grant}, headers={"Range": "bytes=256-511"})
+        assert (seek.status_code, seek.content) == (206, bytes(range(256)))
+        assert by_query.status_code == 206
+        assert queries == []
+
+        playback_grants.revoke(video_id=playable_video)
+        assert client.get(url, params={"grant": grant}, headers={"Range": "bytes=0-1"}).status_code == 403
+
+    def test_removed_content_revokes_grants(self, client, db_session, monkeypatch, auth_headers, playable_video):
+        """Deleting a chapter or a course, or unpublishing it, refuses the grants for every video under it"""
+        db_session.add_all([
+            Academy(id=1, name="أكاديمية المشاهدة", slug="playback-academy"),
+            User(id=9502, fname="مالك", lname="الأكاديمية", email="owner9502@example.com", user_type="academy")
+        ])
+        db_session.flush()
+        db_session.add(AcademyUser(id=9502, academy_id=1, user_id=9502, user_role="owner"))
+        db_session.commit()
+        academy_headers = {"Authorization": f"Bearer {create_access_token(subject=9502, user_type='academy')}"}
+        lesson = db_session.get(Lesson, db_session.get(Video, playable_video).lesson_id)
+        course_id, chapter_id = lesson.course_id, lesson.chapter_id
+
+        chapter = Chapter(course_id=course_id, title="الفصل الثاني", order_number=1)
+        db_session.add(chapter)
+        db_session.flush()
+        other_lesson = Lesson(chapter_id=chapter.id, course_id=course_id, title="درس", type="video")
+        db_session.add(other_lesson)
+        db_session.flush()
+        other_video = Video(lesson_id=other_lesson.id, title="فيديو")
+        db_session.add(other_video)
+        db_session.commit()
+        assert sorted(content_video_ids(db_session, course_id=course_id)) == sorted([playable_video, other_video.id])
+        assert content_video_ids(db_session, chapter_id=chapter_id) == [playable_video]
+
+        url = f"/api/v1/videos/watch/{playable_video}"
+        grant = client.get(url, headers={**auth_headers, "Range": "bytes=0-1"}).headers["X-Playback-Grant"]
+        client.cookies.clear()
+        assert client.delete(f"/api/v1/chapters/{chapter_id}", headers=academy_headers).status_code == 200
+        assert client.get(url, params={"grant": grant}, headers={"Range": "bytes=0-1"}).status_code != 206
+
+        revoked = []
+        monkeypatch.setattr(playback_grants, "revoke", lambda video_id: revoked.append(video_id))
+        response = client.patch(f"/api/v1/academy/courses/{course_id}/unpublish", headers=academy_headers)
+        assert response.status_code == 200
+        assert revoked == [other_video.id]
+        revoked.clear()
+        assert client.delete(f"/api/v1/academy/courses/{course_id}", headers=academy_headers).status_code == 200
+        assert revoked == [other_video.id]
+
+    @pytest.mark.slow
+    def test_benchmark_seek_heavy_session(self, client, auth_headers, playable_video, video_file):
+        """Requests per second for 64 KiB seeks with and without a playback grant"""
+        url = f"/api/v1/videos/watch/{playable_video}"
+        size = video_file.stat().st_size
+        rng = random.Random(41)
+        ranges = [rng.randrange(0, size - 65536) for _ in range(300)]
+
+        def run(headers, keep_grant):
+            start = time.perf_counter()
+            for offset in ranges:
+                if not keep_grant:
+                    client.cookies.clear()
+                response = client.get(url, headers={**headers, "Range": f"bytes={offset}-{offset + 65535}"})
+                assert response.status_code == 206
+            return len(ranges) / (time.perf_counter() - start)
+
+        per_request = run(auth_headers, keep_grant=False)
+        client.get(url, headers={**auth_headers, "Range": "bytes=0-0"})
+        granted = run({}, keep_grant=True)
+
+        grant = client.cookies.get(settings.PLAYBACK_GRANT_COOKIE)
+        start = time.perf_counter()
+        for _ in range(100_000):
+            playback_grants.verify(grant, playable_video)
+        verify_us = (time.perf_counter() - start) * 10
+
+        print(f"\nSeek-heavy session ({len(ranges)} x 64 KiB ranges, one worker):")
+        print(f"  authorize every request: {per_request:.0f} req/s")
+        print(f"  playback grant:          {granted:.0f} req/s")
+        print(f"  grant verify:            {verify_us:.2f}us")
+        assert granted > per_request
+        assert verify_us < 50
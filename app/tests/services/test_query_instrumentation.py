@@ -0,0 +1,219 @@
+"""
+Tests for per-request query instrumentation.
+
+This module covers:
+- Statement fingerprints folding literals and parameter lists
+- Rolling per-route table, repeated statements reported once per route
+- Server-Timing headers and the admin query table
+- Declared budgets for the lessons, chapters and cart routes holding as content grows
+- The pytest plugin failing a test whose route runs over its budget
+- Instrumentation overhead per query benchmark
+"""
+
+import logging
+import re
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core.security import create_access_token
+from app.db import instrumentation
+from app.db.instrumentation import QueryStats, RequestQueries, fingerprint, query_stats
+from app.models.academy import Academy, AcademyUser
+from app.models.cart import Cart
+from app.models.chapter import Chapter
+from app.models.course import Category, Course, CourseStatus
+from app.models.lesson import Lesson
+from app.models.product import Product
+from app.models.student import Student
+from app.models.student_course import StudentCourse
+from app.models.user import User
+from app.models.video import Video
+from app.tests import query_budget
+from app.tests.query_budget import ROUTE_BUDGETS
+
+
+def _queries(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+def _create_course(db, academy_id, chapters, lessons_per_chapter):
+    category = Category(title="عام", slug=f"budget-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=academy_id, title="دورة الميزانية", price=Decimal("120.00"))
+    db.add_all([category, product])
+    db.flush()
+    course = Course(
+        product_id=product.id, academy_id=academy_id, category_id=category.id, trainer_id=9501,
+        slug=f"budget-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s",
+        course_state=CourseStatus.published
+    )
+    db.add(course)
+    db.flush()
+    lessons = []
+    for number in range(chapters):
+        chapter = Chapter(course_id=course.id, title=f"الفصل {number}", order_number=number)
+        db.add(chapter)
+        db.flush()
+        for order in range(lessons_per_chapter):
+            lesson = Lesson(
+                chapter_id=chapter.id, course_id=course.id, title=f"درس {order}", type="video",
+                order_number=order, video_duration=300, is_free_preview=True
+            )
+            db.add(lesson)
+            db.flush()
+            db.add_all([Video(lesson_id=lesson.id, title=f"فيديو {n}", order_number=n, duration=300) for n in range(2)])
+            lessons.append(lesson)
+    db.commit()
+    return course, lessons
+
+
+def _create_users(db):
+    academy = Academy(id=9501, name="أكاديمية الميزانية", slug="budget-academy")
+    owner = User(id=9501, fname="مالك", lname="الأكاديمية", email="owner9501@example.com", user_type="academy")
+    student_user = User(id=9502, fname="طالب", lname="الميزانية", email="student9502@example.com", user_type="student")
+    admin = User(id=9503, fname="مدير", lname="النظام", email="admin9503@example.com", user_type="admin")
+    db.add_all([academy, owner, student_user, admin])
+    db.flush()
+    db.add_all([AcademyUser(id=9501, academy_id=academy.id, user_id=owner.id, user_role="owner"), Student(id=9502, user_id=9502)])
+    db.commit()
+    return {
+        user_type: {"Authorization": f"Bearer {create_access_token(subject=user_id, user_type=user_type)}"}
+        for user_type, user_id in (("academy", 9501), ("student", 9502), ("admin", 9503))
+    }
+
+
+class TestQueryInstrumentation:
+    """Test suite for query instrumentation and budgets"""
+
+    def test_fingerprint_and_route_table(self, caplog):
+        """Statements differing only in values share a fingerprint; repeats are logged once per route"""
+        assert fingerprint("SELECT *  FROM lessons\n WHERE id = 42 AND title = 'it''s'") == (
+            "SELECT * FROM lessons WHERE id = ? AND title = ?"
+        )
+        assert fingerprint("SELECT * FROM videos WHERE lesson_id IN (?, ?, ?) LIMIT ?") == (
+            "SELECT * FROM videos WHERE lesson_id IN (?) LIMIT ?"
+        )
+        assert fingerprint("SELECT anon_1.id FROM t1 WHERE x IN (%s, %s)") == "SELECT anon_1.id FROM t1 WHERE x IN (?)"
+
+        stats = QueryStats(window=3, repeat_threshold=3, max_routes=2)
+        for count in (2, 4, 6, 8):
+            queries = RequestQueries(count=count, seconds=0.001 * count)
+            queries.statements.update({"SELECT lessons": count - 1, "SELECT course": 1})
+            with caplog.at_level(logging.WARNING, logger="app.db.instrumentation"):
+                stats.record("GET /lessons", queries, 0.01 * count)
+        stats.record("GET /cart", RequestQueries(count=1, seconds=0.0005), 0.002)
+
+        assert [record.getMessage() for record in caplog.records] == [
+            "Possible N+1 on GET /lessons: 3 times in one request: SELECT lessons"
+        ]
+        lessons, cart = stats.table()
+        assert (lessons["route"], lessons["requests"], lessons["window"]) == ("GET /lessons", 4, 3)
+        assert (lessons["queries_avg"], lessons["queries_max"], lessons["db_ms_avg"]) == (6.0, 8, 6.0)
+        assert (lessons["repeated_requests"], lessons["worst_repeat"]) == (3, {"statement": "SELECT lessons", "times": 7})
+        assert (cart["route"], cart["worst_repeat"]) == ("GET /cart", None)
+
+        stats.record("GET /me", RequestQueries(count=1), 0.001)
+        assert [row["route"] for row in stats.table()] == ["GET /cart", "GET /me"]
+
+    def test_server_timing_and_admin_table(self, client, db_session):
+        """Responses carry the query count and time; admins see the per-route table"""
+        headers = _create_users(db_session)
+        course, _ = _create_course(db_session, 9501, chapters=2, lessons_per_chapter=2)
+        query_stats.clear()
+
+        response = client.get(f"/api/v1/public/courses/{course.id}/chapters")
+        assert response.status_code == 200
+        assert re.fullmatch(r'db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+', response.headers["server-timing"])
+        assert _queries(response) > 0
+
+        assert client.get("/api/v1/admin/monitoring/queries", headers=headers["student"]).status_code == 403
+        response = client.get("/api/v1/admin/monitoring/queries", headers=headers["admin"])
+        assert response.status_code == 200
+        routes = {row["route"]: row for row in response.json()["routes"]}
+        chapters = routes["GET /api/v1/public/courses/{course_id}/chapters"]
+        assert chapters["requests"] == 1 and chapters["worst_repeat"] is None
+
+    def test_budgets_hold_as_content_grows(self, client, db_session):
+        """The budgeted routes run as many queries for five chapters as for one"""
+        headers = _create_users(db_session)
+        counts = {}
+        for chapters in (1, 5):
+            course, lessons = _create_course(db_session, 9501, chapters=chapters, lessons_per_chapter=chapters)
+            db_session.add(StudentCourse(student_id=9502, course_id=course.id))
+            cookie = f"budget-cart-{chapters}"
+            db_session.add_all([
+                Cart(id=str(uuid.uuid4()), cookie_id=cookie, product_id=_create_course(db_session, 9501, 0, 0)[0].product_id)
+                for _ in range(chapters)
+            ])
+            db_session.commit()
+            requests = {
+                "GET /api/v1/lessons/{lesson_id}": client.get(f"/api/v1/lessons/{lessons[-1].id}", headers=headers["academy"]),
+                "GET /api/v1/public/courses/{course_id}/chapters": client.get(f"/api/v1/public/courses/{course.id}/chapters"),
+                "GET /api/v1/chapters/{chapter_id}": client.get(
+                    f"/api/v1/chapters/{lessons[-1].chapter_id}", headers=headers["academy"]
+                ),
+                "GET /api/v1/cart/": client.get("/api/v1/cart/", headers={"TheCookie": cookie}),
+                "GET /api/v1/cart/summary": client.get("/api/v1/cart/summary", headers={"TheCookie": cookie})
+            }
+            for route, response in requests.items():
+                assert response.status_code == 200, (route, response.text)
+            counts[chapters] = {route: _queries(response) for route, response in requests.items()}
+
+        print(f"\nQueries per request for 1 and 5 chapters: {counts}")
+        assert counts[1] == counts[5]
+        assert all(counts[5][route] <= ROUTE_BUDGETS[route] for route in counts[5])
+
+    def test_plugin_fails_over_budget(self):
+        """The closest query_budget marker wins; a request over it fails the test"""
+        markers = [pytest.mark.query_budget("GET /x", 3).mark, pytest.mark.query_budget("GET /x", 1).mark]
+        item = SimpleNamespace(iter_markers=lambda name: iter(markers))
+        listeners = list(query_stats.listeners)  # This test's own budget check
+
+        def run(count):
+            hook = query_budget.pytest_runtest_call(item)
+            next(hook)
+            queries = RequestQueries(count=count)
+            queries.statements.update({"SELECT 1": count})
+            query_stats.record("GET /x", queries, 0.001)
+            with pytest.raises(StopIteration):
+                hook.send(None)
+
+        run(3)
+        with pytest.raises(pytest.fail.Exception, match=r"GET /x: 4 queries, budget 3\n    4x SELECT 1"):
+            run(4)
+        assert query_stats.listeners == listeners
+        query_stats.clear()
+
+    @pytest.mark.slow
+    def test_benchmark_overhead_per_query(self):
+        """Time added to each statement by the cursor listeners, inside and outside a request"""
+        engine = create_engine("sqlite://")
+        statement = text("SELECT 1 WHERE 42 = :value")
+        rounds = 20000
+
+        def run():
+            with engine.connect() as connection:
+                start = time.perf_counter()
+                for value in range(rounds):
+                    connection.execute(statement, {"value": value})
+                return (time.perf_counter() - start) / rounds
+
+        baseline = min(run() for _ in range(3))
+        instrumentation.install()
+        outside = min(run() for _ in range(3))
+        queries = RequestQueries()
+        token = instrumentation._current.set(queries)
+        try:
+            inside = min(run() for _ in range(3))
+        finally:
+            instrumentation._current.reset(token)
+        engine.dispose()
+
+        print(f"\nPer query on in-memory SQLite ({rounds} statements):")
+        print(f"  plain {baseline * 1e6:.1f}us, outside a request {outside * 1e6:.1f}us, counted {inside * 1e6:.1f}us")
+        assert queries.count == 3 * rounds and len(queries.statements) == 1
+        assert inside - baseline < 20e-6
@@ -0,0 +1,157 @@
+"""
+Tests for the map-reduce AI question generation pipeline.
+
+This module covers:
+- Token-bounded chunking of long chapter content
+- Deduplication and balanced selection of candidates
+- Bulk persistence of questions and options
+- Wall-clock and token-usage benchmarks on a stub model
+"""
+
+import asyncio
+import json
+import time
+import pytest
+from types import SimpleNamespace
+
+from app.models.exam import Exam, Question, QuestionOption
+from app.services.ai.question_generation import QuestionGenerationPipeline, normalize_question_text
+from app.services.ai.token_counter import count_tokens, split_into_chunks
+
+
+class StubChatService:
+    """Chat service stand-in that returns JSON questions after a fixed latency"""
+
+    def __init__(self, latency=0.0):
+        self.config = SimpleNamespace(model_name="gpt-4")
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_completion(self, messages, **kwargs):
+        self.calls += 1
+        chunk_id = self.calls
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+
+        prompt = messages[0]["content"]
+        count = int(prompt.split("عدد الأسئلة:")[1].split()[0])
+        questions = []
+        for i in range(count):
+            questions.append({
+                "type": "multiple_choice",
+                "difficulty": ["easy", "medium", "hard"][i % 3],
+                "question": f"ما أهمية المفهوم ج{chunk_id}س{i} في هذا الجزء",
+                "options": [
+                    {"text": "صحيح", "is_correct": True},
+                    {"text": "خطأ", "is_correct": False}
+                ],
+                "explanation": "شرح"
+            })
+        # Every chunk repeats one generic question that must be deduplicated
+        questions.append({"type": "true_false", "question": "ما هو موضوع الدرس؟", "options": []})
+
+        content = "```json\n" + json.dumps({"questions": questions}, ensure_ascii=False) + "\n```"
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(content)
+        return {
+            "content": content,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+
+def _transcript(sentences):
+    return " ".join(f"هذه الجملة رقم {i} تشرح مفهوماً مهماً في الدرس." for i in range(sentences))
+
+
+class TestQuestionGenerationPipeline:
+    """Test suite for QuestionGenerationPipeline"""
+
+    def test_split_into_chunks_respects_budget(self):
+        """Chunks stay under the token budget and keep all content"""
+        text = _transcript(400)
+        chunks = split_into_chunks(text, max_tokens=300)
+
+        assert len(chunks) > 1
+        assert all(count_tokens(chunk) <= 300 for chunk in chunks)
+        assert sum(len(chunk.split()) for chunk in chunks) == len(text.split())
+
+    def test_normalize_question_text(self):
+        """Diacritics, hamza forms and punctuation are folded"""
+        assert normalize_question_text("ما هِيَ أهمية الدرس؟") == normalize_question_text("ما هي اهمية الدرس")
+
+    def test_generate_covers_all_chunks_and_dedupes(self):
+        """Selected questions are unique and spread across chunks and difficulty"""
+        service = StubChatService()
+        pipeline = QuestionGenerationPipeline(service, chunk_tokens=400, max_concurrency=3)
+
+        result = asyncio.run(pipeline.generate(
+            sources=[_transcript(150), _transcript(150)],
+            questions_count=12,
+            difficulty_level="mixed"
+        ))
+        questions = result["questions"]
+        stats = result["stats"]
+
+        assert len(questions) == 12
+        assert stats["chunks"] > 2
+        assert stats["duplicates_removed"] >= stats["chunks"] - 1
+        assert service.max_in_flight <= 3
+        assert len({normalize_question_text(q["question"]) for q in questions}) == 12
+        assert len({q["_chunk"] for q in questions}) == min(stats["chunks"], 12)
+        difficulties = [q["difficulty"] for q in questions]
+        assert max(difficulties.count(level) for level in set(difficulties)) - \
+            min(difficulties.count(level) for level in set(difficulties)) <= 2
+
+    def test_persist_questions_bulk_inserts(self, db_session):
+        """Questions and options are inserted in the current transaction"""
+        exam = Exam(lesson_id="lesson-1", title="Exam")
+        db_session.add(exam)
+        db_session.flush()
+
+        questions = [
+            {
+                "type": "multiple_choice",
+                "question": "ما عاصمة السعودية؟",
+                "options": [{"text": "الرياض", "is_correct": True}, {"text": "جدة", "is_correct": False}]
+            },
+            {"type": "true_false", "question": "الشمس نجم", "options": [{"text": "صحيح", "is_correct": True}]},
+            {"type": "multiple_choice", "question": "   ", "options": []}
+        ]
+
+        created = QuestionGenerationPipeline.persist_questions(db_session, exam.id, questions)
+
+        assert created == 2
+        stored = db_session.query(Question).filter(Question.exam_id == exam.id).all()
+        assert {q.correct_answer for q in stored} == {"الرياض", "صحيح"}
+        assert all(q.is_ai_generated for q in stored)
+        assert db_session.query(QuestionOption).count() == 3
+
+    @pytest.mark.slow
+    def test_benchmark_wall_clock_and_tokens(self):
+        """Concurrent map stage versus sequential calls on a 2-hour transcript"""
+        sources = [_transcript(1500) for _ in range(4)]
+
+        timings = {}
+        for concurrency in (1, 4):
+            service = StubChatService(latency=0.05)
+            pipeline = QuestionGenerationPipeline(service, chunk_tokens=1500, max_concurrency=concurrency)
+            start = time.perf_counter()
+            result = asyncio.run(pipeline.generate(sources=sources, questions_count=50, difficulty_level="mixed"))
+            timings[concurrency] = time.perf_counter() - start
+            stats = result["stats"]
+
+        print(
+            f"\nQuestion generation bench: {stats['chunks']} chunks, "
+            f"{stats['content_tokens']} content tokens, {stats['usage']['total_tokens']} total tokens, "
+            f"sequential {timings[1] * 1000:.0f}ms, concurrent(4) {timings[4] * 1000:.0f}ms"
+        )
+        assert len(result["questions"]) == 50
+        assert timings[4] < timings[1] / 2
@@ -0,0 +1,138 @@
+"""
+Tests for the compiled single-pass text quality rewriter.
+
+This module covers:
+- Arabic and English rewrite rules applied in one pass
+- Low-confidence short-word removal, after the quality metrics are taken
+- Repeated words collapsed at sentence starts that are also capitalized
+- Per-segment, streaming and batch APIs producing identical output
+- Throughput in MB/s on a 2-hour Arabic transcript
+"""
+
+import random
+import time
+import pytest
+
+from app.services.text_quality_service import TextQualityService, SEGMENT_SEPARATOR
+
+
+def _transcript_segments(count, seed=7):
+    """Whisper-like segments with the noise the rules are meant to fix"""
+    rng = random.Random(seed)
+    vocabulary = [
+        "الدرس", "البرمجة", "قاعدة البيانات", "الخوارزميات", "نتعلم", "اليوم", "كيف", "نكتب",
+        "برنامج", "بسيط", "واحد", "ثلاثة", "عشرة", "في في", "هذا هذا", "،", "؟؟", "  ", "مثال", "على"
+    ]
+    segments = []
+    for i in range(count):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(10, 20))]
+        segments.append({"start": i * 6.0, "end": i * 6.0 + 6.0, "text": " ".join(words)})
+    return segments
+
+
+class TestTextQualityService:
+    """Test suite for TextQualityService"""
+
+    def setup_method(self):
+        self.service = TextQualityService()
+
+    def test_arabic_rules_single_pass(self):
+        """Spacing, punctuation, numbers and repeated words are fixed together"""
+        result = self.service.enhance_transcription_quality(
+            "هذا   هذا درس ،فيه واحد و ثلاثة أمثلة؟؟ في في الحقيقة", language="ar", confidence_score=0.9
+        )
+
+        assert result["enhanced_text"] == "هذا درس، فيه 1 و 3 أمثلة؟ في الحقيقة."
+        rules = result["quality_metrics"]["rules_applied"]
+        assert rules["number"] == 2
+        assert rules["repeated_demonstrative"] == 1
+        assert rules["repeated_preposition"] == 1
+        assert "Spacing normalized" in result["improvements_applied"]
+        assert result["quality_metrics"]["quality_indicators"]["has_proper_spacing"]
+
+    def test_number_words_need_word_boundaries(self):
+        """Number words inside longer words are left alone"""
+        result = self.service.enhance_transcription_quality("الواحد واحد", confidence_score=0.9)
+
+        assert result["enhanced_text"] == "الواحد 1."
+
+    def test_low_confidence_removes_short_words(self):
+        """Short words are dropped below the confidence threshold"""
+        text = "نحن في الدرس من أجل التعلم"
+
+        assert self.service.enhance_transcription_quality(text, confidence_score=0.9)["enhanced_text"] == \
+            "نحن في الدرس من أجل التعلم."
+        assert self.service.enhance_transcription_quality(text, confidence_score=0.1)["enhanced_text"] == \
+            "نحن الدرس أجل التعلم."
+
+    def test_low_confidence_metrics_precede_short_word_removal(self):
+        """Quality metrics describe the text before short words are dropped"""
+        result = self.service.enhance_transcription_quality("نحن في الدرس من أجل التعلم", confidence_score=0.1)
+
+        assert result["enhanced_text"] == "نحن الدرس أجل التعلم."
+        assert result["quality_metrics"]["enhanced_words"] == 6
+        assert result["quality_metrics"]["rules_applied"]["short_word"] == 2
+
+    @pytest.mark.parametrize("text, expected", [
+        ("the the cat sat", "The cat sat."),
+        ("hello. the the dog ran", "Hello. The dog ran."),
+        ("  is is it. was were here", "Is it. Was here."),
+    ])
+    def test_repeated_words_at_sentence_starts(self, text, expected):
+        """Capitalizing a sentence start does not hide its first word from the repeated-word rules"""
+        result = self.service.enhance_transcription_quality(text, language="en", confidence_score=0.9)
+
+        assert result["enhanced_text"] == expected
+        assert self.service.enhance_segment(text, language="en", confidence_score=0.9)["text"] == expected
+
+    def test_english_rules(self):
+        """Sentence capitalization, punctuation spacing and repeated words"""
+        result = self.service.enhance_transcription_quality(
+            "hello  world. this is is the the test ,next", language="en", confidence_score=0.9
+        )
+
+        assert result["enhanced_text"] == "Hello world. This is the test, next."
+        assert result["quality_metrics"]["quality_indicators"]["has_proper_capitalization"]
+
+    def test_control_characters_and_empty_text(self):
+        """Control characters are removed and empty input stays empty"""
+        assert self.service.enhance_transcription_quality("مرحبا\x07 بكم\n\nجميعا", confidence_score=0.9)[
+            "enhanced_text"
+        ] == "مرحبا بكم جميعا."
+        assert self.service.enhance_transcription_quality("", confidence_score=0.9)["enhanced_text"] == ""
+
+    def test_batch_matches_per_segment(self):
+        """One batch call yields exactly the per-segment results, timings preserved"""
+        segments = _transcript_segments(50)
+        segments[3]["text"] = "hidden" + SEGMENT_SEPARATOR + "separator"
+
+        batch = self.service.enhance_segments(segments, language="ar", confidence_score=0.9)
+        streamed = list(self.service.iter_enhanced_segments(segments, language="ar", confidence_score=0.9))
+
+        assert len(batch["segments"]) == len(segments)
+        assert [s["text"] for s in batch["segments"]] == [s["text"] for s in streamed]
+        assert batch["segments"][0]["start"] == 0.0
+        assert batch["enhanced_text"] == " ".join(s["text"] for s in streamed)
+        assert batch["quality_metrics"]["rules_applied"]["number"] > 0
+
+    @pytest.mark.slow
+    def test_benchmark_throughput(self):
+        """MB/s of the single-pass rewriter on a 2-hour Arabic transcript"""
+        segments = _transcript_segments(1200)
+        size_mb = sum(len(s["text"].encode("utf-8")) for s in segments) / (1024 * 1024)
+
+        start = time.perf_counter()
+        for segment in self.service.iter_enhanced_segments(segments, language="ar", confidence_score=0.9):
+            pass
+        streaming_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.service.enhance_segments(segments, language="ar", confidence_score=0.9)
+        batch_seconds = time.perf_counter() - start
+
+        print(
+            f"\nText quality bench: {len(segments)} segments, {size_mb:.2f} MB, "
+            f"per-segment {size_mb / streaming_seconds:.1f} MB/s, "
+            f"batch (with report) {size_mb / batch_seconds:.1f} MB/s"
+        )
+        assert batch_seconds < 5
@@ -0,0 +1,190 @@
+"""
+Tests for deduplicated, batched video view counting.
+
+This module covers:
+- One view per user, video and playback session within the dedupe window
+- Grouped view count updates and per-day rollups for academy dashboards
+- Views put back when a flush fails
+- Row-lock wait of per-request counting versus batched flushes load test
+"""
+
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.chapter import Chapter
+from app.models.course import Category, Course
+from app.models.lesson import Lesson
+from app.models.product import Product
+from app.models.video import Video, VideoDailyViews
+from app.services.view_counter import ViewCounter
+
+
+ACADEMY_ID = 9601
+NOW = datetime(2026, 5, 20, 12, 0).timestamp()
+
+
+def _create_videos(db, lessons=2, videos_per_lesson=2):
+    """Video ids grouped by lesson, in one course of ACADEMY_ID"""
+    category = Category(title="عام", slug=f"views-{uuid.uuid4().hex[:8]}")
+    product = Product(academy_id=ACADEMY_ID, title="دورة المشاهدات", price=Decimal("100.00"))
+    db.add_all([category, product])
+    db.flush()
+    course = Course(
+        product_id=product.id, academy_id=ACADEMY_ID, category_id=category.id, trainer_id=1,
+        slug=f"views-{uuid.uuid4().hex[:8]}", image="i.jpg", content="c", short_content="s"
+    )
+    db.add(course)
+    db.flush()
+    chapter = Chapter(course_id=course.id, title="الفصل", order_number=0)
+    db.add(chapter)
+    db.flush()
+
+    grouped = {}
+    for index in range(lessons):
+        lesson = Lesson(chapter_id=chapter.id, course_id=course.id, title=f"درس {index}", type="video")
+        db.add(lesson)
+        db.flush()
+        videos = [Video(lesson_id=lesson.id, title=f"فيديو {n}") for n in range(videos_per_lesson)]
+        db.add_all(videos)
+        db.flush()
+        grouped[lesson.id] = [video.id for video in videos]
+    db.commit()
+    return grouped
+
+
+class TestViewCounter:
+    """Test suite for ViewCounter"""
+
+    def test_dedupes_per_playback_session(self):
+        """Range chunks and re-authorizations of one session count once per window"""
+        counter = ViewCounter(dedupe_seconds=1800)
+        assert counter.record("v1", 7, "laptop", now=NOW)
+        assert not counter.record("v1", 7, "laptop", now=NOW + 5)
+        assert not counter.record("v1", 7, "laptop", now=NOW + 1799)
+        assert counter.record("v1", 7, "phone", now=NOW + 10)
+        assert counter.record("v1", 8, "laptop", now=NOW + 10)
+        assert counter.record("v2", 7, "laptop", now=NOW + 10)
+        assert counter.record("v1", 7, "laptop", now=NOW + 1800)
+        assert counter.pending == 5
+
+    def test_flush_groups_updates_and_rolls_up(self, count_queries, db_session):
+        """Rows with the same increment share an UPDATE; daily rollups accumulate"""
+        grouped = _create_videos(db_session)
+        (a, b), (c, d) = grouped.values()
+        counter = ViewCounter()
+        for user_id in range(3):
+            counter.record(a, user_id, now=NOW)
+            counter.record(b, user_id, now=NOW)
+        counter.record(c, 1, now=NOW)
+        counter.record(c, 2, now=NOW - 86400)
+
+        with count_queries() as queries:
+            assert counter.flush(db_session, now=NOW) == 8
+        updates = [statement for statement in queries if statement.startswith("UPDATE")]
+        # videos: a,b +3 and c +2; lessons: first +6 and second +2
+        assert len(updates) == 4
+        assert counter.pending == 0
+
+        db_session.expire_all()
+        views = dict(db_session.execute(select(Video.id, Video.views_count).where(Video.id.in_([a, b, c, d]))).all())
+        assert views == {a: 3, b: 3, c: 2, d: 0}
+        lessons = dict(db_session.execute(select(Lesson.id, Lesson.views_count).where(Lesson.id.in_(grouped))).all())
+        assert lessons == dict(zip(grouped, [6, 2]))
+
+        counter.record(a, 9, now=NOW)
+        counter.flush(db_session, now=NOW)
+        assert db_session.get(VideoDailyViews, (a, date(2026, 5, 20))).views == 4
+        daily = ViewCounter.get_daily_views(db_session, ACADEMY_ID, days=3, today=date(2026, 5, 20))
+        assert daily == [
+            {"day": "2026-05-18", "views": 0}, {"day": "2026-05-19", "views": 1}, {"day": "2026-05-20", "views": 8}
+        ]
+
+    def test_failed_flush_keeps_views(self, db_session, monkeypatch):
+        """A flush that fails leaves its views for the next one"""
+        (video_id, _), = _create_videos(db_session, lessons=1).values()
+        counter = ViewCounter()
+        counter.record(video_id, 1, now=NOW)
+        counter.record("deleted-video", 1, now=NOW)
+
+        def fail(db, pending):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(counter, "_write", fail)
+        with pytest.raises(RuntimeError):
+            counter.flush(db_session, now=NOW)
+        assert counter.pending == 2
+
+        monkeypatch.undo()
+        assert counter.flush(db_session, now=NOW) == 1
+        assert counter.pending == 0
+
+    @pytest.mark.slow
+    def test_load_row_lock_wait(self, tmp_path):
+        """Time spent waiting for the write lock: UPDATE per request versus batched flushes"""
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'views.db'}",
+            connect_args={"check_same_thread": False, "timeout": 60, "isolation_level": None}
+        )
+        waits = []
+
+        @event.listens_for(engine, "begin")
+        def begin_immediate(connection):
+            start = time.perf_counter()
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            waits.append(time.perf_counter() - start)
+
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        with Session() as db:
+            grouped = _create_videos(db, lessons=4, videos_per_lesson=5)
+        videos = [(video_id, lesson_id) for lesson_id, ids in grouped.items() for video_id in ids]
+        threads, requests_per_thread = 16, 150
+
+        def per_request(worker):
+            with Session() as db:
+                for n in range(requests_per_thread):
+                    video_id, lesson_id = videos[(worker + n) % len(videos)]
+                    db.execute(update(Video).where(Video.id == video_id).values(views_count=Video.views_count + 1))
+                    db.execute(update(Lesson).where(Lesson.id == lesson_id).values(views_count=Lesson.views_count + 1))
+                    db.commit()
+
+        counter = ViewCounter(session_factory=Session, flush_seconds=0.05)
+
+        def batched(worker):
+            for n in range(requests_per_thread):
+                # Every request is a new session so each one is a view, as in the per-request case
+                counter.record(videos[(worker + n) % len(videos)][0], worker, f"session-{n}")
+
+        def run(target):
+            waits.clear()
+            workers = [threading.Thread(target=target, args=(index,)) for index in range(threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            return time.perf_counter() - start, sum(waits), len(waits)
+
+        before = run(per_request)
+        counter.start()
+        after = run(batched)
+        counter.stop()
+        after = (after[0], sum(waits), len(waits))
+
+        with Session() as db:
+            assert sum(db.execute(select(Video.views_count)).scalars()) == 2 * threads * requests_per_thread
+        engine.dispose()
+
+        print(f"\nView counting load ({threads} threads x {requests_per_thread} views):")
+        for label, (elapsed, wait, transactions) in (("per request", before), ("batched", after)):
+            print(f"  {label}: {elapsed * 1000:.0f}ms, {transactions} write transactions, "
+                  f"lock wait {wait * 1000:.0f}ms")
+        assert after[1] < before[1]
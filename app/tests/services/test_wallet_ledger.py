@@ -0,0 +1,242 @@
+"""
+Tests for the academy wallet ledger.
+
+This module covers:
+- Balanced journals, running balances and one posting per payment
+- Day, week, month and year rollups feeding statistics in a fixed number of queries
+- Keyset pagination of wallet transactions
+- Wallet reads against a large ledger benchmark (WALLET_BENCH_ENTRIES=10000000 for 10M entries)
+"""
+
+import os
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.base import Base
+from app.models.finance import (
+    AcademyFinance, AcademyRevenueRollup, LedgerAccount, LedgerEntry, RollupPeriod, TransactionType
+)
+from app.models.payment import Invoice, Payment, PaymentGateway, PaymentStatus
+from app.models.student import Student
+from app.models.user import User
+from app.services.wallet_ledger import wallet_ledger
+
+
+ACADEMY_ID = 9301
+
+
+@pytest.fixture(autouse=True)
+def commission_rate(monkeypatch):
+    monkeypatch.setattr(settings, "PLATFORM_COMMISSION_RATE", 0.15)
+
+
+def _create_student(db, student_id=9301):
+    db.add(User(id=student_id, fname="طالب", lname="المحفظة", email=f"wallet{student_id}@example.com", user_type="student"))
+    db.add(Student(id=student_id, user_id=student_id))
+    db.flush()
+    return student_id
+
+
+def _settle(db, amount, confirmed_at=None, student_id=9301, academy_id=ACADEMY_ID):
+    """A paid payment posted to the wallet"""
+    invoice = Invoice(
+        invoice_number=f"INV-{uuid.uuid4().hex[:10]}", student_id=student_id, academy_id=academy_id,
+        subtotal=Decimal(amount), total_amount=Decimal(amount), status=PaymentStatus.PAID,
+        billing_name="طالب", billing_email="wallet@example.com"
+    )
+    db.add(invoice)
+    db.flush()
+    payment = Payment(
+        payment_id=f"PAY-{uuid.uuid4().hex[:10]}", invoice_id=invoice.id, student_id=student_id,
+        academy_id=academy_id, amount=Decimal(amount), payment_method="moyasar",
+        payment_gateway=PaymentGateway.MOYASAR, payment_status=PaymentStatus.PAID,
+        net_amount=Decimal(amount), confirmed_at=confirmed_at or datetime.utcnow()
+    )
+    db.add(payment)
+    db.flush()
+    assert wallet_ledger.record_payment(db, payment)
+    db.commit()
+    return payment
+
+
+class TestWalletLedger:
+    """Test suite for WalletLedgerService"""
+
+    def test_payment_posts_balanced_journal(self, db_session):
+        """Debits equal credits, the wallet keeps a running balance and a payment posts once"""
+        _create_student(db_session)
+        first = _settle(db_session, "200.00")
+        second = _settle(db_session, "100.00")
+        assert not wallet_ledger.record_payment(db_session, first)
+
+        debits, credits = db_session.execute(
+            select(func.sum(LedgerEntry.debit), func.sum(LedgerEntry.credit))
+            .where(LedgerEntry.academy_id == ACADEMY_ID)
+        ).one()
+        assert debits == credits == Decimal("345.00")
+
+        wallet = db_session.execute(
+            select(AcademyFinance).where(AcademyFinance.academy_id == ACADEMY_ID)
+        ).scalar_one()
+        db_session.refresh(wallet)
+        assert (wallet.balance, wallet.total_commission, wallet.payments_count) == (
+            Decimal("255.00"), Decimal("45.00"), 2
+        )
+        db_session.refresh(second)
+        assert (second.platform_fee, second.net_amount) == (Decimal("15.00"), Decimal("85.00"))
+
+        assert wallet_ledger.record_withdrawal(db_session, ACADEMY_ID, "55.00") == Decimal("200.00")
+        with pytest.raises(ValueError, match="الرصيد غير كافٍ"):
+            wallet_ledger.record_withdrawal(db_session, ACADEMY_ID, "200.01")
+
+        wallet_entries = db_session.execute(
+            select(LedgerEntry.balance_after)
+            .where(LedgerEntry.academy_id == ACADEMY_ID, LedgerEntry.account == LedgerAccount.ACADEMY_WALLET)
+            .order_by(LedgerEntry.id)
+        ).scalars().all()
+        assert wallet_entries == [Decimal(v) for v in ("200.00", "170.00", "270.00", "255.00", "200.00")]
+
+    def test_rollups_feed_statistics(self, count_queries, db_session):
+        """Buckets are incremented as payments settle; statistics read them in two queries"""
+        _create_student(db_session)
+        today = date(2026, 3, 18)  # A Wednesday
+        at = lambda day: datetime.combine(day, datetime.min.time()) + timedelta(hours=10)
+        _settle(db_session, "100.00", at(today))
+        _settle(db_session, "300.00", at(today))
+        _settle(db_session, "200.00", at(today - timedelta(days=1)))
+        _settle(db_session, "50.00", at(date(2026, 2, 27)))
+
+        months = db_session.execute(
+            select(AcademyRevenueRollup.period_start, AcademyRevenueRollup.revenue, AcademyRevenueRollup.payments_count)
+            .where(AcademyRevenueRollup.academy_id == ACADEMY_ID, AcademyRevenueRollup.period == RollupPeriod.MONTH)
+            .order_by(AcademyRevenueRollup.period_start)
+        ).all()
+        assert months == [(date(2026, 2, 1), Decimal("50.00"), 1), (date(2026, 3, 1), Decimal("600.00"), 3)]
+
+        with count_queries() as queries:
+            day = wallet_ledger.get_statistics(db_session, ACADEMY_ID, RollupPeriod.DAY, today=today)
+        assert len(queries) == 2
+        assert (day["total_revenue"], day["commission_paid"], day["net_earnings"]) == (400.0, 60.0, 340.0)
+        assert (day["transactions_count"], day["average_transaction"], day["growth_rate"]) == (2, 200.0, 100.0)
+        assert day["chart_data"]["labels"][-2:] == ["2026-03-17", "2026-03-18"]
+        assert day["chart_data"]["revenue"][-2:] == [200.0, 400.0]
+
+        week = wallet_ledger.get_statistics(db_session, ACADEMY_ID, RollupPeriod.WEEK, today=today)
+        assert (week["start_date"], week["total_revenue"]) == ("2026-03-16", 600.0)
+        month = wallet_ledger.get_statistics(db_session, ACADEMY_ID, RollupPeriod.MONTH, today=today)
+        assert (month["total_revenue"], month["growth_rate"], month["commission_rate"]) == (600.0, 1100.0, 15.0)
+        assert wallet_ledger.get_statistics(db_session, ACADEMY_ID, RollupPeriod.YEAR, today=today)["total_revenue"] == 650.0
+
+        wallet = wallet_ledger.get_wallet(db_session, ACADEMY_ID, today=today)
+        assert (wallet["balance"], wallet["total_earned"]) == (552.5, 552.5)
+        assert wallet["statistics"]["today_earnings"] == 340.0
+        assert wallet["statistics"]["week_earnings"] == 510.0
+
+    def test_transactions_keyset_pages(self, db_session):
+        """Pages follow next_cursor without gaps or repeats; filters narrow the page"""
+        _create_student(db_session)
+        payments = [_settle(db_session, f"{10 * (i + 1)}.00") for i in range(5)]
+
+        seen, cursor = [], None
+        while True:
+            page = wallet_ledger.get_transactions(db_session, ACADEMY_ID, limit=3, cursor=cursor)
+            seen.extend(page["data"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert len(seen) == 10
+        assert [entry["id"] for entry in seen] == sorted((entry["id"] for entry in seen), reverse=True)
+        newest = seen[0]
+        assert (newest["type"], newest["direction"], newest["amount"]) == ("commission", "debit", 7.5)
+        assert (newest["balance_before"], newest["balance_after"]) == (135.0, 127.5)
+        assert newest["payment_id"] == payments[-1].id
+
+        commissions = wallet_ledger.get_transactions(db_session, ACADEMY_ID, limit=100, entry_type=TransactionType.COMMISSION)
+        assert [entry["amount"] for entry in commissions["data"]] == [7.5, 6.0, 4.5, 3.0, 1.5]
+
+        completed = wallet_ledger.get_completed_payments(db_session, ACADEMY_ID, limit=4)
+        assert [row["id"] for row in completed["data"]] == [p.payment_id for p in reversed(payments[1:])]
+        assert completed["data"][0]["commission_rate"] == 15.0
+        assert completed["summary"] == {
+            "total_payments": 5, "total_amount": 150.0, "total_commission": 22.5, "total_net": 127.5
+        }
+        rest = wallet_ledger.get_completed_payments(db_session, ACADEMY_ID, limit=4, cursor=completed["next_cursor"])
+        assert [row["id"] for row in rest["data"]] == [payments[0].payment_id] and rest["next_cursor"] is None
+
+    @pytest.mark.slow
+    def test_benchmark_reads_at_ledger_scale(self, tmp_path):
+        """Wallet, statistics and transaction pages against a ledger of WALLET_BENCH_ENTRIES entries"""
+        entries = int(os.environ.get("WALLET_BENCH_ENTRIES", 200_000))
+        academies = 100
+        engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode = OFF")
+            connection.exec_driver_sql("PRAGMA synchronous = OFF")
+            # Four entries per payment journal, spread over three years
+            connection.exec_driver_sql(f"""
+                WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < {entries - 1})
+                INSERT INTO ledger_entries
+                    (journal_id, academy_id, account, entry_type, debit, credit, balance_after, created_at)
+                SELECT
+                    'j' || (n / 4), (n / 4) % {academies} + 1,
+                    CASE n % 4 WHEN 0 THEN 'GATEWAY_CLEARING' WHEN 3 THEN 'PLATFORM_COMMISSION' ELSE 'ACADEMY_WALLET' END,
+                    CASE WHEN n % 4 < 2 THEN 'PAYMENT' ELSE 'COMMISSION' END,
+                    CASE n % 4 WHEN 0 THEN 100 WHEN 2 THEN 15 ELSE 0 END,
+                    CASE n % 4 WHEN 1 THEN 100 WHEN 3 THEN 15 ELSE 0 END,
+                    CASE WHEN n % 4 IN (1, 2) THEN n ELSE NULL END,
+                    datetime('2024-01-01', '+' || (n * 94608000 / {entries}) || ' seconds')
+                FROM seq
+            """)
+        with Session() as db:
+            today = date(2026, 12, 30)
+            for academy_id in range(1, academies + 1):
+                db.add(AcademyFinance(academy_id=academy_id, balance=Decimal("1000.00")))
+            for days_ago in range(3 * 365):
+                wallet_ledger._bump_rollups(
+                    db, 1, today - timedelta(days=days_ago), revenue=Decimal("850.00"),
+                    commission=Decimal("127.50"), payments_count=10
+                )
+            db.commit()
+        print(f"\nLedger seeded with {entries:,} entries in {time.perf_counter() - start:.0f}s")
+
+        def timed(read, runs=50):
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                read()
+                timings.append((time.perf_counter() - started) * 1000)
+            return statistics.median(timings)
+
+        with Session() as db:
+            last_page = wallet_ledger.get_transactions(db, 1, limit=20)
+            results = {
+                "wallet": timed(lambda: wallet_ledger.get_wallet(db, 1, today=today)),
+                "stats (month)": timed(lambda: wallet_ledger.get_statistics(db, 1, RollupPeriod.MONTH, today=today)),
+                "transactions (first page)": timed(lambda: wallet_ledger.get_transactions(db, 1, limit=20)),
+                "transactions (next page)": timed(
+                    lambda: wallet_ledger.get_transactions(db, 1, limit=20, cursor=last_page["next_cursor"])
+                ),
+                "SUM over ledger (old approach)": timed(lambda: db.execute(
+                    select(func.sum(LedgerEntry.credit) - func.sum(LedgerEntry.debit)).where(
+                        LedgerEntry.academy_id == 1, LedgerEntry.account == LedgerAccount.ACADEMY_WALLET
+                    )
+                ).scalar(), runs=3),
+            }
+        engine.dispose()
+
+        for name, median in results.items():
+            print(f"  {name}: {median:.2f}ms")
+        assert len(last_page["data"]) == 20
+        assert max(results["wallet"], results["stats (month)"], results["transactions (next page)"]) < 50